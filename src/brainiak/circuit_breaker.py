@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+from collections import deque
+
+from tornado.httpclient import HTTPError as ClientHTTPError
+from tornado.web import HTTPError
+
+from brainiak import log, settings
+
+
+CLOSED = u"closed"
+OPEN = u"open"
+HALF_OPEN = u"half-open"
+
+# Response codes which mean that the backend itself failed (599 is a curl error, such as a timeout)
+FAILURE_CODE = 500
+
+CIRCUIT_OPEN_MESSAGE = u"Circuit breaker of {0} is open: it failed {1:.0%} of the last {2} requests. Retry in {3:.0f}s."
+CIRCUIT_PROBING_MESSAGE = u"Circuit breaker of {0} is half-open: waiting for the request which probes its recovery."
+BREAKER_USAGE_MESSAGE = u"Circuit breaker %(name)s | %(state)s | Error rate: %(error_rate).2f | " + \
+    u"Max timeout: %(timeout).3fs | Rejected: %(total_rejected)s | Opened: %(total_opened)s"
+
+
+class CircuitOpen(HTTPError):
+    """
+    Raised instead of calling a backend whose circuit breaker is open, so the request fails fast with 503.
+    """
+
+    def __init__(self, message):
+        super(CircuitOpen, self).__init__(503, log_message=message)
+
+
+def is_failure(code):
+    return code is not None and code >= FAILURE_CODE
+
+
+class CircuitBreaker(object):
+    """
+    Guards the calls to a backend endpoint (triplestore, Elasticsearch).
+
+    The outcomes of the last settings.CIRCUIT_BREAKER_WINDOW calls are kept. When at least
+    settings.CIRCUIT_BREAKER_MIN_CALLS of them are known and the rate of failures (5xx responses,
+    timeouts and connection errors) reaches settings.CIRCUIT_BREAKER_ERROR_RATE, the breaker opens:
+    calls fail at once with CircuitOpen (503) for settings.CIRCUIT_BREAKER_OPEN_SECS. Then it is
+    half-open, and a single call is let through to probe the backend: the breaker closes if it
+    succeeds and opens again if it fails.
+
+    timeout(operation) gives the request timeout to be used for an operation of the endpoint (e.g. the
+    template of a SPARQL query, see query_stats), which follows the p99 of the latencies observed for it
+    (see settings.ADAPTIVE_TIMEOUT_*). So a stalled backend is detected in about the time of the slowest
+    healthy responses of each operation, instead of the default timeout of curl, while slow operations
+    keep their own, longer, timeout. The error rate is the one of all the operations of the endpoint.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=settings.CIRCUIT_BREAKER_WINDOW)
+        # operation -> its last latencies
+        self.latencies = {}
+        self.opened_at = None
+        self.probing = False
+        self.total_rejected = 0
+        self.total_opened = 0
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return float(sum(self.outcomes)) / len(self.outcomes)
+
+    def timeout(self, operation=None):
+        latencies = self.latencies.get(operation, ())
+        if len(latencies) < settings.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return settings.ADAPTIVE_TIMEOUT_MAX_SECS
+        latencies = sorted(latencies)
+        p99 = latencies[int(math.ceil(0.99 * len(latencies))) - 1]
+        timeout = p99 * settings.ADAPTIVE_TIMEOUT_FACTOR
+        return min(max(timeout, settings.ADAPTIVE_TIMEOUT_MIN_SECS), settings.ADAPTIVE_TIMEOUT_MAX_SECS)
+
+    def before_call(self):
+        if self.state == OPEN:
+            remaining = self.opened_at + settings.CIRCUIT_BREAKER_OPEN_SECS - time.time()
+            if remaining > 0:
+                self.total_rejected += 1
+                raise CircuitOpen(CIRCUIT_OPEN_MESSAGE.format(
+                    self.name, self.error_rate, len(self.outcomes), remaining))
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probing:
+                self.total_rejected += 1
+                raise CircuitOpen(CIRCUIT_PROBING_MESSAGE.format(self.name))
+            self.probing = True
+
+    def end_probe(self):
+        # the call was not a backend failure, but the probe (if it was one) is over
+        self.probing = False
+
+    def max_timeout(self):
+        return max([self.timeout(operation) for operation in self.latencies] or [settings.ADAPTIVE_TIMEOUT_MAX_SECS])
+
+    def record_latency(self, latency, operation=None):
+        latencies = self.latencies.get(operation)
+        if latencies is None:
+            latencies = self.latencies[operation] = deque(maxlen=settings.ADAPTIVE_TIMEOUT_SAMPLES)
+        latencies.append(latency)
+
+    def record_success(self, latency, operation=None):
+        # latency is None when it is not known (e.g. a transfer aborted by the client)
+        if latency is not None:
+            self.record_latency(latency, operation)
+        self.outcomes.append(False)
+        if self.state == HALF_OPEN:
+            self.probing = False
+            self.state = CLOSED
+            self.outcomes.clear()
+            log.logger.info(u"Circuit breaker of {0} closed".format(self.name))
+
+    def record_failure(self):
+        self.outcomes.append(True)
+        if self.state == HALF_OPEN:
+            self.probing = False
+            self._open()
+        elif self.state == CLOSED and len(self.outcomes) >= settings.CIRCUIT_BREAKER_MIN_CALLS and \
+                self.error_rate >= settings.CIRCUIT_BREAKER_ERROR_RATE:
+            self._open()
+
+    def record_outcome(self, code, latency, timeout, operation=None):
+        """
+        Record the outcome of a call which got a response with code after latency seconds.
+        A failure which took the whole timeout is recorded at it, so the timeout of operation can only grow then.
+        """
+        if is_failure(code):
+            if latency >= timeout:
+                self.record_latency(timeout, operation)
+            self.record_failure()
+        else:
+            self.record_success(latency, operation)
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.total_opened += 1
+        log.logger.error(u"Circuit breaker of {0} opened: error rate {1:.2f} in the last {2} requests".format(
+            self.name, self.error_rate, len(self.outcomes)))
+
+    def call(self, function, args=(), operation=None):
+        """
+        Call function with args (it fetches from the backend, with the timeout of operation),
+        unless the breaker is open, and record its outcome (see record_outcome).
+        """
+        self.before_call()
+        timeout = self.timeout(operation)
+        time_i = time.time()
+        try:
+            result = function(*args)
+        except ClientHTTPError as e:
+            self.record_outcome(e.code, time.time() - time_i, timeout, operation)
+            raise
+        except Exception:
+            self.end_probe()
+            raise
+        self.record_success(time.time() - time_i, operation)
+        return result
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "error_rate": self.error_rate,
+            "timeout": self.max_timeout(),
+            "total_rejected": self.total_rejected,
+            "total_opened": self.total_opened
+        }
+
+
+breakers = {}
+
+
+def get_breaker(name):
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def get_usage_message():
+    return u"<br>".join(BREAKER_USAGE_MESSAGE % breaker.stats() for (name, breaker) in sorted(breakers.items()))
+
+
+def status_message():
+    """
+    Describe the breakers which are not closed, or return an empty string if all of them are.
+    """
+    return u"<br>".join(BREAKER_USAGE_MESSAGE % breaker.stats()
+                        for (name, breaker) in sorted(breakers.items()) if breaker.state != CLOSED)
@@ -220,13 +220,14 @@ class Query(object):
 
 def query_filter_instances(query_params):
     query = Query(query_params).to_string()
-    query_response = triplestore.query_sparql(query, query_params.triplestore_config)
+    query_response = triplestore.query_sparql(query, query_params.triplestore_config, query_name="Query.skeleton")
     return query_response
 
 
 def query_count_filter_instances(query_params):
     query = Query(query_params).to_string(count=True)
-    query_response = triplestore.query_sparql(query, query_params.triplestore_config)
+    query_response = triplestore.query_sparql(query, query_params.triplestore_config,
+                                              query_name="Query.skeleton_count")
     return query_response
 
 
@@ -274,7 +275,16 @@ def add_prefix(items_list, class_prefix):
 
 
 def filter_instances(query_params):
-    if not class_exists(query_params):
+    queries = [
+        {"query": build_class_exists_query(query_params), "query_name": "QUERY_CLASS_EXISTS",
+         "cache_tags": [query_params["graph_uri"]]},
+        {"query": Query(query_params).to_string(), "query_name": "Query.skeleton"}
+    ]
+    if query_params.get("do_item_count", None) == "1":
+        queries.append({"query": Query(query_params).to_string(count=True), "query_name": "Query.skeleton_count"})
+    results = triplestore.query_sparql_many(queries, query_params.triplestore_config, raise_errors=True)
+
+    if not is_result_true(results[0]):
         error_message = u"Class {0} in graph {1} does not exist".format(
             query_params["class_uri"], query_params["graph_uri"])
         raise HTTPError(404, log_message=error_message)
@@ -287,7 +297,7 @@ def filter_instances(query_params):
     for p, o, index in extract_po_tuples(query_params):
         keymap[o[1:]] = shorten_uri(p)
 
-    result_dict = query_filter_instances(query_params)
+    result_dict = results[1]
     if not result_dict or not result_dict['results']['bindings']:
         return None
 
@@ -295,7 +305,8 @@ def filter_instances(query_params):
     items_list = merge_by_id(items_list)
     add_prefix(items_list, query_params['class_prefix'])
     decorate_with_resource_id(items_list)
-    return build_json(items_list, query_params)
+    count_result_dict = results[2] if len(results) > 2 else None
+    return build_json(items_list, query_params, count_result_dict)
 
 
 def cast_item(item, property_to_type):
@@ -366,7 +377,7 @@ def cast_items_values(items_list, class_properties):
     return new_list
 
 
-def build_json(items_list, query_params):
+def build_json(items_list, query_params, count_result_dict=None):
     class_url = build_class_url(query_params)
     schema_url = unquote(build_schema_url_for_instance(query_params, class_url))
 
@@ -384,7 +395,9 @@ def build_json(items_list, query_params):
     }
 
     def calculate_total_items():
-        result_dict = query_count_filter_instances(query_params)
+        result_dict = count_result_dict
+        if result_dict is None:
+            result_dict = query_count_filter_instances(query_params)
         total_items = int(get_one_value(result_dict, 'total'))
         return total_items
 
@@ -400,7 +413,12 @@ ASK {
 """
 
 
+def build_class_exists_query(query_params):
+    return QUERY_CLASS_EXISTS % query_params
+
+
 def class_exists(query_params):
-    query = QUERY_CLASS_EXISTS % query_params
-    query_result = triplestore.query_sparql(query, query_params.triplestore_config)
+    query = build_class_exists_query(query_params)
+    query_result = triplestore.query_sparql(query, query_params.triplestore_config,
+                                            cache_tags=[query_params["graph_uri"]], query_name="QUERY_CLASS_EXISTS")
     return is_result_true(query_result)
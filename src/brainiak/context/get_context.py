@@ -11,10 +11,18 @@ from brainiak.prefixes import MemorizeContext
 def list_classes(query_params):
     params = dict(**query_params)
     (params, language_tag) = add_language_support(query_params, "label")
-    if not graph_exists(params):
+    queries = [
+        {"query": build_graph_exists_query(params), "query_name": "QUERY_GRAPH_EXISTS", "cache_tags": [params["graph_uri"]]},
+        {"query": build_classes_list_query(params), "query_name": "QUERY_ALL_CLASSES_OF_A_GRAPH"}
+    ]
+    if params.get("do_item_count", None) == "1":
+        queries.append({"query": build_count_classes_query(params), "query_name": "QUERY_COUNT_ALL_CLASSES_OF_A_GRAPH"})
+    results = triplestore.query_sparql_many(queries, params.triplestore_config, raise_errors=True)
+
+    if not is_result_true(results[0]):
         raise HTTPError(404, log_message=u"Graph {0} does not exist".format(query_params["graph_uri"]))
 
-    query_result_dict = query_classes_list(params)
+    query_result_dict = results[1]
     if not query_result_dict or not query_result_dict['results']['bindings']:
         json = {
             "items": [],
@@ -22,10 +30,11 @@ def list_classes(query_params):
                 params["graph_uri"], int(params["page"]) + 1)
         }
         return json
-    return assemble_list_json(params, query_result_dict)
+    count_query_result_dict = results[2] if len(results) > 2 else None
+    return assemble_list_json(params, query_result_dict, count_query_result_dict)
 
 
-def assemble_list_json(query_params, query_result_dict):
+def assemble_list_json(query_params, query_result_dict, count_query_result_dict=None):
     context = MemorizeContext()
     expand_uri = bool(int(query_params.get('expand_uri', '0')))
     items_list = compress_keys_and_values(
@@ -48,8 +57,10 @@ def assemble_list_json(query_params, query_result_dict):
     }
 
     def calculate_total_items():
-        count_query_result_dict = query_count_classes(query_params)
-        total_items = int(get_one_value(count_query_result_dict, "total_items"))
+        result_dict = count_query_result_dict
+        if result_dict is None:
+            result_dict = query_count_classes(query_params)
+        total_items = int(get_one_value(result_dict, "total_items"))
         return total_items
     decorate_dict_with_pagination(json_dict, query_params, calculate_total_items)
 
@@ -66,9 +77,14 @@ FROM <%(graph_uri)s>
 """
 
 
+def build_count_classes_query(query_params):
+    return QUERY_COUNT_ALL_CLASSES_OF_A_GRAPH % query_params
+
+
 def query_count_classes(query_params):
-    query = QUERY_COUNT_ALL_CLASSES_OF_A_GRAPH % query_params
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    query = build_count_classes_query(query_params)
+    return triplestore.query_sparql(query, query_params.triplestore_config,
+                                    query_name="QUERY_COUNT_ALL_CLASSES_OF_A_GRAPH")
 
 
 QUERY_ALL_CLASSES_OF_A_GRAPH = u"""
@@ -84,12 +100,14 @@ OFFSET %(offset)s
 """
 
 
+def build_classes_list_query(query_params):
+    template_params = dict(query_params, offset=calculate_offset(query_params))
+    return QUERY_ALL_CLASSES_OF_A_GRAPH % template_params
+
+
 def query_classes_list(query_params):
-    offset = calculate_offset(query_params)
-    query_params['offset'] = offset
-    query = QUERY_ALL_CLASSES_OF_A_GRAPH % query_params
-    del query_params['offset']
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    query = build_classes_list_query(query_params)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_ALL_CLASSES_OF_A_GRAPH")
 
 
 QUERY_GRAPH_EXISTS = u"""
@@ -99,7 +117,12 @@ ASK {
 """
 
 
+def build_graph_exists_query(query_params):
+    return QUERY_GRAPH_EXISTS % query_params
+
+
 def graph_exists(query_params):
-    query = QUERY_GRAPH_EXISTS % query_params
-    query_result = triplestore.query_sparql(query, query_params.triplestore_config)
+    query = build_graph_exists_query(query_params)
+    query_result = triplestore.query_sparql(query, query_params.triplestore_config,
+                                            cache_tags=[query_params["graph_uri"]], query_name="QUERY_GRAPH_EXISTS")
     return is_result_true(query_result)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Redis connections whose I/O runs on the IOLoop, in the style of greenlet_tornado.greenlet_fetch:
+a greenlet which sends a command is switched out until the reply arrives, so the IOLoop keeps
+serving other requests meanwhile, instead of being blocked for the network round-trip.
+
+They are used through redis.StrictRedis (see GreenletConnectionPool), so every command, pipelines
+included, behaves as in redis-py. Outside greenlets (at startup, in scripts, in other threads)
+the connections are plain blocking ones.
+"""
+import socket
+import time
+from collections import deque
+
+import greenlet
+import redis
+from redis.connection import Connection, ConnectionPool, PythonParser
+from redis.exceptions import AuthenticationError, ConnectionError, ResponseError
+from tornado.iostream import IOStream, StreamClosedError
+
+from brainiak.greenlet_tornado import greenlet_get_ioloop
+
+
+CRLF = "\r\n"
+
+
+def in_greenlet():
+    return greenlet.getcurrent().parent is not None
+
+
+class GreenletConnection(Connection):
+    """
+    Connection which, when used from a greenlet, connects, writes and reads through a tornado IOStream.
+    Each command (and each pipeline) must be answered within command_timeout seconds, and
+    connecting must take less than connect_timeout seconds, otherwise ConnectionError is raised
+    and the connection is closed (the pool opens a new one, lazily, for the next command).
+    """
+
+    def __init__(self, command_timeout=None, connect_timeout=None, **kwargs):
+        super(GreenletConnection, self).__init__(**kwargs)
+        self.command_timeout = command_timeout
+        self.connect_timeout = connect_timeout
+        self._stream = None
+        self._deadline = None
+        self._resume = None
+        self._error_parser = PythonParser()
+
+    def connect(self):
+        use_stream = in_greenlet()
+        if self._sock is not None or self._stream is not None:
+            if (self._stream is not None) == use_stream:
+                return
+            # connected in the other mode, e.g. at startup
+            self.disconnect()
+        if not use_stream:
+            return super(GreenletConnection, self).connect()
+
+        stream = self._stream = IOStream(socket.socket(socket.AF_INET, socket.SOCK_STREAM),
+                                         io_loop=greenlet_get_ioloop())
+        stream.set_close_callback(self._on_close)
+        try:
+            self._wait(lambda callback: stream.connect((self.host, self.port), callback),
+                       self.connect_timeout)
+        except ConnectionError as e:
+            self.disconnect()
+            raise ConnectionError(u"Error connecting to {0}:{1}. {2}".format(self.host, self.port, e))
+        self._on_stream_connect()
+
+    def _on_stream_connect(self):
+        if self.password:
+            self.send_command("AUTH", self.password)
+            if self.read_response() != "OK":
+                raise AuthenticationError("Invalid Password")
+        if self.db:
+            self.send_command("SELECT", self.db)
+            if self.read_response() != "OK":
+                raise ConnectionError("Invalid Database")
+
+    def disconnect(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.set_close_callback(None)
+            stream.close()
+        super(GreenletConnection, self).disconnect()
+
+    def send_packed_command(self, command):
+        self.connect()
+        if self._stream is None:
+            return super(GreenletConnection, self).send_packed_command(command)
+        self._deadline = time.time() + self.command_timeout if self.command_timeout else None
+        try:
+            self._stream.write(command)
+        except StreamClosedError:
+            self.disconnect()
+            raise ConnectionError("Error while writing to socket. Connection closed.")
+
+    def read_response(self):
+        if self._stream is None:
+            return super(GreenletConnection, self).read_response()
+        try:
+            response = self._read_reply()
+        except Exception:
+            self.disconnect()
+            raise
+        if isinstance(response, ResponseError):
+            raise response
+        return response
+
+    def _read_reply(self):
+        line = self._read(lambda callback: self._stream.read_until(CRLF, callback))
+        (byte, response) = (line[0], line[1:-2])
+        if byte == "-":
+            error = self._error_parser.parse_error(response)
+            if isinstance(error, ConnectionError):
+                raise error
+            return error
+        elif byte == "+":
+            return response
+        elif byte == ":":
+            return long(response)
+        elif byte == "$":
+            length = int(response)
+            if length == -1:
+                return None
+            return self._read(lambda callback: self._stream.read_bytes(length + 2, callback))[:-2]
+        elif byte == "*":
+            length = int(response)
+            if length == -1:
+                return None
+            return [self._read_reply() for i in xrange(length)]
+        raise redis.exceptions.InvalidResponse("Protocol Error")
+
+    def _read(self, start):
+        timeout = None
+        if self._deadline is not None:
+            timeout = max(self._deadline - time.time(), 0)
+        return self._wait(start, timeout)
+
+    def _wait(self, start, timeout):
+        """
+        Call start(callback), which starts an operation of the stream, and switch out the current
+        greenlet until callback is called, the stream is closed or timeout (in seconds) elapses.
+        """
+        gr = greenlet.getcurrent()
+        io_loop = greenlet_get_ioloop()
+        outcome = {}
+
+        def resume(value=None, error=None):
+            if outcome:
+                return
+            outcome.update(value=value, error=error)
+            self._resume = None
+            if timeout_handle is not None:
+                io_loop.remove_timeout(timeout_handle)
+            if greenlet.getcurrent() is not gr:
+                gr.switch()
+
+        timeout_handle = None
+        if timeout is not None:
+            timeout_handle = io_loop.add_timeout(
+                time.time() + timeout,
+                lambda: resume(error=ConnectionError(u"Timeout of {0:.3f}s reading from Redis".format(timeout))))
+        self._resume = resume
+        try:
+            start(lambda value=None: resume(value))
+        except StreamClosedError:
+            resume(error=ConnectionError("Connection closed"))
+
+        if not outcome:
+            gr.parent.switch()
+        if outcome["error"] is not None:
+            raise outcome["error"]
+        return outcome["value"]
+
+    def _on_close(self):
+        if self._resume is not None:
+            self._resume(error=ConnectionError("Connection closed by server"))
+
+
+class PoolTimeoutError(ConnectionError):
+    """
+    Raised when no connection of the pool is released within its wait_timeout.
+    """
+
+
+class GreenletConnectionPool(ConnectionPool):
+    """
+    Pool of GreenletConnection. When all of its max_connections are in use, greenlets wait
+    (switched out, in arrival order) until a connection is released, instead of failing.
+    A greenlet which waits for more than wait_timeout seconds gets PoolTimeoutError.
+    """
+
+    def __init__(self, connection_class=GreenletConnection, max_connections=None, wait_timeout=None, **connection_kwargs):
+        super(GreenletConnectionPool, self).__init__(connection_class, max_connections, **connection_kwargs)
+        self.wait_timeout = wait_timeout
+        self.waiting = deque()
+
+    def get_connection(self, command_name, *keys, **options):
+        self._checkpid()
+        deadline = time.time() + self.wait_timeout if self.wait_timeout is not None else None
+        while not self._available_connections and \
+                self._created_connections >= self.max_connections and in_greenlet():
+            self._wait_for_release(deadline)
+        return super(GreenletConnectionPool, self).get_connection(command_name, *keys, **options)
+
+    def _wait_for_release(self, deadline):
+        gr = greenlet.getcurrent()
+        io_loop = greenlet_get_ioloop()
+
+        def on_timeout():
+            # unless release() already handed it a connection
+            if gr in self.waiting:
+                self.waiting.remove(gr)
+                gr.switch(True)
+
+        timeout_handle = io_loop.add_timeout(deadline, on_timeout) if deadline is not None else None
+        self.waiting.append(gr)
+        timed_out = gr.parent.switch()
+        if timeout_handle is not None:
+            io_loop.remove_timeout(timeout_handle)
+        if timed_out:
+            raise PoolTimeoutError(u"Timeout of {0:.3f}s waiting for a free Redis connection".format(self.wait_timeout))
+
+    def release(self, connection):
+        super(GreenletConnectionPool, self).release(connection)
+        if self.waiting:
+            greenlet_get_ioloop().add_callback(self.waiting.popleft().switch)
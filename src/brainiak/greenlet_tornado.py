@@ -33,6 +33,8 @@ This allows you to write code as if it were synchronous, and not worry about cal
 You also don't have to use any special patterns, such as writing everything as a generator.
 """
 
+import time
+
 import greenlet
 import tornado.httpclient
 from tornado.ioloop import IOLoop
@@ -56,7 +58,19 @@ def greenlet_set_ioloop(io_loop=None):
         _io_loop = io_loop
 
 
-def greenlet_fetch(request, **kwargs):
+def greenlet_get_ioloop():
+    return _io_loop or IOLoop.current()
+
+
+def is_ioloop_running():
+    """
+    True when called from inside a running IOLoop (e.g. from a RequestHandler), where
+    any blocking call freezes every request being served by the process.
+    """
+    return getattr(IOLoop._current, "instance", None) is not None
+
+
+def greenlet_fetch(request, http_client=None, **kwargs):
     """
     Uses the tornado AsyncHTTPClient to execute a request, but blocks until the request
     is complete, yet still allows the tornado IOLoop to do other things in the meantime.
@@ -67,6 +81,9 @@ def greenlet_fetch(request, **kwargs):
     The request arg may be either a string URL or an HTTPRequest object.
     If it is a string, any additional kwargs will be passed directly to AsyncHTTPClient.fetch().
 
+    By default the process-wide AsyncHTTPClient of the IOLoop is used. A dedicated client
+    (e.g. one created with force_instance=True and its own max_clients) may be given in http_client.
+
     Returns an HTTPResponse object, or raises a tornado.httpclient.HTTPError exception
     on error (such as a timeout).
     """
@@ -75,7 +92,8 @@ def greenlet_fetch(request, **kwargs):
 
     def callback(response):
         gr.switch(response)
-    http_client = tornado.httpclient.AsyncHTTPClient(io_loop=_io_loop)
+    if http_client is None:
+        http_client = tornado.httpclient.AsyncHTTPClient(io_loop=_io_loop)
     http_client.fetch(request, callback, **kwargs)
 
     # Now, yield control back to the master greenlet, and wait for data to be sent to us.
@@ -86,6 +104,78 @@ def greenlet_fetch(request, **kwargs):
     return response
 
 
+def greenlet_gather(functions):
+    """
+    Runs each of the given functions (which take no arguments) in its own greenlet, so the
+    asynchronous calls they make (e.g. greenlet_fetch) are in flight at the same time, and
+    blocks the calling greenlet until all of them are done.
+
+    Returns a list with the return value of each function, in the same order of functions.
+    Errors are isolated per function: if one of them raises an exception, the exception
+    instance takes the place of its return value and the others are not interrupted.
+
+    When it is not called from a greenlet wrapped by greenlet_asynchronous (or
+    greenlet_test), the functions are simply run one after another.
+    """
+    gr = greenlet.getcurrent()
+    if gr.parent is None or len(functions) < 2:
+        return [_call_isolated(function) for function in functions]
+
+    io_loop = greenlet_get_ioloop()
+    results = [None] * len(functions)
+    pending = [len(functions)]
+
+    def make_child(index, function):
+        def child():
+            results[index] = _call_isolated(function)
+            pending[0] -= 1
+            if not pending[0]:
+                io_loop.add_callback(gr.switch)
+        return greenlet.greenlet(child, parent=gr.parent)
+
+    for index, function in enumerate(functions):
+        io_loop.add_callback(make_child(index, function).switch)
+
+    # Yield control back to the master greenlet, until the last child wakes us up
+    gr.parent.switch()
+    return results
+
+
+def greenlet_spawn(function):
+    """
+    Runs function (which takes no arguments) in a new greenlet, started by the IOLoop in its next
+    iteration, and returns at once: the calling greenlet (e.g. a request) does not wait for it.
+    Its asynchronous calls (e.g. greenlet_fetch) behave as in a method wrapped by greenlet_asynchronous.
+    The return value of function is discarded, so it should handle its own errors.
+    """
+    root = greenlet.getcurrent()
+    while root.parent is not None:
+        root = root.parent
+    child = greenlet.greenlet(function, parent=root)
+    greenlet_get_ioloop().add_callback(child.switch)
+    return child
+
+
+def greenlet_sleep(seconds):
+    """
+    Pauses the calling greenlet for the given seconds, while the IOLoop does other things in the meantime.
+    When it is not called from a greenlet, it simply blocks, as time.sleep.
+    """
+    gr = greenlet.getcurrent()
+    if gr.parent is None:
+        time.sleep(seconds)
+        return
+    greenlet_get_ioloop().add_timeout(time.time() + seconds, gr.switch)
+    gr.parent.switch()
+
+
+def _call_isolated(function):
+    try:
+        return function()
+    except Exception as e:
+        return e
+
+
 def greenlet_asynchronous(wrapped_method):
     """
     Decorator that allows you to make async calls as if they were synchronous, by pausing the callstack and resuming it later.
@@ -14,7 +14,7 @@ from tornado_cors import CorsMixin, custom_decorator
 # must be imported before other modules
 from brainiak.log import get_logger
 
-from brainiak import __version__, event_bus, triplestore, settings
+from brainiak import __version__, circuit_breaker, event_bus, triplestore, settings
 from brainiak.collection.get_collection import filter_instances
 from brainiak.collection.json_schema import schema as collection_schema
 from brainiak.context.get_context import list_classes
@@ -24,13 +24,14 @@ from brainiak.greenlet_tornado import greenlet_asynchronous
 from brainiak.instance.create_instance import create_instance
 from brainiak.instance.delete_instance import delete_instance
 from brainiak.instance.edit_instance import edit_instance, instance_exists
-from brainiak.instance.get_instance import get_instance
+from brainiak.instance.get_instance import get_instance, get_cached_instance
 from brainiak.instance.patch_instance import apply_patch
 from brainiak.prefixes import normalize_all_uris_recursively, list_prefixes, SHORTEN, EXPAND
 from brainiak.root.get_root import list_all_contexts
 from brainiak.root.json_schema import schema as root_schema
-from brainiak.schema import get_class as schema_resource
+from brainiak.schema import get_class as schema_resource, ontology_model
 from brainiak.schema.get_class import SchemaNotFound
+from brainiak.schema.json_schema import SCHEMAS_PARAM_SCHEMA
 from brainiak.search.search import do_search
 from brainiak.suggest.json_schema import schema as suggest_schema
 from brainiak.search.json_schema import schema as search_schema
@@ -40,8 +41,8 @@ from brainiak.stored_query.execution import execute_query
 from brainiak.stored_query.json_schema import query_crud_schema
 from brainiak.suggest.json_schema import SUGGEST_PARAM_SCHEMA
 from brainiak.suggest.suggest import do_suggest
-from brainiak.utils import cache
-from brainiak.utils.cache import memoize, build_instance_key
+from brainiak.utils import cache, query_stats
+from brainiak.utils.cache import memoize
 from brainiak.utils.i18n import _
 from brainiak.utils.json import validate_json_schema, get_json_request_as_dict
 from brainiak.utils.links import build_schema_url_for_instance, content_type_profile, build_schema_url, build_class_url
@@ -165,6 +166,30 @@ class BrainiakRequestHandler(CorsMixin, RequestHandler):
         cache_msg = u"{0} from {1}".format(cache_verb, self.request.host)
         self.set_header("X-Cache", cache_msg)
         self.set_header("Last-Modified", meta['last_modified'])
+        if 'etag' in meta:
+            self.set_header("Etag", cache.build_response_etag(meta, self.query_params))
+
+    def finalize_not_modified(self, response):
+        """
+        Respond 304 if response (given by memoize with conditional=True) was not modified since
+        the client got it, i.e. the ETag of its view (see add_cache_headers) matched If-None-Match.
+        Otherwise return False, and the response must be finalized as usual.
+        """
+        if response.get('not_modified'):
+            self.set_status(304)
+            return True
+        return False
+
+    def purge_collections(self):
+        """
+        Delete the cached listings which may include instances of the class of the request:
+        the ones of the class and, as instances are listed by inference, of its superclasses.
+        The superclasses come from the ontology model or from the cache, as for the schema of the class.
+        """
+        if settings.ENABLE_CACHE:
+            class_uris = set(schema_resource.query_superclasses(self.query_params))
+            class_uris.add(self.query_params["class_uri"])
+            cache.purge_collections(class_uris)
 
     def _notify_bus(self, **kwargs):
         if kwargs.get("instance_data"):
@@ -217,6 +242,7 @@ class RootJsonSchemaHandler(BrainiakRequestHandler):
     def get_cache_path(self):
         return cache.build_key_for_root_schema()
 
+    @greenlet_asynchronous
     def get(self):
         with safe_params():
             self.query_params = ParamDict(self)
@@ -224,13 +250,15 @@ class RootJsonSchemaHandler(BrainiakRequestHandler):
         response = memoize(
             self.query_params,
             root_schema,
-            key=self.get_cache_path()
+            key=self.get_cache_path(),
+            conditional=True
         )
         if response is None:
             raise HTTPError(404, log_message=_("Failed to retrieve json-schema"))
 
         self.add_cache_headers(response['meta'])
-        self.finalize(response['body'])
+        if not self.finalize_not_modified(response):
+            self.finalize(response['body'])
 
 
 class RootHandler(BrainiakRequestHandler):
@@ -256,12 +284,15 @@ class RootHandler(BrainiakRequestHandler):
         response = memoize(self.query_params,
                            list_all_contexts,
                            function_arguments=self.query_params,
-                           key=cache.build_key_for_root(self.query_params))
+                           key=cache.build_key_for_root(self.query_params),
+                           tags=[cache.ROOT_TAG],
+                           conditional=True)
         if response is None:
             raise HTTPError(404, log_message=_("Failed to retrieve list of graphs"))
 
         self.add_cache_headers(response['meta'])
-        self.finalize(response['body'])
+        if not self.finalize_not_modified(response):
+            self.finalize(response['body'])
 
     def finalize(self, response):
         if isinstance(response, dict):
@@ -306,11 +337,16 @@ class ClassHandler(BrainiakRequestHandler):
 
     @greenlet_asynchronous
     def purge(self, context_name, class_name):
+        with safe_params():
+            self.query_params = ParamDict(self,
+                                          context_name=context_name,
+                                          class_name=class_name)
         if settings.ENABLE_CACHE:
-            with safe_params():
-                self.query_params = ParamDict(self,
-                                              context_name=context_name,
-                                              class_name=class_name)
+            # the class was probably edited, so its graph is reloaded (by every process) before its schema is purged
+            ontology_model.reload_graphs([self.query_params["graph_uri"]])
+            # as well as the cached ontology queries of the class (e.g. QUERY_SUPERCLASS) and of its graph
+            cache.purge_class_queries(self.query_params["class_uri"])
+            cache.purge_graph_queries(self.query_params["graph_uri"])
             path = cache.build_key_for_class(self.query_params)
             cache.purge_by_path(path, False)
         else:
@@ -324,20 +360,48 @@ class ClassHandler(BrainiakRequestHandler):
             self.query_params = ParamDict(self,
                                           context_name=context_name,
                                           class_name=class_name)
+        cache.record_schema_request(context_name, class_name)
         del context_name
         del class_name
 
         try:
-            response = schema_resource.get_cached_schema(self.query_params, include_meta=True)
+            response = schema_resource.get_cached_schema(self.query_params, include_meta=True, conditional=True)
         except schema_resource.SchemaNotFound, e:
             raise HTTPError(404, log_message=e.message)
 
+        self.add_cache_headers(response['meta'])
+        if self.finalize_not_modified(response):
+            return
         if self.query_params['expand_uri'] == "0":
             response = normalize_all_uris_recursively(response, mode=SHORTEN)
-        self.add_cache_headers(response['meta'])
         self.finalize(response['body'])
 
 
+class SchemasHandler(BrainiakRequestHandler):
+
+    @greenlet_asynchronous
+    def post(self):
+        with safe_params():
+            body_params = get_json_request_as_dict(self.request.body)
+            validate_json_schema(body_params, SCHEMAS_PARAM_SCHEMA)
+            self.query_params = ParamDict(self, context_name="_", class_name="_")
+
+        params_list = [schema_resource.build_class_params(self.query_params, item["class_uri"], item.get("graph_uri"))
+                       for item in body_params["classes"]]
+        for class_params in params_list:
+            cache.record_schema_request(class_params["context_name"], class_params["class_name"])
+
+        schemas = schema_resource.get_cached_schemas(params_list)
+        response = {
+            "items": [schema for schema in schemas if schema is not None],
+            "not_found": [{"class_uri": class_params["class_uri"], "graph_uri": class_params["graph_uri"]}
+                          for (class_params, schema) in zip(params_list, schemas) if schema is None]
+        }
+        if self.query_params['expand_uri'] == "0":
+            response = normalize_all_uris_recursively(response, mode=SHORTEN)
+        self.finalize(response)
+
+
 class CollectionJsonSchemaHandler(BrainiakRequestHandler):
 
     @greenlet_asynchronous
@@ -362,10 +426,20 @@ class CollectionHandler(BrainiakRequestHandler):
         del context_name
         del class_name
 
-        response = filter_instances(self.query_params)
-
-        if self.query_params['expand_uri'] == "0":
-            response = normalize_all_uris_recursively(response, mode=SHORTEN)
+        response = memoize(self.query_params,
+                           filter_instances,
+                           function_arguments=self.query_params,
+                           key=cache.build_key_for_collection(self.query_params),
+                           tags=cache.build_collection_tags(self.query_params),
+                           conditional=True)
+
+        if response is not None:
+            self.add_cache_headers(response['meta'])
+            if self.finalize_not_modified(response):
+                return
+            response = response['body']
+            if self.query_params['expand_uri'] == "0":
+                response = normalize_all_uris_recursively(response, mode=SHORTEN)
 
         self.finalize(response)
 
@@ -405,6 +479,7 @@ class CollectionHandler(BrainiakRequestHandler):
 
         self.set_header("location", instance_url)
         self.set_header("X-Brainiak-Resource-URI", instance_uri)
+        self.purge_collections()
 
         self.query_params["instance_uri"] = instance_uri
         self.query_params["instance_id"] = instance_id
@@ -464,8 +539,7 @@ class InstanceHandler(BrainiakRequestHandler):
                                               class_name=class_name,
                                               instance_id=instance_id,
                                               **optional_params)
-            path = build_instance_key(self.query_params)
-            cache.purge_by_path(path, False)
+            cache.purge_an_instance(self.query_params["instance_uri"])
         else:
             raise HTTPError(405, log_message=_("Cache is disabled (Brainaik's settings.ENABLE_CACHE is set to False)"))
 
@@ -479,10 +553,7 @@ class InstanceHandler(BrainiakRequestHandler):
                                           instance_id=instance_id,
                                           **optional_params)
 
-        response = memoize(self.query_params,
-                           get_instance,
-                           key=build_instance_key(self.query_params),
-                           function_arguments=self.query_params)
+        response = get_cached_instance(self.query_params, conditional=True)
 
         if response is None:
             error_message = u"Instance ({0}) of class ({1}) in graph ({2}) was not found.".format(
@@ -491,13 +562,14 @@ class InstanceHandler(BrainiakRequestHandler):
                 self.query_params['graph_uri'])
             raise HTTPError(404, log_message=error_message)
 
-        response_meta = response['meta']
+        self.add_cache_headers(response['meta'])
+        if self.finalize_not_modified(response):
+            return
         response = response['body']
 
         if self.query_params["expand_uri"] == "0":
             response = normalize_all_uris_recursively(response, mode=SHORTEN)
 
-        self.add_cache_headers(response_meta)
         self.finalize(response)
 
     @greenlet_asynchronous
@@ -519,10 +591,7 @@ class InstanceHandler(BrainiakRequestHandler):
             raise HTTPError(400, log_message=_("No JSON object could be decoded"))
 
         # Retrieve original data
-        instance_data = memoize(self.query_params,
-                           get_instance,
-                           key=build_instance_key(self.query_params),
-                           function_arguments=self.query_params)
+        instance_data = get_cached_instance(self.query_params)
         try:
             instance_data = instance_data['body']
         except TypeError:
@@ -539,6 +608,7 @@ class InstanceHandler(BrainiakRequestHandler):
 
         # Clear cache
         cache.purge_an_instance(self.query_params['instance_uri'])
+        self.purge_collections()
 
         self.finalize(status)
 
@@ -598,6 +668,7 @@ class InstanceHandler(BrainiakRequestHandler):
             raise HTTPError(404, log_message=unicode(ex))
 
         cache.purge_an_instance(self.query_params['instance_uri'])
+        self.purge_collections()
 
         self.query_params["expand_object_properties"] = "1"
         instance_data = get_instance(self.query_params)
@@ -627,6 +698,7 @@ class InstanceHandler(BrainiakRequestHandler):
             if settings.NOTIFY_BUS:
                 self._notify_bus(action="DELETE")
             cache.purge_an_instance(self.query_params['instance_uri'])
+            self.purge_collections()
         else:
             msg = _(u"Instance ({0}) of class ({1}) in graph ({2}) was not found.")
             error_message = msg.format(self.query_params["instance_uri"],
@@ -744,12 +816,19 @@ class VersionHandler(BrainiakRequestHandler):
 
 class VirtuosoStatusHandler(BrainiakRequestHandler):
 
+    @greenlet_asynchronous
     def get(self):
-        self.write(triplestore.status())
+        response = triplestore.status()
+        response += u"<br><br>Usage<br>" + triplestore.get_usage_message()
+        breakers_usage = circuit_breaker.get_usage_message()
+        if breakers_usage:
+            response += u"<br>" + breakers_usage
+        self.write(response)
 
 
 class CacheStatusHandler(BrainiakRequestHandler):
 
+    @greenlet_asynchronous
     def get(self):
         response = cache.status_message()
         cache_keys = cache.keys("")
@@ -762,6 +841,18 @@ class CacheStatusHandler(BrainiakRequestHandler):
         self.write(response)
 
 
+class QueryStatsHandler(BrainiakRequestHandler):
+
+    def get(self):
+        self.write({"queries": query_stats.get_stats()})
+
+
+class OntologyStatusHandler(BrainiakRequestHandler):
+
+    def get(self):
+        self.write(ontology_model.status())
+
+
 class EventBusStatusHandler(BrainiakRequestHandler):
 
     def get(self):
@@ -770,6 +861,7 @@ class EventBusStatusHandler(BrainiakRequestHandler):
 
 class StatusHandler(BrainiakRequestHandler):
 
+    @greenlet_asynchronous
     def get(self):
         triplestore_status = triplestore.status()
         event_bus_status = event_bus.status()
@@ -778,6 +870,9 @@ class StatusHandler(BrainiakRequestHandler):
             output.append(triplestore_status)
         if "FAILED" in event_bus_status:
             output.append(event_bus_status)
+        breakers_status = circuit_breaker.status_message()
+        if breakers_status:
+            output.append(breakers_status)
         if output:
             response = "\n".join(output)
         else:
@@ -10,7 +10,7 @@ SELECT DISTINCT ?class_uri ?graph_uri {
 
 def get_class_and_graph(query_params):
     query = QUERY_GET_CLASS_AND_GRAPH % query_params
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_GET_CLASS_AND_GRAPH")
 
 
 def must_retrieve_graph_and_class_uri(query_params):
@@ -2,6 +2,7 @@
 from tornado.web import HTTPError
 from brainiak import triplestore
 from brainiak.schema.get_class import get_cached_schema
+from brainiak.utils import cache
 from brainiak.utils.i18n import _
 from brainiak.utils.sparql import create_explicit_triples, create_instance_uri, create_implicit_triples, \
     extract_instance_id, join_triples, join_prefixes, is_insert_response_successful, InstanceError,\
@@ -36,6 +37,7 @@ def create_instance(query_params, instance_data, instance_uri=None):
     response = query_create_instances(query_params)
     if not is_insert_response_successful(response):
         raise HTTPError(500, log_message=_("Triplestore could not insert triples."))
+    cache.purge_graph_queries(graph_uri)
 
     instance_id = extract_instance_id(instance_uri)
     return (instance_uri, instance_id)
@@ -52,4 +54,4 @@ INSERT DATA INTO <%(graph_uri)s>
 
 def query_create_instances(query_params):
     query = QUERY_INSERT_TRIPLES % query_params
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_INSERT_TRIPLES")
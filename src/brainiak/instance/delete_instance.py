@@ -1,6 +1,7 @@
 from tornado.web import HTTPError
 
 from brainiak import triplestore
+from brainiak.utils import cache
 from brainiak.utils.i18n import _
 from brainiak.utils.sparql import some_triples_deleted, is_result_empty
 
@@ -16,6 +17,7 @@ def delete_instance(query_params):
     query_result_dict = query_delete(query_params)
 
     if some_triples_deleted(query_result_dict, query_params['graph_uri']):
+        cache.purge_graph_queries(query_params['graph_uri'])
         return True
 
 
@@ -28,7 +30,7 @@ SELECT ?dependant {
 
 def query_dependants(query_params):
     query = QUERY_DEPENDANTS_TEMPLATE % query_params
-    result_dict = triplestore.query_sparql(query, query_params.triplestore_config)
+    result_dict = triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_DEPENDANTS_TEMPLATE")
     return result_dict
 
 
@@ -42,5 +44,5 @@ WHERE
 
 def query_delete(query_params):
     query = QUERY_DELETE_INSTANCE % query_params
-    result_dict = triplestore.query_sparql(query, query_params.triplestore_config)
+    result_dict = triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_DELETE_INSTANCE")
     return result_dict
@@ -2,6 +2,7 @@ from tornado.web import HTTPError
 from brainiak import triplestore
 from brainiak.instance.common import extract_class_uri, extract_graph_uri, get_class_and_graph, must_retrieve_graph_and_class_uri
 from brainiak.schema.get_class import get_cached_schema
+from brainiak.utils import cache
 from brainiak.utils.i18n import _
 from brainiak.utils.sparql import is_result_true, create_explicit_triples, create_implicit_triples,\
     join_triples, is_modify_response_successful, join_prefixes, InstanceError, are_there_label_properties_in
@@ -38,6 +39,7 @@ def edit_instance(query_params, instance_data):
     response = modify_instance(query_params, triples=string_triples, prefix=string_prefixes)
     if not is_modify_response_successful(response):
         raise HTTPError(500, log_message=_(u"Triplestore could not update triples."))
+    cache.purge_graph_queries(graph_uri)
 
 
 MODIFY_QUERY = u"""
@@ -55,7 +57,7 @@ WHERE
 def modify_instance(query_params, **kw):
     kw.update(query_params)
     query = MODIFY_QUERY % kw
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="MODIFY_QUERY")
 
 
 QUERY_INSTANCE_EXISTS_TEMPLATE = u"""
@@ -68,5 +70,6 @@ WHERE {
 
 def instance_exists(query_params):
     query = QUERY_INSTANCE_EXISTS_TEMPLATE % query_params
-    result_dict = triplestore.query_sparql(query, query_params.triplestore_config)
+    result_dict = triplestore.query_sparql(query, query_params.triplestore_config,
+                                           query_name="QUERY_INSTANCE_EXISTS_TEMPLATE")
     return is_result_true(result_dict)
@@ -4,9 +4,11 @@ from brainiak.instance.common import extract_class_uri, extract_graph_uri, get_c
 from brainiak.log import get_logger
 from brainiak.schema import get_class
 from brainiak.type_mapper import MAP_RDF_EXPANDED_TYPE_TO_PYTHON
+from brainiak.utils.cache import build_instance_key, build_instance_tags, memoize
 from brainiak.utils.links import build_class_url, split_prefix_and_id_from_uri
 from brainiak.utils.resources import LazyObject
-from brainiak.utils.sparql import get_super_properties, is_result_empty, decode_boolean, get_predicate_datatype
+from brainiak.utils.sparql import get_super_properties, is_result_empty, decode_boolean, get_predicate_datatype, \
+    filter_bindings_by_language
 from brainiak.utils.i18n import _
 
 logger = LazyObject(get_logger)
@@ -17,6 +19,32 @@ def get_instance(query_params):
     Given a URI, verify that the type corresponds to the class being passed as a parameter
     Retrieve all properties and objects of this URI (subject)
     """
+    canonical_instance = get_canonical_instance(query_params)
+    if canonical_instance is None:
+        return None
+    return instance_view(canonical_instance, query_params)
+
+
+def get_cached_instance(query_params, conditional=False):
+    """
+    Cached get_instance. The cache holds a single entry per instance (see get_canonical_instance),
+    whatever the lang, expand_uri and meta_properties requested, so a purge of the instance covers them all.
+    With conditional=True (see memoize), the response may have no body, but not_modified=True.
+    """
+    response = memoize(query_params, get_canonical_instance, query_params,
+                       key=build_instance_key(query_params),
+                       tags=build_instance_tags(query_params),
+                       conditional=conditional)
+    if response is not None and "body" in response:
+        response["body"] = instance_view(response["body"], query_params)
+    return response
+
+
+def get_canonical_instance(query_params):
+    """
+    Return the representation of the instance shared by every request of it: the bindings of its
+    properties in all languages, along with the part of the class schema needed to assemble them.
+    """
     if must_retrieve_graph_and_class_uri(query_params):
         query_result_dict = get_class_and_graph(query_params)
         bindings = query_result_dict['results']['bindings']
@@ -27,11 +55,35 @@ def get_instance(query_params):
 
     if is_result_empty(query_result_dict):
         return None
-    else:
-        class_schema = get_class.get_cached_schema(query_params)
-        return assemble_instance_json(query_params,
-                                      query_result_dict,
-                                      class_schema)
+
+    class_schema = get_class.get_cached_schema(query_params)
+    bindings = [item for item in query_result_dict['results']['bindings']
+                if not int(item.get("is_object_blank", {}).get("value", "0"))]
+    properties = class_schema.get("properties", {})
+    predicates = set(item["predicate"]["value"] for item in bindings)
+    return {
+        "graph_uri": query_params["graph_uri"],
+        "class_uri": query_params["class_uri"],
+        "bindings": bindings,
+        "class_schema": {
+            "title": class_schema.get("title"),
+            "properties": {predicate: properties[predicate] for predicate in predicates if predicate in properties}
+        }
+    }
+
+
+def instance_view(canonical_instance, query_params):
+    """
+    Assemble the instance requested by query_params from its canonical representation (see get_canonical_instance),
+    keeping only the literals in the language requested. URIs are shortened by the handlers, if expand_uri=0.
+    """
+    if must_retrieve_graph_and_class_uri(query_params):
+        query_params["graph_uri"] = canonical_instance["graph_uri"]
+        query_params["class_uri"] = canonical_instance["class_uri"]
+    bindings = filter_bindings_by_language(canonical_instance["bindings"], query_params.get("lang"))
+    return assemble_instance_json(query_params,
+                                  {"results": {"bindings": bindings}},
+                                  canonical_instance["class_schema"])
 
 
 def build_items_dict(bindings, class_uri, expand_object_properties, class_schema):
@@ -140,6 +192,8 @@ def assemble_instance_json(query_params, query_result_dict, class_schema):
     instance.update(items)
     return instance
 
+# Literals are not filtered by language, so the result is shared by all languages (see instance_view).
+
 # Note: we will filter (remove) blank nodes using Python code due to a problem
 # on filtering using isBlank when inference is enabled at Virtuoso. We've
 # reported the bug to the DB team and we expect soon an answer from OpenLink.
@@ -156,7 +210,7 @@ SELECT DISTINCT ?predicate ?object %(object_label_variable)s ?super_property isB
     ?predicate ?object .
 OPTIONAL { ?predicate rdfs:subPropertyOf ?super_property } .
 %(object_label_optional_clause)s
-FILTER((langMatches(lang(?object), "%(lang)s") OR langMatches(lang(?object), "")) OR (IsURI(?object)) AND !isBlank(?object)) .
+FILTER(isLiteral(?object) OR isURI(?object)) .
 }
 """
 
@@ -171,7 +225,8 @@ def query_all_properties_and_objects(query_params):
         template_vars["object_label_variable"] = ""
         template_vars["object_label_optional_clause"] = ""
     query = QUERY_ALL_PROPERTIES_AND_OBJECTS_TEMPLATE % template_vars
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config,
+                                    query_name="QUERY_ALL_PROPERTIES_AND_OBJECTS_TEMPLATE")
 
 
 QUERY_ALL_PROPERTIES_AND_OBJECTS_TEMPLATE_BY_URI = u"""
@@ -196,7 +251,8 @@ def query_all_properties_and_objects_by_instance_uri(query_params):
         template_vars["object_label_variable"] = ""
         template_vars["object_label_optional_clause"] = ""
     query = QUERY_ALL_PROPERTIES_AND_OBJECTS_TEMPLATE_BY_URI % template_vars
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config,
+                                    query_name="QUERY_ALL_PROPERTIES_AND_OBJECTS_TEMPLATE_BY_URI")
 
 
 def _convert_to_python(object_value, class_schema, predicate_uri):
@@ -11,10 +11,13 @@ ROUTES = [
     URLSpec(r'/_status/?$', StatusHandler),
     URLSpec(r'/_status/activemq/?', EventBusStatusHandler),
     URLSpec(r'/_status/cache/?', CacheStatusHandler),
+    URLSpec(r'/_status/ontology/?', OntologyStatusHandler),
+    URLSpec(r'/_status/queries/?', QueryStatsHandler),
     URLSpec(r'/_status/virtuoso/?', VirtuosoStatusHandler),
     URLSpec(r'/_version/?', VersionHandler),
 
     URLSpec(r'/_schema_list/?', RootJsonSchemaHandler),
+    URLSpec(r'/_schemas/?', SchemasHandler),
     URLSpec(r'/(?P<context_name>[\w\-]+)/(?P<class_name>[\w\-]+)/_search/_schema_list/?', SearchJsonSchemaHandler),
     URLSpec(r'/_suggest/_schema_list/?', SuggestJsonSchemaHandler),
     URLSpec(r'/(?P<context_name>[\w\-]+)/_schema_list/?', ContextJsonSchemaHandler),
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
+from copy import copy
 
 from brainiak import triplestore, settings
 from brainiak.log import get_logger
 from brainiak.prefixes import MemorizeContext
+from brainiak.schema.ontology_model import get_ontology_model
 from brainiak.suggest.json_schema import SUGGEST_PARAM_SCHEMA
 from brainiak.type_mapper import DATATYPE_PROPERTY, OBJECT_PROPERTY, _MAP_EXPAND_XSD_TO_JSON_TYPE
 from brainiak.utils.i18n import _
-from brainiak.utils.cache import build_key_for_class, memoize
+from brainiak.utils.cache import build_class_tags, build_key_for_class, memoize, memoize_many
 from brainiak.utils.links import assemble_url, add_link, crud_links, build_relative_class_url
 from brainiak.utils.resources import LazyObject
-from brainiak.utils.sparql import add_language_support, filter_values, get_one_value, get_super_properties, InstanceError, bindings_to_dict
+from brainiak.utils.sparql import add_language_support, filter_values, get_one_value, get_super_properties, InstanceError, bindings_to_dict, \
+    select_bindings_by_language
 
 logger = LazyObject(get_logger)
 
@@ -18,25 +22,136 @@ class SchemaNotFound(Exception):
     pass
 
 
-def get_cached_schema(query_params, include_meta=False):
+def get_cached_schema(query_params, include_meta=False, conditional=False):
+    """
+    With conditional=True (see memoize), the schema returned may have no body, but not_modified=True.
+    The schema is cached without its links, which are added for the request of query_params (see add_schema_links).
+    """
     schema_key = build_key_for_class(query_params)
-    class_object = memoize(query_params, get_schema, query_params, key=schema_key)
-    if class_object is None or not class_object["body"]:
+    class_object = memoize(query_params, get_schema, query_params, key=schema_key,
+                           tags=build_class_tags(query_params), conditional=conditional)
+    if class_object is None or not (class_object.get("not_modified") or class_object["body"]):
         msg = _(u"The class definition for {0} was not found in graph {1}")
         raise SchemaNotFound(msg.format(query_params['class_uri'], query_params['graph_uri']))
+    if "body" in class_object:
+        class_object["body"] = add_schema_links(query_params, class_object["body"])
     if include_meta:
         return class_object
     else:
         return class_object['body']
 
 
+def build_class_params(query_params, class_uri, graph_uri=None):
+    """
+    Params of a request of the schema of class_uri, as /_/_/_schema?class_uri=...&graph_uri=..., from the
+    params of a request with the same arguments (e.g. lang), without parsing it again.
+    The graph defaults to the prefix of the class, as the graph of /<context>/<class>/_schema.
+    """
+    class_params = copy(query_params)
+    class_params["class_uri"] = class_uri
+    class_params["graph_uri"] = graph_uri or class_params["class_prefix"]
+    return class_params
+
+
+def get_cached_schemas(params_list):
+    """
+    Schemas of several classes (None for the ones not found), each one with the params of a request of
+    its schema (as get_cached_schema): the cached ones are read at once and the others computed
+    together (see get_schemas). A class requested more than once is computed only once.
+    """
+    unique_params = OrderedDict()
+    for query_params in params_list:
+        unique_params.setdefault(build_key_for_class(query_params), query_params)
+    keys = unique_params.keys()
+    tags = [build_class_tags(query_params) for query_params in unique_params.values()]
+    entries = dict(zip(keys, memoize_many(keys, get_schemas, unique_params.values(), tags)))
+    schemas = []
+    for query_params in params_list:
+        class_object = entries[build_key_for_class(query_params)]
+        if class_object is not None and class_object["body"]:
+            schemas.append(add_schema_links(query_params, class_object["body"]))
+        else:
+            schemas.append(None)
+    return schemas
+
+
+def get_schemas(params_list):
+    """
+    Schemas of several classes (None for the ones not found), as get_schema for each of them. Without
+    the ontology model, the queries of the class, its superclasses and its cardinalities are sent
+    concurrently for all the classes, and then the predicates of all their superclasses are fetched
+    by a single query (in all languages), instead of one for each class: related classes share most of them.
+    """
+    if not params_list:
+        return []
+    triplestore_config = params_list[0].triplestore_config
+    if get_ontology_model(triplestore_config) is not None:
+        return [get_schema(query_params) for query_params in params_list]
+
+    queries = []
+    for query_params in params_list:
+        query_params.set_aux_param('uniqueness_property', settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE)
+        queries.extend([
+            {"query": build_class_schema_query(query_params), "query_name": "QUERY_CLASS_SCHEMA"},
+            {"query": build_superclasses_query(query_params), "query_name": "QUERY_SUPERCLASS",
+             "cache_tags": build_superclasses_cache_tags(query_params)},
+            {"query": build_cardinalities_query(query_params), "query_name": "QUERY_CARDINALITIES"}
+        ])
+    results = triplestore.query_sparql_many(queries, triplestore_config, raise_errors=True)
+    parts = [results[index:index + 3] for index in range(0, len(results), 3)]
+
+    all_superclasses = set()
+    for (class_schema, superclasses_result, cardinalities_result) in parts:
+        if class_schema["results"]["bindings"]:
+            all_superclasses.update(filter_values(superclasses_result, "class"))
+    predicates = []
+    if all_superclasses:
+        predicates = _query_predicate_without_lang(params_list[0], sorted(all_superclasses))["results"]["bindings"]
+
+    schemas = []
+    for (query_params, (class_schema, superclasses_result, cardinalities_result)) in zip(params_list, parts):
+        superclasses = set(filter_values(superclasses_result, "class"))
+        predicates_result = {"results": {"bindings": [item for item in predicates
+                                                      if item["domain_class"]["value"] in superclasses]}}
+        schemas.append(build_schema(query_params, class_schema, superclasses_result, cardinalities_result, predicates_result))
+    return schemas
+
+
 def get_schema(query_params):
-    context = MemorizeContext(normalize_uri=query_params['expand_uri'])
-    class_schema = query_class_schema(query_params)
+    query_params.set_aux_param('uniqueness_property', settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE)
+    predicates_result = None
+    model = get_ontology_model(query_params.triplestore_config)
+    if model is not None:
+        class_schema = model.query_class_schema(query_params["class_uri"], query_params["graph_uri"], query_params.get("lang"))
+        superclasses_result = model.query_superclasses(query_params["class_uri"])
+        cardinalities_result = model.query_cardinalities(query_params["class_uri"])
+        predicates_result = model.query_predicates(filter_values(superclasses_result, "class"))
+    elif settings.SCHEMA_SINGLE_QUERY:
+        (class_schema, superclasses_result, cardinalities_result, predicates_result) = query_schema(query_params)
+    else:
+        # Only the predicates query depends on the superclasses, the other queries are run concurrently
+        queries = [
+            {"query": build_class_schema_query(query_params), "query_name": "QUERY_CLASS_SCHEMA"},
+            {"query": build_superclasses_query(query_params), "query_name": "QUERY_SUPERCLASS",
+             "cache_tags": build_superclasses_cache_tags(query_params)},
+            {"query": build_cardinalities_query(query_params), "query_name": "QUERY_CARDINALITIES"}
+        ]
+        (class_schema, superclasses_result, cardinalities_result) = \
+            triplestore.query_sparql_many(queries, query_params.triplestore_config, raise_errors=True)
+    return build_schema(query_params, class_schema, superclasses_result, cardinalities_result, predicates_result)
+
+
+def build_schema(query_params, class_schema, superclasses_result, cardinalities_result, predicates_result=None):
+    """
+    Schema of a class from the results of the queries of its parts, see get_schema.
+    predicates_result, if given, has the predicates in all languages (see get_predicates_and_cardinalities).
+    """
     if not class_schema["results"]["bindings"]:
         return
-    superclasses = query_superclasses(query_params)
-    predicates_and_cardinalities = get_predicates_and_cardinalities(context, query_params, superclasses)
+    context = MemorizeContext(normalize_uri=query_params['expand_uri'])
+    superclasses = filter_values(superclasses_result, "class")
+    predicates_and_cardinalities = get_predicates_and_cardinalities(context, query_params, superclasses,
+                                                                     cardinalities_result, predicates_result)
     response_dict = assemble_schema_dict(query_params,
                                          get_one_value(class_schema, "title"),
                                          predicates_and_cardinalities,
@@ -46,9 +161,37 @@ def get_schema(query_params):
 
 
 def assemble_schema_dict(query_params, title, predicates, context, **kw):
+    """
+    The schema of a class, without its links: it is shared by the requests of the class (see add_schema_links).
+    """
     effective_context = {"@language": query_params.get("lang")}
     effective_context.update(context.context)
 
+    schema = {
+        "type": "object",
+        "id": query_params["class_uri"],
+        "@context": effective_context,
+        "$schema": "http://json-schema.org/draft-04/schema#",
+        "title": title,
+        "properties": predicates
+    }
+    comment = kw.get("comment", None)
+    if comment:
+        schema["description"] = comment
+    return schema
+
+
+def add_schema_links(query_params, schema):
+    """
+    Copy of schema (see assemble_schema_dict) with the links of the request of query_params,
+    whose context, class and arguments they depend on.
+    """
+    schema = dict(schema)
+    schema["links"] = build_schema_links(query_params)
+    return schema
+
+
+def build_schema_links(query_params):
     query_params.resource_url = query_params.base_url
     class_url = build_relative_class_url(query_params)
     schema_url = class_url if class_url.endswith('_schema') else class_url + '/_schema'
@@ -94,20 +237,7 @@ def assemble_schema_dict(query_params, title, predicates, context, **kw):
 
     action_links = crud_links(query_params, class_url)
     links.extend(action_links)
-
-    schema = {
-        "type": "object",
-        "id": query_params["class_uri"],
-        "@context": effective_context,
-        "$schema": "http://json-schema.org/draft-04/schema#",
-        "title": title,
-        "links": links,
-        "properties": predicates
-    }
-    comment = kw.get("comment", None)
-    if comment:
-        schema["description"] = comment
-    return schema
+    return links
 
 
 QUERY_CLASS_SCHEMA = u"""
@@ -138,12 +268,118 @@ def build_class_schema_query(params):
 
 def query_class_schema(query_params):
     query = build_class_schema_query(query_params)
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_CLASS_SCHEMA")
+
+
+# QUERY_CLASS_SCHEMA, QUERY_SUPERCLASS, QUERY_CARDINALITIES (without the enumerated values, which are not used)
+# and QUERY_PREDICATE_WITHOUT_LANG in a single query, in all languages: each part binds its own variables
+QUERY_SCHEMA = u"""
+SELECT DISTINCT ?class_title ?class_comment ?superclass ?step ?restriction_predicate ?min ?max ?restriction_range ?predicate ?predicate_graph ?predicate_comment ?type ?range ?title ?range_graph ?range_label ?super_property ?domain_class ?unique_value
+WHERE {
+  {
+    GRAPH <%(graph_uri)s> {
+      <%(class_uri)s> a owl:Class ;
+                      rdfs:label ?class_title .
+      OPTIONAL { <%(class_uri)s> rdfs:comment ?class_comment }
+    }
+  } UNION {
+    <%(class_uri)s> rdfs:subClassOf ?superclass OPTION (TRANSITIVE, t_distinct, t_step('step_no') as ?step, t_min (0)) .
+    ?superclass a owl:Class .
+  } UNION {
+    <%(class_uri)s> rdfs:subClassOf ?s OPTION (TRANSITIVE, t_distinct, t_min (0)) .
+    ?s owl:onProperty ?restriction_predicate .
+    OPTIONAL { ?s owl:minQualifiedCardinality ?min } .
+    OPTIONAL { ?s owl:maxQualifiedCardinality ?max } .
+    OPTIONAL {
+        { ?s owl:onClass ?restriction_range }
+        UNION { ?s owl:onDataRange ?restriction_range }
+        UNION { ?s owl:allValuesFrom ?restriction_range }
+    }
+  } UNION {
+    {
+      GRAPH ?predicate_graph { ?predicate rdfs:domain ?domain_class  } .
+    } UNION {
+      GRAPH ?predicate_graph {?predicate rdfs:domain ?blank} .
+      ?blank a owl:Class .
+      ?blank owl:unionOf ?enumeration .
+      OPTIONAL { ?enumeration rdf:rest ?list_node OPTION(TRANSITIVE, t_min (0)) } .
+      OPTIONAL { ?list_node rdf:first ?domain_class } .
+      FILTER (BOUND(?domain_class))
+    }
+    <%(class_uri)s> rdfs:subClassOf ?domain_class OPTION (TRANSITIVE, t_distinct, t_min (0)) .
+    ?domain_class a owl:Class .
+    {?predicate rdfs:range ?range .}
+    UNION {
+      ?predicate rdfs:range ?blank_range .
+      ?blank_range a owl:Class .
+      ?blank_range owl:unionOf ?range_enumeration .
+      OPTIONAL { ?range_enumeration rdf:rest ?range_list_node OPTION(TRANSITIVE, t_min (0)) } .
+      OPTIONAL { ?range_list_node rdf:first ?range } .
+      FILTER (BOUND(?range))
+    }
+    FILTER (!isBlank(?range))
+    ?predicate rdfs:label ?title .
+    ?predicate rdf:type ?type .
+    OPTIONAL { ?predicate rdfs:subPropertyOf ?super_property } .
+    OPTIONAL { ?predicate %(uniqueness_property)s ?unique_value } .
+    FILTER (?type in (owl:ObjectProperty, owl:DatatypeProperty)) .
+    OPTIONAL { GRAPH ?range_graph {  ?range rdfs:label ?range_label . } } .
+    OPTIONAL { ?predicate rdfs:comment ?predicate_comment }
+  }
+}
+"""
+
+
+def build_schema_query(query_params):
+    template_vars = dict(uniqueness_property=settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE, **query_params)
+    return QUERY_SCHEMA % template_vars
 
 
-def get_predicates_and_cardinalities(context, query_params, superclasses):
-    query_result = query_cardinalities(query_params)
-    bindings = query_predicates(query_params, superclasses)
+def query_schema(query_params):
+    """
+    Query the parts of the schema of a class at once, see QUERY_SCHEMA. Return the results of the
+    queries they replace: the class title and comment in the language of the request, the superclasses
+    (the nearest first), the cardinalities and the predicates in all languages (see select_predicates_language).
+    """
+    query = build_schema_query(query_params)
+    result_dict = triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_SCHEMA")
+    parts = {"class": [], "superclass": [], "cardinality": [], "predicate": []}
+    for item in result_dict["results"]["bindings"]:
+        if "class_title" in item:
+            parts["class"].append(rename_variables(item, class_title="title", class_comment="comment"))
+        elif "superclass" in item:
+            parts["superclass"].append(item)
+        elif "restriction_predicate" in item:
+            parts["cardinality"].append(rename_variables(item, restriction_predicate="predicate", restriction_range="range"))
+        elif "predicate" in item:
+            parts["predicate"].append(item)
+
+    class_schema = select_bindings_by_language(parts["class"], query_params.get("lang"), ["title"], [("comment",)])
+    superclasses = []
+    for item in sorted(parts["superclass"], key=lambda item: int(item.get("step", {}).get("value", 0))):
+        if {"class": item["superclass"]} not in superclasses:
+            superclasses.append({"class": item["superclass"]})
+    return ({"results": {"bindings": class_schema}},
+            {"results": {"bindings": superclasses}},
+            {"results": {"bindings": parts["cardinality"]}},
+            {"results": {"bindings": parts["predicate"]}})
+
+
+def rename_variables(item, **names):
+    return dict((names.get(variable, variable), term) for (variable, term) in item.items())
+
+
+def get_predicates_and_cardinalities(context, query_params, superclasses, query_result=None, predicates_result=None):
+    """
+    predicates_result, if given, has the predicates in all languages (see select_predicates_language),
+    otherwise they are queried in the language of the request.
+    """
+    if query_result is None:
+        query_result = query_cardinalities(query_params)
+    if predicates_result is None:
+        bindings = query_predicates(query_params, superclasses)
+    else:
+        bindings = select_predicates_language(predicates_result, query_params.get("lang"))
     predicate_dict = bindings_to_dict('predicate', bindings)
 
     try:
@@ -225,9 +461,27 @@ WHERE {
 }"""
 
 
+def build_cardinalities_query(query_params):
+    return QUERY_CARDINALITIES % query_params
+
+
 def query_cardinalities(query_params):
-    query = QUERY_CARDINALITIES % query_params
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    model = get_ontology_model(query_params.triplestore_config)
+    if model is not None:
+        return model.query_cardinalities(query_params["class_uri"])
+    query = build_cardinalities_query(query_params)
+    return triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_CARDINALITIES")
+
+
+def select_predicates_language(predicates_result, lang):
+    """
+    Python counterpart of query_predicates, for predicates in all languages (as the ones of
+    QUERY_PREDICATE_WITHOUT_LANG): titles, comments and labels of ranges in the language lang (or
+    without language) are selected, unless no predicate has a title in it, in which case all are kept.
+    """
+    bindings = predicates_result["results"]["bindings"]
+    selected = select_bindings_by_language(bindings, lang, ["title"], [("predicate_comment",), ("range_label", "range_graph")])
+    return {"results": {"bindings": selected or list(bindings)}}
 
 
 def query_predicates(query_params, superclasses):
@@ -287,7 +541,8 @@ def _query_predicate_with_lang(query_params, superclasses):
                          uniqueness_property=query_params.get_aux_param('uniqueness_property'),
                          **query_params)
     query = QUERY_PREDICATE_WITH_LANG % template_vars
-    response = triplestore.query_sparql(query, query_params.triplestore_config)
+    response = triplestore.query_sparql(query, query_params.triplestore_config,
+                                        query_name="QUERY_PREDICATE_WITH_LANG")
     return response
 
 
@@ -330,10 +585,15 @@ def _query_predicate_without_lang(query_params, superclasses):
                          uniqueness_property=settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE,
                          **query_params)
     query = QUERY_PREDICATE_WITHOUT_LANG % template_vars
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    return triplestore.query_sparql(query, query_params.triplestore_config,
+                                    query_name="QUERY_PREDICATE_WITHOUT_LANG")
 
 
 def query_superclasses(query_params):
+    """
+    The class of query_params and its superclasses, from the ontology model if it is loaded, or else
+    from the result of QUERY_SUPERCLASS which is cached for the schema of the class.
+    """
     uniqueness_property = settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE
     query_params.set_aux_param('uniqueness_property', uniqueness_property)
     result_dict = _query_superclasses(query_params)
@@ -350,9 +610,27 @@ WHERE {
 """
 
 
+def build_superclasses_query(query_params):
+    return QUERY_SUPERCLASS % query_params
+
+
+def build_superclasses_cache_tags(query_params):
+    """
+    The cached result of QUERY_SUPERCLASS (see triplestore.query_sparql) is tagged by the class, not by
+    its graph: the writes of instances purge the queries of their graph, but they do not change the
+    hierarchy. It is purged with the schema of the class (see cache.purge_class_queries), and it is
+    shared by the schema and by the purge of the collections of the class (see query_superclasses).
+    """
+    return [query_params["class_uri"]]
+
+
 def _query_superclasses(query_params):
-    query = QUERY_SUPERCLASS % query_params
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+    model = get_ontology_model(query_params.triplestore_config)
+    if model is not None:
+        return model.query_superclasses(query_params["class_uri"])
+    query = build_superclasses_query(query_params)
+    return triplestore.query_sparql(query, query_params.triplestore_config,
+                                    cache_tags=build_superclasses_cache_tags(query_params), query_name="QUERY_SUPERCLASS")
 
 
 def items_from_range(range_uri, min_items=1, max_items=1):
@@ -502,15 +780,26 @@ def join_predicates(old, new):
     return merged_predicate
 
 
-def most_specialized_predicate(class_hierarchy, predicate_a, predicate_b):
-    index_a = class_hierarchy.index(predicate_a['class'])
-    index_b = class_hierarchy.index(predicate_b['class'])
+def rank_classes(class_hierarchy):
+    """
+    Map each class of class_hierarchy (a list of classes, the most specialized first) to its position in it
+    """
+    ranks = {}
+    for (index, class_uri) in enumerate(class_hierarchy):
+        ranks.setdefault(class_uri, index)
+    return ranks
+
+
+def most_specialized_predicate(class_ranks, predicate_a, predicate_b):
+    index_a = class_ranks[predicate_a['class']]
+    index_b = class_ranks[predicate_b['class']]
     return predicate_a if index_a < index_b else predicate_b
 
 
 def convert_bindings_dict(context, bindings, cardinalities, superclasses):
 
     super_predicates = get_super_properties(bindings)
+    class_ranks = rank_classes(superclasses)
     assembled_predicates = {}
 
     for binding_row in bindings:
@@ -518,14 +807,14 @@ def convert_bindings_dict(context, bindings, cardinalities, superclasses):
 
         # super_predicate is when we use rdfs:subPropertyOf
         # this case does not consider inherited predicates
-        if predicate_uri in super_predicates.keys():
+        if predicate_uri in super_predicates:
             continue
 
         predicate = assemble_predicate(predicate_uri, binding_row, cardinalities, context)
         existing_predicate = assembled_predicates.get(predicate_uri, False)
         if existing_predicate:
             if 'datatype' in existing_predicate and 'datatype' in predicate:
-                assembled_predicates[predicate_uri] = most_specialized_predicate(superclasses,
+                assembled_predicates[predicate_uri] = most_specialized_predicate(class_ranks,
                                                                                  existing_predicate,
                                                                                  predicate)
             elif existing_predicate != predicate:
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+
+class ClassHierarchy(object):
+    """
+    Transitive closure of rdfs:subClassOf, materialized for every class: its ancestors (ordered by their
+    distance, the nearest first), its descendants and the distance to each ancestor, so subclass checks
+    and rankings are dict lookups instead of transitive queries or list scans.
+
+    >>> hierarchy = ClassHierarchy([("Musician", "Person"), ("Person", "Thing")])
+    >>> hierarchy.ancestors("Musician")
+    ['Musician', 'Person', 'Thing']
+    >>> hierarchy.is_subclass("Musician", "Thing")
+    True
+    >>> hierarchy.descendants("Person")
+    ['Person', 'Musician']
+    """
+
+    def __init__(self, edges):
+        parents = {}
+        for (subclass, superclass) in edges:
+            if subclass != superclass:
+                parents.setdefault(subclass, set()).add(superclass)
+        self.parents = dict((subclass, sorted(superclasses)) for (subclass, superclasses) in parents.items())
+        # class -> {ancestor -> distance}, and class -> list of ancestors, by distance (itself not included)
+        self.distances = {}
+        self._ancestors = {}
+        for subclass in self.parents:
+            self._ancestors[subclass] = self._breadth_first(subclass)
+        descendants = {}
+        for (subclass, ancestors) in self._ancestors.items():
+            for ancestor in ancestors:
+                descendants.setdefault(ancestor, []).append(subclass)
+        self._descendants = dict(
+            (ancestor, sorted(subclasses, key=lambda subclass: (self.distances[subclass][ancestor], subclass)))
+            for (ancestor, subclasses) in descendants.items())
+
+    def _breadth_first(self, subclass):
+        distances = {subclass: 0}
+        ancestors = [subclass]
+        for node in ancestors:
+            for parent in self.parents.get(node, ()):
+                if parent not in distances:
+                    distances[parent] = distances[node] + 1
+                    ancestors.append(parent)
+        del distances[subclass]
+        self.distances[subclass] = distances
+        return ancestors[1:]
+
+    def __len__(self):
+        return len(set(self._ancestors) | set(self._descendants))
+
+    def ancestors(self, class_uri):
+        """
+        The class and its direct and indirect superclasses, the nearest first
+        """
+        return [class_uri] + self._ancestors.get(class_uri, [])
+
+    def descendants(self, class_uri):
+        """
+        The class and its direct and indirect subclasses, the nearest first
+        """
+        return [class_uri] + self._descendants.get(class_uri, [])
+
+    def is_subclass(self, subclass, superclass):
+        return subclass == superclass or superclass in self.distances.get(subclass, {})
+
+    def distance(self, subclass, superclass):
+        """
+        Number of rdfs:subClassOf steps from subclass to superclass, or None if it is not one of its superclasses
+        """
+        if subclass == superclass:
+            return 0
+        return self.distances.get(subclass, {}).get(superclass)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from brainiak import settings
+
+SCHEMAS_PARAM_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "Describe the classes whose schemas are requested at once",
+    "type": "object",
+    "required": ["classes"],
+    "additionalProperties": False,
+    "properties": {
+        "classes": {
+            "type": "array",
+            "minItems": 1,
+            "maxItems": settings.SCHEMAS_MAX_CLASSES,
+            "items": {
+                "type": "object",
+                "required": ["class_uri"],
+                "additionalProperties": False,
+                "properties": {
+                    "class_uri": {"type": "string", "format": "uri"},
+                    "graph_uri": {"type": "string", "format": "uri"}
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,621 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory model of the ontology: the classes, properties, domains, ranges, restrictions and labels
+of the graphs which describe classes or properties (see get_graph_fingerprints) are loaded
+at startup, so schemas, superclasses and predicate ranges are built without querying the triplestore.
+
+The model answers in the format of the SPARQL results of the queries it replaces (e.g. QUERY_SUPERCLASS
+in get_class), so they are processed by the same code. A graph is reloaded only when its fingerprint
+changes, which is checked every settings.ONTOLOGY_MODEL_REFRESH_SECS, or on demand (see
+reload_graphs), e.g. when the schema of one of its classes is purged.
+"""
+import md5
+import time
+from itertools import product
+
+import ujson
+from tornado.ioloop import PeriodicCallback
+
+from brainiak import log, settings, triplestore
+from brainiak.greenlet_tornado import greenlet_spawn
+from brainiak.prefixes import expand_uri
+from brainiak.schema.hierarchy import ClassHierarchy
+from brainiak.type_mapper import DATATYPE_PROPERTY, OBJECT_PROPERTY
+from brainiak.utils import cache, config_parser
+from brainiak.utils.i18n import _
+from brainiak.utils.sparql import lang_matches
+
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDF_FIRST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#first"
+RDF_REST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#rest"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDFS_COMMENT = "http://www.w3.org/2000/01/rdf-schema#comment"
+RDFS_SUBCLASS_OF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+RDFS_SUBPROPERTY_OF = "http://www.w3.org/2000/01/rdf-schema#subPropertyOf"
+RDFS_DOMAIN = "http://www.w3.org/2000/01/rdf-schema#domain"
+RDFS_RANGE = "http://www.w3.org/2000/01/rdf-schema#range"
+RDF_PROPERTY = "http://www.w3.org/1999/02/22-rdf-syntax-ns#Property"
+OWL_CLASS = "http://www.w3.org/2002/07/owl#Class"
+OWL_RESTRICTION = "http://www.w3.org/2002/07/owl#Restriction"
+OWL_ANNOTATION_PROPERTY = "http://www.w3.org/2002/07/owl#AnnotationProperty"
+OWL_UNION_OF = "http://www.w3.org/2002/07/owl#unionOf"
+OWL_ON_PROPERTY = "http://www.w3.org/2002/07/owl#onProperty"
+OWL_ON_CLASS = "http://www.w3.org/2002/07/owl#onClass"
+OWL_ON_DATA_RANGE = "http://www.w3.org/2002/07/owl#onDataRange"
+OWL_ALL_VALUES_FROM = "http://www.w3.org/2002/07/owl#allValuesFrom"
+OWL_MIN_QUALIFIED_CARDINALITY = "http://www.w3.org/2002/07/owl#minQualifiedCardinality"
+OWL_MAX_QUALIFIED_CARDINALITY = "http://www.w3.org/2002/07/owl#maxQualifiedCardinality"
+
+SCHEMA_PREDICATES = (RDF_FIRST, RDF_REST, RDFS_LABEL, RDFS_COMMENT, RDFS_SUBCLASS_OF, RDFS_SUBPROPERTY_OF,
+                     RDFS_DOMAIN, RDFS_RANGE, OWL_UNION_OF, OWL_ON_PROPERTY, OWL_ON_CLASS, OWL_ON_DATA_RANGE,
+                     OWL_ALL_VALUES_FROM, OWL_MIN_QUALIFIED_CARDINALITY, OWL_MAX_QUALIFIED_CARDINALITY)
+SCHEMA_TYPES = (OWL_CLASS, OBJECT_PROPERTY, DATATYPE_PROPERTY)
+# Types of the subjects whose triples are loaded, besides the blank nodes of restrictions and lists
+SCHEMA_SUBJECT_TYPES = SCHEMA_TYPES + (RDF_PROPERTY, OWL_ANNOTATION_PROPERTY, OWL_RESTRICTION)
+RESTRICTION_RANGES = (OWL_ON_CLASS, OWL_ON_DATA_RANGE, OWL_ALL_VALUES_FROM)
+
+PREDICATE_VARIABLES = ["predicate", "predicate_graph", "predicate_comment", "type", "range", "title",
+                       "range_graph", "range_label", "super_property", "domain_class", "unique_value"]
+
+# The triples which describe classes and properties, of the graph ?graph. Their subjects are the classes and
+# properties (declared as such or with a superclass, domain or range in the graph), the restrictions of the classes
+# and the nodes of the lists of owl:unionOf, so the instances which share the graph (and their labels) are left out
+ONTOLOGY_TRIPLES = u"""
+  GRAPH %(graph)s {
+    {
+      ?s a ?subject_type .
+      FILTER (?subject_type IN (%(subject_types)s))
+    } UNION {
+      ?s rdfs:subClassOf ?superclass .
+    } UNION {
+      ?s rdfs:domain ?domain .
+    } UNION {
+      ?s rdfs:range ?range .
+    } UNION {
+      ?class rdfs:subClassOf ?s .
+      FILTER (isBlank(?s))
+    } UNION {
+      ?union owl:unionOf ?list .
+      ?list rdf:rest ?s OPTION (TRANSITIVE, t_min (0)) .
+    }
+    ?s ?p ?o
+  }
+  FILTER (?p IN (%(predicates)s) OR (?p = rdf:type AND ?o IN (%(types)s)))
+"""
+
+# The triples of a graph which describe classes and properties, in pages of settings.ONTOLOGY_MODEL_PAGE_SIZE
+QUERY_ONTOLOGY_GRAPH = u"""
+SELECT DISTINCT ?s ?p ?o
+WHERE {%(triples)s}
+ORDER BY ?s ?p ?o
+LIMIT %(limit)s
+OFFSET %(offset)s
+"""
+
+# Per graph which declares classes or properties, the number of the triples loaded from it (see QUERY_ONTOLOGY_GRAPH)
+# and their checksum: the sum of a number taken from the md5 of each triple, so it changes whenever any of them is
+# added, removed or edited (e.g. the text of a label), even if the number of triples does not.
+# Only those triples are scanned, so editing the instances which share the graph leaves the fingerprint as it is
+QUERY_ONTOLOGY_FINGERPRINT = u"""
+SELECT ?graph COUNT(*) AS ?total SUM(?hash) AS ?checksum
+WHERE {
+  {
+    SELECT DISTINCT ?graph ?s ?p ?o
+    WHERE {
+      {
+        SELECT DISTINCT ?graph
+        WHERE { GRAPH ?graph { ?class a ?type } FILTER (?type IN (%(types)s)) }
+      }%(triples)s
+    }
+  }
+  BIND (MD5(CONCAT(COALESCE(STR(?s), "_"), " ", STR(?p), " ", COALESCE(STR(?o), "_"), "@",
+                   COALESCE(LANG(?o), ""), "^", COALESCE(STR(DATATYPE(?o)), ""))) AS ?md5)
+  BIND (xsd:integer(SUBSTR(CONCAT(REPLACE(?md5, "[a-f]", ""), "0"), 1, 12)) AS ?hash)
+}
+GROUP BY ?graph
+"""
+
+
+def build_ontology_triples(graph):
+    predicates = SCHEMA_PREDICATES + (expand_uri(settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE),)
+    return ONTOLOGY_TRIPLES % {
+        "graph": graph,
+        "predicates": u", ".join(u"<{0}>".format(uri) for uri in predicates),
+        "types": u", ".join(u"<{0}>".format(uri) for uri in SCHEMA_TYPES),
+        "subject_types": u", ".join(u"<{0}>".format(uri) for uri in SCHEMA_SUBJECT_TYPES)
+    }
+
+
+def build_ontology_graph_query(graph_uri, offset=0):
+    return QUERY_ONTOLOGY_GRAPH % {
+        "triples": build_ontology_triples(u"<{0}>".format(graph_uri)),
+        "limit": settings.ONTOLOGY_MODEL_PAGE_SIZE,
+        "offset": offset
+    }
+
+
+def build_ontology_fingerprint_query():
+    return QUERY_ONTOLOGY_FINGERPRINT % {
+        "triples": build_ontology_triples(u"?graph"),
+        "types": u", ".join(u"<{0}>".format(uri) for uri in SCHEMA_TYPES)
+    }
+
+
+def get_graph_fingerprints(triplestore_config=None, async=False):
+    """
+    Return a dict of graph_uri -> fingerprint of the ontology in the graph (see QUERY_ONTOLOGY_FINGERPRINT).
+    Unless async=True, it runs without greenlets, so it must be called outside the IOLoop (e.g. at startup).
+    """
+    triplestore_config = triplestore_config or config_parser.parse_section()
+    result_dict = triplestore.query_sparql(build_ontology_fingerprint_query(),
+                                           triplestore_config,
+                                           async=async,
+                                           query_name="QUERY_ONTOLOGY_FINGERPRINT")
+    fingerprints = {}
+    for binding in result_dict["results"]["bindings"]:
+        fingerprints[binding["graph"]["value"]] = u"{0}@@{1}".format(binding["total"]["value"], binding["checksum"]["value"])
+    return fingerprints
+
+
+def to_term(binding):
+    """
+    Compact and hashable form of a term of a SPARQL JSON result: (value, type, language, datatype)
+    """
+    return (binding["value"], binding["type"], binding.get("xml:lang", u""), binding.get("datatype"))
+
+
+def uri_term(uri):
+    return (uri, u"uri", u"", None)
+
+
+def to_binding(term):
+    (value, type_, lang, datatype) = term
+    binding = {"type": type_, "value": value}
+    if lang:
+        binding["xml:lang"] = lang
+    if datatype:
+        binding["datatype"] = datatype
+    return binding
+
+
+def is_blank(term):
+    return term[1] == u"bnode" or term[0].startswith(u"nodeID://")
+
+
+def in_language(term, lang):
+    """
+    As the language filters of the queries: literals in the language lang or without language (any if lang is empty)
+    """
+    return not lang or not term[2] or lang_matches(term[2], lang)
+
+
+def build_result(variables, rows):
+    """
+    SPARQL JSON result with a binding for each row, a tuple of terms (or None, if unbound) of the variables
+    """
+    bindings = []
+    for row in rows:
+        bindings.append(dict((variable, to_binding(term)) for (variable, term) in zip(variables, row) if term is not None))
+    return {"head": {"vars": list(variables)}, "results": {"bindings": bindings}}
+
+
+def distinct(items):
+    unique_items = []
+    seen = set()
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique_items.append(item)
+    return unique_items
+
+
+class OntologyModel(object):
+
+    def __init__(self, triplestore_config):
+        self.triplestore_config = triplestore_config
+        self.uniqueness_property = expand_uri(settings.ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE)
+        # graph_uri -> fingerprint, and graph_uri -> list of (subject, predicate, object term), of the loaded graphs
+        self.fingerprints = {}
+        self.graphs = {}
+        # predicate -> subject -> list of (graph_uri, object term), of all graphs
+        self.facts = {}
+        self.hierarchy = ClassHierarchy([])
+        # property -> its direct subproperties
+        self.subproperties = {}
+        # class -> list of (predicate, graph_uri) of the properties whose rdfs:domain is (or includes) the class
+        self.domains = {}
+        # class -> (graphs which declare it, digest of the facts its schema is built from), see affected_schemas
+        self.class_digests = {}
+        self.loaded_at = None
+        self.refreshing = False
+        # graphs to reload, which were forced while a refresh was running (see refresh)
+        self.pending_graphs = set()
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def refresh(self, graph_fingerprints=None, async=True, force_graphs=()):
+        """
+        Reload the graphs whose fingerprint changed (or which are in force_graphs) and drop the ones which
+        no longer describe classes or properties. Requests keep using the previous indexes until all of
+        them are loaded. Return the list of graphs reloaded or dropped.
+
+        async=False loads them without greenlets, which is only allowed outside the IOLoop, e.g. at startup.
+
+        Only one refresh runs at a time: the force_graphs of a refresh asked meanwhile (e.g. by reload_graphs,
+        during the periodic refresh) are reloaded, with fresh fingerprints, once the running one finishes.
+        """
+        if self.refreshing:
+            self.pending_graphs.update(force_graphs)
+            return []
+        self.refreshing = True
+        try:
+            refreshed = self._refresh(graph_fingerprints, async, force_graphs)
+            while self.pending_graphs:
+                (force_graphs, self.pending_graphs) = (sorted(self.pending_graphs), set())
+                refreshed.extend(graph_uri for graph_uri in self._refresh(None, async, force_graphs)
+                                 if graph_uri not in refreshed)
+        finally:
+            self.refreshing = False
+        return refreshed
+
+    def _refresh(self, graph_fingerprints, async, force_graphs):
+        if graph_fingerprints is None:
+            graph_fingerprints = get_graph_fingerprints(self.triplestore_config, async=async)
+        changed = sorted(graph_uri for (graph_uri, fingerprint) in graph_fingerprints.items()
+                         if self.fingerprints.get(graph_uri) != fingerprint or graph_uri in force_graphs)
+        removed = sorted(set(self.fingerprints) - set(graph_fingerprints))
+        if self.loaded and not changed and not removed:
+            return []
+        graphs = dict((graph_uri, triples) for (graph_uri, triples) in self.graphs.items() if graph_uri not in removed)
+        for graph_uri in changed:
+            graphs[graph_uri] = self.load_graph(graph_uri, async)
+        self.build(graphs, graph_fingerprints)
+        log.logger.info(_(u"Ontology model: loaded {0} graphs ({1} triples), reloaded or dropped {2}").format(
+            len(self.graphs), self.count_triples(), u", ".join(changed + removed)))
+        return changed + removed
+
+    def load_graph(self, graph_uri, async=True):
+        triples = []
+        offset = 0
+        while True:
+            result_dict = triplestore.query_sparql(build_ontology_graph_query(graph_uri, offset),
+                                                   self.triplestore_config,
+                                                   async=async,
+                                                   query_name="QUERY_ONTOLOGY_GRAPH")
+            bindings = result_dict["results"]["bindings"]
+            triples.extend((item["s"]["value"], item["p"]["value"], to_term(item["o"])) for item in bindings)
+            if len(bindings) < settings.ONTOLOGY_MODEL_PAGE_SIZE:
+                return triples
+            offset += settings.ONTOLOGY_MODEL_PAGE_SIZE
+
+    def build(self, graphs, graph_fingerprints):
+        """
+        Replace the indexes by the ones of the triples of graphs. It does not switch greenlets,
+        so requests never see indexes partially built.
+        """
+        facts = {}
+        for (graph_uri, triples) in graphs.items():
+            for (subject, predicate, term) in triples:
+                facts.setdefault(predicate, {}).setdefault(subject, []).append((graph_uri, term))
+        self.facts = facts
+        self.graphs = graphs
+        self.fingerprints = dict(graph_fingerprints)
+        self.hierarchy = ClassHierarchy((subclass, term[0])
+                                        for (subclass, objects) in facts.get(RDFS_SUBCLASS_OF, {}).items()
+                                        for (graph_uri, term) in objects)
+        self.subproperties = self._inverse(RDFS_SUBPROPERTY_OF)
+
+        domains = {}
+        for (predicate, objects) in facts.get(RDFS_DOMAIN, {}).items():
+            for (graph_uri, term) in objects:
+                for domain in [term] + self._union_members(term[0]):
+                    entries = domains.setdefault(domain[0], [])
+                    if (predicate, graph_uri) not in entries:
+                        entries.append((predicate, graph_uri))
+        self.domains = domains
+        self.class_digests = self._digest_classes()
+        self.loaded_at = time.time()
+
+    def _digest_classes(self):
+        by_subject = {}
+        for (predicate, subjects) in self.facts.items():
+            for (subject, objects) in subjects.items():
+                by_subject.setdefault(subject, []).extend((predicate, graph_uri, term) for (graph_uri, term) in objects)
+
+        def describe(subject, visited=()):
+            # blank nodes are replaced by their own facts, as their ids change whenever a graph is reloaded
+            description = []
+            for (predicate, graph_uri, term) in by_subject.get(subject, ()):
+                if is_blank(term):
+                    term = tuple(describe(term[0], visited + (subject,))) if term[0] not in visited else None
+                description.append((predicate, graph_uri, term))
+            return sorted(description, key=ujson.dumps)
+
+        class_digests = {}
+        for (subject, objects) in self.facts.get(RDF_TYPE, {}).items():
+            graphs = tuple(sorted(graph_uri for (graph_uri, term) in objects if term[0] == OWL_CLASS))
+            if not graphs or subject.startswith(u"nodeID://"):
+                continue
+            # the class, its restrictions, the properties of its domain and the labels of their ranges:
+            # what it inherits is in the digests of its superclasses
+            parts = [describe(subject)]
+            for (predicate, graph_uri) in sorted(self.domains.get(subject, ())):
+                parts.append((predicate, graph_uri, describe(predicate)))
+                parts.extend((range_[0], sorted(self._objects_by_graph(range_[0], RDFS_LABEL))) for range_ in self._ranges(predicate))
+            class_digests[subject] = (graphs, md5.new(ujson.dumps(parts)).hexdigest())
+        return class_digests
+
+    def affected_schemas(self, class_digests, hierarchy):
+        """
+        The schemas which changed since the model had class_digests and hierarchy (e.g. before a refresh),
+        as a list of (graph_uri, class_uri): the ones of the classes whose own facts (see _digest_classes)
+        changed, were added or removed, and the ones of their subclasses, before and after the change.
+        """
+        changed = [class_uri for class_uri in set(class_digests) | set(self.class_digests)
+                   if class_digests.get(class_uri) != self.class_digests.get(class_uri)]
+        affected = set()
+        for class_uri in changed:
+            affected.update(hierarchy.descendants(class_uri))
+            affected.update(self.hierarchy.descendants(class_uri))
+        schemas = set()
+        for class_uri in affected:
+            for digests in (class_digests, self.class_digests):
+                schemas.update((graph_uri, class_uri) for graph_uri in digests.get(class_uri, ((), None))[0])
+        return sorted(schemas)
+
+    def _inverse(self, predicate):
+        inverse = {}
+        for (subject, objects) in self.facts.get(predicate, {}).items():
+            for (graph_uri, term) in objects:
+                inverse.setdefault(term[0], set()).add(subject)
+        return inverse
+
+    def count_triples(self):
+        return sum(len(triples) for triples in self.graphs.values())
+
+    def stats(self):
+        types = self.facts.get(RDF_TYPE, {})
+        return {
+            "loaded_at": self.loaded_at,
+            "graphs": self.fingerprints,
+            "triples": self.count_triples(),
+            "hierarchy": len(self.hierarchy),
+            "classes": sum(1 for objects in types.values() if any(term[0] == OWL_CLASS for (graph_uri, term) in objects)),
+            "properties": sum(1 for objects in types.values() if any(term[0] != OWL_CLASS for (graph_uri, term) in objects))
+        }
+
+    def _objects_by_graph(self, subject, predicate):
+        return self.facts.get(predicate, {}).get(subject, ())
+
+    def _objects(self, subject, predicate):
+        return distinct(term for (graph_uri, term) in self._objects_by_graph(subject, predicate))
+
+    def _labels(self, subject, predicate, lang, graph_uri=None):
+        return distinct(term for (term_graph_uri, term) in self._objects_by_graph(subject, predicate)
+                        if graph_uri in (None, term_graph_uri) and in_language(term, lang))
+
+    def _has_type(self, subject, type_uri, graph_uri=None):
+        return any(term[0] == type_uri and graph_uri in (None, term_graph_uri)
+                   for (term_graph_uri, term) in self._objects_by_graph(subject, RDF_TYPE))
+
+    def _list_members(self, list_node):
+        members = []
+        visited = set()
+        pending = [list_node]
+        while pending:
+            node = pending.pop(0)
+            if node in visited:
+                continue
+            visited.add(node)
+            members.extend(self._objects(node, RDF_FIRST))
+            pending.extend(term[0] for term in self._objects(node, RDF_REST))
+        return distinct(members)
+
+    def _union_members(self, node):
+        """
+        Members of the owl:unionOf of node, if it is a class (e.g. an anonymous class which is the domain or range of a property)
+        """
+        members = []
+        if self._has_type(node, OWL_CLASS):
+            for list_node in self._objects(node, OWL_UNION_OF):
+                members.extend(self._list_members(list_node[0]))
+        return members
+
+    def _ranges(self, predicate):
+        ranges = []
+        for term in self._objects(predicate, RDFS_RANGE):
+            ranges.extend(range_ for range_ in [term] + self._union_members(term[0]) if not is_blank(range_))
+        return distinct(ranges)
+
+    def _closure(self, node, edges):
+        """
+        node followed by the nodes reachable from it through edges (a function of a node to its neighbours), breadth-first
+        """
+        nodes = [node]
+        visited = set(nodes)
+        for current in nodes:
+            for neighbour in edges(current):
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    nodes.append(neighbour)
+        return nodes
+
+    def ancestors(self, class_uri):
+        return self.hierarchy.ancestors(class_uri)
+
+    def descendants(self, class_uri):
+        return self.hierarchy.descendants(class_uri)
+
+    def is_subclass(self, subclass, superclass):
+        return self.hierarchy.is_subclass(subclass, superclass)
+
+    def query_class_schema(self, class_uri, graph_uri, lang=None):
+        """
+        Result of get_class.QUERY_CLASS_SCHEMA
+        """
+        rows = []
+        if self._has_type(class_uri, OWL_CLASS, graph_uri):
+            comments = self._labels(class_uri, RDFS_COMMENT, lang, graph_uri) or [None]
+            rows = product(self._labels(class_uri, RDFS_LABEL, lang, graph_uri), comments)
+        return build_result(["title", "comment"], rows)
+
+    def query_superclasses(self, class_uri):
+        """
+        Result of get_class.QUERY_SUPERCLASS: the class and its superclasses, the nearest first
+        """
+        rows = [(uri_term(uri),) for uri in self.ancestors(class_uri) if self._has_type(uri, OWL_CLASS)]
+        return build_result(["class"], rows)
+
+    def query_cardinalities(self, class_uri):
+        """
+        Result of get_class.QUERY_CARDINALITIES, without the enumerated values (which are not used)
+        """
+        rows = []
+        for node in self.ancestors(class_uri):
+            ranges = distinct(term for predicate in RESTRICTION_RANGES for term in self._objects(node, predicate))
+            for predicate in self._objects(node, OWL_ON_PROPERTY):
+                rows.extend(product([predicate],
+                                    self._objects(node, OWL_MIN_QUALIFIED_CARDINALITY) or [None],
+                                    self._objects(node, OWL_MAX_QUALIFIED_CARDINALITY) or [None],
+                                    ranges or [None]))
+        return build_result(["predicate", "min", "max", "range"], distinct(rows))
+
+    def query_predicates(self, superclasses):
+        """
+        Result of get_class.QUERY_PREDICATE_WITHOUT_LANG: titles, comments and labels of ranges in all
+        languages, from which get_class.select_predicates_language selects the ones of the request.
+        """
+        rows = []
+        for class_uri in distinct(superclasses):
+            for (predicate, predicate_graph) in self.domains.get(class_uri, ()):
+                types = [term for term in self._objects(predicate, RDF_TYPE) if term[0] in (OBJECT_PROPERTY, DATATYPE_PROPERTY)]
+                titles = self._objects(predicate, RDFS_LABEL)
+                ranges = self._ranges(predicate)
+                if not (types and titles and ranges):
+                    continue
+                comments = self._objects(predicate, RDFS_COMMENT) or [None]
+                super_properties = self._objects(predicate, RDFS_SUBPROPERTY_OF) or [None]
+                unique_values = self._objects(predicate, self.uniqueness_property) or [None]
+                for range_ in ranges:
+                    range_labels = [(uri_term(graph_uri), term) for (graph_uri, term)
+                                    in self._objects_by_graph(range_[0], RDFS_LABEL)] or [(None, None)]
+                    for (comment, type_, title, (range_graph, range_label), super_property, unique_value) in \
+                            product(comments, types, titles, distinct(range_labels), super_properties, unique_values):
+                        rows.append((uri_term(predicate), uri_term(predicate_graph), comment, type_, range_, title,
+                                     range_graph, range_label, super_property, uri_term(class_uri), unique_value))
+        return build_result(PREDICATE_VARIABLES, distinct(rows))
+
+    def query_predicate_ranges(self, target, lang=None):
+        """
+        Result of suggest.QUERY_PREDICATE_RANGES: the ranges of target and their subclasses
+        """
+        rows = []
+        for root_range in self._ranges(target):
+            for range_uri in self.descendants(root_range[0]):
+                graphs = [uri_term(graph_uri) for (graph_uri, term) in self._objects_by_graph(range_uri, RDF_TYPE)
+                          if term[0] == OWL_CLASS]
+                rows.extend(product([uri_term(range_uri)], self._labels(range_uri, RDFS_LABEL, lang), graphs))
+        return build_result(["range", "range_label", "range_graph"], distinct(rows))
+
+    def query_subproperties(self, super_property):
+        """
+        Result of utils.sparql.QUERY_SUBPROPERTIES: the direct and indirect subproperties of super_property
+        """
+        subproperties = self._closure(super_property, lambda node: sorted(self.subproperties.get(node, ())))[1:]
+        return build_result(["property"], [(uri_term(uri),) for uri in subproperties])
+
+
+_model = None
+_refresh_callback = None
+_change_listener = None
+
+
+def get_ontology_model(triplestore_config):
+    """
+    Return the model, if it is loaded from the triplestore of triplestore_config, or None,
+    in which case the triplestore must be queried.
+    """
+    if _model is not None and _model.loaded and _model.triplestore_config == triplestore_config:
+        return _model
+    return None
+
+
+def load_ontology_model(graph_fingerprints=None, triplestore_config=None, force_graphs=()):
+    """
+    Load (or refresh) the model of the triplestore of triplestore_config (the default one, if not given).
+    It runs without greenlets, so it must be called outside the IOLoop (e.g. at startup).
+    If it fails, schemas are queried from the triplestore until a scheduled refresh loads it.
+    """
+    global _model
+    if not settings.ONTOLOGY_MODEL_ENABLED:
+        return
+    try:
+        triplestore_config = triplestore_config or config_parser.parse_section()
+        if _model is None or _model.triplestore_config != triplestore_config:
+            _model = OntologyModel(triplestore_config)
+        _model.refresh(graph_fingerprints, async=False, force_graphs=force_graphs)
+    except Exception as e:
+        log.logger.error(_(u"Ontology model: failed to load it, schemas will be queried from the triplestore: {0}").format(e))
+
+
+def refresh_ontology_model(force_graphs=()):
+    """
+    Refresh the model within the IOLoop. If it fails, the model loaded before keeps being used.
+    If any graph changed, the listener given to schedule_ontology_refresh is called with the schemas
+    affected by the change (see OntologyModel.affected_schemas).
+    """
+    if _model is None:
+        return []
+    (class_digests, hierarchy, loaded) = (_model.class_digests, _model.hierarchy, _model.loaded)
+    try:
+        changed = _model.refresh(force_graphs=force_graphs)
+    except Exception as e:
+        log.logger.error(_(u"Ontology model: failed to refresh it: {0}").format(e))
+        return []
+    # the schemas cached while the model was not loaded were queried from the triplestore, so they are up to date
+    if changed and loaded and _change_listener is not None:
+        schemas = _model.affected_schemas(class_digests, hierarchy)
+        log.logger.info(_(u"Ontology model: {0} schemas affected by the change of {1}").format(len(schemas), u", ".join(changed)))
+        if schemas:
+            _change_listener(schemas)
+    return changed
+
+
+def reload_graphs(graph_uris):
+    """
+    Reload graph_uris (e.g. a graph whose class was edited, even if its fingerprint did not change yet)
+    in this process, and ask the other processes to reload them as well.
+    """
+    if _model is None:
+        return []
+    cache.publish_graphs_reload(graph_uris)
+    return refresh_ontology_model(force_graphs=graph_uris)
+
+
+def _refresh_periodically():
+    # the listener of the reloads asked by other processes is started here, in the IOLoop of each process
+    cache.ensure_invalidation_listener(lambda graph_uris: greenlet_spawn(lambda: refresh_ontology_model(force_graphs=graph_uris)))
+    greenlet_spawn(refresh_ontology_model)
+
+
+def schedule_ontology_refresh(change_listener=None):
+    """
+    Refresh the model every settings.ONTOLOGY_MODEL_REFRESH_SECS, in a greenlet, once the IOLoop is started.
+    change_listener, if given, is called with the list of (graph_uri, class_uri) of the schemas affected
+    by each change of the ontology, e.g. to compute them again (see warm_up.recompute_schemas).
+    """
+    global _refresh_callback, _change_listener
+    _change_listener = change_listener
+    if _model is None or not settings.ONTOLOGY_MODEL_REFRESH_SECS or _refresh_callback is not None:
+        return
+    _refresh_callback = PeriodicCallback(_refresh_periodically, settings.ONTOLOGY_MODEL_REFRESH_SECS * 1000)
+    _refresh_callback.start()
+
+
+def status():
+    if _model is None:
+        return {"loaded": False}
+    return dict(_model.stats(), loaded=_model.loaded)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from tornado.httpserver import HTTPRequest
+from tornado.web import RequestHandler
+
+from brainiak import log, settings
+from brainiak.greenlet_tornado import greenlet_spawn
+from brainiak.schema.get_class import build_class_params, get_cached_schema, get_schemas
+from brainiak.utils import cache
+from brainiak.utils.i18n import _
+from brainiak.utils.params import ParamDict
+
+
+def schedule_warm_up(application):
+    """
+    Warm up the schemas in a greenlet, once the IOLoop is started, so the process does not wait for it.
+    """
+    if settings.ENABLE_CACHE and settings.CACHE_WARM_UP_SCHEMAS:
+        greenlet_spawn(lambda: warm_up_schemas(application))
+
+
+def warm_up_schemas(application):
+    """
+    Cache the schemas of the settings.CACHE_WARM_UP_SCHEMAS most requested classes (see
+    cache.record_schema_request) in the namespace of this process, which may be new, so the first
+    requests after a deploy do not all miss. Only one process warms up each namespace.
+    """
+    if not cache.acquire_warm_up():
+        return
+    schemas = cache.most_requested_schemas(settings.CACHE_WARM_UP_SCHEMAS) or []
+    warmed_up = 0
+    for (context_name, class_name) in schemas:
+        try:
+            get_cached_schema(build_schema_params(application, context_name, class_name))
+            warmed_up += 1
+        except Exception as e:
+            log.logger.error(_(u"Cache: failed to warm up the schema of {0}/{1}: {2}").format(context_name, class_name, e))
+    log.logger.info(_(u"Cache: warmed up {0} of {1} schemas").format(warmed_up, len(schemas)))
+
+
+def schedule_recompute(application):
+    """
+    Listener of the changes of the ontology (see ontology_model.schedule_ontology_refresh) which
+    recomputes the schemas they affect in a greenlet, so the refresh does not wait for it.
+    """
+    return lambda schemas: greenlet_spawn(lambda: recompute_schemas(application, schemas))
+
+
+def recompute_schemas(application, schemas):
+    """
+    Compute again and cache the schemas, given as (graph_uri, class_uri), which are cached (see
+    cache.recompute_many), e.g. the ones affected by a change of the ontology, instead of serving them
+    stale until they expire or purging every schema: the ones not cached are computed when requested.
+    """
+    if not settings.ENABLE_CACHE:
+        return
+    try:
+        base_params = build_schema_params(application, "_", "_")
+        params_list = [build_class_params(base_params, class_uri, graph_uri) for (graph_uri, class_uri) in schemas]
+        recomputed = cache.recompute_many([cache.build_key_for_class(params) for params in params_list],
+                                          get_schemas, params_list,
+                                          tags=[cache.build_class_tags(params) for params in params_list])
+    except Exception as e:
+        log.logger.error(_(u"Cache: failed to recompute {0} schemas: {1}").format(len(schemas), e))
+        return
+    log.logger.info(_(u"Cache: recomputed {0} of {1} schemas affected by the change of the ontology").format(len(recomputed), len(schemas)))
+
+
+def build_schema_params(application, context_name, class_name):
+    """
+    ParamDict of a request of the schema of a class (see handlers.ClassHandler) with the default parameters.
+    Its host and path are not part of the schemas cached, which are stored without their links (see get_cached_schema).
+    """
+    request = HTTPRequest("GET", u"/{0}/{1}/_schema".format(context_name, class_name), host="localhost")
+    return ParamDict(RequestHandler(application, request), context_name=context_name, class_name=class_name)
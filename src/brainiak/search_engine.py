@@ -5,7 +5,7 @@ import urllib
 from tornado.httpclient import HTTPRequest
 from tornado.httpclient import HTTPError as ClientHTTPError
 
-from brainiak import log
+from brainiak import circuit_breaker, log
 from brainiak.greenlet_tornado import greenlet_fetch
 from brainiak.settings import ELASTICSEARCH_ENDPOINT
 
@@ -145,9 +145,13 @@ def delete_instance(index_name, type_name, instance_id):
 
 
 def _do_request(request_params):
+    breaker = circuit_breaker.get_breaker(u"elasticsearch {0}".format(ELASTICSEARCH_ENDPOINT))
+    # searches and writes of the index have their own timeouts
+    operation = request_params.get("method", "GET")
+    request_params["request_timeout"] = breaker.timeout(operation)
     request = HTTPRequest(**request_params)
     time_i = time.time()
-    response = greenlet_fetch(request)
+    response = breaker.call(greenlet_fetch, (request,), operation=operation)
     time_f = time.time()
     time_diff = time_f - time_i
 
@@ -7,11 +7,13 @@ from tornado.ioloop import IOLoop
 from tornado.options import define, options, parse_command_line
 from tornado.web import Application as TornadoApplication
 
-from brainiak import log, settings
+from brainiak import __version__, log, settings
 from brainiak.greenlet_tornado import greenlet_set_ioloop
 from brainiak.routes import ROUTES
 from brainiak import event_bus
-from brainiak.utils.cache import flushall
+from brainiak.schema.ontology_model import load_ontology_model, schedule_ontology_refresh
+from brainiak.schema.warm_up import schedule_recompute, schedule_warm_up
+from brainiak.utils.cache import set_namespace
 from brainiak.utils.sparql import load_label_properties
 
 
@@ -27,10 +29,13 @@ class Application(TornadoApplication):
             log.initialize()
             event_bus.initialize()
             load_label_properties()
-            # Wipeout all entries to avoid inconsistencies due to algorithmic changes between releases
-
-            flushall()
+            # Avoid inconsistencies due to algorithmic changes between releases
+            set_namespace(__version__)
+            # If the triplestore is not available, schemas are queried from it until the model is loaded
+            load_ontology_model()
             super(Application, self).__init__(ROUTES, debug=debug)
+            schedule_warm_up(self)
+            schedule_ontology_refresh(schedule_recompute(self))
         except Exception as e:
             sys.stdout.write(u"Failed to initialize application. {0}".format(unicode(e)))
             traceback.print_exc(file=sys.stdout)
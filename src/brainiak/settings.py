@@ -5,8 +5,79 @@ DEBUG = False
 
 REDIS_ENDPOINT = 'localhost'
 REDIS_PORT = 6379
+# Within requests, Redis is accessed without blocking the IOLoop (see brainiak.greenlet_redis), through at most
+# REDIS_MAX_CONNECTIONS connections per process. Commands fail (and are handled as cache misses) when Redis does not
+# answer in REDIS_TIMEOUT_SECS, when connecting takes more than REDIS_CONNECT_TIMEOUT_SECS, or when no connection is
+# free in REDIS_POOL_TIMEOUT_SECS
+REDIS_MAX_CONNECTIONS = 10
+REDIS_TIMEOUT_SECS = 0.5
+REDIS_CONNECT_TIMEOUT_SECS = 0.5
+REDIS_POOL_TIMEOUT_SECS = 0.5
+# In-process LRU cache in front of Redis (see brainiak.utils.local_cache), bounded by number of
+# entries and bytes. Entries are dropped when any process publishes their invalidation in
+# CACHE_INVALIDATION_CHANNEL, or after LOCAL_CACHE_TTL_SECS. LOCAL_CACHE_MAX_ENTRIES = 0 disables it
+LOCAL_CACHE_MAX_ENTRIES = 1000
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+LOCAL_CACHE_TTL_SECS = 60
+CACHE_INVALIDATION_CHANNEL = "brainiak##cache_invalidation"
+CACHE_INVALIDATION_RETRY_SECS = 5
+# Responses cached by memoize are still served for CACHE_STALE_SECS after they expire, while they are
+# recomputed in background. Hot entries are refreshed a bit earlier, more eagerly the greater
+# CACHE_EARLY_REFRESH_BETA is (0 disables it)
+CACHE_STALE_SECS = 12 * 60 * 60
+CACHE_EARLY_REFRESH_BETA = 1.0
+# When a process starts with a new cache namespace (a new release), the schemas of the
+# CACHE_WARM_UP_SCHEMAS most requested classes are cached in background (0 disables it). Requests of schemas
+# are counted in each process and sent to Redis every CACHE_WARM_UP_FLUSH_EVERY requests
+CACHE_WARM_UP_SCHEMAS = 50
+CACHE_WARM_UP_FLUSH_EVERY = 100
+# On a miss, only the process which takes the lock of the key computes it, while the others check every
+# CACHE_RECOMPUTE_POLL_SECS whether it was stored. The lock expires after CACHE_RECOMPUTE_LOCK_MS, but it is extended
+# while its holder computes the key. The others compute it themselves when the lock is released or expires without
+# it, or after CACHE_RECOMPUTE_WAIT_SECS (as long as the slowest query may take). CACHE_RECOMPUTE_LOCK_MS = 0 disables it
+CACHE_RECOMPUTE_LOCK_MS = 5000
+CACHE_RECOMPUTE_POLL_SECS = 0.05
+CACHE_RECOMPUTE_WAIT_SECS = 20
+# Classes and properties are kept in memory (see brainiak.schema.ontology_model), so schemas are built without
+# querying the triplestore. Graphs are loaded in pages of ONTOLOGY_MODEL_PAGE_SIZE triples, and reloaded when their
+# fingerprint changes, which is checked every ONTOLOGY_MODEL_REFRESH_SECS (0 disables it)
+ONTOLOGY_MODEL_ENABLED = True
+ONTOLOGY_MODEL_REFRESH_SECS = 60
+ONTOLOGY_MODEL_PAGE_SIZE = 10000
+# Without the ontology model, fetch the parts of a schema in a single query, in all languages (see
+# get_class.QUERY_SCHEMA), instead of four or five queries. Off until tools/benchmark_schema.py shows it is
+# faster on the triplestore in use
+SCHEMA_SINGLE_QUERY = False
+# Maximum number of classes whose schemas are requested at once (POST /_schemas)
+SCHEMAS_MAX_CLASSES = 100
 
 TRIPLESTORE_CONFIG_FILEPATH = 'src/brainiak/triplestore.ini'
+# Size of the keep-alive connection pool kept for each triplestore.ini section,
+# unless the section defines max_connections
+TRIPLESTORE_MAX_CONNECTIONS = 10
+# A triplestore endpoint (e.g. one of the read replicas listed in read_urls) is not used for
+# TRIPLESTORE_EJECTION_SECS after TRIPLESTORE_EJECTION_FAILURES consecutive failures
+TRIPLESTORE_EJECTION_FAILURES = 3
+TRIPLESTORE_EJECTION_SECS = 30
+# Maximum number of rows returned by a stored query execution (None means no limit).
+# The transfer of the triplestore response is aborted once the limit is reached
+STORED_QUERY_MAX_ROWS = None
+
+# Circuit breakers of the triplestore and Elasticsearch endpoints (see brainiak.circuit_breaker):
+# the breaker opens for CIRCUIT_BREAKER_OPEN_SECS when, among the last CIRCUIT_BREAKER_WINDOW
+# requests (and at least CIRCUIT_BREAKER_MIN_CALLS), the rate of failures reaches CIRCUIT_BREAKER_ERROR_RATE
+CIRCUIT_BREAKER_WINDOW = 20
+CIRCUIT_BREAKER_MIN_CALLS = 10
+CIRCUIT_BREAKER_ERROR_RATE = 0.5
+CIRCUIT_BREAKER_OPEN_SECS = 10
+# Request timeout of each operation of an endpoint (e.g. a query template): ADAPTIVE_TIMEOUT_FACTOR times the p99
+# of its last ADAPTIVE_TIMEOUT_SAMPLES latencies (timeouts included), kept between ADAPTIVE_TIMEOUT_MIN_SECS and
+# ADAPTIVE_TIMEOUT_MAX_SECS. ADAPTIVE_TIMEOUT_MAX_SECS is used until ADAPTIVE_TIMEOUT_MIN_SAMPLES latencies are known
+ADAPTIVE_TIMEOUT_FACTOR = 3
+ADAPTIVE_TIMEOUT_SAMPLES = 200
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_MIN_SECS = 1
+ADAPTIVE_TIMEOUT_MAX_SECS = 20
 
 ELASTICSEARCH_ENDPOINT = 'localhost:9200'
 
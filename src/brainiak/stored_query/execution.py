@@ -2,8 +2,8 @@ import copy
 
 from tornado.web import HTTPError
 
-from brainiak import log
-from brainiak.triplestore import query_sparql
+from brainiak import log, settings
+from brainiak.triplestore import query_sparql_stream
 from brainiak.utils.i18n import _
 from brainiak.utils.sparql import compress_keys_and_values
 
@@ -12,6 +12,9 @@ QUERY_EXECUTION_LOG_FORMAT = "Stored Query [{query_id}] - app {app_name} - {url}
 
 NO_RESULTS_MESSAGE_FORMAT = "The query returned no results. SPARQL endpoint [{0}]\n  Query: {1}"
 
+TRUNCATED_MESSAGE_FORMAT = "The query returned more than {0} rows, only the first {0} are listed. " + \
+    "Use LIMIT/OFFSET in the query to fetch the others"
+
 
 def execute_query(query_id, stored_query, querystring_params):
     query = get_query(stored_query, querystring_params)
@@ -22,15 +25,23 @@ def execute_query(query_id, stored_query, querystring_params):
     request_dict.update({"query": query})
     log.logger.info(QUERY_EXECUTION_LOG_FORMAT.format(**request_dict))
 
-    result_dict = query_sparql(query,
-                               querystring_params.triplestore_config)
-    items = compress_keys_and_values(result_dict)
+    # rows are compressed while the response is received, the raw response is never held in memory
+    rows = query_sparql_stream(query,
+                               querystring_params.triplestore_config,
+                               max_rows=settings.STORED_QUERY_MAX_ROWS,
+                               query_name=u"stored query {0}".format(query_id))
+    items = compress_keys_and_values(rows)
     if not items:
         message = NO_RESULTS_MESSAGE_FORMAT.format(querystring_params.triplestore_config["url"], query)
         return {
             "items": [],
             # TODO explain in which instance of Virtuoso the query was executed?
             "warning": message}
+    if rows.truncated:
+        return {
+            "items": items,
+            "truncated": True,
+            "warning": TRUNCATED_MESSAGE_FORMAT.format(settings.STORED_QUERY_MAX_ROWS)}
     return {"items": items}
 
 
@@ -5,16 +5,17 @@ from tornado.web import HTTPError
 from brainiak import settings, triplestore
 from brainiak.prefixes import uri_to_slug, safe_slug_to_prefix
 from brainiak.schema.get_class import get_cached_schema
+from brainiak.schema.ontology_model import get_ontology_model
 from brainiak.search_engine import run_search, run_analyze
 from brainiak.utils import resources
 from brainiak.utils.i18n import _
 from brainiak.utils.sparql import is_result_empty, add_language_support, \
-    filter_values, LABEL_PROPERTIES, get_subproperties
+    filter_values, LABEL_PROPERTIES, build_subproperties_query
 
 
 def do_suggest(query_params, suggest_params):
     search_params = suggest_params["search"]
-    range_result = _get_predicate_ranges(query_params, search_params)
+    (range_result, search_fields) = _get_predicate_ranges_and_search_fields(query_params, search_params)
     if is_result_empty(range_result):
         message = _(u"Either the predicate {0} does not exists or it does not have any rdfs:range defined in the triplestore")
         message = message.format(search_params["target"])
@@ -24,7 +25,7 @@ def do_suggest(query_params, suggest_params):
     graphs = _validate_graph_restriction(query_params, range_result)
     indexes = ["semantica." + uri_to_slug(graph) for graph in graphs]
 
-    search_fields = list(set(_get_search_fields(query_params, suggest_params) + LABEL_PROPERTIES))
+    search_fields = list(set(search_fields + LABEL_PROPERTIES))
 
     response_params = suggest_params.get("response", {})
     response_fields = _get_response_fields(
@@ -114,27 +115,37 @@ def _build_predicate_ranges_query(query_params, search_params):
     return QUERY_PREDICATE_RANGES % params
 
 
-def _get_predicate_ranges(query_params, search_params):
-    query = _build_predicate_ranges_query(query_params, search_params)
-    return triplestore.query_sparql(query, query_params.triplestore_config)
+def _build_predicate_ranges_cache_tags(search_params):
+    # the graph of the target predicate, by the convention of the prefix of its URI
+    return [search_params["target"].rsplit("/", 1)[0] + "/"]
 
 
-QUERY_SUBPROPERTIES = u"""
-DEFINE input:inference <%(ruleset)s>
-SELECT DISTINCT ?property WHERE {
-  ?property rdfs:subPropertyOf <%(property)s>
-}
-"""
-
+def _get_predicate_ranges_and_search_fields(query_params, search_params):
+    """
+    Query concurrently the ranges of the target predicate and the subproperties
+    of each of the search fields. Return the ranges result and the search fields
+    extended with their subproperties.
+    """
+    search_fields_in_search_params = search_params.get("fields", [])
+    model = get_ontology_model(query_params.triplestore_config)
+    if model is not None:
+        search_fields = set(search_fields_in_search_params)
+        for field in search_fields_in_search_params:
+            search_fields.update(filter_values(model.query_subproperties(field), "property"))
+        range_result = model.query_predicate_ranges(search_params["target"], query_params.get("lang"))
+        return (range_result, list(search_fields))
+
+    queries = [{"query": _build_predicate_ranges_query(query_params, search_params), "query_name": "QUERY_PREDICATE_RANGES",
+                "cache_tags": _build_predicate_ranges_cache_tags(search_params)}]
+    queries.extend([{"query": build_subproperties_query(field), "query_name": "QUERY_SUBPROPERTIES"}
+                    for field in search_fields_in_search_params])
+    results = triplestore.query_sparql_many(queries, query_params.triplestore_config, raise_errors=True)
 
-def _get_search_fields(query_params, search_params):
-    search_fields_in_search_params = search_params.get("search", []).get("fields", [])
     search_fields = set(search_fields_in_search_params)
-    for field in search_fields_in_search_params:
-        sub_properties = get_subproperties(field)
-        search_fields.update(sub_properties)
+    for subproperties_result in results[1:]:
+        search_fields.update(filter_values(subproperties_result, "property"))
 
-    return list(search_fields)
+    return (results[0], list(search_fields))
 
 
 def _validate_class_restriction(search_params, range_result):
@@ -190,7 +201,8 @@ def _build_class_fields_query(classes, field):
 
 def _get_class_fields_value(query_params, classes, meta_field):
     query = _build_class_fields_query(classes, meta_field)
-    class_field_query_response = triplestore.query_sparql(query, query_params.triplestore_config)
+    class_field_query_response = triplestore.query_sparql(query, query_params.triplestore_config,
+                                                          query_name="QUERY_CLASS_FIELDS")
     class_field_values = filter_values(class_field_query_response, "field_value")
     return class_field_values
 
@@ -227,8 +239,11 @@ def _get_required_fields_from_schema_response(schema):
 
 def _get_response_fields_from_meta_fields(query_params, response_params, classes):
     meta_fields_response = set([])
-    for meta_field in response_params.get("meta_fields", []):
-        meta_field_values = _get_class_fields_value(query_params, classes, meta_field)
+    queries = [{"query": _build_class_fields_query(classes, meta_field), "query_name": "QUERY_CLASS_FIELDS"}
+               for meta_field in response_params.get("meta_fields", [])]
+    results = triplestore.query_sparql_many(queries, query_params.triplestore_config, raise_errors=True)
+    for class_field_query_response in results:
+        meta_field_values = filter_values(class_field_query_response, "field_value")
         for meta_field_value in meta_field_values:
             values = meta_field_value.split(",")
             values = [v.strip() for v in values]
@@ -1,23 +1,27 @@
 # -*- coding: utf-8 -*-
 import copy
+import re
 import time
 import urllib
+from collections import deque
+from functools import partial
 
-import requests
-from requests.auth import HTTPDigestAuth
+import greenlet
 import ujson as json
-from simplejson import JSONDecodeError
 
-from tornado.httpclient import HTTPRequest
+from tornado.httpclient import AsyncHTTPClient, HTTPClient, HTTPRequest
 from tornado.httpclient import HTTPError as ClientHTTPError
 from tornado.web import HTTPError
 
-from brainiak import log
-from brainiak.greenlet_tornado import greenlet_fetch
+from brainiak import circuit_breaker, log, settings
+from brainiak.greenlet_tornado import greenlet_fetch, greenlet_gather, greenlet_get_ioloop, is_ioloop_running
+from brainiak.utils import cache, query_stats
+from brainiak.utils.bindings_decoder import BindingsDecoder, BindingsDecoderError
+from brainiak.utils.sparql_result import decode_sparql_results
 from brainiak.utils.config_parser import parse_section
 
 
-JSON_DECODE_ERROR_MESSAGE = "Could not decode JSON:\n  {0}"
+INCOMPLETE_BINDINGS_MESSAGE = u"The triplestore response has no complete results.bindings list"
 UNAUTHORIZED_MESSAGE = 'Check triplestore user and password.'
 
 DEFAULT_VIRTUOSO_REQUEST_HEADERS = {
@@ -26,31 +30,452 @@ DEFAULT_VIRTUOSO_REQUEST_HEADERS = {
 DEFAULT_RESPONSE_FORMAT = "application/sparql-results+json"
 DEFAULT_HTTP_METHOD = "POST"
 
+# Keys of triplestore.ini sections which configure Brainiak itself and are not request parameters
+CLIENT_CONFIG_KEYS = ("app_name", "max_connections", "read_urls")
+READ_URLS_SEPARATOR = re.compile(r"[\s,]+")
+# Response codes which mean that the endpoint itself failed (599 is a curl error, such as a timeout)
+ENDPOINT_FAILURE_CODE = 500
 
-def do_run_query(request_params, async):
-    # app_name (from triplestore.ini) can't be passed forward to tornado.httpclient.HTTPRequest .
-    # It raises an exception
-    # Similarly, there are parameters that make requests.request fail
-    request_params.pop("app_name", None)
 
-    time_i = time.time()
-    if async:
-        request = HTTPRequest(**request_params)
+def is_endpoint_failure(code):
+    return code is not None and code >= ENDPOINT_FAILURE_CODE
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of keep-alive connections to a single triplestore endpoint, used on behalf of
+    a single client id (section of triplestore.ini).
+
+    Each pool owns its own curl client, so connections are reused across SPARQL queries and
+    requests of one client id never wait for slots used by another one. When all the
+    max_clients slots are busy, the calling greenlet is queued until a slot is released.
+
+    The pool also tracks the health of its endpoint: after settings.TRIPLESTORE_EJECTION_FAILURES
+    consecutive failures (5xx responses or connection errors) it is unavailable for
+    settings.TRIPLESTORE_EJECTION_SECS. A single failure after that period ejects it again,
+    and a single success makes it healthy.
+    """
+
+    def __init__(self, url, app_name, max_clients):
+        self.url = url
+        self.app_name = app_name
+        self.max_clients = max_clients
+        self.active = 0
+        self.waiting = deque()
+        self.total_requests = 0
+        self.total_queued = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.total_ejections = 0
+        self._http_client = None
+        self._io_loop = None
+
+    @property
+    def http_client(self):
+        io_loop = greenlet_get_ioloop()
+        if self._http_client is None or self._io_loop is not io_loop:
+            self._io_loop = io_loop
+            self._http_client = AsyncHTTPClient(io_loop=io_loop,
+                                                force_instance=True,
+                                                max_clients=self.max_clients)
+        return self._http_client
+
+    @property
+    def queue_depth(self):
+        return len(self.waiting)
+
+    @property
+    def outstanding(self):
+        return self.active + len(self.waiting)
+
+    def is_available(self, now=None):
+        return (now or time.time()) >= self.ejected_until
+
+    def record_outcome(self, code):
+        if not is_endpoint_failure(code):
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.TRIPLESTORE_EJECTION_FAILURES:
+            self.ejected_until = time.time() + settings.TRIPLESTORE_EJECTION_SECS
+            self.total_ejections += 1
+            log.logger.error(u"Triplestore endpoint {0} ({1}) ejected for {2}s after {3} consecutive failures".format(
+                self.url, self.app_name, settings.TRIPLESTORE_EJECTION_SECS, self.consecutive_failures))
+
+    def acquire(self):
+        self.total_requests += 1
+        if self.active < self.max_clients and not self.waiting:
+            self.active += 1
+            return
+
+        current = greenlet.getcurrent()
+        queued_at = time.time()
+        self.total_queued += 1
+        self.waiting.append(current)
+        # the slot is handed over by release(), without decrementing self.active
+        current.parent.switch()
+
+        wait_time = time.time() - queued_at
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def release(self):
+        if self.waiting:
+            next_in_line = self.waiting.popleft()
+            greenlet_get_ioloop().add_callback(next_in_line.switch)
+        else:
+            self.active -= 1
+
+    def fetch(self, request):
+        self.acquire()
         try:
-            response = greenlet_fetch(request)
+            response = greenlet_fetch(request, http_client=self.http_client)
         except ClientHTTPError as e:
-            if e.code == 401:
-                raise HTTPError(e.code, message=UNAUTHORIZED_MESSAGE)
+            self.record_outcome(e.code)
+            raise
+        else:
+            self.record_outcome(response.code)
+            return response
+        finally:
+            self.release()
+
+    def stats(self):
+        if self.total_queued:
+            average_wait_time = self.total_wait_time / self.total_queued
+        else:
+            average_wait_time = 0.0
+        return {
+            "app_name": self.app_name,
+            "url": self.url,
+            "max_clients": self.max_clients,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "total_requests": self.total_requests,
+            "total_queued": self.total_queued,
+            "total_wait_time": self.total_wait_time,
+            "average_wait_time": average_wait_time,
+            "max_wait_time": self.max_wait_time,
+            "available": self.is_available(),
+            "total_ejections": self.total_ejections
+        }
+
+
+# SPARQL Update operations, which must never be coalesced
+SPARUL_PATTERN = re.compile(r"(^|\s|\})(INSERT|DELETE|MODIFY|LOAD|CLEAR|CREATE|DROP|COPY|MOVE|ADD)\s",
+                            re.IGNORECASE | re.UNICODE)
+# Quoted strings (kept as they are) or runs of whitespace (collapsed) of a query
+QUERY_WHITESPACE_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|\s+', re.UNICODE)
+
+
+def is_update_query(query):
+    return SPARUL_PATTERN.search(query) is not None
+
+
+def normalize_query(query):
+    """
+    Collapse runs of whitespace of a query into a single space, except inside quoted strings.
+
+    >>> normalize_query(u"SELECT ?s  {\n  ?s rdfs:label \"a  b\" }  ")
+    u'SELECT ?s { ?s rdfs:label "a  b" }'
+    """
+    def replace(match):
+        token = match.group()
+        return token if token[0] in "\"'" else u" "
+    return QUERY_WHITESPACE_PATTERN.sub(replace, query).strip()
+
+
+class InFlightQuery(object):
+    """
+    A read query sent to the triplestore, whose response is shared by all the greenlets
+    which asked for the same query while it was in flight.
+    """
+
+    def __init__(self):
+        self.waiting = []
+        self.response = None
+        self.error = None
+
+    def wait(self):
+        current = greenlet.getcurrent()
+        self.waiting.append(current)
+        current.parent.switch()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        io_loop = greenlet_get_ioloop()
+        for waiting in self.waiting:
+            io_loop.add_callback(waiting.switch)
+        self.waiting = []
+
+
+def parse_read_urls(triplestore_config):
+    return [url for url in READ_URLS_SEPARATOR.split(triplestore_config.get("read_urls", "")) if url]
+
+
+class TriplestoreClient(object):
+    """
+    Keeps one ConnectionPool per (endpoint, client id) pair.
+    The size of each pool is given by the max_connections key of the triplestore.ini section,
+    or by settings.TRIPLESTORE_MAX_CONNECTIONS if the section does not define it.
+
+    The url of a section is its primary endpoint, which receives all the SPARQL Update queries.
+    If the section lists read replicas in read_urls, read queries are balanced among the available
+    replicas, choosing the one with less outstanding requests. Reads go to the primary only when
+    no replica is available.
+
+    Identical read queries (same endpoint, client id and query text, ignoring whitespace) sent
+    while one of them is in flight are coalesced: only the first one reaches the triplestore and
+    the others wait for its response.
+
+    Each endpoint (the primary or a replica) has its own circuit breaker (see get_breaker), which
+    records the outcome of each request actually sent to it, once per coalesced query.
+    """
+
+    def __init__(self):
+        self.pools = {}
+        self.in_flight = {}
+        self.total_coalesced = 0
+        self.total_coalescing_leaders = 0
+        self._read_turn = 0
+
+    def _pool_key(self, triplestore_config, url=None):
+        return (url or triplestore_config["url"],
+                triplestore_config.get("app_name"),
+                triplestore_config.get("auth_username"))
+
+    def get_pool(self, triplestore_config, url=None):
+        key = self._pool_key(triplestore_config, url)
+        pool = self.pools.get(key)
+        if pool is None:
+            max_clients = int(triplestore_config.get("max_connections", settings.TRIPLESTORE_MAX_CONNECTIONS))
+            pool = self.pools[key] = ConnectionPool(key[0], key[1], max_clients)
+        return pool
+
+    def choose_pool(self, triplestore_config, read=False):
+        if read:
+            now = time.time()
+            replicas = [self.get_pool(triplestore_config, url) for url in parse_read_urls(triplestore_config)]
+            replicas = [pool for pool in replicas if pool.is_available(now)]
+            if replicas:
+                # rotate the replicas, so ties are not always won by the first one
+                self._read_turn = (self._read_turn + 1) % len(replicas)
+                replicas = replicas[self._read_turn:] + replicas[:self._read_turn]
+                return min(replicas, key=lambda pool: pool.outstanding)
+        return self.get_pool(triplestore_config)
+
+    def get_breaker(self, pool):
+        return circuit_breaker.get_breaker(u"triplestore {0}".format(pool.url))
+
+    def _build_request(self, request_params, **kwargs):
+        for key in CLIENT_CONFIG_KEYS:
+            request_params.pop(key, None)
+        request_params.update(kwargs)
+        return HTTPRequest(**request_params)
+
+    def fetch(self, request_params, query=None, operation=None):
+        """
+        Send the request to the pool of its endpoint, guarded by the circuit breaker of the endpoint
+        and with the timeout of operation (see CircuitBreaker.timeout).
+        """
+        if query is None or is_update_query(query):
+            return self._fetch(self.get_pool(request_params), request_params, operation)
+
+        key = self._pool_key(request_params) + (normalize_query(query),)
+        in_flight_query = self.in_flight.get(key)
+        if in_flight_query is not None:
+            self.total_coalesced += 1
+            return in_flight_query.wait()
+
+        in_flight_query = self.in_flight[key] = InFlightQuery()
+        self.total_coalescing_leaders += 1
+        pool = self.choose_pool(request_params, read=True)
+        try:
+            response = self._fetch(pool, request_params, operation)
+        except Exception as e:
+            in_flight_query.finish(error=e)
+            raise
+        else:
+            in_flight_query.finish(response=response)
+        finally:
+            del self.in_flight[key]
+        return response
+
+    def _fetch(self, pool, request_params, operation):
+        breaker = self.get_breaker(pool)
+        request = self._build_request(request_params, url=pool.url, request_timeout=breaker.timeout(operation))
+        return breaker.call(pool.fetch, (request,), operation=operation)
+
+    def stream(self, request_params, log_params, max_rows=None):
+        pool = self.choose_pool(request_params, read=True)
+        breaker = self.get_breaker(pool)
+        stream = BindingsStream(pool, log_params, max_rows, breaker)
+        stream.request = self._build_request(request_params, url=pool.url,
+                                             request_timeout=breaker.timeout(log_params.get("query_name")),
+                                             streaming_callback=stream.on_chunk)
+        return stream
+
+    def stats(self):
+        return [pool.stats() for (key, pool) in sorted(self.pools.items())]
+
+    def coalescing_stats(self):
+        return {
+            "in_flight": len(self.in_flight),
+            "total_coalesced": self.total_coalesced,
+            "total_coalescing_leaders": self.total_coalescing_leaders
+        }
+
+
+class BindingsStream(object):
+    """
+    Iterable over the rows of results.bindings of a SPARQL query response, which yields
+    each row as soon as it is decoded from the chunks of the body received by curl.
+
+    The request is only sent when the iteration starts, and it holds a slot of the
+    connection pool until the response is complete. If max_rows is given, at most max_rows
+    rows are yielded: the transfer is aborted as soon as a row beyond them is decoded, and
+    truncated is set. The transfer is also aborted if the iteration is stopped before the end
+    of the response.
+
+    If breaker is given, the request is not sent while it is open (see CircuitBreaker.call),
+    and the outcome of the request is recorded by it. Aborted transfers are not failures.
+    """
+
+    def __init__(self, pool, log_params, max_rows=None, breaker=None):
+        self.pool = pool
+        self.log_params = log_params
+        self.max_rows = max_rows
+        self.breaker = breaker
+        self.truncated = False
+        self.request = None
+        self.decoder = BindingsDecoder()
+        self.rows = deque()
+        self.rows_received = 0
+        self.bytes_received = 0
+        self.response = None
+        self.error = None
+        self.aborted = False
+        self._waiting = None
+        self._time_i = None
+
+    def __iter__(self):
+        assert greenlet.getcurrent().parent is not None, "BindingsStream can only be iterated (possibly indirectly) from a RequestHandler method wrapped by the greenlet_asynchronous decorator."
+        if self.breaker is not None:
+            self.breaker.before_call()
+        self.pool.acquire()
+        self._time_i = time.time()
+        try:
+            self.pool.http_client.fetch(self.request, self.on_response)
+        except:
+            self.pool.release()
+            if self.breaker is not None:
+                self.breaker.end_probe()
+            raise
+
+        try:
+            while True:
+                while self.rows:
+                    yield self.rows.popleft()
+                if self.response is not None:
+                    break
+                self._wait()
+        finally:
+            if self.response is None:
+                self.aborted = True
+
+        self._check_response()
+
+    def on_chunk(self, chunk):
+        # Runs inside curl's write function: returning 0 aborts the transfer
+        if self.aborted:
+            return 0
+        self.bytes_received += len(chunk)
+        try:
+            rows = self.decoder.feed(chunk)
+        except BindingsDecoderError as e:
+            self.error = e
+            self.aborted = True
+            self._wake_up()
+            return 0
+
+        if self.max_rows is not None and self.rows_received + len(rows) > self.max_rows:
+            rows = rows[:self.max_rows - self.rows_received]
+            self.truncated = True
+            self.aborted = True
+        if rows:
+            self.rows_received += len(rows)
+            self.rows.extend(rows)
+            self._wake_up()
+        if self.aborted:
+            return 0
+
+    def on_response(self, response):
+        self.pool.release()
+        if not self.aborted:
+            self.pool.record_outcome(response.code)
+        self.response = response
+        self.log_params["time_diff"] = time.time() - self._time_i
+        log_request(self.log_params)
+        query_name = self.log_params.get("query_name")
+        if self.breaker is not None:
+            if self.aborted:
+                self.breaker.record_success(None, query_name)
             else:
-                raise e
-    else:
-        request_params.pop("auth_mode", None)
-        request_params.pop("auth_username", None)
-        request_params.pop("auth_password", None)
+                self.breaker.record_outcome(response.code, self.log_params["time_diff"],
+                                            self.request.request_timeout, query_name)
+        if response.error and not self.aborted:
+            query_stats.record_query_error(query_name)
+        else:
+            query_stats.record_query(query_name, self.log_params["time_diff"], self.bytes_received)
+        self._wake_up()
+
+    def _wait(self):
+        self._waiting = greenlet.getcurrent()
+        self._waiting.parent.switch()
+
+    def _wake_up(self):
+        if self._waiting is not None:
+            waiting, self._waiting = self._waiting, None
+            greenlet_get_ioloop().add_callback(waiting.switch)
+
+    def _check_response(self):
+        if self.error is not None:
+            raise self.error
+        if self.aborted:
+            return
+        if self.response.error:
+            if self.response.code == 401:
+                raise HTTPError(401, message=UNAUTHORIZED_MESSAGE)
+            raise self.response.error
+        if not self.decoder.finished:
+            raise BindingsDecoderError(INCOMPLETE_BINDINGS_MESSAGE)
+
+
+class BlockingQueryError(Exception):
+    pass
+
+
+BLOCKING_QUERY_MESSAGE = u"Synchronous SPARQL queries (async=False) would block the IOLoop, " + \
+    u"they can only be run at startup or from scripts. Use query_sparql with async=True instead."
 
-        response = requests.request(**request_params)
-        if response.status_code == 401:
-            raise HTTPError(401, message=UNAUTHORIZED_MESSAGE)
+
+def do_run_query(request_params, async, query=None, query_name=None):
+    time_i = time.time()
+    try:
+        if async:
+            response = client.fetch(request_params, query, query_name)
+        else:
+            response = fetch_blocking(request_params)
+    except ClientHTTPError as e:
+        if e.code == 401:
+            raise HTTPError(e.code, message=UNAUTHORIZED_MESSAGE)
+        else:
+            raise e
 
     time_f = time.time()
     diff = time_f - time_i
@@ -58,6 +483,21 @@ def do_run_query(request_params, async):
     return response, diff
 
 
+def fetch_blocking(request_params):
+    """
+    Thin synchronous wrapper over the request sent by the asynchronous path, for startup and
+    scripts: it is fetched by a HTTPClient, which runs its own IOLoop until the response arrives.
+    It refuses to run inside the IOLoop of the server, which it would freeze for the whole round-trip.
+    """
+    if is_ioloop_running():
+        raise BlockingQueryError(BLOCKING_QUERY_MESSAGE)
+    http_client = HTTPClient()
+    try:
+        return http_client.fetch(client._build_request(request_params))
+    finally:
+        http_client.close()
+
+
 def log_request(log_params):
     """
         Just logs the request
@@ -68,48 +508,133 @@ def log_request(log_params):
     log.logger.info(log_msg)
 
 
-def _process_json_triplestore_response(response, async=True):
+def _process_json_triplestore_response(response, columnar=False):
     """
         Returns a python dict with triplestore response.
-        Unifying tornado and requests response.
+        If columnar is True, the results of SELECT queries are returned as a SparqlResult.
     """
-    if async:
-        result_dict = json.loads(unicode(response.body))
-    else:
-        try:
-            result_dict = response.json()
-        except JSONDecodeError:
-            raise ClientHTTPError(400, JSON_DECODE_ERROR_MESSAGE.format(response.text))
-    return result_dict
+    return _decode_json_body(response.body, columnar)
+
+
+def _decode_json_body(body, columnar=False):
+    if columnar:
+        return decode_sparql_results(body)
+    # ujson decodes the UTF-8 body itself, there is no need to copy it to an unicode object first
+    return json.loads(body)
 
 
-def query_sparql(query, triplestore_config, async=True):
+def _query_cache_key(query, triplestore_config):
+    query_id = u"@@".join(map(unicode, client._pool_key(triplestore_config)) + [normalize_query(query)])
+    return cache.build_key_for_query(query_id)
+
+
+def query_sparql(query, triplestore_config, async=True, columnar=False, cache_tags=None, query_name=None):
     """
     Simple interface that given a SPARQL query string returns a string representing a SPARQL results bindings
     in JSON format. For now it only works with Virtuoso, but in futurw we intend to support other databases
     that are SPARQL 1.1 complaint (including SPARQL result bindings format).
+
+    For SELECT queries with many rows, columnar=True returns a SparqlResult instead of a dict,
+    which is compatible with the dict (but read-only) and more compact, though slower to build.
+
+    cache_tags is a list with the graphs read by the query. If given (and the cache is enabled), the
+    response is cached, keyed by the normalized query, until the cache of any of these graphs is purged
+    (see cache.purge_graph_queries, called by the operations which write to a graph).
+
+    query_name names the template of the query (e.g. "QUERY_CARDINALITIES"): the latency, errors
+    and response sizes of the queries are aggregated per name, see /_status/queries.
+
+    async=False sends the same request without greenlets (see fetch_blocking), which is only
+    allowed outside the IOLoop: at startup or in scripts.
     """
-    request_params = _build_request_params(query, triplestore_config, async)
+    use_cache = bool(cache_tags) and settings.ENABLE_CACHE and not is_update_query(query)
+    if use_cache:
+        cache_key = _query_cache_key(query, triplestore_config)
+        body = cache.retrieve_raw(cache_key)
+        if body is not None:
+            log.logger.debug(u"Cache: query result HIT {0}".format(cache_key))
+            return _decode_json_body(body, columnar)
+
+    request_params = _build_request_params(query, triplestore_config)
     log_params = copy.copy(request_params)
 
-    response, time_diff = do_run_query(request_params, async)
+    try:
+        response, time_diff = do_run_query(request_params, async, query, query_name)
+    except Exception:
+        query_stats.record_query_error(query_name)
+        raise
 
     log_params["query"] = unicode(query)
     log_params["time_diff"] = time_diff
     log_request(log_params)
+    query_stats.record_query(query_name, time_diff, _response_size(response))
 
-    result_dict = _process_json_triplestore_response(response, async)
+    result_dict = _process_json_triplestore_response(response, columnar)
+    if use_cache:
+        cache.create_query_result(cache_key, response.body, cache_tags)
     return result_dict
 
+
+def _response_size(response):
+    body = response.body
+    return len(body) if body is not None else None
+
+
+def query_sparql_stream(query, triplestore_config, max_rows=None, query_name=None):
+    """
+    Streaming version of query_sparql for SELECT queries. Instead of the whole result dict,
+    returns an iterable over the rows of results.bindings, which are decoded while the
+    response is being received. So, the memory used does not grow with the size of the response.
+
+    If max_rows is given, at most max_rows rows are returned and the transfer is aborted then:
+    the truncated attribute of the iterable tells if there were more rows.
+
+    As query_sparql, it is guarded by the circuit breaker of the endpoint, with the timeout of
+    query_name, and it is sent to a read replica if there is one available.
+    """
+    request_params = _build_request_params(query, triplestore_config)
+    log_params = copy.copy(request_params)
+    log_params["query"] = unicode(query)
+    log_params["query_name"] = query_name
+    return client.stream(request_params, log_params, max_rows)
+
+
+def query_sparql_many(queries, triplestore_config, raise_errors=False, columnar=False):
+    """
+    Dispatches several independent SPARQL queries concurrently and gathers their results,
+    so the total latency is roughly the one of the slowest query instead of the sum of all.
+    Returns a list with the result dict of each query, in the same order of queries.
+
+    Errors are isolated per query: a failing query does not interrupt the others and the
+    exception it raised takes its place in the returned list. If raise_errors is True, the
+    first of these exceptions is raised after all the queries have finished.
+
+    If columnar is True, results of SELECT queries are returned as SparqlResult (see query_sparql).
+    Each query is either a query string or a dict with the query (key "query") and
+    other arguments of query_sparql, such as query_name and cache_tags.
+    """
+    functions = []
+    for query in queries:
+        kwargs = {"columnar": columnar}
+        if isinstance(query, dict):
+            kwargs.update(query)
+            query = kwargs.pop("query")
+        functions.append(partial(query_sparql, query, triplestore_config, **kwargs))
+    results = greenlet_gather(functions)
+    if raise_errors:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
+
 # This is based on virtuoso_connector app, used by App Semantica, so QA2 Virtuoso Analyser works
 format_post = u"POST - %(url)s - %(user_ip)s - %(auth_username)s [tempo: %(time_diff)s] - QUERY - %(query)s"
 
 
-def _build_request_params(query, triplestore_config, async):
+def _build_request_params(query, triplestore_config):
     """
-        This function creates a dict according to the param async.
-        If True, a dict with args for tornado.httpclient.HTTPRequest is created.
-        If False, a dict with args for requests.request interface is created.
+        This function creates a dict with args for tornado.httpclient.HTTPRequest,
+        used both by asynchronous and synchronous queries.
     """
     body_params = {
         "query": unicode(query).encode("utf-8"),
@@ -125,19 +650,7 @@ def _build_request_params(query, triplestore_config, async):
     }
 
     request_params.update(triplestore_config)
-    if async:
-        request_params.update(body_dict)
-    else:
-        request_params.update({
-            "data": body_params,
-            "url": triplestore_config["url"]})
-        if "auth_mode" in triplestore_config and \
-           "auth_username" in triplestore_config and  \
-           "auth_password" in triplestore_config:
-            # Considering all DIGEST authencations
-            auth_credentials = HTTPDigestAuth(triplestore_config["auth_username"],
-                                              triplestore_config["auth_password"])
-            request_params.update({"auth": auth_credentials})
+    request_params.update(body_dict)
 
     return request_params
 
@@ -169,7 +682,8 @@ def status():
 
     auth_msg = _run_status_request(query, endpoint_dict, info)
 
-    unauthorized_endpoint_dict.pop("auth_mode", None)
+    for key in ("auth_mode", "auth_username", "auth_password"):
+        unauthorized_endpoint_dict.pop(key, None)
 
     info.update({
         "type": u"not-authenticated",
@@ -182,9 +696,26 @@ def status():
     return msg
 
 
+POOL_USAGE_MESSAGE = u"Pool %(app_name)s | %(url)s | Active: %(active)s/%(max_clients)s | Queue depth: %(queue_depth)s | " + \
+    u"Requests: %(total_requests)s | Queued: %(total_queued)s | Average wait: %(average_wait_time).4fs | Max wait: %(max_wait_time).4fs | " + \
+    u"Available: %(available)s | Ejections: %(total_ejections)s"
+
+
+COALESCING_USAGE_MESSAGE = u"Coalesced queries: %(total_coalesced)s | Queries shared: %(total_coalescing_leaders)s | In flight: %(in_flight)s"
+
+
+def get_usage_message():
+    pools_stats = client.stats()
+    if not pools_stats:
+        return u"No connection pools were used yet"
+    lines = [POOL_USAGE_MESSAGE % pool_stats for pool_stats in pools_stats]
+    lines.append(COALESCING_USAGE_MESSAGE % client.coalescing_stats())
+    return u"<br>".join(lines)
+
+
 def _run_status_request(query, endpoint_dict, info):
     try:
-        query_sparql(query, endpoint_dict, async=False)
+        query_sparql(query, endpoint_dict, query_name="status")
     except (ClientHTTPError, HTTPError) as e:
         # Reason for this: ClientHTTPError has one pattern and HTTPError for status code attribute
         code = hasattr(e, "status_code") and e.status_code
@@ -196,3 +727,7 @@ def _run_status_request(query, endpoint_dict, info):
     else:
         message = VIRTUOSO_SUCCESS_MESSAGE % info
     return message
+
+
+# Singleton
+client = TriplestoreClient()
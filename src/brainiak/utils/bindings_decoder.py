@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import re
+
+import ujson as json
+
+
+BINDINGS_START = re.compile(r'"bindings"\s*:\s*\[')
+# A complete string, an opening quote of a string which is not complete yet, or a structural character
+BINDINGS_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|"|[{}\]]')
+
+
+class BindingsDecoderError(Exception):
+    pass
+
+
+class BindingsDecoder(object):
+    """
+    Incremental decoder of SPARQL results in JSON format (application/sparql-results+json).
+
+    Chunks of the response body are given to feed() as they arrive, and it returns the rows of
+    results.bindings which were completed by that chunk, each one decoded to a dict. Only the row
+    being received is kept in memory, instead of the whole body and the tree of dicts built from it.
+
+    Usage:
+
+    >>> decoder = BindingsDecoder()
+    >>> decoder.feed('{"head": {"vars": ["s"]}, "results": {"bindings": [{"s": {"type": "uri", ')
+    []
+    >>> decoder.feed('"value": "http://a"}}, {"s": ')
+    [{u's': {u'type': u'uri', u'value': u'http://a'}}]
+    >>> decoder.feed('{"type": "uri", "value": "http://b"}}]}}')
+    [{u's': {u'type': u'uri', u'value': u'http://b'}}]
+    >>> decoder.finished
+    True
+
+    The body is scanned as UTF-8 bytes: quotes, backslashes and braces never occur inside
+    multi-byte characters, so rows can be split anywhere between chunks.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.head = None
+        self.started = False
+        self.finished = False
+        self.rows_count = 0
+        self._position = 0
+        self._depth = 0
+        self._row_start = None
+
+    def feed(self, chunk):
+        if self.finished:
+            return []
+        self.buffer += chunk
+
+        if not self.started:
+            match = BINDINGS_START.search(self.buffer)
+            if match is None:
+                return []
+            self.started = True
+            self.head = self.buffer[:match.start()]
+            self.buffer = self.buffer[match.end():]
+            self._position = 0
+
+        rows = []
+        for token in BINDINGS_TOKEN.finditer(self.buffer, self._position):
+            value = token.group()
+            if value == '"':
+                # the string is not complete yet, resume from its beginning when more data arrives
+                self._position = token.start()
+                break
+            self._position = token.end()
+            if value == "{":
+                if not self._depth:
+                    self._row_start = token.start()
+                self._depth += 1
+            elif value == "}":
+                self._depth -= 1
+                if not self._depth:
+                    rows.append(self._decode_row(self.buffer[self._row_start:token.end()]))
+                    self._row_start = None
+            elif not self._depth:
+                # "]" closing the bindings list
+                self.finished = True
+                break
+        else:
+            self._position = len(self.buffer)
+
+        self._discard_consumed()
+        self.rows_count += len(rows)
+        return rows
+
+    def _decode_row(self, row_string):
+        try:
+            return json.loads(row_string)
+        except ValueError as e:
+            raise BindingsDecoderError(u"Could not decode row of SPARQL results: {0}".format(e))
+
+    def _discard_consumed(self):
+        if self.finished:
+            self.buffer = ""
+            self._position = 0
+            return
+        start = self._row_start if self._row_start is not None else self._position
+        if start:
+            self.buffer = self.buffer[start:]
+            self._position -= start
+            if self._row_start is not None:
+                self._row_start = 0
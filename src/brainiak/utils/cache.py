@@ -1,29 +1,76 @@
+import math
 import md5
+import os
+import random
+import socket
+import threading
+import time
 import traceback
-from email.utils import formatdate
+import uuid
+from collections import Counter
+from copy import copy
+from email.utils import formatdate, mktime_tz, parsedate_tz
 
 import redis
 import ujson
+from tornado.ioloop import IOLoop
 
 from brainiak import log
 from brainiak import settings
+from brainiak.greenlet_redis import GreenletConnectionPool, PoolTimeoutError
+from brainiak.greenlet_tornado import greenlet_gather, greenlet_sleep, greenlet_spawn
+from brainiak.prefixes import expand_uri
 from brainiak.utils.i18n import _
+from brainiak.utils.local_cache import LocalCache
 
 
 TIME_TO_LIVE_IN_SECS = 24 * 60 * 60
 
+# Params which are part of the path of the resources, already identified by the keys which use params
+KEY_EXCLUDED_PARAMS = ('class_name', 'class_prefix', 'context_name', 'instance_prefix', 'instance_id', 'graph_uri', 'class_uri')
+# Params applied to the cached instances when they are read (see brainiak.instance.get_instance.instance_view)
+INSTANCE_VIEW_PARAMS = ('lang', 'expand_uri', 'meta_properties')
+
+
+# # params (see build_canonical_params) are part of every key which depends on request arguments
+def build_canonical_params(query_params, excluded_keys=KEY_EXCLUDED_PARAMS):
+    """
+    Return the params of a ParamDict which change the response, in a canonical form, so that
+    equivalent requests share the same key: params whose values equal their defaults (see
+    ParamDict.defaults) are dropped, prefixed URIs are expanded and the remaining params are sorted.
+    E.g. ?page=2&lang=en, ?lang=en&page=2 and ?lang=en&page=2&expand_uri=0 give lang=en&page=1
+    """
+    defaults = getattr(query_params, "defaults", {})
+    params = []
+    for (name, value) in sorted(query_params.items()):
+        if (name in excluded_keys) or (value is None):
+            continue
+        if isinstance(value, basestring):
+            value = expand_uri(value)
+        if name in defaults and value == expand_uri(defaults[name] or u""):
+            continue
+        params.append(u"{0}={1}".format(name, value))
+    return u"&".join(params)
+
+
+# path@@params##request
+def build_key_for_request(query_params):
+    return u"{0}@@{1}##request".format(query_params.request.path, build_canonical_params(query_params))
+
+
 # # Root-related
 build_key_for_root_schema = lambda: u"_##json_schema"
 
 
 # @@params##root
 def build_key_for_root(query_params):
-    return u"@@{0}##root".format(query_params.to_string())
+    return u"@@{0}##root".format(build_canonical_params(query_params))
 
 
 # _@@_/_@@instance_uri@@params##instance
 def build_instance_key(query_params):
-    return u"_@@_@@{0}@@{1}##instance".format(query_params["instance_uri"], query_params.to_string())
+    params = build_canonical_params(query_params, KEY_EXCLUDED_PARAMS + INSTANCE_VIEW_PARAMS)
+    return u"_@@_@@{0}@@{1}##instance".format(query_params["instance_uri"], params)
 
 
 # graph_uri@@class_uri@@instance_uri##instance
@@ -33,7 +80,11 @@ def build_instance_key(query_params):
 
 # # Class/collection-related
 build_key_for_class = lambda query_params: u"{0}@@{1}##class".format(query_params["graph_uri"], query_params["class_uri"])
-# # graph_uri@@class_uri##collection
+
+
+# graph_uri@@class_uri@@params##collection
+def build_key_for_collection(query_params):
+    return u"{0}@@{1}@@{2}##collection".format(query_params["graph_uri"], query_params["class_uri"], build_canonical_params(query_params))
 # # graph_uri@@class_uri##json_schema
 
 # # Instance-related
@@ -43,6 +94,72 @@ build_key_for_class = lambda query_params: u"{0}@@{1}##class".format(query_param
 # # graph@@predicate##range
 # # graph@@predicate##subproperty
 
+# # Query-related
+# # md5(endpoint@@normalized query)##query
+build_key_for_query = lambda query_id: u"{0}##query".format(md5.new(query_id.encode("utf-8")).hexdigest())
+
+# # Lock-related
+# # key##lock (held by the process which computes key after a miss, see acquire_recompute_lock)
+build_key_for_lock = lambda key: u"{0}##lock".format(key)
+
+# # Tag-related
+# # tag##tag (set of the keys tagged with tag, see create_tagged and purge_tags)
+build_key_for_tag = lambda tag: u"{0}##tag".format(tag)
+# # Tags of the instances (instance@@instance_uri, class@@class_uri, graph@@graph_uri and instances)
+build_instance_tag = lambda instance_uri: u"instance@@{0}".format(instance_uri)
+build_class_tag = lambda class_uri: u"class@@{0}".format(class_uri)
+build_graph_tag = lambda graph_uri: u"graph@@{0}".format(graph_uri)
+ALL_INSTANCES_TAG = u"instances"
+# # Tag of the schemas of a class (##class keys)
+build_schema_tag = lambda class_uri: u"schema@@{0}".format(class_uri)
+# # Tag of the listings of the instances of a class (##collection keys)
+build_collection_tag = lambda class_uri: u"collection@@{0}".format(class_uri)
+# # Tag of the listings of the root (##root keys)
+ROOT_TAG = u"root"
+# # Tag of the query results which read graph_uri (##query keys)
+# graph_uri may also be the URI of a class, for queries which only read its definition
+build_query_tag = lambda graph_uri: u"query@@{0}".format(graph_uri)
+
+
+def build_instance_tags(query_params):
+    """
+    Requests which do not give the class or the graph of the instance (e.g. /_/_/_?instance_uri=...)
+    have "_" in their place, so they are tagged only by the instance, not by placeholder class or graph tags.
+    """
+    if _is_unspecified(query_params["class_uri"]) or _is_unspecified(query_params["graph_uri"]):
+        return [build_instance_tag(query_params["instance_uri"]), ALL_INSTANCES_TAG]
+    return [build_instance_tag(query_params["instance_uri"]),
+            build_class_tag(query_params["class_uri"]),
+            build_graph_tag(query_params["graph_uri"]),
+            ALL_INSTANCES_TAG]
+
+
+def _is_unspecified(uri):
+    # "_" in the path of the request, possibly after the prefix (e.g. the class_uri "_/_" of /_/_/_)
+    return uri == u"_" or uri.endswith(u"/_")
+
+
+def build_collection_tags(query_params):
+    return [build_collection_tag(query_params["class_uri"]), ALL_INSTANCES_TAG]
+
+
+def build_class_tags(query_params):
+    return [build_schema_tag(query_params["class_uri"]), build_graph_tag(query_params["graph_uri"])]
+
+
+# # Namespace-related
+# # namespace::key (every key, see set_namespace), except for the keys below, shared by all namespaces
+build_namespaced_key = lambda namespace, key: u"{0}::{1}".format(namespace, key)
+# # Sorted set of context_name/class_name by the number of requests of their schemas (see record_schema_request)
+SCHEMA_POPULARITY_KEY = u"_##schema_popularity"
+# # namespace::_##warm_up (set by the process which warms up the namespace, see acquire_warm_up)
+WARM_UP_KEY = u"_##warm_up"
+
+
+# Number of keys given to each UNLINK/DEL command and asked to each SCAN iteration
+UNLINK_BATCH_SIZE = 1000
+SCAN_COUNT = 1000
+
 
 class CacheError(redis.exceptions.RedisError):
     pass
@@ -50,9 +167,69 @@ class CacheError(redis.exceptions.RedisError):
 
 exceptions = (CacheError, redis.connection.ConnectionError)
 
+# Entries of memoize are stored as their serialized meta and body, separated by ENTRY_SEPARATOR
+# (which JSON escapes inside strings), so the meta can be read without deserializing the body
+ENTRY_SEPARATOR = "\n"
+
+# Lua scripts which release or extend the lock of a key (KEYS[1]) only if it is still held by the token ARGV[1]
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) end
+return 0
+"""
+EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("pexpire", KEYS[1], ARGV[2]) end
+return 0
+"""
+
+# Published in settings.CACHE_INVALIDATION_CHANNEL as {INVALIDATE_KEYS: [key, ...], "origin": process_id()},
+# for the other processes to drop these keys from their local cache (see publish_invalidation)
+INVALIDATE_KEYS = "invalidate"
+# Published as the keys of INVALIDATE_KEYS, to clear the whole local cache
+INVALIDATE_ALL = "*"
+# Published in settings.CACHE_INVALIDATION_CHANNEL as {RELOAD_GRAPHS: [graph_uri, ...], "origin": process_id()},
+# for the other processes to reload these graphs of their ontology model (see publish_graphs_reload)
+RELOAD_GRAPHS = "reload_graphs"
+
 
 def connect():
-    return redis.StrictRedis(host=settings.REDIS_ENDPOINT, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=0)
+    connection_pool = GreenletConnectionPool(
+        host=settings.REDIS_ENDPOINT,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD,
+        db=0,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        wait_timeout=settings.REDIS_POOL_TIMEOUT_SECS,
+        command_timeout=settings.REDIS_TIMEOUT_SECS,
+        connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECS)
+    return redis.StrictRedis(connection_pool=connection_pool)
+
+
+def build_namespace(version):
+    return md5.new(u"{0}".format(version).encode("utf-8")).hexdigest()[:12]
+
+
+def set_namespace(version):
+    """
+    Prefix every key with a namespace derived from the version of the code, instead of flushing Redis
+    when it changes: the entries of the previous namespaces are no longer read and expire by their TTL,
+    while processes which still run the previous release (e.g. in a rolling restart) keep using their own.
+    Changes of the ontology do not change the namespace, so every process of a release purges the same
+    entries (see schema.warm_up.recompute_schemas).
+    """
+    global namespace
+    namespace = build_namespace(version)
+    log.logger.info(_(u"Cache: namespace {0} (version {1})").format(namespace, version))
+
+
+def namespaced(key):
+    return build_namespaced_key(namespace, key) if namespace else key
+
+
+def _strip_namespace(key):
+    prefix = build_namespaced_key(namespace, u"")
+    if namespace and key.startswith(prefix):
+        return key[len(prefix):]
+    return key
 
 
 def current_time():
@@ -81,22 +258,52 @@ def _fresh_retrieve(function, params):
     return fresh_json
 
 
-def memoize(params, function, function_arguments=None, key=False):
+def memoize(params, function, function_arguments=None, key=False, tags=None, conditional=False):
+    """
+    tags (e.g. build_instance_tags) allow the entry to be deleted by purge_tags, along with the other
+    entries which share any of them.
+
+    key defaults to build_key_for_request(params).
+
+    Entries are fresh for TIME_TO_LIVE_IN_SECS. For settings.CACHE_STALE_SECS more, they are still
+    returned, as STALE, while a background greenlet recomputes them (see refresh_in_background).
+    Fresh entries may also be refreshed before they expire, see must_refresh.
+
+    With conditional=True, the If-None-Match and If-Modified-Since headers of params.request are
+    checked against the meta of the entry (see is_not_modified): if the client already has it,
+    the entry is returned without its body, with not_modified=True, and the body is not deserialized.
+
+    On a miss, the entry is computed by a single process at a time: the others wait for it
+    (see acquire_recompute_lock and wait_for_recompute), instead of computing it too.
+    """
     if settings.ENABLE_CACHE:
-        key = key or params.request.uri
-        cached_json = retrieve(key)
+        key = key or build_key_for_request(params)
+        if conditional:
+            def not_modified(meta):
+                return is_not_modified(meta, params.request.headers, params)
+            cached_json = retrieve(key, not_modified)
+        else:
+            not_modified = None
+            cached_json = retrieve(key)
+        lock = None
+        if cached_json is None:
+            lock = acquire_recompute_lock(key)
+            if not lock:
+                cached_json = wait_for_recompute(key, not_modified)
         if (cached_json is None):
-            fresh_json = _fresh_retrieve(function, function_arguments)
+            try:
+                fresh_json = _retrieve_and_store(key, function, function_arguments, tags)
+            finally:
+                release_recompute_lock(key, lock)
             if fresh_json is not None:
-                value = ujson.dumps(fresh_json)
-                create(key, value)
                 fresh_json['meta']['cache'] = 'MISS'
+                if conditional and not_modified(fresh_json['meta']):
+                    fresh_json = {'meta': fresh_json['meta'], 'not_modified': True}
                 return fresh_json
             else:
                 return None
         else:
-            cached_json['meta']['cache'] = 'HIT'
-            return cached_json
+            return _mark_hit(key, cached_json, function, function_arguments, tags)
     else:
         json_object = _fresh_retrieve(function, function_arguments)
         if json_object is not None:
@@ -104,16 +311,266 @@ def memoize(params, function, function_arguments=None, key=False):
         return json_object
 
 
+def _mark_hit(key, cached_json, function, function_arguments, tags):
+    meta = cached_json['meta']
+    meta['cache'] = 'STALE' if is_stale(meta) else 'HIT'
+    if must_refresh(meta):
+        refresh_in_background(key, function, function_arguments, tags)
+    if 'body' not in cached_json:
+        cached_json['not_modified'] = True
+    return cached_json
+
+
+def memoize_many(keys, function, function_arguments, tags=None):
+    """
+    Entries of several keys at once, as memoize does for each of them (but without conditional), with
+    the tags of each key in tags, if given:
+    the cached ones are read by a single MGET (see retrieve_many) and the missing ones are computed by
+    a single call of function, given the list of their function_arguments, which returns the list of
+    their bodies (None for the ones not found), so the work shared by them is done once.
+    The keys which another process is computing are waited for concurrently (see wait_for_recompute).
+
+    Return a list with the entry of each key (None if it was not found), in the same order of keys.
+    """
+    if not settings.ENABLE_CACHE:
+        return _fresh_retrieve_many(function, function_arguments)
+
+    def single_function(arguments):
+        return function([arguments])[0]
+
+    tags = tags or [None] * len(keys)
+    entries = retrieve_many(keys) or [None] * len(keys)
+    for (index, cached_json) in enumerate(entries):
+        if cached_json is not None:
+            _mark_hit(keys[index], cached_json, single_function, function_arguments[index], tags[index])
+
+    missing = [index for (index, cached_json) in enumerate(entries) if cached_json is None]
+    locks = dict((index, acquire_recompute_lock(keys[index])) for index in missing)
+    waiting = [index for index in missing if not locks[index]]
+    waited = greenlet_gather([lambda key=keys[index]: wait_for_recompute(key) for index in waiting])
+    for (index, cached_json) in zip(waiting, waited):
+        if cached_json is not None and not isinstance(cached_json, Exception):
+            entries[index] = _mark_hit(keys[index], cached_json, single_function, function_arguments[index], tags[index])
+
+    computing = [index for index in missing if entries[index] is None]
+    try:
+        fresh_entries = _retrieve_and_store_many([keys[index] for index in computing], function,
+                                                 [function_arguments[index] for index in computing],
+                                                 [tags[index] for index in computing])
+    finally:
+        for (index, lock) in locks.items():
+            release_recompute_lock(keys[index], lock)
+    for (index, fresh_json) in zip(computing, fresh_entries):
+        if fresh_json is not None:
+            fresh_json['meta']['cache'] = 'MISS'
+        entries[index] = fresh_json
+    return entries
+
+
+def recompute_many(keys, function, function_arguments, tags=None):
+    """
+    Compute again, by a single call of function (as memoize_many), the entries of keys which are cached,
+    because what they were computed from changed (e.g. the ontology), and delete the ones no longer found.
+    Each key is recomputed by a single process (see acquire_recompute_lock), which drops it from the
+    local cache of the others. Return the keys recomputed.
+    """
+    cached_entries = retrieve_many(keys, lambda meta: True) or []
+    locks = dict((index, acquire_recompute_lock(keys[index]))
+                 for (index, cached_json) in enumerate(cached_entries) if cached_json is not None)
+    recomputing = sorted(index for (index, lock) in locks.items() if lock)
+    if not recomputing:
+        return []
+    tags = tags or [None] * len(keys)
+    try:
+        fresh_entries = _retrieve_and_store_many([keys[index] for index in recomputing], function,
+                                                 [function_arguments[index] for index in recomputing],
+                                                 [tags[index] for index in recomputing])
+    finally:
+        for index in recomputing:
+            release_recompute_lock(keys[index], locks[index])
+    obsolete = [keys[index] for (index, fresh_json) in zip(recomputing, fresh_entries) if fresh_json is None]
+    if obsolete:
+        unlink(obsolete)
+    invalidate_local([namespaced(keys[index]) for index in recomputing])
+    return [keys[index] for index in recomputing]
+
+
+def _fresh_retrieve_many(function, function_arguments):
+    bodies = function(function_arguments) if function_arguments else []
+    entries = [_fresh_retrieve(lambda: body, None) for body in bodies]
+    for json_object in entries:
+        if json_object is not None:
+            json_object['meta']['cache'] = 'MISS'
+    return entries
+
+
+def _retrieve_and_store_many(keys, function, function_arguments, tags=None):
+    """
+    Compute the entries of keys by a single call of function and store them, as _retrieve_and_store,
+    with the tags of each key in tags, if given. Their compute time is the time of the whole call.
+    """
+    if not keys:
+        return []
+    time_i = time.time()
+    entries = [_fresh_retrieve(lambda: body, None) for body in function(function_arguments)]
+    time_f = time.time()
+    ttl = TIME_TO_LIVE_IN_SECS + settings.CACHE_STALE_SECS
+    for (key, fresh_json, key_tags) in zip(keys, entries, tags or [None] * len(keys)):
+        if fresh_json is not None:
+            fresh_json["meta"]["expires_at"] = time_f + TIME_TO_LIVE_IN_SECS
+            fresh_json["meta"]["compute_time"] = time_f - time_i
+            if key_tags:
+                create_tagged(key, encode_entry(fresh_json), key_tags, ttl)
+            else:
+                create(key, encode_entry(fresh_json), ttl)
+    return entries
+
+
+def _retrieve_and_store(key, function, function_arguments, tags):
+    time_i = time.time()
+    fresh_json = _fresh_retrieve(function, function_arguments)
+    if fresh_json is None:
+        return None
+    time_f = time.time()
+    fresh_json["meta"]["expires_at"] = time_f + TIME_TO_LIVE_IN_SECS
+    fresh_json["meta"]["compute_time"] = time_f - time_i
+
+    value = encode_entry(fresh_json)
+    ttl = TIME_TO_LIVE_IN_SECS + settings.CACHE_STALE_SECS
+    if tags:
+        create_tagged(key, value, tags, ttl)
+    else:
+        create(key, value, ttl)
+    return fresh_json
+
+
+def build_etag(serialized_body):
+    return '"{0}"'.format(md5.new(serialized_body).hexdigest())
+
+
+def encode_entry(json_object):
+    """
+    Serialize an entry of memoize, adding to its meta the strong ETag of its body.
+    Responses do not use it as is, but the ETag of their view of the entry (see build_response_etag).
+    """
+    body = ujson.dumps(json_object["body"])
+    json_object["meta"]["etag"] = build_etag(body)
+    return ujson.dumps(json_object["meta"]) + ENTRY_SEPARATOR + body
+
+
+def decode_entry(value, skip_body=None):
+    """
+    Deserialize a value stored by encode_entry, or by create. The body is left out of the entry
+    when skip_body(meta) is true.
+    """
+    if ENTRY_SEPARATOR not in value:
+        return ujson.loads(value)
+    (meta, body) = value.split(ENTRY_SEPARATOR, 1)
+    entry = {"meta": ujson.loads(meta)}
+    if skip_body is None or not skip_body(entry["meta"]):
+        entry["body"] = ujson.loads(body)
+    return entry
+
+
+def build_response_etag(meta, query_params):
+    """
+    The ETag of the response to query_params built from the entry described by meta. An entry may be
+    shared by several views (e.g. the INSTANCE_VIEW_PARAMS of instances), so the ETag of the entry is
+    combined with the params of the request, and the ETag of a view (e.g. lang=pt) never validates another.
+    """
+    etag = meta["etag"] + build_canonical_params(query_params)
+    return build_etag(etag.encode("utf-8"))
+
+
+def is_not_modified(meta, request_headers, query_params=None):
+    """
+    Whether the client which sent request_headers already has the entry described by meta:
+    If-None-Match is compared to its ETag (to the one of the view of query_params, if given,
+    see build_response_etag) and, only when it is absent, If-Modified-Since to its last_modified (RFC 7232).
+    """
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match is not None:
+        etag = meta.get("etag")
+        if etag is None:
+            return False
+        if query_params is not None:
+            etag = build_response_etag(meta, query_params)
+        etags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in etags or etag in etags or "W/" + etag in etags
+    if_modified_since = request_headers.get("If-Modified-Since")
+    if if_modified_since and meta.get("last_modified"):
+        since = parsedate_tz(if_modified_since)
+        last_modified = parsedate_tz(meta["last_modified"])
+        return since is not None and last_modified is not None and mktime_tz(last_modified) <= mktime_tz(since)
+    return False
+
+
+def is_stale(meta, now=None):
+    expires_at = meta.get("expires_at")
+    return expires_at is not None and (now or time.time()) >= expires_at
+
+
+def must_refresh(meta, now=None):
+    """
+    Stale entries are always refreshed. Fresh ones are refreshed early with a probability which
+    grows exponentially as they approach expiry, scaled by the time they took to be computed
+    (probabilistic early expiration, "XFetch"): only hot entries are likely to be refreshed
+    early, so they never expire, while cold ones wait for their expiry.
+    """
+    expires_at = meta.get("expires_at")
+    if expires_at is None:
+        return False
+    now = now or time.time()
+    gap = -meta.get("compute_time", 0) * settings.CACHE_EARLY_REFRESH_BETA * math.log(1 - random.random())
+    return now + gap >= expires_at
+
+
+def refresh_in_background(key, function, function_arguments, tags):
+    """
+    Recompute the entry in a new greenlet, so the current request does not wait for it.
+    There is at most one refresh of each key at a time in this process.
+    The refresh gets a copy of function_arguments (e.g. the ParamDict of the request), which the
+    request may still change after this returns.
+    """
+    if key in refreshing_keys:
+        return
+    refreshing_keys.add(key)
+    function_arguments = copy(function_arguments)
+
+    def refresh():
+        lock = acquire_recompute_lock(key)
+        # another process is already refreshing it
+        if not lock:
+            refreshing_keys.discard(key)
+            return
+        try:
+            _retrieve_and_store(key, function, function_arguments, tags)
+            log.logger.debug(_(u"Cache: refreshed {0}").format(key))
+        except Exception:
+            log.logger.error(_(u"Cache: failed refreshing {0}: {1}").format(key, traceback.format_exc()))
+        finally:
+            release_recompute_lock(key, lock)
+            refreshing_keys.discard(key)
+
+    greenlet_spawn(refresh)
+
+
 def safe_redis(function):
+    """
+    Errors of Redis are handled as cache misses (None is returned), after a second try. The second try
+    uses the same pool: the failed connection was closed, and the pool opens a new one if needed.
+    When no connection of the pool is free in time, the call is not tried again, it would wait once more.
+    """
 
     def wrapper(*params):
         try:
             response = function(*params)
+        except PoolTimeoutError:
+            log.logger.error(_(u"CacheError: {0}").format(traceback.format_exc()))
+            response = None
         except exceptions:
             log.logger.error(_(u"CacheError: First try returned {0}").format(traceback.format_exc()))
             try:
-                global redis_client
-                redis_client = connect()
                 response = function(*params)
             except exceptions:
                 log.logger.error(_(u"CacheError: Second try returned {0}").format(traceback.format_exc()))
@@ -123,13 +580,108 @@ def safe_redis(function):
     return wrapper
 
 
+def process_id():
+    return u"{0}:{1}".format(socket.gethostname(), os.getpid())
+
+
+def acquire_recompute_lock(key):
+    """
+    Take the lock of key, with SET NX PX, so that other processes (in any host) wait instead of
+    computing it as well. It expires after settings.CACHE_RECOMPUTE_LOCK_MS, in case its holder dies,
+    but it is extended while it is held (see keep_recompute_lock), however long the computation takes.
+
+    Return the token which holds the lock, to be given to release_recompute_lock, or False if another
+    process holds it. When Redis fails (or the lock is disabled), return True: every process computes the key.
+    """
+    if not settings.CACHE_RECOMPUTE_LOCK_MS:
+        return True
+    # the token tells which process holds the lock, for debugging
+    token = u"{0}:{1}".format(process_id(), uuid.uuid4().hex)
+    try:
+        if not redis_client.set(namespaced(build_key_for_lock(key)), token,
+                                px=settings.CACHE_RECOMPUTE_LOCK_MS, nx=True):
+            return False
+    except exceptions:
+        log.logger.error(_(u"CacheError: failed locking {0}: {1}").format(key, traceback.format_exc()))
+        return True
+    held_locks.add((key, token))
+    keep_recompute_lock(key, token)
+    return token
+
+
+def keep_recompute_lock(key, token):
+    """
+    Extend the lock of key every half of settings.CACHE_RECOMPUTE_LOCK_MS, in a background greenlet,
+    until it is released or lost (e.g. taken by another process, after Redis failed to extend it).
+    """
+    def extend():
+        while True:
+            greenlet_sleep(settings.CACHE_RECOMPUTE_LOCK_MS / 2000.0)
+            if (key, token) not in held_locks:
+                return
+            if not extend_recompute_lock(key, token):
+                held_locks.discard((key, token))
+                return
+
+    greenlet_spawn(extend)
+
+
+@safe_redis
+def extend_recompute_lock(key, token):
+    return redis_client.eval(EXTEND_LOCK_SCRIPT, 1, namespaced(build_key_for_lock(key)), token,
+                             settings.CACHE_RECOMPUTE_LOCK_MS)
+
+
+def release_recompute_lock(key, lock):
+    """
+    Release the lock of key taken by acquire_recompute_lock, which returned lock, only if it is still
+    held by its token: a lock which expired and was taken by another process is kept.
+    """
+    if lock is True or not lock:
+        return
+    held_locks.discard((key, lock))
+    _release_recompute_lock(key, lock)
+
+
+@safe_redis
+def _release_recompute_lock(key, token):
+    return redis_client.eval(RELEASE_LOCK_SCRIPT, 1, namespaced(build_key_for_lock(key)), token)
+
+
+@safe_redis
+def is_recompute_locked(key):
+    return redis_client.exists(namespaced(build_key_for_lock(key)))
+
+
+def wait_for_recompute(key, skip_body=None):
+    """
+    Wait for the process which holds the lock of key to store it, checking every
+    settings.CACHE_RECOMPUTE_POLL_SECS, and return the entry (as retrieve does).
+    Return None if the lock is released or expires without the entry being stored (e.g. its holder failed),
+    or after settings.CACHE_RECOMPUTE_WAIT_SECS, so the caller computes it.
+    """
+    deadline = time.time() + settings.CACHE_RECOMPUTE_WAIT_SECS
+    while time.time() < deadline:
+        greenlet_sleep(settings.CACHE_RECOMPUTE_POLL_SECS)
+        cached_json = retrieve(key, skip_body)
+        if cached_json is not None:
+            return cached_json
+        if not is_recompute_locked(key):
+            # the entry may have been stored right before the lock was released
+            return retrieve(key, skip_body)
+    log.logger.info(_(u"Cache: gave up waiting for {0} to be computed by another process").format(key))
+    return None
+
+
 def purge(pattern):
+    """
+    Delete the keys which start with pattern, found by SCAN. It visits the whole keyspace, so it is meant
+    for administrative purges (PURGE with X-Cache-Recursive): the API itself purges by tags (see purge_tags).
+    """
     keys_with_pattern = keys(pattern) or []
     log.logger.debug(_(u"Cache: key(s) to be deleted: {0}").format(keys_with_pattern))
     log_details = _(u"{0} key(s), matching the pattern: {1}").format(len(keys_with_pattern), pattern)
-    response = 1
-    for key in keys_with_pattern:
-        response *= delete(key)
+    response = unlink(keys_with_pattern) if keys_with_pattern else 1
 
     if response and keys_with_pattern:
         log.logger.info(_(u"Cache: purged with success {0}").format(log_details))
@@ -139,12 +691,139 @@ def purge(pattern):
         log.logger.info(_(u"Cache: failed purging {0}").format(log_details))
 
 
+def invalidate_local(keys):
+    """
+    Drop keys (or everything, if keys is INVALIDATE_ALL) from the local cache
+    of this process and, through Redis pub/sub, of every other process.
+    """
+    if not local_cache.enabled:
+        return
+    _apply_invalidation(keys)
+    publish_invalidation(keys)
+
+
+def _as_unicode(key):
+    return key if isinstance(key, unicode) else key.decode("utf-8")
+
+
+def _apply_invalidation(keys):
+    if keys == INVALIDATE_ALL:
+        local_cache.clear()
+    else:
+        local_cache.delete(keys)
+
+
+def _apply_message(message):
+    # the messages of this process were applied by it before they were published (e.g. the values it just created)
+    if message["origin"] == process_id():
+        return
+    if INVALIDATE_KEYS in message:
+        _apply_invalidation(message[INVALIDATE_KEYS])
+    elif graphs_reload_listener is not None:
+        graphs_reload_listener(message[RELOAD_GRAPHS])
+
+
+@safe_redis
+def publish_invalidation(keys):
+    """
+    Ask the other processes to drop keys (or everything, if keys is INVALIDATE_ALL) from their local cache.
+    """
+    message = {INVALIDATE_KEYS: keys, "origin": process_id()}
+    return redis_client.publish(settings.CACHE_INVALIDATION_CHANNEL, ujson.dumps(message))
+
+
+@safe_redis
+def publish_graphs_reload(graph_uris):
+    """
+    Ask the other processes to reload graph_uris, by calling the graphs_reload_listener
+    given to ensure_invalidation_listener (see ontology_model.reload_graphs).
+    """
+    message = {RELOAD_GRAPHS: list(graph_uris), "origin": process_id()}
+    return redis_client.publish(settings.CACHE_INVALIDATION_CHANNEL, ujson.dumps(message))
+
+
+def ensure_invalidation_listener(on_graphs_reload=None):
+    """
+    Start the thread which applies the invalidations published by other processes, once per process
+    (it is started lazily, so processes forked after the application is created have their own).
+    on_graphs_reload, if given, is called in the IOLoop with the graphs of each publish_graphs_reload.
+    """
+    global listener_pid, graphs_reload_listener
+    if on_graphs_reload is not None:
+        graphs_reload_listener = on_graphs_reload
+    if listener_pid == os.getpid():
+        return
+    listener_pid = os.getpid()
+    listener = threading.Thread(target=listen_invalidations, args=(IOLoop.instance(),))
+    listener.daemon = True
+    listener.start()
+
+
+def listen_invalidations(io_loop):
+    # The local cache is only changed from the IOLoop thread, so messages are handed to it by add_callback
+    while True:
+        try:
+            pubsub = connect().pubsub()
+            pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # invalidations published while this process was not subscribed are lost
+            io_loop.add_callback(local_cache.clear)
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    io_loop.add_callback(_apply_message, ujson.loads(message["data"]))
+        except exceptions:
+            log.logger.error(_(u"CacheError: invalidation listener failed {0}").format(traceback.format_exc()))
+        time.sleep(settings.CACHE_INVALIDATION_RETRY_SECS)
+
+
+def _retrieve_value(key):
+    """
+    Serialized value of key, from the local cache or else from Redis (then kept in the local cache).
+    """
+    key = namespaced(key)
+    if local_cache.enabled:
+        ensure_invalidation_listener()
+        value = local_cache.get(key)
+        if value is not None:
+            return value
+    value = redis_client.get(key)
+    if value is None:
+        redis_stats["misses"] += 1
+    else:
+        redis_stats["hits"] += 1
+        local_cache.set(key, value)
+    return value
+
+
+def _retrieve_values(keys):
+    """
+    Serialized values of keys, as _retrieve_value, with the ones not in the local cache read by a single MGET.
+    """
+    keys = [namespaced(key) for key in keys]
+    values = [None] * len(keys)
+    if local_cache.enabled:
+        ensure_invalidation_listener()
+        values = [local_cache.get(key) for key in keys]
+    missing = [index for (index, value) in enumerate(values) if value is None]
+    if missing:
+        for (index, value) in zip(missing, redis_client.mget([keys[index] for index in missing])):
+            if value is None:
+                redis_stats["misses"] += 1
+            else:
+                redis_stats["hits"] += 1
+                local_cache.set(keys[index], value)
+                values[index] = value
+    return values
+
+
 @safe_redis
 def update_if_present(key, value):
+    key = namespaced(key)
     response = redis_client.get(key)
     if response:
-        value = ujson.dumps(_fresh_retrieve(lambda: value, None))
-        if value is not None:
+        fresh_json = _fresh_retrieve(lambda: value, None)
+        if fresh_json is not None:
+            value = encode_entry(fresh_json)
+            invalidate_local([key])
             result = redis_client.setex(key, TIME_TO_LIVE_IN_SECS, value)
         else:
             result = None
@@ -154,33 +833,149 @@ def update_if_present(key, value):
 
 
 @safe_redis
-def create(key, value):
+def create(key, value, ttl=TIME_TO_LIVE_IN_SECS):
+    """
+    Store value in key. If key existed (e.g. it was refreshed), the other processes drop it from their local caches.
+    """
+    key = namespaced(key)
     if value is not None:
-        return redis_client.setex(key, TIME_TO_LIVE_IN_SECS, value)
+        local_cache.set(key, value)
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.exists(key)
+        pipeline.setex(key, ttl, value)
+        (existed, response) = pipeline.execute()
+        _publish_overwrite(key, existed)
+        return response
+
+
+def _publish_overwrite(key, existed):
+    # the local cache of this process already has the new value: its own listener ignores the message
+    if existed and local_cache.enabled:
+        publish_invalidation([key])
 
 
 @safe_redis
-def retrieve(key):
-    response = redis_client.get(key)
+def retrieve(key, skip_body=None):
+    # The serialized value is decoded on each hit: callers change the objects they get
+    response = _retrieve_value(key)
     if response:
-        response = ujson.loads(response)
+        response = decode_entry(response, skip_body)
     return response
 
 
+@safe_redis
+def retrieve_many(keys, skip_body=None):
+    """
+    Entries of keys (None for the ones not found), as retrieve, read by a single round-trip to Redis.
+    """
+    return [decode_entry(value, skip_body) if value else None for value in _retrieve_values(keys)]
+
+
+@safe_redis
+def retrieve_raw(key):
+    return _retrieve_value(key)
+
+
+@safe_redis
+def create_tagged(key, value, tags, ttl=TIME_TO_LIVE_IN_SECS):
+    """
+    Store value in key and add key to the set of each tag, so all the keys
+    of a tag can be deleted at once by purge_tags. If key existed, it is invalidated as in create.
+    """
+    key = namespaced(key)
+    local_cache.set(key, value)
+    pipeline = redis_client.pipeline()
+    pipeline.exists(key)
+    pipeline.setex(key, ttl, value)
+    for tag in tags:
+        tag_key = namespaced(build_key_for_tag(tag))
+        pipeline.sadd(tag_key, key)
+        # the set of a tag outlives the keys added to it
+        pipeline.expire(tag_key, max(ttl, TIME_TO_LIVE_IN_SECS + settings.CACHE_STALE_SECS))
+    responses = pipeline.execute()
+    _publish_overwrite(key, responses[0])
+    return responses[1:]
+
+
+def create_query_result(key, value, graph_uris):
+    return create_tagged(key, value, [build_query_tag(graph_uri) for graph_uri in graph_uris])
+
+
+@safe_redis
+def purge_tags(tags):
+    """
+    Delete the keys tagged with any of tags, and the sets of the tags: the sets are read in one
+    pipelined round-trip, and the keys are deleted in another one (see unlink).
+    """
+    tag_keys = [namespaced(build_key_for_tag(tag)) for tag in tags]
+    pipeline = redis_client.pipeline(transaction=False)
+    for tag_key in tag_keys:
+        pipeline.smembers(tag_key)
+    tagged_keys = set()
+    for members in pipeline.execute():
+        tagged_keys.update(members)
+    tagged_keys = list(tagged_keys)
+    log.logger.debug(_(u"Cache: key(s) tagged with {0} to be deleted: {1}").format(tags, tagged_keys))
+    return _unlink(tagged_keys + tag_keys)
+
+
+@safe_redis
+def unlink(keys):
+    return _unlink([namespaced(key) for key in keys])
+
+
+def _unlink(keys):
+    """
+    Delete keys in a single pipelined round-trip, with UNLINK (which reclaims memory
+    out of the main thread of Redis) or, for Redis older than 4.0, with DEL.
+    """
+    global unlink_command
+    invalidate_local([_as_unicode(key) for key in keys])
+    if not keys:
+        return 0
+    pipeline = redis_client.pipeline(transaction=False)
+    for start in range(0, len(keys), UNLINK_BATCH_SIZE):
+        pipeline.execute_command(unlink_command, *keys[start:start + UNLINK_BATCH_SIZE])
+    try:
+        return sum(pipeline.execute())
+    except redis.exceptions.ResponseError:
+        if unlink_command == "DEL":
+            raise
+        unlink_command = "DEL"
+        return _unlink(keys)
+
+
 @safe_redis
 def delete(keys):
+    keys = namespaced(keys)
+    invalidate_local([keys])
     return redis_client.delete(keys)
 
 
 @safe_redis
 def flushall():
+    invalidate_local(INVALIDATE_ALL)
     return redis_client.flushall()
 
 
 @safe_redis
 def keys(pattern):
-    pattern = u"{0}*".format(pattern)
-    return redis_client.keys(pattern)
+    pattern = namespaced(u"{0}*".format(pattern))
+    return [_strip_namespace(key) for key in scan_keys(pattern)]
+
+
+def scan_keys(pattern):
+    """
+    Iterate over the keys which match pattern with SCAN, which visits the keyspace
+    incrementally (SCAN_COUNT keys per call) instead of blocking Redis like KEYS does.
+    """
+    cursor = "0"
+    while True:
+        (cursor, batch) = redis_client.execute_command("SCAN", cursor, "MATCH", pattern, "COUNT", SCAN_COUNT)
+        for key in batch:
+            yield key
+        if cursor in ("0", 0):
+            break
 
 
 @safe_redis
@@ -212,6 +1007,24 @@ def get_usage_message():
     return msg_template % redis_info
 
 
+def get_local_usage_message():
+    msg_template = "Local cache | Entries: %(entries)s/%(max_entries)s | Bytes: %(size)s/%(max_bytes)s | " + \
+        "Evictions: %(evictions)s<br>" + \
+        "L1 (local) hits: %(hits)s | misses: %(misses)s | Hit ratio: %(hit_ratio)s<br>" + \
+        "L2 (Redis) hits: %(redis_hits)s | misses: %(redis_misses)s | Hit ratio: %(redis_hit_ratio)s"
+    stats = local_cache.stats()
+    redis_lookups = redis_stats["hits"] + redis_stats["misses"]
+    stats.update({
+        "redis_hits": redis_stats["hits"],
+        "redis_misses": redis_stats["misses"],
+        "redis_hit_ratio": float(redis_stats["hits"]) / redis_lookups if redis_lookups else None
+    })
+    for key in ("hit_ratio", "redis_hit_ratio"):
+        if stats[key] is None:
+            stats[key] = "No hits"
+    return msg_template % stats
+
+
 def status_message():
     params = {
         #"password": md5.new(str(settings.REDIS_PASSWORD)).digest(),  # do not cast to unicode
@@ -223,7 +1036,7 @@ def status_message():
 
     try:
         response = ping()
-        params["usage"] = get_usage_message()
+        params["usage"] = get_usage_message() + "<br>" + get_local_usage_message()
     except exceptions:
         params["error"] = traceback.format_exc()
         msg = failure_msg
@@ -237,21 +1050,86 @@ def status_message():
     return msg % params
 
 
+def record_schema_request(context_name, class_name):
+    """
+    Count a request of the schema of a class, so the most requested ones are warmed up in new namespaces
+    (see schema.warm_up). Counts are sent to Redis once every settings.CACHE_WARM_UP_FLUSH_EVERY requests.
+    """
+    if not settings.ENABLE_CACHE:
+        return
+    schema_requests[u"{0}/{1}".format(context_name, class_name)] += 1
+    if sum(schema_requests.values()) >= settings.CACHE_WARM_UP_FLUSH_EVERY:
+        flush_schema_requests()
+
+
+@safe_redis
+def flush_schema_requests():
+    counts = dict(schema_requests)
+    schema_requests.clear()
+    pipeline = redis_client.pipeline(transaction=False)
+    for (schema, count) in counts.items():
+        pipeline.zincrby(SCHEMA_POPULARITY_KEY, schema, count)
+    return pipeline.execute()
+
+
+@safe_redis
+def most_requested_schemas(count):
+    """
+    Return the count most requested schemas, as (context_name, class_name) tuples.
+    """
+    schemas = redis_client.zrevrange(SCHEMA_POPULARITY_KEY, 0, count - 1)
+    return [tuple(schema.decode("utf-8").split(u"/", 1)) for schema in schemas]
+
+
+@safe_redis
+def acquire_warm_up():
+    """
+    Return True for a single process per namespace, the one which warms it up.
+    """
+    return bool(redis_client.set(namespaced(WARM_UP_KEY), os.getpid(), ex=TIME_TO_LIVE_IN_SECS, nx=True))
+
+
 def purge_an_instance(instance_uri):
-    pattern = u"_@@_@@{0}@@*##instance".format(instance_uri)
-    log.logger.debug(_(u"CacheDebug: Delete cache keys related to pattern {0}".format(pattern)))
-    purge(pattern)
+    tag = build_instance_tag(instance_uri)
+    log.logger.debug(_(u"CacheDebug: Delete cache keys related to tag {0}".format(tag)))
+    purge_tags([tag])
+
+
+def purge_collections(class_uris):
+    """
+    Delete the cached listings of the instances of each of class_uris (see build_collection_tags).
+    """
+    tags = [build_collection_tag(class_uri) for class_uri in class_uris]
+    log.logger.debug(_(u"CacheDebug: Delete cache keys related to tags {0}".format(tags)))
+    purge_tags(tags)
+
+
+def purge_graph_queries(graph_uri):
+    """
+    Delete the cached results of the queries which read graph_uri (see triplestore.query_sparql).
+    """
+    if settings.ENABLE_CACHE:
+        purge_tags([build_query_tag(graph_uri)])
+
+
+def purge_class_queries(class_uri):
+    """
+    Delete the cached results of the queries tagged by class_uri (e.g. QUERY_SUPERCLASS), which
+    read the definition of the class rather than the instances of a graph.
+    """
+    if settings.ENABLE_CACHE:
+        purge_tags([build_query_tag(class_uri)])
 
 
 def purge_all_instances():
-    purge("*##instance")
+    purge_tags([ALL_INSTANCES_TAG])
 
 
 def purge_root(recursive=False):
     if recursive:
         flushall()
     else:
-        purge("*##root")
+        purge_tags([ROOT_TAG])
 
 
 def purge_by_path(path, recursive):
@@ -266,5 +1144,20 @@ def purge_by_path(path, recursive):
         delete(path)
 
 
-# Singleton
+# Singletons
 redis_client = connect()
+# Prefix of the keys of this process, see set_namespace
+namespace = u""
+# Schema requests not sent to Redis yet, see record_schema_request
+schema_requests = Counter()
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TTL_SECS)
+# Lookups which reached Redis, i.e. missed the local cache
+redis_stats = {"hits": 0, "misses": 0}
+listener_pid = None
+# Called with the graphs of the ontology model to reload, when another process asks it, see ensure_invalidation_listener
+graphs_reload_listener = None
+unlink_command = "UNLINK"
+# Keys being recomputed by refresh_in_background
+refreshing_keys = set()
+# (key, token) of the recompute locks held by this process, see acquire_recompute_lock
+held_locks = set()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import OrderedDict
+
+
+class LocalCache(object):
+    """
+    In-process LRU cache of the serialized values of the Redis cache (see brainiak.utils.cache),
+    bounded both by the number of entries and by the total size (in bytes) of keys and values.
+
+    Entries also expire ttl seconds after being stored, which bounds their staleness in case
+    an invalidation message published by another process is missed.
+
+    >>> local_cache = LocalCache(max_entries=2, max_bytes=1024, ttl=60)
+    >>> local_cache.set("a", "1")
+    >>> local_cache.set("b", "2")
+    >>> local_cache.get("a")
+    '1'
+    >>> local_cache.set("c", "3")
+    >>> local_cache.get("b") is None
+    True
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires_at), from the least to the most recently used
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key, now=None):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        (value, size, expires_at) = entry
+        if (now or time.time()) >= expires_at:
+            self.size -= size
+            self.misses += 1
+            return None
+        self.entries[key] = entry
+        self.hits += 1
+        return value
+
+    def set(self, key, value, now=None):
+        self._discard(key)
+        size = len(key) + len(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+        self.entries[key] = (value, size, (now or time.time()) + self.ttl)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            (evicted_key, (evicted_value, evicted_size, expires_at)) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def delete(self, keys):
+        for key in keys:
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else None
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio()
+        }
@@ -164,6 +164,9 @@ class ParamDict(dict):
         if kw:
             raise InvalidParam(kw.popitem()[0])
 
+        # values before the request arguments are applied, see brainiak.utils.cache.build_canonical_params
+        self.defaults = dict(self)
+
         # Override params with arguments passed in the handler's request object
         self._override_with(handler)
         self._post_override()
@@ -332,6 +335,16 @@ class ParamDict(dict):
             if not required_param in arguments:
                 raise RequiredParamMissing(required_param)
 
+    def __copy__(self):
+        "Copy which can be changed (e.g. by set_aux_param) without changing this one"
+        params = self.__class__.__new__(self.__class__)
+        params.__dict__.update(self.__dict__)
+        params._aux_parameters = copy(self._aux_parameters)
+        params.arguments = copy(self.arguments)
+        # dict.update does not run the side effects of __setitem__
+        dict.update(params, self)
+        return params
+
     def set_aux_param(self, key, value):
         self._aux_parameters[key] = value
 
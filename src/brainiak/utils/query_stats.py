@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+In-process statistics of the SPARQL queries sent to the triplestore, per query template.
+
+Each call site of triplestore.query_sparql names the template it uses (query_name), and for each
+name the latency and the size of the responses are recorded in histograms, served by /_status/queries.
+"""
+
+UNNAMED_QUERY = u"unnamed"
+
+# Each power of two range of values is split in 2 ** SUB_BUCKET_BITS buckets,
+# so recorded values are approximated with a relative error below 1 / 2 ** SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 2 ** SUB_BUCKET_BITS
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    exponent = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (exponent + 1) * SUB_BUCKETS + (value >> exponent) - SUB_BUCKETS
+
+
+def bucket_lower_bound(index):
+    if index < 2 * SUB_BUCKETS:
+        return index
+    exponent = index // SUB_BUCKETS - 1
+    return ((index % SUB_BUCKETS) + SUB_BUCKETS) << exponent
+
+
+class Histogram(object):
+    """
+    Histogram of non-negative integers with log-linear buckets (in the style of HdrHistogram):
+    its memory is proportional to the number of distinct buckets used, not to the number of values.
+
+    >>> histogram = Histogram()
+    >>> for value in range(1, 101): histogram.record(value)
+    >>> histogram.percentile(50)
+    50
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile):
+        """
+        Return the highest value equivalent to the values at the given percentile (0 to 100).
+        """
+        if not self.count:
+            return None
+        target = max(percentile * self.count / 100.0, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(bucket_lower_bound(index + 1) - 1, self.max)
+        return self.max
+
+    def to_dict(self):
+        summary = {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": float(self.total) / self.count if self.count else None
+        }
+        for percentile in PERCENTILES:
+            summary["p{0:g}".format(percentile)] = self.percentile(percentile)
+        return summary
+
+
+class QueryStats(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = Histogram()
+        self.response_size = Histogram()
+        self.errors = 0
+        self.total_time = 0.0
+
+    def record(self, time_diff, size=None):
+        self.total_time += time_diff
+        self.latency.record(time_diff * 1000000)
+        if size is not None:
+            self.response_size.record(size)
+
+    def record_error(self):
+        self.errors += 1
+
+    def to_dict(self):
+        return {
+            "count": self.latency.count,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "latency_us": self.latency.to_dict(),
+            "response_size_bytes": self.response_size.to_dict()
+        }
+
+
+stats = {}
+
+
+def get_query_stats(query_name=None):
+    query_name = query_name or UNNAMED_QUERY
+    query_stats = stats.get(query_name)
+    if query_stats is None:
+        query_stats = stats[query_name] = QueryStats(query_name)
+    return query_stats
+
+
+def record_query(query_name, time_diff, size=None):
+    get_query_stats(query_name).record(time_diff, size)
+
+
+def record_query_error(query_name):
+    get_query_stats(query_name).record_error()
+
+
+def get_stats():
+    """
+    Return the statistics of each query name, ordered by the total time spent in the triplestore.
+    """
+    items = [dict(query_stats.to_dict(), name=name) for (name, query_stats) in stats.items()]
+    return sorted(items, key=lambda item: item["total_time"], reverse=True)
@@ -12,6 +12,7 @@ from brainiak.triplestore import query_sparql
 from brainiak.type_mapper import MAP_RDF_EXPANDED_TYPE_TO_PYTHON
 from brainiak.utils.resources import LazyObject
 from brainiak.utils import config_parser
+from brainiak.utils.sparql_result import SparqlBindings, SparqlResult, URI
 from brainiak.utils.i18n import _
 
 logger = LazyObject(get_logger)
@@ -33,6 +34,13 @@ IGNORED_DATATYPES = [XML_LITERAL, XSD_STRING]
 
 def get_super_properties(bindings):
     super_properties = {}
+    if isinstance(bindings, SparqlBindings):
+        result = bindings.result
+        for (key, value) in zip(result.column('super_property'), result.column('predicate')):
+            if key is not None:
+                super_properties[key] = value
+        return super_properties
+
     for item in bindings:
         if 'super_property' in item:
             key = item['super_property']['value']
@@ -106,6 +114,12 @@ def get_one_value(result_dict, key):
     >>> get_one_value(result_dict, 'inexistent_key')
     False
     """
+    if isinstance(result_dict, SparqlResult):
+        for value in result_dict.column(key):
+            if value is not None:
+                return value
+        return False
+
     values = filter_values(result_dict, key)
     if not values:
         return False
@@ -124,6 +138,8 @@ def filter_values(result_dict, key):
     >>> filter_values(result_dict, 'inexistent_key')
     []
     """
+    if isinstance(result_dict, SparqlResult):
+        return result_dict.bound_values(key)
     return [item[key]['value'] for item in result_dict['results']['bindings'] if item.get(key)]
 
 
@@ -156,6 +172,12 @@ def bindings_to_dict(key_name, bindings):
                                  u'type': {u'type': u'uri', u'value': u'http://www.w3.org/2002/07/owl#DatatypeProperty'}}
     """
     bindings_by_predicate = {}
+    if isinstance(bindings, SparqlResult):
+        for (index, value) in enumerate(bindings.column(key_name)):
+            if value is not None:
+                bindings_by_predicate[value] = bindings.bindings[index]
+        return bindings_by_predicate
+
     for record in bindings['results']['bindings']:
         key_item = record.get(key_name, None)
         if key_item is None:
@@ -193,9 +215,21 @@ def compress_keys_and_values(result_dict, keymap={}, ignore_keys=[], context=Non
     >>> compress_keys_and_values(result_dict, context=context)
     [{'key': 'foaf:value'}]
 
+    Instead of a response dict, an iterable over the rows of 'bindings' may be given
+    (e.g. the one returned by triplestore.query_sparql_stream), which is consumed lazily.
+
+    >>> compress_keys_and_values(iter([{'key': {'type': 'some type', 'value': 'some value'}}]))
+    [{'key': 'some value'}]
+
     """
+    if isinstance(result_dict, SparqlResult):
+        return _compress_columns(result_dict, keymap, ignore_keys, context, expand_uri)
+    if isinstance(result_dict, dict):
+        bindings = result_dict['results']['bindings']
+    else:
+        bindings = result_dict
     result_list = []
-    for item in result_dict['results']['bindings']:
+    for item in bindings:
         row = {}
         for key in item:
             if key not in ignore_keys:
@@ -208,6 +242,25 @@ def compress_keys_and_values(result_dict, keymap={}, ignore_keys=[], context=Non
     return result_list
 
 
+def _compress_columns(result, keymap, ignore_keys, context, expand_uri):
+    columns = [(keymap.get(variable, variable), result.values[column], result.types[column])
+               for (column, variable) in enumerate(result.variables)
+               if variable not in ignore_keys]
+    shorten = context and not expand_uri
+    result_list = []
+    for index in xrange(result.length):
+        row = {}
+        for (effective_key, values, types) in columns:
+            value = values[index]
+            if value is None:
+                continue
+            if shorten and types[index] == URI and effective_key != '@id':
+                value = context.shorten_uri(value)
+            row[effective_key] = value
+        result_list.append(row)
+    return result_list
+
+
 def is_result_empty(result_dict):
     """
     Return True if result_dict['results']['bindings'] has no items, False otherwise.
@@ -619,7 +672,7 @@ def is_value_already_used(instance_uri, object_value, predicate_uri, class_objec
         "predicate_uri": predicate_uri,
         "object_value": object_value
     }
-    query_result = triplestore.query_sparql(query, query_params.triplestore_config)
+    query_result = triplestore.query_sparql(query, query_params.triplestore_config, query_name="QUERY_VALUE_EXISTS")
     return is_result_true(query_result)
 
 
@@ -667,6 +720,67 @@ def add_language_support(query_params, language_dependent_variable):
     return (query_params, language_tag)
 
 
+def lang_matches(language_tag, language_range):
+    """
+    Python counterpart of SPARQL's langMatches: the range "pt" matches the tags "pt" and "pt-BR",
+    "*" matches any tag and "" matches only the empty tag (of literals without language).
+    """
+    language_tag = language_tag.lower()
+    language_range = language_range.lower()
+    if language_range == "*":
+        return language_tag != ""
+    return language_tag == language_range or language_tag.startswith(language_range + "-")
+
+
+def filter_bindings_by_language(bindings, lang, variable="object"):
+    """
+    Python counterpart of QUERY_FILTER_LABEL_BY_LANGUAGE: keep the bindings whose variable
+    is in the language lang or has no language at all (e.g. URIs and typed literals).
+    """
+    lang = lang or ""
+    return [item for item in bindings
+            if not item[variable].get("xml:lang") or lang_matches(item[variable]["xml:lang"], lang)]
+
+
+def select_bindings_by_language(bindings, lang, required, optional=()):
+    """
+    Python counterpart of the language filters of a query (see add_language_support), applied to its
+    bindings in all languages. The bindings whose required variables are in other language than lang
+    are dropped. Each group of optional variables (e.g. ("range_label", "range_graph")) whose first
+    variable is in other language is unbound, as if it was not found, unless the same binding also
+    exists with the group in the language lang. If lang is empty, all the bindings are kept.
+    """
+    def in_language(item, variable):
+        term = item.get(variable)
+        return not lang or term is None or not term.get("xml:lang") or lang_matches(term["xml:lang"], lang)
+
+    def key(item, excluded=()):
+        return tuple(sorted((variable, term["value"], term.get("xml:lang"))
+                            for (variable, term) in item.items() if variable not in excluded))
+
+    selected = []
+    for item in bindings:
+        if not all(in_language(item, variable) for variable in required):
+            continue
+        item = dict(item)
+        for group in optional:
+            if not in_language(item, group[0]):
+                for variable in group:
+                    item.pop(variable, None)
+        selected.append(item)
+
+    bound_groups = set((group, key(item, group)) for item in selected for group in optional if group[0] in item)
+    unique_items = []
+    seen = set()
+    for item in selected:
+        item_key = key(item)
+        if item_key in seen or any(group[0] not in item and (group, key(item, group)) in bound_groups for group in optional):
+            continue
+        seen.add(item_key)
+        unique_items.append(item)
+    return unique_items
+
+
 class UnexpectedResultException(Exception):
     pass
 
@@ -715,15 +829,20 @@ SELECT DISTINCT ?property WHERE {
 LABEL_PROPERTIES = [RDFS_LABEL]
 
 
-def get_subproperties(super_property):
+def build_subproperties_query(super_property):
     params = {
         "ruleset": "http://semantica.globo.com/ruleset",
         "property": super_property
     }
-    query = QUERY_SUBPROPERTIES % params
+    return QUERY_SUBPROPERTIES % params
+
+
+def get_subproperties(super_property):
+    query = build_subproperties_query(super_property)
     result_dict = query_sparql(query,
                                config_parser.parse_section(),
-                               async=False)
+                               async=False,
+                               query_name="QUERY_SUBPROPERTIES")
     subproperties = filter_values(result_dict, "property")
     return subproperties
 
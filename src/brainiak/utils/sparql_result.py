@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+import ujson as json
+
+
+# Codes of term types kept in the type columns. Unknown types are kept as literals.
+UNBOUND = 0
+TERM_TYPES = (None, u"uri", u"literal", u"typed-literal", u"bnode")
+TERM_TYPE_CODES = dict((term_type, code) for (code, term_type) in enumerate(TERM_TYPES) if term_type)
+URI = TERM_TYPE_CODES[u"uri"]
+LITERAL = TERM_TYPE_CODES[u"literal"]
+
+
+class SparqlResult(object):
+    """
+    Compact, columnar representation of the results of a SPARQL SELECT query.
+
+    Variables are stored once. For each variable there is a column with the values of
+    every row (None when the variable is not bound), a column of term type codes (array of bytes)
+    and sparse columns with the language and the datatype of the literals that have them.
+
+    Callers which read the dict decoded from application/sparql-results+json keep working:
+    result['results']['bindings'] is a sequence of SparqlRow, which behave like the binding dicts
+    ({'variable': {'type': ..., 'value': ...}}) on access, but are read-only. Helpers of brainiak.utils.sparql
+    (filter_values, get_one_value, bindings_to_dict, compress_keys_and_values...) read the columns directly.
+
+    It takes less memory than the dict, but it is built from it, so it takes longer: it is only worth it
+    for results which are kept (e.g. cached in memory), not for the ones processed once by a request.
+
+    >>> result = SparqlResult.from_dict({'head': {'vars': ['s']}, 'results': {'bindings': [{'s': {'type': 'uri', 'value': 'http://a'}}]}})
+    >>> result.column('s')
+    ['http://a']
+    >>> result['results']['bindings'][0]['s']
+    {'type': u'uri', 'value': 'http://a'}
+    """
+
+    def __init__(self, variables=()):
+        self.variables = []
+        self.values = []
+        self.types = []
+        self.langs = []
+        self.datatypes = []
+        self.length = 0
+        self._columns = {}
+        for variable in variables:
+            self._add_column(variable)
+
+    @classmethod
+    def from_dict(cls, result_dict):
+        result = cls(result_dict.get("head", {}).get("vars", []))
+        for binding in result_dict["results"]["bindings"]:
+            result.append(binding)
+        return result
+
+    @classmethod
+    def from_json(cls, body):
+        return cls.from_dict(json.loads(body))
+
+    def _add_column(self, variable):
+        self._columns[variable] = len(self.variables)
+        self.variables.append(variable)
+        self.values.append([None] * self.length)
+        self.types.append(array('B', [UNBOUND]) * self.length)
+        self.langs.append({})
+        self.datatypes.append({})
+
+    def append(self, binding):
+        for variable in binding:
+            if variable not in self._columns:
+                self._add_column(variable)
+
+        index = self.length
+        for (column, variable) in enumerate(self.variables):
+            term = binding.get(variable)
+            if term is None:
+                self.values[column].append(None)
+                self.types[column].append(UNBOUND)
+                continue
+            self.values[column].append(term["value"])
+            self.types[column].append(TERM_TYPE_CODES.get(term.get("type"), LITERAL))
+            if "xml:lang" in term:
+                self.langs[column][index] = term["xml:lang"]
+            if "datatype" in term:
+                self.datatypes[column][index] = term["datatype"]
+        self.length += 1
+
+    def column_index(self, variable):
+        return self._columns.get(variable)
+
+    def column(self, variable):
+        """
+        Return the values of the variable in every row, None where it is not bound.
+        """
+        column = self._columns.get(variable)
+        if column is None:
+            return [None] * self.length
+        return self.values[column]
+
+    def bound_values(self, variable):
+        return [value for value in self.column(variable) if value is not None]
+
+    def term(self, index, column):
+        term_type = self.types[column][index]
+        if term_type == UNBOUND:
+            return None
+        term = {"type": TERM_TYPES[term_type], "value": self.values[column][index]}
+        lang = self.langs[column].get(index)
+        if lang is not None:
+            term["xml:lang"] = lang
+        datatype = self.datatypes[column].get(index)
+        if datatype is not None:
+            term["datatype"] = datatype
+        return term
+
+    @property
+    def bindings(self):
+        return SparqlBindings(self)
+
+    def to_dict(self):
+        return {
+            "head": {"vars": list(self.variables)},
+            "results": {"bindings": [row.to_dict() for row in self]}
+        }
+
+    # Compatibility with the decoded JSON dict
+
+    def __getitem__(self, key):
+        if key == "results":
+            return {"bindings": self.bindings}
+        if key == "head":
+            return {"vars": list(self.variables)}
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in ("head", "results")
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for index in xrange(self.length):
+            yield SparqlRow(self, index)
+
+
+class SparqlBindings(object):
+    """
+    Read-only sequence of the rows of a SparqlResult, standing for results.bindings.
+    """
+    __slots__ = ("result",)
+
+    def __init__(self, result):
+        self.result = result
+
+    def __len__(self):
+        return self.result.length
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SparqlRow(self.result, i) for i in xrange(*index.indices(self.result.length))]
+        if index < 0:
+            index += self.result.length
+        if not 0 <= index < self.result.length:
+            raise IndexError(index)
+        return SparqlRow(self.result, index)
+
+    def __eq__(self, other):
+        return list(row.to_dict() for row in self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class SparqlRow(object):
+    """
+    A row of a SparqlResult, which behaves like a binding dict: row['variable'] is the
+    term dict of the variable, built on access. row.value('variable') gives the value directly.
+    """
+    __slots__ = ("result", "index")
+
+    def __init__(self, result, index):
+        self.result = result
+        self.index = index
+
+    def value(self, variable, default=None):
+        column = self.result.column_index(variable)
+        if column is None:
+            return default
+        value = self.result.values[column][self.index]
+        return default if value is None else value
+
+    def __getitem__(self, variable):
+        column = self.result.column_index(variable)
+        term = None if column is None else self.result.term(self.index, column)
+        if term is None:
+            raise KeyError(variable)
+        return term
+
+    def get(self, variable, default=None):
+        try:
+            return self[variable]
+        except KeyError:
+            return default
+
+    def __contains__(self, variable):
+        column = self.result.column_index(variable)
+        return column is not None and self.result.types[column][self.index] != UNBOUND
+
+    def keys(self):
+        result = self.result
+        return [variable for (column, variable) in enumerate(result.variables)
+                if result.types[column][self.index] != UNBOUND]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(variable, self[variable]) for variable in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, SparqlRow):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def decode_sparql_results(body):
+    """
+    Decode a application/sparql-results+json body to a SparqlResult. Bodies without
+    results.bindings (e.g. responses of ASK queries) are decoded to a dict, as usual.
+    """
+    result_dict = json.loads(body)
+    if "bindings" not in result_dict.get("results", {}):
+        return result_dict
+    return SparqlResult.from_dict(result_dict)
@@ -24,6 +24,18 @@ class TestFilterInstanceResource(TornadoAsyncHTTPTestCase, URLTestCase):
     def tearDown(self):
         get_collection.filter_instances = self.original_filter_instances
 
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_filter_is_cached(self, settings):
+        self.fetch('/person/Gender/?lang=pt', method='PURGE')
+        response = self.fetch('/person/Gender/?lang=pt', method='GET')
+        self.assertEqual(response.code, 200)
+        self.assertTrue(response.headers['X-Cache'].startswith('MISS'))
+        with patch("brainiak.handlers.filter_instances") as filter_instances:
+            cached_response = self.fetch('/person/Gender/?lang=pt', method='GET')
+            self.assertFalse(filter_instances.called)
+        self.assertTrue(cached_response.headers['X-Cache'].startswith('HIT'))
+        self.assertEqual(cached_response.body, response.body)
+
     @patch("brainiak.handlers.logger")
     def test_filter_with_invalid_query_string(self, log):
         response = self.fetch('/person/Gender/?love=u', method='GET')
@@ -936,10 +948,11 @@ class FilterInstancesQueryTestCase(QueryTestCase):
         self.assertEqual(len(computed_bindings), 2)
         self.assertEqual(sorted(computed_bindings), sorted(expected_bindings))
 
-    @patch("brainiak.collection.get_collection.query_filter_instances", return_value={"results": {"bindings": []}})
-    @patch("brainiak.collection.get_collection.query_count_filter_instances", return_value={"results": {"bindings": []}})
-    @patch("brainiak.collection.get_collection.class_exists", return_value=True)
-    def test_filter_instances_result_is_empty_raises_404(self, mocked_class_exists, mocked_query_count, mocked_query):
+    @patch("brainiak.collection.get_collection.triplestore.query_sparql_many",
+           return_value=[{"boolean": True}, {"results": {"bindings": []}}])
+    @patch("brainiak.collection.get_collection.build_class_exists_query")
+    @patch("brainiak.collection.get_collection.Query")
+    def test_filter_instances_result_is_empty_raises_404(self, mocked_query, mocked_build_class_exists_query, mocked_query_sparql_many):
         params = Params({
             "o": "",
             "p": "",
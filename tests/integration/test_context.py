@@ -46,8 +46,8 @@ class ListClassesResourceTestCase(TornadoAsyncHTTPTestCase, QueryTestCase):
         patcher.stop()
 
     @patch("brainiak.handlers.logger")
-    @patch("brainiak.context.get_context.graph_exists", return_value=True)
-    def test_list_classes_empty(self, mocked_graph_exists, log):
+    @patch("brainiak.context.get_context.is_result_true", return_value=True)
+    def test_list_classes_empty(self, mocked_is_result_true, log):
         original_graph_uri = self.graph_uri
         self.graph_uri = "http://empty.graph"
         response = self.fetch('/test/?graph_uri=' + self.graph_uri)
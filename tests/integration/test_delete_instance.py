@@ -82,6 +82,18 @@ class DeleteQueriesTestCase(QueryTestCase, TornadoAsyncHTTPTestCase):
         mock_purge.assert_called_with(u'http://tatipedia.org/Platypus')
         self.assertEqual(response.code, 204)
 
+    @patch("brainiak.handlers.settings", ENABLE_CACHE=True, NOTIFY_BUS=False)
+    @patch("brainiak.handlers.schema_resource.query_superclasses", return_value=[u"http://tatipedia.org/Animal"])
+    @patch("brainiak.handlers.cache.purge_collections")
+    @patch("brainiak.handlers.cache.purge_an_instance")
+    def test_handler_204_purges_collections_of_class_and_superclasses(self, purge_an_instance, purge_collections,
+                                                                      query_superclasses, settings):
+        response = self.fetch(
+                    '/anygraph/Species/Platypus?class_prefix=http://tatipedia.org/&instance_prefix=http://tatipedia.org/&graph_uri=http://somegraph.org/',
+                    method="DELETE")
+        self.assertEqual(response.code, 204)
+        purge_collections.assert_called_with(set([u"http://tatipedia.org/Species", u"http://tatipedia.org/Animal"]))
+
     @patch("brainiak.handlers.logger")
     def test_handler_409(self, log):
         response = self.fetch('/anygraph/Place/Australia?class_prefix=http://tatipedia.org/&instance_prefix=http://tatipedia.org/&graph_uri=http://somegraph.org/', method="DELETE")
@@ -417,10 +417,14 @@ class PredicatesQueryTestCaseMultipleDomainRange(QueryTestCase):
 
 class GetSchemaTestCase(TornadoAsyncTestCase):
 
-    @patch("brainiak.schema.get_class.query_class_schema", return_value={"results": {"bindings": [{"dummy_key": "dummy_value"}]}})
-    @patch("brainiak.schema.get_class.query_superclasses", return_value=["classeA", "classeB"])
+    @patch("brainiak.schema.get_class.get_ontology_model", return_value=None)
+    @patch("brainiak.schema.get_class.settings.SCHEMA_SINGLE_QUERY", False)
+    @patch("brainiak.schema.get_class.triplestore.query_sparql_many", return_value=[
+        {"results": {"bindings": [{"dummy_key": "dummy_value"}]}},
+        {"results": {"bindings": [{"class": {"value": "classeA"}}, {"class": {"value": "classeB"}}]}},
+        {"results": {"bindings": []}}])
     @patch("brainiak.schema.get_class.get_predicates_and_cardinalities", return_value="property_dict")
-    def test_query_get_schema(self, mocked_get_preds_and_cards, mocked_query_superclasses, mocked_query_class_schema):
+    def test_query_get_schema(self, mocked_get_preds_and_cards, mocked_query_sparql_many):
 
         params = {
             "context_name": "ctx",
@@ -442,13 +446,19 @@ class GetSchemaTestCase(TornadoAsyncTestCase):
         self.assertIn("properties", schema_response)
 
         self.assertEqual(schema_response["properties"], "property_dict")
+        self.assertEqual(len(mocked_query_sparql_many.call_args[0][0]), 3)
+        self.assertEqual(mocked_get_preds_and_cards.call_args[0][2], ["classeA", "classeB"])
         # FIXME: enhance the structure of the response
         self.stop()
 
-    @patch("brainiak.schema.get_class.query_class_schema", return_value={"results": {"bindings": []}})
-    @patch("brainiak.schema.get_class.query_superclasses", return_value=["classeA", "classeB"])
+    @patch("brainiak.schema.get_class.get_ontology_model", return_value=None)
+    @patch("brainiak.schema.get_class.settings.SCHEMA_SINGLE_QUERY", False)
+    @patch("brainiak.schema.get_class.triplestore.query_sparql_many", return_value=[
+        {"results": {"bindings": []}},
+        {"results": {"bindings": []}},
+        {"results": {"bindings": []}}])
     @patch("brainiak.schema.get_class.get_predicates_and_cardinalities", return_value="property_dict")
-    def test_query_get_schema_empty_response(self, mocked_get_preds_and_cards, mocked_query_superclasses, mocked_query_class_schema):
+    def test_query_get_schema_empty_response(self, mocked_get_preds_and_cards, mocked_query_sparql_many):
 
         params = {
             "context_name": "ctx",
@@ -699,11 +709,26 @@ class TestClassResource(TornadoAsyncHTTPTestCase):
         cached_value = retrieve("http://semantica.globo.com/person/@@http://semantica.globo.com/person/Gender##class")
         self.assertTrue(cached_value)
 
+    @patch("brainiak.handlers.cache.purge_by_path")
+    @patch("brainiak.handlers.cache.purge_class_queries")
+    @patch("brainiak.handlers.cache.purge_graph_queries")
+    @patch("brainiak.handlers.ontology_model.reload_graphs")
+    @patch("brainiak.handlers.settings", ENABLE_CACHE=True)
+    def test_purge_drops_the_cached_queries_of_the_class(self, enable_cache, reload_graphs, purge_graph_queries,
+                                                         purge_class_queries, purge_by_path):
+        response = self.fetch("/person/Gender/_schema", method='PURGE')
+        self.assertEqual(response.code, 200)
+        reload_graphs.assert_called_once_with(["http://semantica.globo.com/person/"])
+        purge_class_queries.assert_called_once_with("http://semantica.globo.com/person/Gender")
+        purge_graph_queries.assert_called_once_with("http://semantica.globo.com/person/")
+
+    @patch("brainiak.handlers.ontology_model.reload_graphs")
     @patch("brainiak.utils.i18n.settings", DEFAULT_LANG="en")
     @patch("brainiak.handlers.settings", ENABLE_CACHE=False)
-    def test_purge_returns_405_when_cache_is_disabled(self, enable_cache, default_lang):
+    def test_purge_returns_405_when_cache_is_disabled(self, enable_cache, default_lang, reload_graphs):
         response = self.fetch("/person/Gender/_schema", method='PURGE')
         self.assertEqual(response.code, 405)
+        self.assertFalse(reload_graphs.called)
         received = json.loads(response.body)
         expected = {u'errors': [u"HTTP error: 405\nCache is disabled (Brainaik's settings.ENABLE_CACHE is set to False)"]}
         self.assertEqual(received, expected)
@@ -829,6 +854,33 @@ class TestClassResource(TornadoAsyncHTTPTestCase):
             )
 
 
+class TestSchemasResource(TornadoAsyncHTTPTestCase):
+
+    @patch("brainiak.handlers.schema_resource.get_cached_schemas", return_value=[{"title": "Gender"}, None])
+    def test_200_with_the_schemas_found(self, get_cached_schemas):
+        body = json.dumps({"classes": [
+            {"class_uri": "http://semantica.globo.com/person/Gender"},
+            {"class_uri": "http://example.onto/Nothing", "graph_uri": "http://example.onto/graph/"}
+        ]})
+        response = self.fetch("/_schemas?expand_uri=1", method="POST", body=body)
+        self.assertEqual(response.code, 200)
+        self.assertEqual(json.loads(response.body), {
+            "items": [{"title": "Gender"}],
+            "not_found": [{"class_uri": "http://example.onto/Nothing", "graph_uri": "http://example.onto/graph/"}]
+        })
+        params_list = get_cached_schemas.call_args[0][0]
+        self.assertEqual(params_list[0]["graph_uri"], "http://semantica.globo.com/person/")
+        self.assertEqual(params_list[0]["context_name"], "person")
+
+    def test_400_without_classes(self):
+        response = self.fetch("/_schemas", method="POST", body=json.dumps({"classes": []}))
+        self.assertEqual(response.code, 400)
+
+    def test_400_with_malformed_json(self):
+        response = self.fetch("/_schemas", method="POST", body="{classes")
+        self.assertEqual(response.code, 400)
+
+
 class InheritedPredicateRedifinitionTestCase(TornadoAsyncHTTPTestCase, QueryTestCase):
 
     fixtures_by_graph = {
@@ -82,6 +82,26 @@ class InstanceResourceTestCase(TornadoAsyncHTTPTestCase, QueryTestCase):
         self.assertIn(u'/person/Gender/Female', body['@id'])
         self.assertTrue(response.headers['X-Cache'].startswith('HIT'))
 
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_get_instance_in_other_language_and_expansion_is_cached_once(self, mock_cache):
+        self.fetch('/person/Gender/Female?lang=pt', method='GET')
+        response = self.fetch('/person/Gender/Female?lang=en&expand_uri=1', method='GET')
+        body = ujson.loads(response.body)
+        self.assertEqual(response.code, 200)
+        self.assertTrue(response.headers['X-Cache'].startswith('HIT'))
+        self.assertEqual(body[URI_PREFIX + u'upper/name'], u'Female')
+
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_get_instance_etag_of_other_language_is_not_modified_only_for_it(self, mock_cache):
+        response = self.fetch('/person/Gender/Female?lang=pt', method='GET')
+        etag = response.headers['Etag']
+        response = self.fetch('/person/Gender/Female?lang=en', method='GET', headers={"If-None-Match": etag})
+        self.assertEqual(response.code, 200)
+        self.assertNotEqual(response.headers['Etag'], etag)
+        self.assertEqual(json.loads(response.body)['upper:name'], u'Female')
+        response = self.fetch('/person/Gender/Female?lang=pt', method='GET', headers={"If-None-Match": etag})
+        self.assertEqual(response.code, 304)
+
     def test_get_instance_200_with_expanded_uris(self):
         response = self.fetch('/person/Gender/Female?expand_uri=1', method='GET')
         body = json.loads(response.body)
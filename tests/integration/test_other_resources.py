@@ -1,4 +1,6 @@
 # coding: utf-8
+import json
+
 from mock import patch
 from stomp.exception import NotConnectedException
 
@@ -141,3 +143,21 @@ class LifecheckTestCase(TornadoAsyncHTTPTestCase):
         response = self.fetch('/_status/', method='GET')
         self.assertEqual(response.code, 200)
         self.assertEqual(response.body, "Virtuoso FAILED\nActiveMQ FAILED")
+
+    @patch("brainiak.event_bus.logger")
+    def test_lifecheck_failed_due_to_open_circuit_breaker(self, log):
+        handlers.triplestore.status = lambda: "Virtuoso SUCCEED"
+        handlers.event_bus.status = lambda: "ActiveMQ SUCCEED"
+        with patch("brainiak.handlers.circuit_breaker.status_message", return_value="Circuit breaker triplestore | open"):
+            response = self.fetch('/_status/', method='GET')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, "Circuit breaker triplestore | open")
+
+
+class QueryStatsResourceTestCase(TornadoAsyncHTTPTestCase):
+
+    @patch("brainiak.handlers.query_stats.get_stats", return_value=[{"name": "QUERY_CARDINALITIES", "count": 1}])
+    def test_query_stats(self, mocked_get_stats):
+        response = self.fetch('/_status/queries', method='GET')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(json.loads(response.body), {"queries": [{"name": "QUERY_CARDINALITIES", "count": 1}]})
@@ -52,3 +52,13 @@ class ListAllContextsTestCase(TornadoAsyncHTTPTestCase):
         body = json.loads(response.body)
         self.assertEqual(body, {'status': "cached"})
         self.assertTrue(response.headers['X-Cache'].startswith('HIT from localhost'))
+
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_304_when_etag_matches(self, enable_cache):
+        response = self.fetch("/_schema_list/", method='GET')
+        self.assertEqual(response.code, 200)
+        etag = response.headers['Etag']
+        response = self.fetch("/_schema_list/", method='GET', headers={"If-None-Match": etag})
+        self.assertEqual(response.code, 304)
+        self.assertEqual(response.headers['Etag'], etag)
+        self.assertEqual(response.body, "")
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from brainiak.schema.ontology_model import OntologyModel, get_graph_fingerprints
+from brainiak.utils.config_parser import parse_section
+from tests.sparql import QueryTestCase
+
+
+class FingerprintTestCase(QueryTestCase):
+
+    fixtures = ["tests/sample/animalia.n3"]
+    graph_uri = "http://example.onto/"
+
+    def test_fingerprint_changes_when_a_label_is_edited(self):
+        fingerprint = get_graph_fingerprints()[self.graph_uri]
+        self.query(u'DELETE DATA FROM <http://example.onto/> { <http://example.onto/gender> rdfs:label "Gender" }')
+        self.query(u'INSERT DATA INTO <http://example.onto/> { <http://example.onto/gender> rdfs:label "Sex" }')
+        edited_fingerprint = get_graph_fingerprints()[self.graph_uri]
+        # the same number of triples, with a different checksum
+        self.assertEqual(edited_fingerprint.split(u"@@")[0], fingerprint.split(u"@@")[0])
+        self.assertNotEqual(edited_fingerprint, fingerprint)
+
+
+class OntologyGraphTestCase(QueryTestCase):
+
+    fixtures = ["tests/sample/people.ttl"]
+    graph_uri = "http://on.to/"
+
+    def test_instances_of_the_graph_are_not_loaded(self):
+        model = OntologyModel(parse_section())
+        subjects = set(subject for (subject, predicate, term) in model.load_graph(self.graph_uri, async=False))
+        self.assertIn("http://on.to/Person", subjects)
+        self.assertIn("http://on.to/name", subjects)
+        # declared only by its domain
+        self.assertIn("http://www.w3.org/2000/01/rdf-schema#label", subjects)
+        self.assertNotIn("http://on.to/rodrigoSenra", subjects)
+
+    def test_fingerprint_does_not_change_when_an_instance_is_edited(self):
+        fingerprint = get_graph_fingerprints()[self.graph_uri]
+        self.query(u'INSERT DATA INTO <http://on.to/> { <http://on.to/rodrigoSenra> rdfs:label "Senra" }')
+        self.assertEqual(get_graph_fingerprints()[self.graph_uri], fingerprint)
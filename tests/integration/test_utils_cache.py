@@ -5,8 +5,8 @@ import json
 from mock import patch, Mock
 
 from brainiak import server
-from brainiak.utils.cache import create, delete, keys, memoize, ping, purge, purge_all_instances, \
-    purge_an_instance, retrieve, redis_client, update_if_present
+from brainiak.utils.cache import create, create_tagged, delete, keys, memoize, ping, purge, purge_all_instances, \
+    purge_an_instance, retrieve, redis_client, update_if_present, ALL_INSTANCES_TAG, build_instance_tag
 
 from tests.mocks import MockRequest
 from tests.tornado_cases import TornadoAsyncHTTPTestCase
@@ -141,11 +141,11 @@ class PurgeTestCase(unittest.TestCase):
             debug.assert_called_with("Cache: key(s) to be deleted: ['some_other_url', 'some_url']")
 
     @patch("brainiak.utils.i18n.settings", DEFAULT_LANG="en")
-    @patch("brainiak.utils.cache.delete", return_value=False)
+    @patch("brainiak.utils.cache.unlink", return_value=0)
     @patch("brainiak.utils.cache.log.logger.debug")
     @patch("brainiak.utils.cache.log.logger.info")
     @patch("brainiak.utils.cache.log", logger=logging.getLogger("xubiru"))
-    def test_cleanup_fails(self, logger, info, debug, delete, settings):
+    def test_cleanup_fails(self, logger, info, debug, unlink, settings):
         purge("problematic_key")
         self.assertEqual(info.call_count, 1)
         info.assert_called_with("Cache: failed purging 1 key(s), matching the pattern: problematic_key")
@@ -158,8 +158,8 @@ class PurgeAllInstancesTestCase(unittest.TestCase):
     def setUp(self):
         self.assertTrue(ping())  # assert Redis is up
         create("non_default_key", {})
-        create("_@@_@@inst_a##instance", {})
-        create("_@@_@@inst_b@@a=1&b=2##instance", {})
+        create_tagged("_@@_@@inst_a##instance", "{}", [ALL_INSTANCES_TAG])
+        create_tagged("_@@_@@inst_b@@a=1&b=2##instance", "{}", [ALL_INSTANCES_TAG])
         create("_##json_schema", {})
         create("_##root", {})
         create("some_graph@@some_instance##class", {})
@@ -190,10 +190,11 @@ class PurgeAnInstanceTestCase(unittest.TestCase):
 
     def setUp(self):
         self.assertTrue(ping())  # assert Redis is up
-        create(u"_@@_@@http://Charles@@xubiru##instance", {})
-        create(u"_@@_@@http://NinaFox@@class_uri=http://dog&instance_uri=http://NinaFox##instance", "something")
-        create(u"_@@_@@http://NinaFox@@xubiru=##instance##instance", "something")
-        create(u"_@@_@@http://NinaFox@@abc##instance", "something")
+        create_tagged(u"_@@_@@http://Charles@@xubiru##instance", "{}", [build_instance_tag("http://Charles")])
+        nina_fox_tags = [build_instance_tag("http://NinaFox")]
+        create_tagged(u"_@@_@@http://NinaFox@@class_uri=http://dog&instance_uri=http://NinaFox##instance", "something", nina_fox_tags)
+        create_tagged(u"_@@_@@http://NinaFox@@xubiru=##instance##instance", "something", nina_fox_tags)
+        create_tagged(u"_@@_@@http://NinaFox@@abc##instance", "something", nina_fox_tags)
 
     def tearDown(self):
         delete(u"_@@_@@http://Charles@@xubiru##instance")
@@ -206,7 +207,7 @@ class PurgeAnInstanceTestCase(unittest.TestCase):
     @patch("brainiak.utils.cache.log", logger=logging.getLogger("xubiru"))
     def test_purge_an_instance(self, logger, debug_mock, settings):
         purge_an_instance("http://NinaFox")
-        self.assertTrue('CacheDebug: Delete cache keys related to pattern' in str(debug_mock.call_args_list))
+        self.assertTrue('CacheDebug: Delete cache keys related to tag' in str(debug_mock.call_args_list))
         self.assertEqual(retrieve(u"_@@_@@http://Charles@@xubiru##instance"), {})
         self.assertEqual(retrieve(u"_@@_@@http://NinaFox@@class_uri=http://dog##instance"), None)
         self.assertEqual(retrieve(u"_@@_@@http://NinaFox@@a=1&b=2##instance"), None)
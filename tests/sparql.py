@@ -8,6 +8,7 @@ import urllib2
 import rdflib
 
 from brainiak import settings, triplestore
+from brainiak.schema.ontology_model import load_ontology_model
 from brainiak.utils.config_parser import parse_section
 
 
@@ -158,6 +159,8 @@ class QueryTestCase(SimpleTestCase):
                     load(fixture, graph)
 
         self.process_inference_options()
+        # the fixtures may have the same fingerprint as the ones loaded before in the same graph
+        load_ontology_model(force_graphs=self.fixtures_by_graph.keys() or [self.graph_uri])
 
     def _drop_graph_from_triplestore(self, graph):
         isql_down = ISQL_DOWN % {"graph": graph}
@@ -0,0 +1,135 @@
+import unittest
+
+from mock import patch, Mock
+from tornado.httpclient import HTTPError as ClientHTTPError
+
+from brainiak import circuit_breaker
+from brainiak.circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+
+
+BREAKER_SETTINGS = {
+    "CIRCUIT_BREAKER_WINDOW": 4,
+    "CIRCUIT_BREAKER_MIN_CALLS": 4,
+    "CIRCUIT_BREAKER_ERROR_RATE": 0.5,
+    "CIRCUIT_BREAKER_OPEN_SECS": 10,
+    "ADAPTIVE_TIMEOUT_FACTOR": 2,
+    "ADAPTIVE_TIMEOUT_SAMPLES": 100,
+    "ADAPTIVE_TIMEOUT_MIN_SAMPLES": 3,
+    "ADAPTIVE_TIMEOUT_MIN_SECS": 0.5,
+    "ADAPTIVE_TIMEOUT_MAX_SECS": 20
+}
+
+
+def failing_fetch(code):
+    def fetch():
+        raise ClientHTTPError(code)
+    return fetch
+
+
+@patch("brainiak.circuit_breaker.log")
+@patch("brainiak.circuit_breaker.settings", **BREAKER_SETTINGS)
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def open_breaker(self, breaker):
+        for i in range(2):
+            breaker.call(lambda: "response")
+        for i in range(2):
+            self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(599))
+
+    def test_breaker_opens_at_error_rate(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        breaker.call(lambda: "response")
+        breaker.call(lambda: "response")
+        self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(500))
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(599))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.total_opened, 1)
+
+    def test_client_errors_are_not_failures(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        for i in range(4):
+            self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(400))
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.error_rate, 0.0)
+
+    def test_open_breaker_fails_fast_with_503(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.open_breaker(breaker)
+        fetch = Mock()
+        with self.assertRaises(CircuitOpen) as exception:
+            breaker.call(fetch)
+        self.assertEqual(exception.exception.status_code, 503)
+        self.assertFalse(fetch.called)
+        self.assertEqual(breaker.total_rejected, 1)
+
+    def test_successful_probe_closes_breaker(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.open_breaker(breaker)
+        breaker.opened_at -= 10
+        self.assertEqual(breaker.call(lambda: "response"), "response")
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.error_rate, 0.0)
+
+    def test_failed_probe_opens_breaker_again(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.open_breaker(breaker)
+        breaker.opened_at -= 10
+        self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(599))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.total_opened, 2)
+
+    def test_only_one_probe_while_half_open(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.open_breaker(breaker)
+        breaker.opened_at -= 10
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertRaises(CircuitOpen, breaker.before_call)
+
+    def test_timeout_follows_p99_latency(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.assertEqual(breaker.timeout(), 20)
+        for latency in [0.1, 0.2, 1.5]:
+            breaker.record_success(latency)
+        self.assertEqual(breaker.timeout(), 3.0)
+        breaker.latencies.clear()
+        for latency in [0.01, 0.01, 0.01]:
+            breaker.record_success(latency)
+        self.assertEqual(breaker.timeout(), 0.5)
+
+    def test_timeout_is_kept_per_operation(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        for latency in [0.01, 0.01, 0.01]:
+            breaker.record_success(latency, "QUERY_ASK")
+        for latency in [2, 3, 4]:
+            breaker.record_success(latency, "QUERY_SCHEMA")
+        self.assertEqual(breaker.timeout("QUERY_ASK"), 0.5)
+        self.assertEqual(breaker.timeout("QUERY_SCHEMA"), 8)
+        self.assertEqual(breaker.timeout("QUERY_UNKNOWN"), 20)
+        self.assertEqual(breaker.max_timeout(), 8)
+
+    @patch("brainiak.circuit_breaker.time.time", side_effect=[0, 5])
+    def test_timed_out_call_is_recorded_at_its_timeout(self, time, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        for latency in [1, 1, 1]:
+            breaker.record_success(latency, "QUERY_SCHEMA")
+        self.assertEqual(breaker.timeout("QUERY_SCHEMA"), 2)
+        self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(599), operation="QUERY_SCHEMA")
+        self.assertEqual(list(breaker.latencies["QUERY_SCHEMA"]), [1, 1, 1, 2])
+        self.assertEqual(breaker.timeout("QUERY_SCHEMA"), 4)
+
+    def test_fast_failure_is_not_recorded_as_latency(self, settings, log):
+        breaker = CircuitBreaker("triplestore")
+        self.assertRaises(ClientHTTPError, breaker.call, failing_fetch(599), operation="QUERY_SCHEMA")
+        self.assertEqual(breaker.latencies, {})
+
+    def test_status_message_lists_only_breakers_not_closed(self, settings, log):
+        with patch.dict(circuit_breaker.breakers, clear=True):
+            circuit_breaker.get_breaker("elasticsearch")
+            self.assertEqual(circuit_breaker.status_message(), u"")
+            self.open_breaker(circuit_breaker.get_breaker("triplestore"))
+            message = circuit_breaker.status_message()
+            self.assertIn(u"triplestore | open", message)
+            self.assertNotIn(u"elasticsearch", message)
+            self.assertIn(u"elasticsearch | closed", circuit_breaker.get_usage_message())
@@ -26,3 +26,17 @@ class TestCaseInstanceCreateResource(unittest.TestCase):
             create_instance(params, instance_data, "http://uri-teste")
             expected = ["The property (http://www.w3.org/2000/01/rdf-schema#label) defined in the schema (http://somedomain/class) must map a unique value. The value provided (teste) is already used by another instance."]
             self.assertEqual(json.loads(str(e.exception)), expected)
+
+    @patch("brainiak.instance.create_instance.cache.purge_graph_queries")
+    @patch("brainiak.instance.create_instance.create_explicit_triples", return_value=[])
+    @patch("brainiak.instance.create_instance.query_create_instances")
+    @patch("brainiak.instance.create_instance.is_insert_response_successful", return_value=True)
+    @patch("brainiak.instance.create_instance.get_cached_schema", return_value=mock_schema({"rdfs:label": "string"}, id="http://somedomain/class"))
+    def test_instance_inserted_purges_graph_queries(self, mock_get_cached_schema, mocked_response_successful,
+                                                     mocked_query_create_instances, mocked_create_explicit_triples,
+                                                     mocked_purge_graph_queries):
+        handler = MockHandler()
+        params = ParamDict(handler, class_uri="http://somedomain/class", graph_uri="http://somedomain/graph")
+        instance_data = {"http://www.w3.org/2000/01/rdf-schema#label": "teste"}
+        create_instance(params, instance_data, "http://uri-teste")
+        mocked_purge_graph_queries.assert_called_with("http://somedomain/graph")
@@ -23,7 +23,7 @@ class TestCaseInstanceResource(unittest.TestCase):
         get_instance.assemble_instance_json = self.original_assemble_instance_json
         triplestore.query_sparql = self.original_query_sparql
 
-    @patch("brainiak.instance.get_instance.query_all_properties_and_objects", return_value={"results": {"bindings": ["not_empty"]}})
+    @patch("brainiak.instance.get_instance.query_all_properties_and_objects", return_value={"results": {"bindings": [{"predicate": {"value": "name"}, "object": {"value": "Brasil"}}]}})
     @patch("brainiak.instance.get_instance.assemble_instance_json", return_value="ok")
     @patch("brainiak.schema.get_class.get_cached_schema", return_value={})
     def test_get_instance_with_result(self, get_cached_schema, assemble_instance_json, query_all_properties_and_objects):
@@ -66,7 +66,7 @@ class TestCaseInstanceResource(unittest.TestCase):
         self.assertTrue(query_all_properties_and_objects.called)
 
     def test_query_all_properties_and_objects_with_expand_object_properties(self):
-        triplestore.query_sparql = lambda query, query_params: query
+        triplestore.query_sparql = lambda query, query_params, **kwargs: query
 
         class Params(dict):
             triplestore_config = {}
@@ -89,13 +89,13 @@ class TestCaseInstanceResource(unittest.TestCase):
                     ?predicate ?object .
             OPTIONAL { ?predicate rdfs:subPropertyOf ?super_property } .
             OPTIONAL { ?object rdfs:label ?object_label } .
-            FILTER((langMatches(lang(?object), "en") OR langMatches(lang(?object), "")) OR (IsURI(?object)) AND !isBlank(?object)) .
+            FILTER(isLiteral(?object) OR isURI(?object)) .
             }
             """
         self.assertEqual(strip(computed), strip(expected))
 
     def test_query_all_properties_and_objects_without_expand_object_properties(self):
-        triplestore.query_sparql = lambda query, query_params: query
+        triplestore.query_sparql = lambda query, query_params, **kwargs: query
 
         class Params(dict):
             triplestore_config = {}
@@ -118,12 +118,86 @@ class TestCaseInstanceResource(unittest.TestCase):
                     ?predicate ?object .
             OPTIONAL { ?predicate rdfs:subPropertyOf ?super_property } .
 
-            FILTER((langMatches(lang(?object), "en") OR langMatches(lang(?object), "")) OR (IsURI(?object)) AND !isBlank(?object)) .
+            FILTER(isLiteral(?object) OR isURI(?object)) .
             }
             """
         self.assertEqual(strip(computed), strip(expected))
 
 
+class CanonicalInstanceTestCase(unittest.TestCase):
+
+    maxDiff = None
+
+    def setUp(self):
+        self.bindings = [
+            {"predicate": {"value": "label"}, "object": {"type": "literal", "xml:lang": "pt", "value": "Gato"}},
+            {"predicate": {"value": "label"}, "object": {"type": "literal", "xml:lang": "en", "value": "Cat"}},
+            {"predicate": {"value": "legs"}, "object": {"type": "typed-literal", "value": "4"}},
+            {"predicate": {"value": "legs"}, "object": {"type": "bnode", "value": "nodeID://b1"}, "is_object_blank": {"value": "1"}},
+            {"predicate": {"value": "unknown"}, "object": {"type": "literal", "value": "ignored"}}
+        ]
+        self.class_schema = {
+            "title": "Animal",
+            "properties": {
+                "label": {"type": "string", "datatype": "http://www.w3.org/2001/XMLSchema#string"},
+                "legs": {"type": "integer", "datatype": "http://www.w3.org/2001/XMLSchema#int"},
+                "other": {"type": "string", "datatype": "http://www.w3.org/2001/XMLSchema#string"}
+            }
+        }
+
+    def prepare_params(self, querystring=""):
+        handler = MockHandler(querystring=querystring)
+        return ParamDict(handler, context_name="animals", class_name="Animal", instance_id="cat",
+                         meta_properties=None, expand_object_properties=None)
+
+    @patch("brainiak.schema.get_class.get_cached_schema")
+    @patch("brainiak.instance.get_instance.query_all_properties_and_objects")
+    def test_get_canonical_instance(self, query_all_properties_and_objects, get_cached_schema):
+        query_all_properties_and_objects.return_value = {"results": {"bindings": self.bindings}}
+        get_cached_schema.return_value = self.class_schema
+        query_params = self.prepare_params()
+        computed = get_instance.get_canonical_instance(query_params)
+        self.assertEqual(computed["class_uri"], query_params["class_uri"])
+        self.assertEqual(len(computed["bindings"]), 4)
+        self.assertEqual(computed["class_schema"]["title"], "Animal")
+        self.assertEqual(sorted(computed["class_schema"]["properties"]), ["label", "legs"])
+
+    def test_instance_view_selects_language(self):
+        canonical_instance = {
+            "graph_uri": "http://semantica.globo.com/animals/",
+            "class_uri": "http://semantica.globo.com/animals/Animal",
+            "bindings": self.bindings[:3],
+            "class_schema": self.class_schema
+        }
+        computed = get_instance.instance_view(canonical_instance, self.prepare_params("lang=en"))
+        self.assertEqual(computed["label"], "Cat")
+        self.assertEqual(computed["legs"], 4)
+        self.assertEqual(computed["_type_title"], "Animal")
+
+        query_params = self.prepare_params("lang=pt&meta_properties=0")
+        computed = get_instance.instance_view(canonical_instance, query_params)
+        expected = {
+            "label": "Gato",
+            "legs": 4,
+            "http://www.w3.org/1999/02/22-rdf-syntax-ns#type": query_params["class_uri"]
+        }
+        self.assertEqual(computed, expected)
+
+    @patch("brainiak.instance.get_instance.memoize")
+    def test_get_cached_instance_shares_the_key_of_all_views(self, memoize):
+        memoize.return_value = {"meta": {}, "body": {
+            "graph_uri": "http://semantica.globo.com/animals/",
+            "class_uri": "http://semantica.globo.com/animals/Animal",
+            "bindings": self.bindings[:3],
+            "class_schema": self.class_schema
+        }}
+        query_params = self.prepare_params("lang=en&expand_uri=1&meta_properties=0")
+        response = get_instance.get_cached_instance(query_params)
+        self.assertEqual(response["body"]["label"], "Cat")
+        expected_key = u"_@@_@@{0}@@##instance".format(query_params["instance_uri"])
+        self.assertEqual(memoize.call_args[1]["key"], expected_key)
+
+
 class AssembleTestCase(unittest.TestCase):
 
     maxDiff = None
@@ -1,7 +1,12 @@
 import unittest
+
+from mock import patch
+
 from brainiak.prefixes import SHORTEN
 import brainiak.schema.get_class as schema
+from tests.mocks import MockHandler
 from brainiak import prefixes
+from brainiak.utils.params import ParamDict
 from brainiak.schema.get_class import _extract_cardinalities, assemble_predicate, convert_bindings_dict, normalize_predicate_range, merge_ranges, join_predicates, get_common_key
 
 
@@ -614,5 +619,131 @@ class SelectMostSpecializedInHierarchyTestCase(unittest.TestCase):
         predicate_in_A = {'class': 'A'}
         predicate_in_B = {'class': 'B'}
         hierarchy = ['B', 'A']  # B inherits from A
-        result = schema.most_specialized_predicate(hierarchy, predicate_in_A, predicate_in_B)
+        result = schema.most_specialized_predicate(schema.rank_classes(hierarchy), predicate_in_A, predicate_in_B)
         self.assertEqual(result, predicate_in_B)
+
+    def test_rank_classes(self):
+        self.assertEqual(schema.rank_classes(['C', 'B', 'A', 'B']), {'C': 0, 'B': 1, 'A': 2})
+
+
+class QuerySchemaTestCase(unittest.TestCase):
+
+    class Params(dict):
+        triplestore_config = {}
+
+    def test_build_schema_query(self):
+        query = schema.build_schema_query({"class_uri": "http://ex/City", "graph_uri": "http://ex/"})
+        self.assertIn("GRAPH <http://ex/> {", query)
+        self.assertIn("<http://ex/City> rdfs:subClassOf ?superclass", query)
+        self.assertNotIn("%(", query)
+
+    @patch("brainiak.schema.get_class.triplestore.query_sparql", return_value={"results": {"bindings": [
+        {"class_title": {"type": "literal", "value": "City", "xml:lang": "en"}},
+        {"class_title": {"type": "literal", "value": "Cidade", "xml:lang": "pt"},
+         "class_comment": {"type": "literal", "value": "Uma cidade", "xml:lang": "pt"}},
+        {"superclass": {"type": "uri", "value": "http://ex/Place"}, "step": {"type": "literal", "value": "1"}},
+        {"superclass": {"type": "uri", "value": "http://ex/City"}, "step": {"type": "literal", "value": "0"}},
+        {"restriction_predicate": {"type": "uri", "value": "http://ex/name"},
+         "min": {"type": "literal", "value": "1"},
+         "restriction_range": {"type": "uri", "value": "http://www.w3.org/2001/XMLSchema#string"}},
+        {"predicate": {"type": "uri", "value": "http://ex/name"},
+         "title": {"type": "literal", "value": "Nome", "xml:lang": "pt"}}
+    ]}})
+    def test_query_schema_splits_the_parts_of_the_schema(self, mocked_query_sparql):
+        (class_schema, superclasses, cardinalities, predicates) = schema.query_schema(
+            self.Params(class_uri="http://ex/City", graph_uri="http://ex/", lang="pt"))
+        self.assertEqual(mocked_query_sparql.call_count, 1)
+        self.assertEqual(class_schema["results"]["bindings"], [{
+            "title": {"type": "literal", "value": "Cidade", "xml:lang": "pt"},
+            "comment": {"type": "literal", "value": "Uma cidade", "xml:lang": "pt"}}])
+        self.assertEqual(schema.filter_values(superclasses, "class"), ["http://ex/City", "http://ex/Place"])
+        self.assertEqual(cardinalities["results"]["bindings"], [{
+            "predicate": {"type": "uri", "value": "http://ex/name"},
+            "min": {"type": "literal", "value": "1"},
+            "range": {"type": "uri", "value": "http://www.w3.org/2001/XMLSchema#string"}}])
+        self.assertEqual(predicates["results"]["bindings"], [{
+            "predicate": {"type": "uri", "value": "http://ex/name"},
+            "title": {"type": "literal", "value": "Nome", "xml:lang": "pt"}}])
+
+    @patch("brainiak.schema.get_class.get_ontology_model", return_value=None)
+    @patch("brainiak.schema.get_class.triplestore.query_sparql", return_value={"results": {"bindings": []}})
+    def test_superclasses_query_is_cached_by_class(self, mocked_query_sparql, get_ontology_model):
+        schema._query_superclasses(self.Params(class_uri="http://ex/City", class_prefix="http://ex/", graph_uri="http://ex/"))
+        self.assertEqual(mocked_query_sparql.call_args[1]["cache_tags"], ["http://ex/City"])
+        self.assertEqual(mocked_query_sparql.call_args[1]["query_name"], "QUERY_SUPERCLASS")
+
+    def test_select_predicates_language_keeps_all_when_none_is_in_the_language(self):
+        result = {"results": {"bindings": [{"title": {"type": "literal", "value": "Name", "xml:lang": "en"}}]}}
+        self.assertEqual(schema.select_predicates_language(result, "pt"), result)
+
+
+def uri(value):
+    return {"type": "uri", "value": value}
+
+
+class GetSchemasTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.query_params = ParamDict(MockHandler(querystring="lang=pt"), context_name="_", class_name="_")
+
+    def test_build_class_params(self):
+        class_params = schema.build_class_params(self.query_params, "http://ex/onto/City")
+        self.assertEqual(class_params["class_uri"], "http://ex/onto/City")
+        self.assertEqual(class_params["class_name"], "City")
+        self.assertEqual(class_params["graph_uri"], "http://ex/onto/")
+        self.assertEqual(class_params["lang"], "pt")
+        self.assertIs(class_params.triplestore_config, self.query_params.triplestore_config)
+        other_params = schema.build_class_params(self.query_params, "http://ex/onto/Place", "http://ex/graph/")
+        self.assertEqual(other_params["graph_uri"], "http://ex/graph/")
+        self.assertEqual(other_params["context_name"], "graph")
+        self.assertEqual(class_params["class_uri"], "http://ex/onto/City")
+
+    @patch("brainiak.schema.get_class.build_schema", side_effect=lambda params, class_schema, superclasses, cardinalities, predicates:
+           [item["predicate"]["value"] for item in predicates["results"]["bindings"]])
+    @patch("brainiak.schema.get_class._query_predicate_without_lang", return_value={"results": {"bindings": [
+        {"predicate": uri("http://ex/onto/name"), "domain_class": uri("http://ex/onto/Place")},
+        {"predicate": uri("http://ex/onto/population"), "domain_class": uri("http://ex/onto/City")}
+    ]}})
+    @patch("brainiak.schema.get_class.triplestore.query_sparql_many", return_value=[
+        {"results": {"bindings": [{"title": {"type": "literal", "value": "Cidade"}}]}},
+        {"results": {"bindings": [{"class": uri("http://ex/onto/City")}, {"class": uri("http://ex/onto/Place")}]}},
+        {"results": {"bindings": []}},
+        {"results": {"bindings": [{"title": {"type": "literal", "value": "Lugar"}}]}},
+        {"results": {"bindings": [{"class": uri("http://ex/onto/Place")}]}},
+        {"results": {"bindings": []}}])
+    @patch("brainiak.schema.get_class.get_ontology_model", return_value=None)
+    def test_get_schemas_shares_the_predicates_query(self, get_ontology_model, query_sparql_many, query_predicates, build_schema):
+        params_list = [schema.build_class_params(self.query_params, "http://ex/onto/City"),
+                       schema.build_class_params(self.query_params, "http://ex/onto/Place")]
+        schemas = schema.get_schemas(params_list)
+        queries = query_sparql_many.call_args[0][0]
+        self.assertEqual(len(queries), 6)
+        self.assertEqual(queries[1]["query_name"], "QUERY_SUPERCLASS")
+        self.assertEqual(queries[1]["cache_tags"], ["http://ex/onto/City"])
+        self.assertEqual(query_predicates.call_count, 1)
+        self.assertEqual(query_predicates.call_args[0][1], ["http://ex/onto/City", "http://ex/onto/Place"])
+        self.assertEqual(schemas, [["http://ex/onto/name", "http://ex/onto/population"], ["http://ex/onto/name"]])
+
+    @patch("brainiak.schema.get_class.memoize_many", return_value=[{"body": {"title": "Cidade"}, "meta": {}}, None])
+    def test_get_cached_schemas_of_repeated_classes(self, memoize_many):
+        params_list = [schema.build_class_params(self.query_params, "http://ex/onto/City"),
+                       schema.build_class_params(self.query_params, "http://ex/onto/Place"),
+                       schema.build_class_params(self.query_params, "http://ex/onto/City")]
+        schemas = schema.get_cached_schemas(params_list)
+        self.assertEqual([item and item["title"] for item in schemas], ["Cidade", None, "Cidade"])
+        self.assertEqual(memoize_many.call_args[0][0], [u"http://ex/onto/@@http://ex/onto/City##class",
+                                                        u"http://ex/onto/@@http://ex/onto/Place##class"])
+        self.assertEqual(memoize_many.call_args[0][3], [[u"schema@@http://ex/onto/City", u"graph@@http://ex/onto/"],
+                                                        [u"schema@@http://ex/onto/Place", u"graph@@http://ex/onto/"]])
+
+    @patch("brainiak.schema.get_class.memoize", return_value={"body": {"title": "Cidade"}, "meta": {}})
+    def test_cached_schema_gets_the_links_of_the_request(self, memoize):
+        query_params = ParamDict(MockHandler(uri="http://mock.test.com/place/City/_schema"),
+                                 context_name="place", class_name="City")
+        cached_schema = memoize.return_value["body"]
+        class_schema = schema.get_cached_schema(query_params)
+        self.assertEqual(memoize.call_args[1]["tags"], schema.build_class_tags(query_params))
+        links = dict((link["rel"], link["href"]) for link in class_schema["links"])
+        self.assertTrue(links["class"].startswith(u"/place/City/_schema"))
+        # the cached entry is left without links, as it is shared by every request of the class
+        self.assertNotIn("links", cached_schema)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import greenlet
+import redis
+from mock import patch
+from redis.exceptions import ConnectionError, ResponseError
+from tornado.tcpserver import TCPServer
+from tornado.testing import AsyncTestCase, bind_unused_port
+
+from brainiak.greenlet_redis import GreenletConnection, GreenletConnectionPool, PoolTimeoutError
+from brainiak import greenlet_tornado
+
+
+class FakeRedisServer(TCPServer):
+    """
+    Understands GET, SET and DEL; never answers HANG and answers any other command with an error.
+    """
+
+    def __init__(self, **kwargs):
+        super(FakeRedisServer, self).__init__(**kwargs)
+        self.data = {}
+        self.connections = 0
+
+    def handle_stream(self, stream, address):
+        self.connections += 1
+        self.read_command(stream)
+
+    def read_command(self, stream):
+        def on_count(line):
+            self.read_args(stream, int(line[1:-2]), [])
+        stream.read_until("\r\n", on_count)
+
+    def read_args(self, stream, count, args):
+        if len(args) == count:
+            self.answer(stream, args)
+            return
+
+        def on_length(line):
+            stream.read_bytes(int(line[1:-2]) + 2, lambda arg: self.read_args(stream, count, args + [arg[:-2]]))
+        stream.read_until("\r\n", on_length)
+
+    def answer(self, stream, args):
+        command = args[0].upper()
+        if command == "HANG":
+            return
+        if command == "GET":
+            value = self.data.get(args[1])
+            reply = "$-1\r\n" if value is None else "${0}\r\n{1}\r\n".format(len(value), value)
+        elif command == "SET":
+            self.data[args[1]] = args[2]
+            reply = "+OK\r\n"
+        elif command == "DEL":
+            reply = ":{0}\r\n".format(sum(1 for key in args[1:] if self.data.pop(key, None) is not None))
+        else:
+            reply = "-ERR unknown command '{0}'\r\n".format(args[0])
+        stream.write(reply)
+        self.read_command(stream)
+
+
+class GreenletRedisTestCase(AsyncTestCase):
+
+    def setUp(self):
+        super(GreenletRedisTestCase, self).setUp()
+        self.io_loop_patcher = patch("brainiak.greenlet_tornado._io_loop", self.io_loop)
+        self.io_loop_patcher.start()
+        sock, self.port = bind_unused_port()
+        self.server = FakeRedisServer(io_loop=self.io_loop)
+        self.server.add_socket(sock)
+
+    def tearDown(self):
+        self.server.stop()
+        self.io_loop_patcher.stop()
+        super(GreenletRedisTestCase, self).tearDown()
+
+    def client(self, **kwargs):
+        pool = GreenletConnectionPool(host="127.0.0.1", port=self.port, command_timeout=0.2, **kwargs)
+        return redis.StrictRedis(connection_pool=pool)
+
+    @greenlet_tornado.greenlet_test
+    def test_commands_inside_greenlet(self):
+        client = self.client()
+        self.assertTrue(client.set("key", "value"))
+        self.assertEqual(client.get("key"), "value")
+        self.assertEqual(client.get("other"), None)
+        self.assertEqual(client.delete("key", "other"), 1)
+        self.assertTrue(client.connection_pool._available_connections[0]._stream is not None)
+
+    @greenlet_tornado.greenlet_test
+    def test_pipeline_inside_greenlet(self):
+        pipeline = self.client().pipeline(transaction=False)
+        pipeline.set("a", "1")
+        pipeline.set("b", "22")
+        pipeline.get("a")
+        pipeline.get("b")
+        self.assertEqual(pipeline.execute(), [True, True, "1", "22"])
+
+    @greenlet_tornado.greenlet_test
+    def test_error_reply_raises_response_error(self):
+        client = self.client()
+        self.assertRaises(ResponseError, client.execute_command, "UNLINK", "key")
+        self.assertEqual(client.get("key"), None)
+
+    @greenlet_tornado.greenlet_test
+    def test_command_timeout_raises_connection_error(self):
+        connection = GreenletConnection(host="127.0.0.1", port=self.port, command_timeout=0.05)
+        connection.send_command("HANG")
+        self.assertRaises(ConnectionError, connection.read_response)
+        self.assertEqual(connection._stream, None)
+
+    @greenlet_tornado.greenlet_test
+    def test_connection_refused_raises_connection_error(self):
+        sock, port = bind_unused_port()
+        sock.close()
+        connection = GreenletConnection(host="127.0.0.1", port=port, connect_timeout=0.2)
+        self.assertRaises(ConnectionError, connection.connect)
+
+    def test_the_io_loop_serves_other_callbacks_while_waiting(self):
+        client = self.client()
+        events = []
+
+        def get():
+            events.append(client.get("key"))
+            if len(events) == 2:
+                self.stop()
+
+        self.server.data["key"] = "value"
+        greenlet.greenlet(get).switch()
+        events.append("waiting")
+        self.io_loop.add_callback(lambda: greenlet.greenlet(get).switch())
+        self.wait()
+        self.assertEqual(events, ["waiting", "value", "value"])
+
+    def test_pool_makes_greenlets_wait_for_a_connection(self):
+        client = self.client(max_connections=1)
+        results = []
+
+        def get():
+            results.append(client.get("key"))
+            if len(results) == 3:
+                self.stop()
+
+        self.server.data["key"] = "value"
+        for i in range(3):
+            greenlet.greenlet(get).switch()
+        self.wait()
+        self.assertEqual(results, ["value"] * 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_waiting_for_a_connection_times_out(self):
+        client = self.client(max_connections=1, wait_timeout=0.05)
+        results = []
+
+        def hang():
+            try:
+                client.execute_command("HANG")
+            except ConnectionError as e:
+                results.append(type(e))
+            self.stop()
+
+        def get():
+            try:
+                client.get("key")
+            except PoolTimeoutError as e:
+                results.append(type(e))
+
+        greenlet.greenlet(hang).switch()
+        greenlet.greenlet(get).switch()
+        self.wait()
+        # the waiting greenlet gives up before the command which holds the connection times out
+        self.assertEqual(results, [PoolTimeoutError, ConnectionError])
+        self.assertEqual(len(client.connection_pool.waiting), 0)
+
+    def test_blocking_outside_greenlet(self):
+        connection = GreenletConnection(host="127.0.0.1", port=self.port)
+        connection.connect()
+        self.assertEqual(connection._stream, None)
+        self.assertTrue(connection._sock is not None)
+        connection.disconnect()
@@ -2,6 +2,7 @@
 import unittest
 
 from mock import patch
+from tornado.web import HTTPError
 
 from brainiak import settings
 
@@ -15,43 +16,64 @@ class GetContextTestCase(unittest.TestCase):
     maxDiff = None
 
     def setUp(self):
-        self.original_add_language_support = get_context.add_language_support
-        get_context.add_language_support = lambda query, lang: (query, lang)
-
-        self.original_query_count_classes = get_context.query_count_classes
-        get_context.query_count_classes = lambda x: 1
-
-        self.original_query_classes_list = get_context.query_classes_list
-        get_context.query_classes_list = lambda x: None
-
         self.original_assemble_list_json = get_context.assemble_list_json
-        self.original_query_classes_list = get_context.query_classes_list
+        self.original_get_one_value = get_context.get_one_value
 
     def tearDown(self):
-        get_context.add_language_support = self.original_add_language_support
-        get_context.query_count_classes = self.original_query_count_classes
-        get_context.query_classes_list = self.original_query_classes_list
         get_context.assemble_list_json = self.original_assemble_list_json
-        get_context.query_classes_list = self.original_query_classes_list
+        get_context.get_one_value = self.original_get_one_value
 
-    @patch("brainiak.context.get_context.graph_exists", return_value=True)
-    def test_list_classes_with_no_result(self, mocked_graph_exists):
-        get_context.get_one_value = lambda x, y: "0"
+    @patch("brainiak.context.get_context.triplestore.query_sparql_many",
+           return_value=[{"boolean": True}, {'results': {'bindings': []}}])
+    def test_list_classes_with_no_result(self, mocked_query_sparql_many):
         handler = MockHandler(page="1")
         params = ParamDict(handler, context_name="context_name", class_name="class_name", **LIST_PARAMS)
         result = get_context.list_classes(params)
         self.assertEqual(result["items"], [])
 
-    @patch("brainiak.context.get_context.graph_exists", return_value=True)
-    def test_list_classes_return_result(self, mocked_graph_exists):
-        get_context.get_one_value = lambda x, y: "1"
-        get_context.assemble_list_json = lambda x, y: "expected result"
-        get_context.query_classes_list = lambda x: {'results': {'bindings': 'do not remove this'}}
+    @patch("brainiak.context.get_context.triplestore.query_sparql_many",
+           return_value=[{"boolean": True}, {'results': {'bindings': 'do not remove this'}}])
+    def test_list_classes_return_result(self, mocked_query_sparql_many):
+        get_context.assemble_list_json = lambda x, y, z: "expected result"
         handler = MockHandler(page="1")
         params = ParamDict(handler, context_name="context_name", class_name="class_name", **LIST_PARAMS)
         expected = get_context.list_classes(params)
         self.assertEqual(expected, "expected result")
 
+    @patch("brainiak.context.get_context.triplestore.query_sparql_many",
+           return_value=[{"boolean": False}, {'results': {'bindings': []}}])
+    def test_list_classes_graph_does_not_exist(self, mocked_query_sparql_many):
+        handler = MockHandler(page="1")
+        params = ParamDict(handler, context_name="context_name", class_name="class_name", **LIST_PARAMS)
+        with self.assertRaises(HTTPError) as exception:
+            get_context.list_classes(params)
+        self.assertEqual(exception.exception.status_code, 404)
+
+    @patch("brainiak.context.get_context.triplestore.query_sparql_many",
+           return_value=[{"boolean": True}, {'results': {'bindings': 'do not remove this'}}, "count result"])
+    def test_list_classes_fetches_count_together_with_page(self, mocked_query_sparql_many):
+        get_context.assemble_list_json = lambda x, y, z: z
+        handler = MockHandler(querystring="do_item_count=1")
+        params = ParamDict(handler, context_name="context_name", class_name="class_name", **LIST_PARAMS)
+        computed = get_context.list_classes(params)
+        self.assertEqual(computed, "count result")
+        queries = mocked_query_sparql_many.call_args[0][0]
+        self.assertEqual(len(queries), 3)
+        self.assertIn("ASK", queries[0]["query"])
+        self.assertEqual(queries[0]["cache_tags"], ["context_name"])
+        self.assertIn("LIMIT", queries[1]["query"])
+        self.assertIn("COUNT", queries[2]["query"])
+        self.assertEqual(queries[2]["query_name"], "QUERY_COUNT_ALL_CLASSES_OF_A_GRAPH")
+
+    @patch("brainiak.context.get_context.query_count_classes")
+    def test_assemble_list_json_uses_given_count(self, mocked_query_count_classes):
+        handler = MockHandler(querystring="do_item_count=1")
+        params = ParamDict(handler, context_name="company", **LIST_PARAMS)
+        count_result = {'results': {'bindings': [{'total_items': {'type': 'literal', 'value': '3'}}]}}
+        computed = get_context.assemble_list_json(params, {'results': {'bindings': []}}, count_result)
+        self.assertEqual(computed['item_count'], 3)
+        self.assertFalse(mocked_query_count_classes.called)
+
     def test_assemble_list_json_with_class_prefix(self):
         handler = MockHandler(uri="http://poke.oioi/company/")
         params = ParamDict(handler, context_name="company", **LIST_PARAMS)
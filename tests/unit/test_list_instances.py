@@ -1,9 +1,10 @@
 import unittest
 
 from mock import patch
+from tornado.web import HTTPError
 
 from brainiak.collection.get_collection import Query, merge_by_id, build_json,\
-    cast_item, cast_items_values, build_map_property_to_type
+    cast_item, cast_items_values, build_map_property_to_type, filter_instances
 from brainiak.utils.params import LIST_PARAMS, ParamDict
 from tests.mocks import MockRequest, MockHandler
 from tests.sparql import strip
@@ -574,3 +575,48 @@ class BuildJSONTestCase(URLTestCase):
         something = build_json(items, params)
         self.assertEqual(something["@context"], {'@language': 'pt'})
         self.assertEqual(something["items"], [])
+
+    @patch("brainiak.collection.get_collection.query_count_filter_instances")
+    @patch("brainiak.collection.get_collection.get_class.get_cached_schema", return_value={"properties": {}})
+    def test_query_with_given_count(self, mock_get_schema, mock_query_count):
+        handler = MockHandler(querystring="do_item_count=1")
+        params = ParamDict(handler, context_name="zoo", class_name="Lion", **(LIST_PARAMS))
+        count_result_dict = {"results": {"bindings": [{"total": {"type": "literal", "value": "7"}}]}}
+        computed = build_json([], params, count_result_dict)
+        self.assertEqual(computed["item_count"], 7)
+        self.assertFalse(mock_query_count.called)
+
+
+class FilterInstancesTestCase(unittest.TestCase):
+
+    @patch("brainiak.collection.get_collection.triplestore.query_sparql_many",
+           return_value=[{"boolean": False}, {"results": {"bindings": []}}])
+    def test_filter_instances_of_inexistent_class(self, mock_query_sparql_many):
+        handler = MockHandler()
+        params = ParamDict(handler, context_name="zoo", class_name="Lion", **(LIST_PARAMS))
+        with self.assertRaises(HTTPError) as exception:
+            filter_instances(params)
+        self.assertEqual(exception.exception.status_code, 404)
+
+    @patch("brainiak.collection.get_collection.build_json", return_value="json")
+    @patch("brainiak.collection.get_collection.triplestore.query_sparql_many")
+    def test_filter_instances_fetches_count_together_with_page(self, mock_query_sparql_many, mock_build_json):
+        bindings = [{
+            "subject": {"type": "uri", "value": "http://zoo.com/Lion/Nala"},
+            "label": {"type": "literal", "value": "Nala"}
+        }]
+        mock_query_sparql_many.return_value = [{"boolean": True}, {"results": {"bindings": bindings}}, "count"]
+        handler = MockHandler(querystring="do_item_count=1")
+        params = ParamDict(handler, context_name="zoo", class_name="Lion", **(LIST_PARAMS))
+
+        computed = filter_instances(params)
+
+        self.assertEqual(computed, "json")
+        queries = mock_query_sparql_many.call_args[0][0]
+        self.assertEqual(len(queries), 3)
+        self.assertIn("ASK", queries[0]["query"])
+        self.assertEqual(queries[0]["cache_tags"], ["zoo"])
+        self.assertIn("LIMIT", queries[1]["query"])
+        self.assertIn("count(DISTINCT ?subject)", queries[2]["query"])
+        self.assertEqual(queries[2]["query_name"], "Query.skeleton_count")
+        self.assertEqual(mock_build_json.call_args[0][2], "count")
@@ -3,7 +3,7 @@ from unittest import TestCase
 from brainiak.handlers import ClassHandler, VersionHandler, \
     HealthcheckHandler, VirtuosoStatusHandler, InstanceHandler, SuggestHandler, \
     StoredQueryCollectionHandler, StoredQueryCRUDHandler, StoredQueryCRUDHandler, \
-    StoredQueryExecutionHandler
+    StoredQueryExecutionHandler, SchemasHandler
 from brainiak.routes import ROUTES
 
 
@@ -29,6 +29,10 @@ class RouteTestCase(TestCase):
         VIRTUOSO_STATUS = '/_suggest'
         self.assertTrue(regex.match(VIRTUOSO_STATUS))
 
+    def test_schemas(self):
+        regex = self._regex_for(SchemasHandler)
+        self.assertTrue(regex.match('/_schemas'))
+
     def test_schema_resource(self):
         regex = self._regex_for(ClassHandler)
         VALID_SCHEMA_RESOURCE_SUFFIX = '/person/Gender/_schema'
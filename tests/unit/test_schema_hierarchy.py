@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from brainiak.schema.hierarchy import ClassHierarchy
+
+
+class ClassHierarchyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Thing <- Person <- Musician, Thing <- Place <- City, and Singer <- Musician, Singer <- Place
+        self.hierarchy = ClassHierarchy([
+            ("Person", "Thing"), ("Musician", "Person"), ("Place", "Thing"),
+            ("City", "Place"), ("Singer", "Musician"), ("Singer", "Person")
+        ])
+
+    def test_ancestors_nearest_first(self):
+        self.assertEqual(self.hierarchy.ancestors("Singer"), ["Singer", "Musician", "Person", "Thing"])
+        self.assertEqual(self.hierarchy.ancestors("Thing"), ["Thing"])
+        self.assertEqual(self.hierarchy.ancestors("Unknown"), ["Unknown"])
+
+    def test_descendants_nearest_first(self):
+        self.assertEqual(self.hierarchy.descendants("Thing"), ["Thing", "Person", "Place", "City", "Musician", "Singer"])
+        self.assertEqual(self.hierarchy.descendants("City"), ["City"])
+
+    def test_is_subclass(self):
+        self.assertTrue(self.hierarchy.is_subclass("Singer", "Thing"))
+        self.assertTrue(self.hierarchy.is_subclass("Singer", "Singer"))
+        self.assertFalse(self.hierarchy.is_subclass("Thing", "Singer"))
+        self.assertFalse(self.hierarchy.is_subclass("City", "Person"))
+
+    def test_distance_is_the_shortest_path(self):
+        self.assertEqual(self.hierarchy.distance("Singer", "Person"), 1)
+        self.assertEqual(self.hierarchy.distance("Singer", "Thing"), 2)
+        self.assertEqual(self.hierarchy.distance("Singer", "Singer"), 0)
+        self.assertEqual(self.hierarchy.distance("Singer", "City"), None)
+
+    def test_cycles_terminate(self):
+        hierarchy = ClassHierarchy([("A", "B"), ("B", "A"), ("A", "A")])
+        self.assertEqual(hierarchy.ancestors("A"), ["A", "B"])
+        self.assertEqual(hierarchy.descendants("A"), ["A", "B"])
+        self.assertTrue(hierarchy.is_subclass("B", "A"))
+        self.assertEqual(len(hierarchy), 2)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from mock import Mock, patch
+
+from brainiak.schema import ontology_model
+from brainiak.schema.ontology_model import OntologyModel, uri_term, RDF_TYPE, RDF_FIRST, RDF_REST, RDFS_LABEL, \
+    RDFS_COMMENT, RDFS_SUBCLASS_OF, RDFS_SUBPROPERTY_OF, RDFS_DOMAIN, RDFS_RANGE, OWL_CLASS, OWL_UNION_OF, \
+    OWL_ON_PROPERTY, OWL_ON_DATA_RANGE, OWL_MIN_QUALIFIED_CARDINALITY
+from brainiak.schema.get_class import convert_bindings_dict, get_schema, select_predicates_language
+from brainiak.type_mapper import DATATYPE_PROPERTY, OBJECT_PROPERTY
+from brainiak.utils.sparql import filter_values, get_one_value
+from brainiak.prefixes import MemorizeContext
+
+
+GRAPH = "http://test.graph/"
+OTHER_GRAPH = "http://other.graph/"
+UNIQUE = "http://semantica.globo.com/base/tem_valor_unico"
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+CONFIG = {"url": "http://localhost:8890/sparql"}
+
+
+def literal(value, lang=u""):
+    return (value, u"literal", lang, None)
+
+
+def bnode(value):
+    return (value, u"bnode", u"", None)
+
+
+def triples(*items):
+    return [(subject, predicate, uri_term(term) if isinstance(term, str) else term)
+            for (subject, predicate, term) in items]
+
+
+ONTOLOGY = triples(
+    ("http://ex/Thing", RDF_TYPE, OWL_CLASS),
+    ("http://ex/Thing", RDFS_LABEL, literal(u"Coisa", u"pt")),
+    ("http://ex/Thing", RDFS_LABEL, literal(u"Thing", u"en")),
+    ("http://ex/Person", RDF_TYPE, OWL_CLASS),
+    ("http://ex/Person", RDFS_SUBCLASS_OF, "http://ex/Thing"),
+    ("http://ex/Person", RDFS_SUBCLASS_OF, bnode(u"nodeID://b1")),
+    ("http://ex/Person", RDFS_LABEL, literal(u"Pessoa", u"pt")),
+    ("http://ex/Person", RDFS_COMMENT, literal(u"Ser humano", u"pt")),
+    ("nodeID://b1", OWL_ON_PROPERTY, "http://ex/name"),
+    ("nodeID://b1", OWL_MIN_QUALIFIED_CARDINALITY, literal(u"1")),
+    ("nodeID://b1", OWL_ON_DATA_RANGE, XSD_STRING),
+    ("http://ex/Musician", RDF_TYPE, OWL_CLASS),
+    ("http://ex/Musician", RDFS_SUBCLASS_OF, "http://ex/Person"),
+    ("http://ex/Place", RDF_TYPE, OWL_CLASS),
+    ("http://ex/Place", RDFS_LABEL, literal(u"Lugar", u"pt")),
+    ("http://ex/City", RDF_TYPE, OWL_CLASS),
+    ("http://ex/City", RDFS_SUBCLASS_OF, "http://ex/Place"),
+    ("http://ex/City", RDFS_LABEL, literal(u"Cidade", u"pt")),
+    ("http://ex/name", RDF_TYPE, DATATYPE_PROPERTY),
+    ("http://ex/name", RDFS_DOMAIN, "http://ex/Person"),
+    ("http://ex/name", RDFS_RANGE, XSD_STRING),
+    ("http://ex/name", RDFS_LABEL, literal(u"Nome", u"pt")),
+    ("http://ex/nickname", RDF_TYPE, DATATYPE_PROPERTY),
+    ("http://ex/nickname", RDFS_DOMAIN, "http://ex/Person"),
+    ("http://ex/nickname", RDFS_RANGE, XSD_STRING),
+    ("http://ex/nickname", RDFS_LABEL, literal(u"Nickname", u"en")),
+    ("http://ex/place", RDF_TYPE, OBJECT_PROPERTY),
+    ("http://ex/place", RDFS_DOMAIN, "http://ex/Thing"),
+    ("http://ex/place", RDFS_RANGE, "http://ex/Place"),
+    ("http://ex/place", RDFS_LABEL, literal(u"Lugar")),
+    ("http://ex/birthPlace", RDF_TYPE, OBJECT_PROPERTY),
+    ("http://ex/birthPlace", RDFS_DOMAIN, bnode(u"nodeID://b2")),
+    ("http://ex/birthPlace", RDFS_RANGE, "http://ex/Place"),
+    ("http://ex/birthPlace", RDFS_LABEL, literal(u"Local de nascimento", u"pt")),
+    ("http://ex/birthPlace", RDFS_SUBPROPERTY_OF, "http://ex/place"),
+    ("http://ex/birthPlace", UNIQUE, literal(u"1")),
+    ("nodeID://b2", RDF_TYPE, OWL_CLASS),
+    ("nodeID://b2", OWL_UNION_OF, bnode(u"nodeID://l1")),
+    ("nodeID://l1", RDF_FIRST, "http://ex/Musician"),
+    ("nodeID://l1", RDF_REST, bnode(u"nodeID://l2")),
+    ("nodeID://l2", RDF_FIRST, "http://ex/Place"),
+    ("nodeID://l2", RDF_REST, "http://www.w3.org/1999/02/22-rdf-syntax-ns#nil")
+)
+
+
+def build_model(graphs=None):
+    model = OntologyModel(CONFIG)
+    model.build(graphs or {GRAPH: ONTOLOGY}, {GRAPH: u"41@@"})
+    return model
+
+
+class OntologyModelQueriesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = build_model()
+
+    def test_superclasses_nearest_first(self):
+        result = self.model.query_superclasses("http://ex/Musician")
+        self.assertEqual(filter_values(result, "class"), ["http://ex/Musician", "http://ex/Person", "http://ex/Thing"])
+
+    def test_descendants(self):
+        self.assertEqual(self.model.descendants("http://ex/Thing"), ["http://ex/Thing", "http://ex/Person", "http://ex/Musician"])
+
+    def test_class_schema_in_language(self):
+        result = self.model.query_class_schema("http://ex/Person", GRAPH, "pt")
+        self.assertEqual(get_one_value(result, "title"), u"Pessoa")
+        self.assertEqual(get_one_value(result, "comment"), u"Ser humano")
+        self.assertEqual(filter_values(self.model.query_class_schema("http://ex/Thing", GRAPH, "en"), "title"), [u"Thing"])
+
+    def test_class_schema_of_other_graph_is_empty(self):
+        result = self.model.query_class_schema("http://ex/Person", OTHER_GRAPH, "pt")
+        self.assertEqual(result["results"]["bindings"], [])
+
+    def test_cardinalities_of_inherited_restrictions(self):
+        result = self.model.query_cardinalities("http://ex/Musician")
+        self.assertEqual(result["results"]["bindings"], [{
+            "predicate": {"type": u"uri", "value": "http://ex/name"},
+            "min": {"type": u"literal", "value": u"1"},
+            "range": {"type": u"uri", "value": XSD_STRING}
+        }])
+
+    def test_predicates_of_superclasses_and_of_domain_unions(self):
+        superclasses = filter_values(self.model.query_superclasses("http://ex/Musician"), "class")
+        bindings = select_predicates_language(self.model.query_predicates(superclasses), "pt")["results"]["bindings"]
+        predicates = sorted(item["predicate"]["value"] for item in bindings)
+        self.assertEqual(predicates, ["http://ex/birthPlace", "http://ex/name", "http://ex/place"])
+        birth_place = [item for item in bindings if item["predicate"]["value"] == "http://ex/birthPlace"][0]
+        self.assertEqual(birth_place["domain_class"]["value"], "http://ex/Musician")
+        self.assertEqual(birth_place["predicate_graph"]["value"], GRAPH)
+        self.assertEqual(birth_place["range_label"], {"type": u"literal", "value": u"Lugar", "xml:lang": u"pt"})
+        self.assertEqual(birth_place["super_property"]["value"], "http://ex/place")
+        self.assertEqual(birth_place["unique_value"]["value"], u"1")
+
+    def test_predicates_in_any_language_when_none_is_in_the_language(self):
+        model = build_model({GRAPH: [item for item in ONTOLOGY if item[0] != "http://ex/name"]})
+        bindings = select_predicates_language(model.query_predicates(["http://ex/Person"]), "es")["results"]["bindings"]
+        self.assertEqual([item["title"]["value"] for item in bindings], [u"Nickname"])
+
+    def test_predicates_become_the_schema_properties(self):
+        superclasses = filter_values(self.model.query_superclasses("http://ex/Musician"), "class")
+        bindings = select_predicates_language(self.model.query_predicates(superclasses), "pt")["results"]["bindings"]
+        # place is not a property of its own, as birthPlace is its subproperty
+        cardinalities = {"http://ex/name": {XSD_STRING: {"minItems": 1, "required": True}}}
+        properties = convert_bindings_dict(MemorizeContext(), bindings, cardinalities, superclasses)
+        self.assertEqual(sorted(properties.keys()), ["http://ex/birthPlace", "http://ex/name"])
+        self.assertEqual(properties["http://ex/name"]["required"], True)
+        self.assertEqual(properties["http://ex/birthPlace"]["unique_value"], True)
+
+    def test_predicate_ranges_include_subclasses(self):
+        result = self.model.query_predicate_ranges("http://ex/birthPlace", "pt")
+        self.assertEqual(result["results"]["bindings"], [
+            {"range": {"type": u"uri", "value": "http://ex/Place"},
+             "range_label": {"type": u"literal", "value": u"Lugar", "xml:lang": u"pt"},
+             "range_graph": {"type": u"uri", "value": GRAPH}},
+            {"range": {"type": u"uri", "value": "http://ex/City"},
+             "range_label": {"type": u"literal", "value": u"Cidade", "xml:lang": u"pt"},
+             "range_graph": {"type": u"uri", "value": GRAPH}}
+        ])
+
+    def test_subproperties(self):
+        self.assertEqual(filter_values(self.model.query_subproperties("http://ex/place"), "property"), ["http://ex/birthPlace"])
+        self.assertEqual(filter_values(self.model.query_subproperties("http://ex/birthPlace"), "property"), [])
+
+    @patch("brainiak.schema.get_class.triplestore.query_sparql_many", side_effect=AssertionError("queried the triplestore"))
+    @patch("brainiak.schema.get_class.triplestore.query_sparql", side_effect=AssertionError("queried the triplestore"))
+    def test_get_schema_without_querying_the_triplestore(self, query_sparql, query_sparql_many):
+        query_params = _FakeParams(class_uri="http://ex/Person", graph_uri=GRAPH, lang="pt", expand_uri="0",
+                                   class_prefix="http://ex/")
+        with patch("brainiak.schema.get_class.get_ontology_model", return_value=self.model):
+            with patch("brainiak.schema.get_class.assemble_schema_dict", side_effect=lambda params, title, predicates, context, **kw:
+                       {"title": title, "properties": predicates, "description": kw["comment"]}):
+                schema = get_schema(query_params)
+        self.assertEqual(schema["title"], u"Pessoa")
+        self.assertEqual(schema["description"], u"Ser humano")
+        self.assertEqual(sorted(schema["properties"].keys()), ["http://ex/name", "http://ex/place"])
+
+
+class _FakeParams(dict):
+
+    triplestore_config = CONFIG
+
+    def set_aux_param(self, key, value):
+        pass
+
+    def get_aux_param(self, key):
+        return None
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    @patch("brainiak.schema.ontology_model.triplestore.query_sparql", return_value={"results": {"bindings": [
+        {"graph": {"value": "http://semantica.globo.com/person/"}, "total": {"value": "120"}, "checksum": {"value": "8162"}},
+        {"graph": {"value": "http://semantica.globo.com/place/"}, "total": {"value": "80"}, "checksum": {"value": "5078"}}
+    ]}})
+    def test_get_graph_fingerprints(self, query_sparql):
+        fingerprints = ontology_model.get_graph_fingerprints(CONFIG)
+        self.assertEqual(fingerprints, {
+            "http://semantica.globo.com/person/": u"120@@8162",
+            "http://semantica.globo.com/place/": u"80@@5078"
+        })
+        self.assertEqual(query_sparql.call_args[1]["async"], False)
+
+    def test_instances_are_not_loaded(self):
+        graph_query = ontology_model.build_ontology_graph_query(GRAPH)
+        # the subjects are the classes, properties, restrictions and list nodes, not anything with a label
+        self.assertIn(u"?s a ?subject_type", graph_query)
+        self.assertIn(u"<http://www.w3.org/2002/07/owl#Restriction>", graph_query)
+        self.assertIn(u"?class rdfs:subClassOf ?s", graph_query)
+        self.assertIn(u"?list rdf:rest ?s OPTION (TRANSITIVE, t_min (0))", graph_query)
+        self.assertTrue(graph_query.strip().startswith(u"SELECT DISTINCT ?s ?p ?o"))
+
+    def test_fingerprint_covers_the_triples_loaded(self):
+        graph_query = ontology_model.build_ontology_graph_query(GRAPH)
+        fingerprint_query = ontology_model.build_ontology_fingerprint_query()
+        triples = ontology_model.build_ontology_triples(u"?graph")
+        self.assertIn(triples, fingerprint_query)
+        # each triple is counted once, as it is loaded once
+        self.assertIn(u"SELECT DISTINCT ?graph ?s ?p ?o", fingerprint_query)
+        self.assertIn(triples.replace(u"?graph", u"<{0}>".format(GRAPH)), graph_query)
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch("brainiak.schema.ontology_model.triplestore.query_sparql")
+    def test_edited_label_reloads_the_graph(self, query_sparql, log):
+        # the label of a class is edited: the number of triples is the same, their checksum is not
+        bindings = [{"graph": {"value": GRAPH}, "total": {"value": "41"}, "checksum": {"value": "8162"}}]
+        edited_bindings = [{"graph": {"value": GRAPH}, "total": {"value": "41"}, "checksum": {"value": "8409"}}]
+        query_sparql.side_effect = lambda query, *args, **kwargs: {"results": {"bindings": (
+            bindings if kwargs["query_name"] == "QUERY_ONTOLOGY_FINGERPRINT" else [])}}
+        model = OntologyModel(CONFIG)
+        model.refresh(async=False)
+        bindings = edited_bindings
+        self.assertEqual(model.refresh(async=False), [GRAPH])
+
+
+class OntologyModelRefreshTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = build_model({GRAPH: ONTOLOGY, OTHER_GRAPH: []})
+        self.model.fingerprints = {GRAPH: u"41@@", OTHER_GRAPH: u"0@@"}
+
+    @patch.object(OntologyModel, "load_graph", return_value=[])
+    @patch("brainiak.schema.ontology_model.get_graph_fingerprints", return_value={GRAPH: u"41@@", OTHER_GRAPH: u"0@@"})
+    def test_unchanged_graphs_are_not_reloaded(self, get_graph_fingerprints, load_graph):
+        self.assertEqual(self.model.refresh(), [])
+        self.assertFalse(load_graph.called)
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch.object(OntologyModel, "load_graph", return_value=[])
+    @patch("brainiak.schema.ontology_model.get_graph_fingerprints", return_value={GRAPH: u"42@@"})
+    def test_changed_graphs_are_reloaded_and_removed_ones_dropped(self, get_graph_fingerprints, load_graph, log):
+        self.assertEqual(self.model.refresh(), [GRAPH, OTHER_GRAPH])
+        load_graph.assert_called_once_with(GRAPH, True)
+        self.assertEqual(self.model.graphs, {GRAPH: []})
+        self.assertEqual(self.model.fingerprints, {GRAPH: u"42@@"})
+        self.assertEqual(filter_values(self.model.query_superclasses("http://ex/Person"), "class"), [])
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch.object(OntologyModel, "load_graph", return_value=ONTOLOGY)
+    def test_forced_graphs_are_reloaded(self, load_graph, log):
+        self.model.refresh({GRAPH: u"41@@", OTHER_GRAPH: u"0@@"}, async=False, force_graphs=[OTHER_GRAPH])
+        load_graph.assert_called_once_with(OTHER_GRAPH, False)
+        self.assertEqual(filter_values(self.model.query_superclasses("http://ex/Person"), "class"),
+                         ["http://ex/Person", "http://ex/Thing"])
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch("brainiak.schema.ontology_model.get_graph_fingerprints", return_value={GRAPH: u"42@@", OTHER_GRAPH: u"0@@"})
+    def test_graphs_forced_during_a_refresh_are_reloaded_after_it(self, get_graph_fingerprints, log):
+        loaded = []
+
+        def load_graph(graph_uri, async):
+            # e.g. reload_graphs, while the periodic refresh waits for the triplestore
+            if not loaded:
+                self.assertEqual(self.model.refresh(force_graphs=[OTHER_GRAPH]), [])
+            loaded.append(graph_uri)
+            return []
+
+        with patch.object(self.model, "load_graph", side_effect=load_graph):
+            self.assertEqual(self.model.refresh(), [GRAPH, OTHER_GRAPH])
+        self.assertEqual(loaded, [GRAPH, OTHER_GRAPH])
+        self.assertEqual(self.model.pending_graphs, set())
+        self.assertFalse(self.model.refreshing)
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch("brainiak.schema.ontology_model.triplestore.query_sparql", side_effect=[
+        {"results": {"bindings": [{"s": {"type": "uri", "value": "http://ex/Person"},
+                                   "p": {"type": "uri", "value": RDFS_LABEL},
+                                   "o": {"type": "literal", "value": "Pessoa", "xml:lang": "pt"}}] * 2}},
+        {"results": {"bindings": []}}
+    ])
+    @patch("brainiak.schema.ontology_model.settings", ONTOLOGY_MODEL_PAGE_SIZE=2, ANNOTATION_PROPERTY_HAS_UNIQUE_VALUE=UNIQUE)
+    def test_load_graph_in_pages(self, settings, query_sparql, log):
+        triples = self.model.load_graph(GRAPH, async=False)
+        self.assertEqual(triples, [("http://ex/Person", RDFS_LABEL, (u"Pessoa", u"literal", u"pt", None))] * 2)
+        self.assertEqual(query_sparql.call_count, 2)
+        self.assertIn("OFFSET 2", query_sparql.call_args[0][0])
+        self.assertEqual(query_sparql.call_args[1]["async"], False)
+
+
+def rename_blank_nodes(items):
+    def rename(value):
+        return value.replace(u"nodeID://", u"nodeID://renamed")
+    return [(rename(subject), predicate, (rename(term[0]),) + term[1:]) for (subject, predicate, term) in items]
+
+
+class OntologyChangesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = build_model()
+
+    def affected_schemas(self, ontology):
+        (class_digests, hierarchy) = (self.model.class_digests, self.model.hierarchy)
+        self.model.build({GRAPH: ontology}, {GRAPH: u"42@@"})
+        return self.model.affected_schemas(class_digests, hierarchy)
+
+    def test_reloaded_graph_without_changes_affects_no_schema(self):
+        self.assertEqual(self.affected_schemas(rename_blank_nodes(ONTOLOGY)), [])
+
+    def test_changed_property_affects_the_classes_of_its_domain_and_their_subclasses(self):
+        ontology = [item for item in ONTOLOGY if item[:2] != ("http://ex/name", RDFS_LABEL)]
+        ontology.append(("http://ex/name", RDFS_LABEL, literal(u"Nome completo", u"pt")))
+        self.assertEqual(self.affected_schemas(ontology), [(GRAPH, "http://ex/Musician"), (GRAPH, "http://ex/Person")])
+
+    def test_changed_restriction_affects_the_class_and_its_subclasses(self):
+        ontology = [item for item in ONTOLOGY if item[:2] != ("nodeID://b1", OWL_MIN_QUALIFIED_CARDINALITY)]
+        self.assertEqual(self.affected_schemas(ontology), [(GRAPH, "http://ex/Musician"), (GRAPH, "http://ex/Person")])
+
+    def test_new_superclass_affects_the_class(self):
+        ontology = ONTOLOGY + triples(("http://ex/City", RDFS_SUBCLASS_OF, "http://ex/Thing"))
+        self.assertEqual(self.affected_schemas(ontology), [(GRAPH, "http://ex/City")])
+
+    def test_removed_class_is_affected(self):
+        ontology = [item for item in ONTOLOGY if item[0] != "http://ex/City"]
+        self.assertEqual(self.affected_schemas(ontology), [(GRAPH, "http://ex/City")])
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch.object(OntologyModel, "load_graph", return_value=ONTOLOGY + triples(("http://ex/City", RDFS_COMMENT, literal(u"Urbe"))))
+    @patch("brainiak.schema.ontology_model.get_graph_fingerprints", return_value={GRAPH: u"42@@"})
+    def test_refresh_calls_the_change_listener(self, get_graph_fingerprints, load_graph, log):
+        listener = Mock()
+        ontology_model._model = self.model
+        ontology_model._change_listener = listener
+        try:
+            self.assertEqual(ontology_model.refresh_ontology_model(), [GRAPH])
+        finally:
+            ontology_model._model = None
+            ontology_model._change_listener = None
+        listener.assert_called_once_with([(GRAPH, "http://ex/City")])
+
+
+class ReloadGraphsTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        ontology_model._model = None
+
+    @patch("brainiak.schema.ontology_model.cache.publish_graphs_reload")
+    @patch("brainiak.schema.ontology_model.refresh_ontology_model", return_value=[GRAPH])
+    def test_reload_graphs_in_every_process(self, refresh_ontology_model, publish_graphs_reload):
+        ontology_model._model = build_model({GRAPH: ONTOLOGY})
+        self.assertEqual(ontology_model.reload_graphs([GRAPH]), [GRAPH])
+        refresh_ontology_model.assert_called_once_with(force_graphs=[GRAPH])
+        publish_graphs_reload.assert_called_once_with([GRAPH])
+
+    @patch("brainiak.schema.ontology_model.cache.publish_graphs_reload")
+    def test_reload_graphs_without_model(self, publish_graphs_reload):
+        self.assertEqual(ontology_model.reload_graphs([GRAPH]), [])
+        self.assertFalse(publish_graphs_reload.called)
+
+
+class OntologyModelLoadTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        ontology_model._model = None
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch.object(OntologyModel, "load_graph", return_value=ONTOLOGY)
+    def test_load_ontology_model(self, load_graph, log):
+        ontology_model.load_ontology_model({GRAPH: u"41@@"}, CONFIG)
+        self.assertTrue(ontology_model.get_ontology_model(CONFIG) is ontology_model._model)
+        self.assertEqual(ontology_model.get_ontology_model({"url": "http://other:8890/sparql"}), None)
+        self.assertEqual(ontology_model.status()["graphs"], {GRAPH: u"41@@"})
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch.object(OntologyModel, "load_graph", side_effect=Exception("timeout"))
+    def test_schemas_are_queried_if_the_model_fails_to_load(self, load_graph, log):
+        ontology_model.load_ontology_model({GRAPH: u"41@@"}, CONFIG)
+        self.assertEqual(ontology_model.get_ontology_model(CONFIG), None)
+        self.assertTrue(log.logger.error.called)
+
+    @patch("brainiak.schema.ontology_model.log")
+    @patch("brainiak.schema.ontology_model.get_graph_fingerprints", side_effect=[Exception("timeout"), {GRAPH: u"41@@"}])
+    @patch.object(OntologyModel, "load_graph", return_value=ONTOLOGY)
+    def test_model_which_failed_to_load_is_loaded_by_the_next_refresh(self, load_graph, get_graph_fingerprints, log):
+        listener = Mock()
+        ontology_model._change_listener = listener
+        try:
+            ontology_model.load_ontology_model(triplestore_config=CONFIG)
+            self.assertEqual(ontology_model.get_ontology_model(CONFIG), None)
+            self.assertEqual(ontology_model.refresh_ontology_model(), [GRAPH])
+        finally:
+            ontology_model._change_listener = None
+        self.assertTrue(ontology_model.get_ontology_model(CONFIG) is ontology_model._model)
+        self.assertFalse(listener.called)
+
+    @patch("brainiak.schema.ontology_model.settings", ONTOLOGY_MODEL_ENABLED=False)
+    def test_disabled_model_is_not_loaded(self, settings):
+        ontology_model.load_ontology_model({GRAPH: u"41@@"}, CONFIG)
+        self.assertEqual(ontology_model.get_ontology_model(CONFIG), None)
@@ -0,0 +1,55 @@
+import unittest
+
+from mock import patch, Mock
+
+from brainiak.schema.warm_up import build_schema_params, recompute_schemas, warm_up_schemas
+
+
+@patch("brainiak.schema.warm_up.log")
+@patch("brainiak.schema.warm_up.settings", CACHE_WARM_UP_SCHEMAS=2)
+class WarmUpTestCase(unittest.TestCase):
+
+    @patch("brainiak.schema.warm_up.get_cached_schema")
+    @patch("brainiak.schema.warm_up.build_schema_params", side_effect=lambda application, context, klass: (context, klass))
+    @patch("brainiak.schema.warm_up.cache")
+    def test_warm_up_most_requested_schemas(self, cache, build_schema_params, get_cached_schema, settings, log):
+        cache.acquire_warm_up.return_value = True
+        cache.most_requested_schemas.return_value = [("person", "Gender"), ("place", "City")]
+        get_cached_schema.side_effect = [{}, Exception("Virtuoso is down")]
+        warm_up_schemas(Mock())
+        cache.most_requested_schemas.assert_called_with(2)
+        self.assertEqual(get_cached_schema.call_count, 2)
+        get_cached_schema.assert_called_with(("place", "City"))
+        self.assertTrue(log.logger.error.called)
+
+    @patch("brainiak.schema.warm_up.get_cached_schema")
+    @patch("brainiak.schema.warm_up.cache")
+    def test_warm_up_runs_once_per_namespace(self, cache, get_cached_schema, settings, log):
+        cache.acquire_warm_up.return_value = False
+        warm_up_schemas(Mock())
+        self.assertFalse(cache.most_requested_schemas.called)
+        self.assertFalse(get_cached_schema.called)
+
+    def test_build_schema_params(self, settings, log):
+        query_params = build_schema_params(Mock(ui_methods={}, ui_modules={}), u"person", u"Gender")
+        self.assertEqual(query_params["graph_uri"], u"http://semantica.globo.com/person/")
+        self.assertEqual(query_params["class_uri"], u"http://semantica.globo.com/person/Gender")
+
+
+@patch("brainiak.schema.warm_up.log")
+@patch("brainiak.schema.warm_up.settings", ENABLE_CACHE=True)
+class RecomputeTestCase(unittest.TestCase):
+
+    @patch("brainiak.schema.warm_up.cache.recompute_many", return_value=["key"])
+    def test_recompute_affected_schemas(self, recompute_many, settings, log):
+        recompute_schemas(Mock(ui_methods={}, ui_modules={}), [(u"http://ex/graph/", u"http://ex/onto/City")])
+        (keys, function, params_list) = recompute_many.call_args[0]
+        self.assertEqual(keys, [u"http://ex/graph/@@http://ex/onto/City##class"])
+        self.assertEqual(params_list[0]["class_uri"], u"http://ex/onto/City")
+        self.assertEqual(params_list[0]["graph_uri"], u"http://ex/graph/")
+        self.assertEqual(recompute_many.call_args[1]["tags"], [[u"schema@@http://ex/onto/City", u"graph@@http://ex/graph/"]])
+
+    @patch("brainiak.schema.warm_up.cache.recompute_many", side_effect=Exception("Virtuoso is down"))
+    def test_recompute_failure_is_logged(self, recompute_many, settings, log):
+        recompute_schemas(Mock(ui_methods={}, ui_modules={}), [(u"http://ex/graph/", u"http://ex/onto/City")])
+        self.assertTrue(log.logger.error.called)
@@ -27,5 +27,6 @@ class TestCase(unittest.TestCase):
         self.assertEqual(settings.REDIS_ENDPOINT, 'localhost')
         self.assertEqual(settings.REDIS_PORT, 6379)
         self.assertEqual(settings.SERVER_PORT, 5100)
+        self.assertEqual(settings.STORED_QUERY_MAX_ROWS, None)
         self.assertEqual(settings.TRIPLESTORE_CONFIG_FILEPATH, 'src/brainiak/triplestore.ini')
         self.assertEqual(settings.URI_PREFIX, "http://semantica.globo.com/")
@@ -6,6 +6,14 @@ from tornado.web import HTTPError
 from brainiak.stored_query import execution
 
 
+class Rows(list):
+    "Rows of triplestore.query_sparql_stream"
+
+    def __init__(self, rows, truncated=False):
+        super(Rows, self).__init__(rows)
+        self.truncated = truncated
+
+
 class StoredQueryExecuteTestCase(TestCase):
 
     def test_get_query_with_valid_params_in_request(self):
@@ -36,12 +44,12 @@ class StoredQueryExecuteTestCase(TestCase):
 
     @patch("brainiak.stored_query.execution.compress_keys_and_values",
            return_value=[])
-    @patch("brainiak.stored_query.execution.query_sparql")
+    @patch("brainiak.stored_query.execution.query_sparql_stream")
     @patch("brainiak.stored_query.execution.get_query",
            return_value="SELECT ?s FROM <http://my_graph.com/> {?s a owl:Class}")
     def test_execute_query_with_no_results(self,
                                            mock_get_query,
-                                           mock_query_sparql,
+                                           mock_query_sparql_stream,
                                            mock_compress):
         query_id = "query_id"
         stored_query = {
@@ -67,3 +75,36 @@ class StoredQueryExecuteTestCase(TestCase):
 
         response = execution.execute_query(query_id, stored_query, QueryStringParams())
         self.assertEqual(expected_response, response)
+
+    @patch("brainiak.stored_query.execution.settings", STORED_QUERY_MAX_ROWS=2)
+    @patch("brainiak.stored_query.execution.query_sparql_stream",
+           return_value=Rows([{"s": {"type": "uri", "value": "http://a"}}, {"s": {"type": "uri", "value": "http://b"}}]))
+    @patch("brainiak.stored_query.execution.get_query", return_value="SELECT ?s {?s a owl:Class}")
+    def test_execute_query_consumes_rows_with_limit(self, mock_get_query, mock_query_sparql_stream, mock_settings):
+        class QueryStringParams(object):
+            arguments = {}
+            triplestore_config = {
+                "app_name": "my_app",
+                "url": "url"
+            }
+
+        response = execution.execute_query("query_id", {}, QueryStringParams())
+        self.assertEqual(response, {"items": [{"s": "http://a"}, {"s": "http://b"}]})
+        self.assertEqual(mock_query_sparql_stream.call_args[1], {"max_rows": 2, "query_name": u"stored query query_id"})
+
+    @patch("brainiak.stored_query.execution.settings", STORED_QUERY_MAX_ROWS=1)
+    @patch("brainiak.stored_query.execution.query_sparql_stream",
+           return_value=Rows([{"s": {"type": "uri", "value": "http://a"}}], truncated=True))
+    @patch("brainiak.stored_query.execution.get_query", return_value="SELECT ?s {?s a owl:Class}")
+    def test_execute_query_tells_when_rows_are_truncated(self, mock_get_query, mock_query_sparql_stream, mock_settings):
+        class QueryStringParams(object):
+            arguments = {}
+            triplestore_config = {
+                "app_name": "my_app",
+                "url": "url"
+            }
+
+        response = execution.execute_query("query_id", {}, QueryStringParams())
+        self.assertEqual(response["items"], [{"s": "http://a"}])
+        self.assertTrue(response["truncated"])
+        self.assertIn("more than 1 rows", response["warning"])
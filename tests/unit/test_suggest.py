@@ -196,17 +196,47 @@ class SuggestTestCase(TestCase):
         self.assertEqual(len(computed), 1)
         self.assertDictEqual(expected, computed[0])
 
-    @patch("brainiak.suggest.suggest.get_subproperties", return_value=["property1", "property2"])
-    def test_get_search_fields(self, mocked_get_subproperties):
+    @patch("brainiak.suggest.suggest.triplestore.query_sparql_many")
+    def test_get_predicate_ranges_and_search_fields(self, mocked_query_sparql_many):
+        subproperties_result = {"results": {"bindings": [
+            {"property": {"type": "uri", "value": "property1"}},
+            {"property": {"type": "uri", "value": "property2"}}
+        ]}}
+        mocked_query_sparql_many.return_value = ["range result", subproperties_result]
         expected = {"property1", "property2", "rdfs:label"}
         search_params = {
-            "search": {
-                "fields": ["rdfs:label"]
-            }
+            "target": "http://some.predicate/hasRange",
+            "fields": ["rdfs:label"]
         }
-        search_fields = suggest._get_search_fields({}, search_params)
+        query_params = ParamDict(MockHandler(), lang="pt")
+        range_result, search_fields = suggest._get_predicate_ranges_and_search_fields(query_params, search_params)
 
+        self.assertEqual(range_result, "range result")
         self.assertEqual(expected, set(search_fields))
+        queries = mocked_query_sparql_many.call_args[0][0]
+        self.assertEqual(len(queries), 2)
+        self.assertIn("<http://some.predicate/hasRange> rdfs:range", queries[0]["query"])
+        self.assertEqual(queries[0]["query_name"], "QUERY_PREDICATE_RANGES")
+        self.assertEqual(queries[0]["cache_tags"], ["http://some.predicate/"])
+        self.assertIn("rdfs:subPropertyOf <rdfs:label>", queries[1]["query"])
+
+    @patch("brainiak.suggest.suggest.triplestore.query_sparql_many", side_effect=AssertionError("queried the triplestore"))
+    @patch("brainiak.suggest.suggest.get_ontology_model")
+    def test_get_predicate_ranges_and_search_fields_from_the_ontology_model(self, get_ontology_model, mocked_query_sparql_many):
+        model = get_ontology_model.return_value
+        model.query_predicate_ranges.return_value = "range result"
+        model.query_subproperties.return_value = {"results": {"bindings": [{"property": {"type": "uri", "value": "property1"}}]}}
+        search_params = {
+            "target": "http://some.predicate",
+            "fields": ["rdfs:label"]
+        }
+        query_params = ParamDict(MockHandler(), lang="pt")
+        range_result, search_fields = suggest._get_predicate_ranges_and_search_fields(query_params, search_params)
+
+        self.assertEqual(range_result, "range result")
+        self.assertEqual({"property1", "rdfs:label"}, set(search_fields))
+        model.query_predicate_ranges.assert_called_once_with("http://some.predicate", "pt")
+        model.query_subproperties.assert_called_once_with("rdfs:label")
 
     def test_get_title_value(self):
         expected = ("rdfs:label", "label1")
@@ -239,16 +269,23 @@ SELECT DISTINCT ?field_value {
         meta_field = "field"
         self.assertEqual(expected, suggest._build_class_fields_query(classes, meta_field))
 
-    @patch("brainiak.suggest.suggest._get_class_fields_value",
-           return_value=["metafield1, metafield2", "metafield2", "metafield2, metafield3"])
-    def test_get_response_fields_from_meta_fields(self, mocked_get_meta_fields_value):
+    @patch("brainiak.suggest.suggest.triplestore.query_sparql_many")
+    def test_get_response_fields_from_meta_fields(self, mocked_query_sparql_many):
+        def field_values_result(*values):
+            return {"results": {"bindings": [{"field_value": {"type": "literal", "value": value}} for value in values]}}
+        mocked_query_sparql_many.return_value = [
+            field_values_result("metafield1, metafield2", "metafield2"),
+            field_values_result("metafield2, metafield3")
+        ]
         expected = ["metafield3", "metafield2", "metafield1"]
         response_params = {
             "meta_fields": ["a", "b"]
         }
-        query_params = classes = {}
+        query_params = ParamDict(MockHandler())
+        classes = ["class_a"]
         response = suggest._get_response_fields_from_meta_fields(query_params, response_params, classes)
         self.assertEqual(sorted(expected), sorted(response))
+        self.assertEqual(len(mocked_query_sparql_many.call_args[0][0]), 2)
 
     ##################################
     # get_instance_fields
@@ -576,9 +613,9 @@ class ExtraSuggestTestCase(TestCase):
     @patch("brainiak.suggest.suggest._build_items", return_value=SAMPLE_BUILD_ITEMS)
     @patch("brainiak.suggest.suggest.run_search", return_value=SAMPLE_ES_RESPONSE)
     @patch("brainiak.suggest.suggest.run_analyze", return_value={u'tokens': [{u'token': u'globoland'}]})
-    @patch("brainiak.suggest.suggest.get_subproperties", return_value=[u'http://semantica.globo.com/upper/name'])
-    @patch("brainiak.suggest.suggest._get_predicate_ranges", return_value=SAMPLE_RESPOSE_TO_GET_PREDICATE_RANGES)
-    def test_do_suggest_with_data(self, mock_get_predicate_ranges, mock_get_subproperties, mock_run_analyze, mock_run_search, mock_build_items, mock_decorate):
+    @patch("brainiak.suggest.suggest._get_predicate_ranges_and_search_fields",
+           return_value=(SAMPLE_RESPOSE_TO_GET_PREDICATE_RANGES, [u'http://semantica.globo.com/upper/name']))
+    def test_do_suggest_with_data(self, mock_get_predicate_ranges_and_search_fields, mock_run_analyze, mock_run_search, mock_build_items, mock_decorate):
         handler = MockHandler()
         params = {
             'lang': 'pt',
@@ -615,9 +652,9 @@ class ExtraSuggestTestCase(TestCase):
 
     @patch("brainiak.suggest.suggest.run_search", return_value={"hits": {"total": 0}})
     @patch("brainiak.suggest.suggest.run_analyze", return_value={u'tokens': []})
-    @patch("brainiak.suggest.suggest.get_subproperties", return_value=[])
-    @patch("brainiak.suggest.suggest._get_predicate_ranges", return_value=SAMPLE_RESPOSE_TO_GET_PREDICATE_RANGES)
-    def test_do_suggest_without_data(self, mock_get_predicate_ranges, mock_get_subproperties, mock_run_analyze, mock_run_search):
+    @patch("brainiak.suggest.suggest._get_predicate_ranges_and_search_fields",
+           return_value=(SAMPLE_RESPOSE_TO_GET_PREDICATE_RANGES, []))
+    def test_do_suggest_without_data(self, mock_get_predicate_ranges_and_search_fields, mock_run_analyze, mock_run_search):
         handler = MockHandler()
         params = {
             'lang': 'pt',
@@ -640,8 +677,9 @@ class ExtraSuggestTestCase(TestCase):
         computed = suggest.do_suggest(query_params, suggest_params)
         self.assertEqual(computed, {})
 
-    @patch("brainiak.suggest.suggest._get_predicate_ranges", return_value={u'results': {u'bindings': []}})
-    def test_do_suggest_without_predicate_definition(self, mock_get_predicate_ranges):
+    @patch("brainiak.suggest.suggest._get_predicate_ranges_and_search_fields",
+           return_value=({u'results': {u'bindings': []}}, []))
+    def test_do_suggest_without_predicate_definition(self, mock_get_predicate_ranges_and_search_fields):
         query_params = {}
         suggest_params = {u'search': {"target": "something"}}
         with self.assertRaises(HTTPError) as exception:
@@ -1,14 +1,17 @@
 # coding: utf-8
 import json
+import time
 import unittest
 
-from mock import patch
-from requests.auth import HTTPDigestAuth
-import simplejson
+import greenlet
+from mock import Mock, patch
 from tornado.httpclient import HTTPError as ClientHTTPError
 from tornado.web import HTTPError
 
-from brainiak import triplestore
+from brainiak import circuit_breaker, triplestore
+from brainiak.greenlet_tornado import greenlet_gather, greenlet_spawn
+from brainiak.utils import query_stats
+from brainiak.utils.sparql_result import SparqlResult
 from tests.mocks import triplestore_config
 
 
@@ -16,7 +19,9 @@ class MockResponse(object):
 
     def __init__(self, status_code=200, body="{}"):
         self.status_code = status_code
+        self.code = status_code
         self.body = body
+        self.content = body
         self.text = body
 
     def json(self):
@@ -42,19 +47,24 @@ class TriplestoreTestCase(unittest.TestCase):
     @patch("brainiak.triplestore.parse_section", return_value={"auth_username": "USER",
                                                                "auth_password": "PASSWORD",
                                                                "url": "url"})
-    @patch("brainiak.triplestore.requests.request", return_value=MockResponse())
-    def test_both_without_auth_and_with_auth_work(self, mock_request, mock_parse_section, log):
+    @patch("brainiak.triplestore.client.fetch", return_value=MockResponse())
+    def test_both_without_auth_and_with_auth_work(self, mock_fetch, mock_parse_section, log):
         received_msg = triplestore.status()
         msg1 = 'Virtuoso connection authenticated [USER:PASSWORD] | SUCCEED | url'
         msg2 = 'Virtuoso connection not-authenticated | SUCCEED | url'
         expected_msg = "<br>".join([msg1, msg2])
         self.assertEqual(received_msg, expected_msg)
+        authenticated_params = mock_fetch.call_args_list[0][0][0]
+        not_authenticated_params = mock_fetch.call_args_list[1][0][0]
+        self.assertEqual(authenticated_params["auth_username"], "USER")
+        self.assertNotIn("auth_username", not_authenticated_params)
+        self.assertNotIn("auth_password", not_authenticated_params)
 
     @patch("brainiak.triplestore.log.logger")
     @patch("brainiak.triplestore.parse_section", return_value={"auth_username": "USER",
                                                                "auth_password": "PASSWORD",
                                                                "url": "url"})
-    @patch("brainiak.triplestore.requests.request", side_effect=[MockResponse(401), MockResponse()])
+    @patch("brainiak.triplestore.client.fetch", side_effect=[ClientHTTPError(401), MockResponse()])
     def test_without_auth_works_but_with_auth_doesnt(self, mock_parse_section, mock_request, mock_log):
         received_msg = triplestore.status()
         msg1 = "Virtuoso connection authenticated [USER:PASSWORD] | FAILED | url | Status code: 401. Message: "
@@ -66,7 +76,7 @@ class TriplestoreTestCase(unittest.TestCase):
     @patch("brainiak.triplestore.parse_section", return_value={"auth_username": "USER",
                                                                "auth_password": "PASSWORD",
                                                                "url": "url"})
-    @patch("brainiak.triplestore.requests.request", side_effect=[MockResponse(), MockResponse(401)])
+    @patch("brainiak.triplestore.client.fetch", side_effect=[MockResponse(), ClientHTTPError(401)])
     def test_without_auth_doesnt_work_but_with_auth_works(self, mock_request, mock_parse_section, mock_log):
         received_msg = triplestore.status()
         msg1 = "Virtuoso connection authenticated [USER:PASSWORD] | SUCCEED | url"
@@ -77,7 +87,7 @@ class TriplestoreTestCase(unittest.TestCase):
     @patch("brainiak.triplestore.parse_section", return_value={"auth_username": "USER",
                                                                "auth_password": "PASSWORD",
                                                                "url": "url"})
-    @patch("brainiak.triplestore.requests.request", return_value=MockResponse(401))
+    @patch("brainiak.triplestore.client.fetch", side_effect=ClientHTTPError(401))
     def test_both_without_auth_and_with_auth_dont_work(self, mock_request, mock_parse_section):
         received_msg = triplestore.status()
         msg1 = "Virtuoso connection authenticated [USER:PASSWORD] | FAILED | url | Status code: 401. Message: "
@@ -95,29 +105,6 @@ class TriplestoreTestCase(unittest.TestCase):
         response = triplestore._process_json_triplestore_response(tornado_response)
         self.assertEqual(expected, response)
 
-    def test_process_triplestore_response_async_false(self):
-        expected = {"a": "json string"}
-
-        class RequestsHTTPResponse:
-            def json(self):
-                return {"a": "json string"}
-
-        tornado_response = RequestsHTTPResponse()
-        response = triplestore._process_json_triplestore_response(tornado_response,
-                                                                  async=False)
-        self.assertEqual(response, expected)
-
-    def test_process_triplestore_response_async_false_invalid_json(self):
-        class RequestsHTTPResponse:
-            def json(self):
-                raise simplejson.JSONDecodeError("", "", 10)
-            text = ""
-        tornado_response = RequestsHTTPResponse()
-        self.assertRaises(ClientHTTPError,
-                          triplestore._process_json_triplestore_response,
-                          tornado_response,
-                          async=False)
-
     @patch("brainiak.triplestore.parse_section", return_value={"auth_username": "USER",
                                                                "auth_password": "PASSWORD",
                                                                "url": "url"})
@@ -134,7 +121,7 @@ class TriplestoreTestCase(unittest.TestCase):
         request_params = {"url": "http://aa"}
         self.assertRaises(ClientHTTPError, triplestore.do_run_query, request_params, async=True)
 
-    def test_build_request_params_for_async_query(self):
+    def test_build_request_params(self):
         expected_request_for_tornado = {
             "headers": {
                 "Content-Type": "application/x-www-form-urlencoded"
@@ -145,28 +132,36 @@ class TriplestoreTestCase(unittest.TestCase):
         expected_request_for_tornado.update(self.TRIPLESTORE_CONFIG)
 
         response = triplestore._build_request_params(self.EXAMPLE_QUERY,
-                                                     self.TRIPLESTORE_CONFIG,
-                                                     async=True)
+                                                     self.TRIPLESTORE_CONFIG)
         self.assertEqual(response, expected_request_for_tornado)
 
-    def test_build_request_params_for_sync_query(self):
-        expected_request_for_requests = {
-            "headers": {
-                "Content-Type": "application/x-www-form-urlencoded"
-            },
-            "method": triplestore.DEFAULT_HTTP_METHOD,
-            "data": {
-                "query": self.EXAMPLE_QUERY,
-                'format': triplestore.DEFAULT_RESPONSE_FORMAT
-            }
-        }
-        expected_request_for_requests.update(self.TRIPLESTORE_CONFIG)
+    @patch("brainiak.triplestore.is_ioloop_running", return_value=False)
+    @patch("brainiak.triplestore.HTTPClient")
+    def test_sync_query_sends_same_request_with_blocking_client(self, mocked_http_client, mocked_running):
+        mocked_http_client.return_value.fetch.return_value = MockResponse(body='{"a": 1}')
+        request_params = triplestore._build_request_params(self.EXAMPLE_QUERY, self.TRIPLESTORE_CONFIG)
+        response, time_diff = triplestore.do_run_query(request_params, async=False)
+        self.assertEqual(response.body, '{"a": 1}')
+        request = mocked_http_client.return_value.fetch.call_args[0][0]
+        self.assertEqual(request.url, "url")
+        self.assertEqual(request.body, self.EXAMPLE_QUERY_URL_ENCODED)
+        self.assertEqual(request.auth_mode, "digest")
+        self.assertEqual(request.auth_username, "api-semantica")
+        self.assertTrue(mocked_http_client.return_value.close.called)
 
-        response = triplestore._build_request_params(self.EXAMPLE_QUERY,
-                                                     self.TRIPLESTORE_CONFIG,
-                                                     async=False)
-        response.pop("auth")  # object created inside _build_request_params
-        self.assertEqual(response, expected_request_for_requests)
+    @patch("brainiak.triplestore.is_ioloop_running", return_value=False)
+    @patch("brainiak.triplestore.HTTPClient")
+    def test_sync_query_with_http_error_401(self, mocked_http_client, mocked_running):
+        mocked_http_client.return_value.fetch.side_effect = ClientHTTPError(401)
+        request_params = triplestore._build_request_params(self.EXAMPLE_QUERY, self.TRIPLESTORE_CONFIG)
+        self.assertRaises(HTTPError, triplestore.do_run_query, request_params, async=False)
+
+    @patch("brainiak.triplestore.is_ioloop_running", return_value=True)
+    @patch("brainiak.triplestore.HTTPClient")
+    def test_sync_query_is_refused_inside_ioloop(self, mocked_http_client, mocked_running):
+        self.assertRaises(triplestore.BlockingQueryError, triplestore.query_sparql,
+                          self.EXAMPLE_QUERY, self.TRIPLESTORE_CONFIG, async=False)
+        self.assertFalse(mocked_http_client.called)
 
     @patch('brainiak.triplestore.log.logger')
     @patch('brainiak.triplestore.do_run_query', return_value=(MockResponse(), 0))
@@ -180,3 +175,548 @@ class TriplestoreTestCase(unittest.TestCase):
         response = triplestore.query_sparql("", triplestore_config)
         self.assertEqual(greenlet_fetch.call_count, 1)
         self.assertEqual(response, {})
+
+
+class FakeIOLoop(object):
+
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def run_callbacks(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def test_acquire_and_release_without_contention(self):
+        pool = triplestore.ConnectionPool("http://a", "Brainiak", 2)
+        pool.acquire()
+        pool.acquire()
+        self.assertEqual(pool.active, 2)
+        self.assertEqual(pool.queue_depth, 0)
+        pool.release()
+        pool.release()
+        self.assertEqual(pool.active, 0)
+        self.assertEqual(pool.stats()["total_requests"], 2)
+        self.assertEqual(pool.stats()["total_queued"], 0)
+
+    def test_acquire_queues_greenlet_when_pool_is_full(self):
+        io_loop = FakeIOLoop()
+        pool = triplestore.ConnectionPool("http://a", "Brainiak", 1)
+        steps = []
+
+        def first():
+            pool.acquire()
+            steps.append("first acquired")
+            greenlet.getcurrent().parent.switch()
+            pool.release()
+            steps.append("first released")
+
+        def second():
+            pool.acquire()
+            steps.append("second acquired")
+            pool.release()
+
+        with patch("brainiak.triplestore.greenlet_get_ioloop", return_value=io_loop):
+            first_greenlet = greenlet.greenlet(first)
+            second_greenlet = greenlet.greenlet(second)
+            first_greenlet.switch()
+            second_greenlet.switch()
+            self.assertEqual(pool.queue_depth, 1)
+            self.assertEqual(steps, ["first acquired"])
+
+            first_greenlet.switch()
+            self.assertEqual(steps, ["first acquired", "first released"])
+            self.assertEqual(pool.active, 1)
+
+            io_loop.run_callbacks()
+
+        self.assertEqual(steps, ["first acquired", "first released", "second acquired"])
+        self.assertEqual(pool.active, 0)
+        self.assertEqual(pool.queue_depth, 0)
+        self.assertEqual(pool.stats()["total_queued"], 1)
+
+    def test_client_keeps_one_pool_per_endpoint_and_client_id(self):
+        client = triplestore.TriplestoreClient()
+        pool = client.get_pool({"url": "http://a", "app_name": "Brainiak", "auth_username": "dba"})
+        same_pool = client.get_pool({"url": "http://a", "app_name": "Brainiak", "auth_username": "dba"})
+        other_client_pool = client.get_pool({"url": "http://a", "app_name": "Other", "auth_username": "one_user"})
+        other_endpoint_pool = client.get_pool({"url": "http://b", "app_name": "Brainiak", "auth_username": "dba"})
+        self.assertIs(pool, same_pool)
+        self.assertIsNot(pool, other_client_pool)
+        self.assertIsNot(pool, other_endpoint_pool)
+        self.assertEqual(len(client.stats()), 3)
+
+    @patch("brainiak.triplestore.settings", TRIPLESTORE_MAX_CONNECTIONS=7)
+    def test_pool_size_is_read_from_config_section(self, mocked_settings):
+        client = triplestore.TriplestoreClient()
+        default_pool = client.get_pool({"url": "http://a", "app_name": "Brainiak"})
+        configured_pool = client.get_pool({"url": "http://a", "app_name": "Other", "max_connections": "3"})
+        self.assertEqual(default_pool.max_clients, 7)
+        self.assertEqual(configured_pool.max_clients, 3)
+
+    @patch("brainiak.triplestore.ConnectionPool.fetch", return_value="response")
+    def test_client_fetch_removes_client_config_keys_from_request(self, mocked_fetch):
+        client = triplestore.TriplestoreClient()
+        request_params = {"url": "http://a", "app_name": "Brainiak", "max_connections": "3", "method": "POST", "body": ""}
+        response = client.fetch(request_params)
+        self.assertEqual(response, "response")
+        request = mocked_fetch.call_args[0][0]
+        self.assertEqual(request.url, "http://a")
+
+    @patch("brainiak.triplestore.client.stats", return_value=[])
+    def test_get_usage_message_without_pools(self, mocked_stats):
+        self.assertEqual(triplestore.get_usage_message(), u"No connection pools were used yet")
+
+
+class QuerySparqlManyTestCase(unittest.TestCase):
+
+    @patch("brainiak.triplestore.query_sparql", side_effect=[{"result": 1}, ClientHTTPError(500), {"result": 3}])
+    def test_query_sparql_many_isolates_errors(self, mocked_query_sparql):
+        results = triplestore.query_sparql_many(["query 1", "query 2", "query 3"], triplestore_config)
+        self.assertEqual(results[0], {"result": 1})
+        self.assertIsInstance(results[1], ClientHTTPError)
+        self.assertEqual(results[2], {"result": 3})
+        self.assertEqual(mocked_query_sparql.call_count, 3)
+
+    @patch("brainiak.triplestore.query_sparql", side_effect=[ClientHTTPError(500), {"result": 2}])
+    def test_query_sparql_many_raise_errors(self, mocked_query_sparql):
+        self.assertRaises(ClientHTTPError, triplestore.query_sparql_many,
+                          ["query 1", "query 2"], triplestore_config, raise_errors=True)
+        self.assertEqual(mocked_query_sparql.call_count, 2)
+
+    @patch("brainiak.triplestore.query_sparql", return_value={"result": 1})
+    def test_query_sparql_many_passes_arguments_of_each_query(self, mocked_query_sparql):
+        queries = ["query 1", {"query": "query 2", "query_name": "QUERY_2", "cache_tags": ["http://g"]}]
+        triplestore.query_sparql_many(queries, triplestore_config, columnar=True)
+        self.assertEqual(mocked_query_sparql.call_args_list[0][1], {"columnar": True})
+        self.assertEqual(mocked_query_sparql.call_args_list[1][0], ("query 2", triplestore_config))
+        self.assertEqual(mocked_query_sparql.call_args_list[1][1],
+                         {"columnar": True, "query_name": "QUERY_2", "cache_tags": ["http://g"]})
+
+    def test_greenlet_gather_runs_functions_concurrently(self):
+        io_loop = FakeIOLoop()
+        steps = []
+
+        def wait_for_response(name):
+            def function():
+                steps.append(name + " sent")
+                # simulates greenlet_fetch, which switches back to the master greenlet
+                child = greenlet.getcurrent()
+                io_loop.add_callback(lambda: child.switch())
+                child.parent.switch()
+                steps.append(name + " received")
+                return name
+            return function
+
+        def request_handler():
+            results = greenlet_gather([wait_for_response("a"), wait_for_response("b")])
+            steps.append(results)
+
+        with patch("brainiak.greenlet_tornado.greenlet_get_ioloop", return_value=io_loop):
+            greenlet.greenlet(request_handler).switch()
+            self.assertEqual(steps, [])
+            io_loop.run_callbacks()
+
+        self.assertEqual(steps, ["a sent", "b sent", "a received", "b received", ["a", "b"]])
+
+    def test_greenlet_spawn_does_not_block_the_caller(self):
+        io_loop = FakeIOLoop()
+        steps = []
+
+        def background():
+            steps.append("background started")
+            child = greenlet.getcurrent()
+            io_loop.add_callback(lambda: child.switch())
+            child.parent.switch()
+            steps.append("background finished")
+
+        def request_handler():
+            greenlet_spawn(background)
+            steps.append("request finished")
+
+        with patch("brainiak.greenlet_tornado.greenlet_get_ioloop", return_value=io_loop):
+            greenlet.greenlet(request_handler).switch()
+            self.assertEqual(steps, ["request finished"])
+            io_loop.run_callbacks()
+
+        self.assertEqual(steps, ["request finished", "background started", "background finished"])
+
+
+class FakePool(object):
+
+    def __init__(self):
+        self.released = False
+        self.outcomes = []
+        self.http_client = self
+
+    def acquire(self):
+        pass
+
+    def release(self):
+        self.released = True
+
+    def record_outcome(self, code):
+        self.outcomes.append(code)
+
+    def fetch(self, request, callback):
+        self.callback = callback
+
+
+class FakeStreamResponse(object):
+
+    def __init__(self, code=200):
+        self.code = code
+        self.error = ClientHTTPError(code) if code != 200 else None
+
+
+class BindingsStreamTestCase(unittest.TestCase):
+
+    body = '{"head": {"vars": ["s"]}, "results": {"bindings": [' + \
+        '{"s": {"type": "uri", "value": "http://a"}}, {"s": {"type": "uri", "value": "http://b"}}]}}'
+
+    def consume(self, stream, chunks, response):
+        io_loop = FakeIOLoop()
+        consumed = []
+
+        def request_handler():
+            for row in stream:
+                consumed.append(row["s"]["value"])
+
+        with patch("brainiak.triplestore.greenlet_get_ioloop", return_value=io_loop):
+            with patch("brainiak.triplestore.log_request"):
+                request_handler_greenlet = greenlet.greenlet(request_handler)
+                request_handler_greenlet.switch()
+                callback_results = [stream.on_chunk(chunk) for chunk in chunks]
+                io_loop.run_callbacks()
+                stream.pool.callback(response)
+                io_loop.run_callbacks()
+        return consumed, callback_results, request_handler_greenlet
+
+    def test_rows_are_yielded(self):
+        stream = triplestore.BindingsStream(FakePool(), {})
+        consumed, callback_results, request_handler_greenlet = self.consume(
+            stream, [self.body[:60], self.body[60:]], FakeStreamResponse())
+        self.assertEqual(consumed, ["http://a", "http://b"])
+        self.assertEqual(callback_results, [None, None])
+        self.assertTrue(request_handler_greenlet.dead)
+        self.assertTrue(stream.pool.released)
+
+    def test_max_rows_aborts_transfer(self):
+        stream = triplestore.BindingsStream(FakePool(), {}, max_rows=1)
+        consumed, callback_results, request_handler_greenlet = self.consume(
+            stream, [self.body], FakeStreamResponse(599))
+        self.assertEqual(consumed, ["http://a"])
+        self.assertEqual(callback_results, [0])
+        self.assertTrue(request_handler_greenlet.dead)
+
+    def test_max_rows_does_not_truncate_as_many_rows(self):
+        stream = triplestore.BindingsStream(FakePool(), {}, max_rows=2)
+        consumed, callback_results, request_handler_greenlet = self.consume(
+            stream, [self.body], FakeStreamResponse())
+        self.assertEqual(consumed, ["http://a", "http://b"])
+        self.assertEqual(callback_results, [None])
+        self.assertFalse(stream.truncated)
+
+    def test_aborted_transfer_is_not_a_failure_of_the_breaker(self):
+        breaker = circuit_breaker.CircuitBreaker("triplestore")
+        stream = triplestore.BindingsStream(FakePool(), {"query_name": "stored query"}, max_rows=1, breaker=breaker)
+        self.consume(stream, [self.body], FakeStreamResponse(599))
+        self.assertTrue(stream.truncated)
+        self.assertEqual(list(breaker.outcomes), [False])
+        self.assertNotIn("stored query", breaker.latencies)
+
+    def test_failed_stream_is_recorded_by_the_breaker(self):
+        breaker = circuit_breaker.CircuitBreaker("triplestore")
+        stream = triplestore.BindingsStream(FakePool(), {"query_name": "stored query"}, breaker=breaker)
+        stream.request = Mock(request_timeout=0)
+        self.assertRaises(ClientHTTPError, self.consume, stream, [], FakeStreamResponse(599))
+        self.assertEqual(list(breaker.outcomes), [True])
+        self.assertEqual(list(breaker.latencies["stored query"]), [0])
+
+    def test_stream_is_not_sent_while_the_breaker_is_open(self):
+        breaker = circuit_breaker.CircuitBreaker("triplestore")
+        breaker.before_call = Mock(side_effect=circuit_breaker.CircuitOpen("open"))
+        pool = FakePool()
+        stream = triplestore.BindingsStream(pool, {}, breaker=breaker)
+        consume = greenlet.greenlet(lambda: list(stream))
+        self.assertRaises(circuit_breaker.CircuitOpen, consume.switch)
+        self.assertFalse(hasattr(pool, "callback"))
+
+    @patch("brainiak.triplestore.circuit_breaker.breakers", {})
+    def test_query_sparql_stream_is_guarded_by_the_breaker_of_its_endpoint(self):
+        config = dict(triplestore_config, read_urls="http://replica")
+        with patch("brainiak.triplestore.client", triplestore.TriplestoreClient()):
+            stream = triplestore.query_sparql_stream("SELECT ?s {?s ?p ?o}", config, max_rows=5, query_name="stored query")
+        self.assertEqual(stream.breaker.name, u"triplestore http://replica")
+        self.assertEqual(stream.request.url, "http://replica")
+        self.assertEqual(stream.request.request_timeout, stream.breaker.timeout("stored query"))
+        self.assertEqual(stream.max_rows, 5)
+
+    def test_http_error_is_raised(self):
+        stream = triplestore.BindingsStream(FakePool(), {})
+        self.assertRaises(ClientHTTPError, self.consume, stream, ["Internal error"], FakeStreamResponse(500))
+
+    def test_incomplete_response_raises_error(self):
+        stream = triplestore.BindingsStream(FakePool(), {})
+        self.assertRaises(triplestore.BindingsDecoderError, self.consume, stream, [self.body[:60]], FakeStreamResponse())
+
+
+class ColumnarResponseTestCase(unittest.TestCase):
+
+    def test_process_response_columnar(self):
+        response = MockResponse(body='{"head": {"vars": ["s"]}, "results": {"bindings": [{"s": {"type": "uri", "value": "http://a"}}]}}')
+        result = triplestore._process_json_triplestore_response(response, columnar=True)
+        self.assertIsInstance(result, SparqlResult)
+        self.assertEqual(result.column("s"), ["http://a"])
+
+
+class CoalescingTestCase(unittest.TestCase):
+
+    request_params = {"url": "http://a", "app_name": "Brainiak", "method": "POST", "body": ""}
+
+    def run_concurrently(self, client, queries, pool_fetch):
+        io_loop = FakeIOLoop()
+        results = []
+
+        def caller(query):
+            def run():
+                try:
+                    results.append(client.fetch(dict(self.request_params), query))
+                except ClientHTTPError as e:
+                    results.append(e)
+            return run
+
+        with patch("brainiak.triplestore.greenlet_get_ioloop", return_value=io_loop):
+            with patch("brainiak.triplestore.ConnectionPool.fetch", side_effect=pool_fetch) as mocked_fetch:
+                for query in queries:
+                    greenlet.greenlet(caller(query)).switch()
+                io_loop.run_callbacks()
+        return results, mocked_fetch
+
+    def in_flight_fetch(self, outcome):
+        def fetch(request):
+            # simulates greenlet_fetch: waits in the master greenlet until the response arrives
+            current = greenlet.getcurrent()
+            triplestore.greenlet_get_ioloop().add_callback(current.switch)
+            current.parent.switch()
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return fetch
+
+    def test_identical_queries_are_coalesced(self):
+        client = triplestore.TriplestoreClient()
+        queries = [u"SELECT ?s { ?s a owl:Class }", u"\nSELECT ?s\n{\n  ?s a owl:Class\n}\n"]
+        results, mocked_fetch = self.run_concurrently(client, queries, self.in_flight_fetch("response"))
+        self.assertEqual(results, ["response", "response"])
+        self.assertEqual(mocked_fetch.call_count, 1)
+        self.assertEqual(client.coalescing_stats(), {"in_flight": 0, "total_coalesced": 1, "total_coalescing_leaders": 1})
+
+    def test_different_queries_are_not_coalesced(self):
+        client = triplestore.TriplestoreClient()
+        queries = [u"SELECT ?s {?s a owl:Class}", u"SELECT ?o {?s a ?o}"]
+        results, mocked_fetch = self.run_concurrently(client, queries, self.in_flight_fetch("response"))
+        self.assertEqual(mocked_fetch.call_count, 2)
+        self.assertEqual(client.total_coalesced, 0)
+
+    def test_update_queries_are_not_coalesced(self):
+        client = triplestore.TriplestoreClient()
+        queries = [u"INSERT DATA INTO <http://g> {<http://s> a owl:Class}"] * 2
+        results, mocked_fetch = self.run_concurrently(client, queries, self.in_flight_fetch("response"))
+        self.assertEqual(mocked_fetch.call_count, 2)
+        self.assertEqual(client.total_coalesced, 0)
+
+    def test_outcome_of_coalesced_queries_is_recorded_once(self):
+        client = triplestore.TriplestoreClient()
+        queries = [u"SELECT ?s {?s a owl:Class}"] * 3
+        with patch.dict(circuit_breaker.breakers, clear=True):
+            results, mocked_fetch = self.run_concurrently(client, queries, self.in_flight_fetch(ClientHTTPError(500)))
+            breaker = circuit_breaker.breakers[u"triplestore http://a"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(list(breaker.outcomes), [True])
+
+    def test_errors_are_shared(self):
+        client = triplestore.TriplestoreClient()
+        queries = [u"SELECT ?s {?s a owl:Class}"] * 2
+        results, mocked_fetch = self.run_concurrently(client, queries, self.in_flight_fetch(ClientHTTPError(500)))
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(result, ClientHTTPError) for result in results))
+        self.assertEqual(client.in_flight, {})
+
+    def test_normalize_query_keeps_strings(self):
+        self.assertEqual(triplestore.normalize_query(u' SELECT ?s\n{ ?s rdfs:label "a  b" ;\t rdfs:comment \'c  d\' }'),
+                         u'SELECT ?s { ?s rdfs:label "a  b" ; rdfs:comment \'c  d\' }')
+
+    def test_is_update_query(self):
+        self.assertTrue(triplestore.is_update_query(u"DELETE DATA FROM <http://g> {<http://s> a owl:Class}"))
+        self.assertTrue(triplestore.is_update_query(u"WITH <http://g>\nDELETE {?s ?p ?o} WHERE {?s ?p ?o}"))
+        self.assertFalse(triplestore.is_update_query(u"SELECT ?created {?created a owl:Class}"))
+
+
+class QueryCacheTestCase(unittest.TestCase):
+
+    query = u"ASK { GRAPH <http://g> {?s ?p ?o} }"
+
+    @patch("brainiak.triplestore.log_request")
+    @patch("brainiak.triplestore.cache.create_query_result")
+    @patch("brainiak.triplestore.cache.retrieve_raw", return_value=None)
+    @patch("brainiak.triplestore.do_run_query", return_value=(MockResponse(body='{"boolean": true}'), 0))
+    @patch("brainiak.triplestore.settings", ENABLE_CACHE=True)
+    def test_miss_stores_response_with_tags(self, settings, do_run_query, retrieve_raw, create_query_result, log_request):
+        result = triplestore.query_sparql(self.query, triplestore_config, cache_tags=["http://g"])
+        self.assertEqual(result, {"boolean": True})
+        self.assertTrue(do_run_query.called)
+        cache_key = retrieve_raw.call_args[0][0]
+        create_query_result.assert_called_with(cache_key, '{"boolean": true}', ["http://g"])
+
+    @patch("brainiak.triplestore.cache.create_query_result")
+    @patch("brainiak.triplestore.cache.retrieve_raw", return_value='{"head": {"vars": ["s"]}, "results": {"bindings": []}}')
+    @patch("brainiak.triplestore.do_run_query")
+    @patch("brainiak.triplestore.settings", ENABLE_CACHE=True)
+    def test_hit_does_not_query_triplestore(self, settings, do_run_query, retrieve_raw, create_query_result):
+        result = triplestore.query_sparql(u"SELECT ?s {?s a owl:Class}", triplestore_config,
+                                          columnar=True, cache_tags=["http://g"])
+        self.assertIsInstance(result, SparqlResult)
+        self.assertFalse(do_run_query.called)
+        self.assertFalse(create_query_result.called)
+
+    @patch("brainiak.triplestore.log_request")
+    @patch("brainiak.triplestore.cache.retrieve_raw")
+    @patch("brainiak.triplestore.do_run_query", return_value=(MockResponse(body='{"boolean": true}'), 0))
+    @patch("brainiak.triplestore.settings", ENABLE_CACHE=False)
+    def test_cache_disabled(self, settings, do_run_query, retrieve_raw, log_request):
+        triplestore.query_sparql(self.query, triplestore_config, cache_tags=["http://g"])
+        self.assertFalse(retrieve_raw.called)
+
+    @patch("brainiak.triplestore.log_request")
+    @patch("brainiak.triplestore.cache.retrieve_raw")
+    @patch("brainiak.triplestore.do_run_query", return_value=(MockResponse(body='{"boolean": true}'), 0))
+    @patch("brainiak.triplestore.settings", ENABLE_CACHE=True)
+    def test_update_queries_are_not_cached(self, settings, do_run_query, retrieve_raw, log_request):
+        triplestore.query_sparql(u"INSERT DATA INTO <http://g> {<http://s> a owl:Class}", triplestore_config,
+                                 cache_tags=["http://g"])
+        self.assertFalse(retrieve_raw.called)
+
+    def test_cache_key_ignores_whitespace(self):
+        self.assertEqual(triplestore._query_cache_key(self.query, triplestore_config),
+                         triplestore._query_cache_key(u"ASK {\n  GRAPH <http://g> {?s ?p ?o}\n}", triplestore_config))
+        self.assertNotEqual(triplestore._query_cache_key(self.query, triplestore_config),
+                            triplestore._query_cache_key(self.query, dict(triplestore_config, url="http://other")))
+
+
+class ReadReplicasTestCase(unittest.TestCase):
+
+    config = {"url": "http://primary", "app_name": "Brainiak", "read_urls": "http://replica1, http://replica2"}
+    request_params = dict(config, method="POST", body="")
+
+    def test_parse_read_urls(self):
+        self.assertEqual(triplestore.parse_read_urls(self.config), ["http://replica1", "http://replica2"])
+        self.assertEqual(triplestore.parse_read_urls({"url": "http://primary"}), [])
+
+    def test_reads_go_to_replica_with_less_outstanding_requests(self):
+        client = triplestore.TriplestoreClient()
+        client.get_pool(self.config, "http://replica1").active = 2
+        pool = client.choose_pool(self.config, read=True)
+        self.assertEqual(pool.url, "http://replica2")
+
+    def test_writes_go_to_primary(self):
+        client = triplestore.TriplestoreClient()
+        self.assertEqual(client.choose_pool(self.config).url, "http://primary")
+
+    def test_reads_go_to_primary_without_replicas(self):
+        client = triplestore.TriplestoreClient()
+        pool = client.choose_pool({"url": "http://primary", "app_name": "Brainiak"}, read=True)
+        self.assertEqual(pool.url, "http://primary")
+
+    @patch("brainiak.triplestore.log")
+    @patch("brainiak.triplestore.settings", TRIPLESTORE_EJECTION_FAILURES=2, TRIPLESTORE_EJECTION_SECS=30)
+    def test_ejected_replica_is_not_chosen(self, settings, log):
+        client = triplestore.TriplestoreClient()
+        replica = client.get_pool(self.config, "http://replica1")
+        replica.record_outcome(599)
+        self.assertTrue(replica.is_available())
+        replica.record_outcome(500)
+        self.assertFalse(replica.is_available())
+        self.assertEqual(replica.total_ejections, 1)
+        for i in range(3):
+            self.assertEqual(client.choose_pool(self.config, read=True).url, "http://replica2")
+
+        client.get_pool(self.config, "http://replica2").ejected_until = replica.ejected_until
+        self.assertEqual(client.choose_pool(self.config, read=True).url, "http://primary")
+
+    @patch("brainiak.triplestore.log")
+    @patch("brainiak.triplestore.settings", TRIPLESTORE_EJECTION_FAILURES=2, TRIPLESTORE_EJECTION_SECS=30)
+    def test_success_resets_failures(self, settings, log):
+        pool = triplestore.ConnectionPool("http://a", "Brainiak", 1)
+        pool.record_outcome(599)
+        pool.record_outcome(404)
+        pool.record_outcome(599)
+        self.assertTrue(pool.is_available())
+
+    @patch("brainiak.triplestore.ConnectionPool.fetch", return_value="response")
+    def test_fetch_sends_reads_to_replica_and_updates_to_primary(self, mocked_fetch):
+        client = triplestore.TriplestoreClient()
+        client.fetch(dict(self.request_params), u"SELECT ?s {?s a owl:Class}")
+        self.assertIn(mocked_fetch.call_args[0][0].url, ["http://replica1", "http://replica2"])
+        client.fetch(dict(self.request_params), u"INSERT DATA INTO <http://g> {<http://s> a owl:Class}")
+        self.assertEqual(mocked_fetch.call_args[0][0].url, "http://primary")
+
+    @patch("brainiak.triplestore.ConnectionPool.fetch", return_value="response")
+    def test_reads_are_recorded_by_the_breaker_of_the_replica(self, mocked_fetch):
+        client = triplestore.TriplestoreClient()
+        with patch.dict(circuit_breaker.breakers, clear=True):
+            client.fetch(dict(self.request_params), u"SELECT ?s {?s a owl:Class}", "QUERY_CLASSES")
+            replica_url = mocked_fetch.call_args[0][0].url
+            self.assertEqual(circuit_breaker.breakers.keys(), [u"triplestore {0}".format(replica_url)])
+            self.assertEqual(len(circuit_breaker.breakers.values()[0].latencies["QUERY_CLASSES"]), 1)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    @patch("brainiak.triplestore.ConnectionPool.fetch", return_value="response")
+    def test_do_run_query_sets_adaptive_timeout(self, mocked_fetch):
+        request_params = {"url": "http://a", "method": "POST", "body": ""}
+        with patch.dict(circuit_breaker.breakers, clear=True):
+            response, time_diff = triplestore.do_run_query(request_params, True, u"SELECT ?s {?s a owl:Class}")
+            breaker = circuit_breaker.breakers[u"triplestore http://a"]
+            self.assertEqual(len(breaker.latencies), 1)
+        self.assertEqual(response, "response")
+        self.assertEqual(mocked_fetch.call_args[0][0].request_timeout, breaker.timeout())
+
+    @patch("brainiak.triplestore.ConnectionPool.fetch")
+    def test_do_run_query_fails_fast_when_breaker_is_open(self, mocked_fetch):
+        request_params = {"url": "http://a", "method": "POST", "body": ""}
+        with patch.dict(circuit_breaker.breakers, clear=True):
+            breaker = circuit_breaker.get_breaker(u"triplestore http://a")
+            breaker.state = circuit_breaker.OPEN
+            breaker.opened_at = time.time()
+            with self.assertRaises(HTTPError) as exception:
+                triplestore.do_run_query(request_params, True, u"SELECT ?s {?s a owl:Class}")
+        self.assertEqual(exception.exception.status_code, 503)
+        self.assertFalse(mocked_fetch.called)
+
+
+class QueryStatsTestCase(unittest.TestCase):
+
+    @patch("brainiak.triplestore.log_request")
+    @patch("brainiak.triplestore.do_run_query", return_value=(MockResponse(body='{"boolean": true}'), 0.25))
+    def test_query_sparql_records_named_query(self, do_run_query, log_request):
+        with patch.dict(query_stats.stats, clear=True):
+            triplestore.query_sparql(u"ASK {?s ?p ?o}", triplestore_config, query_name="QUERY_ANYTHING")
+            stats = query_stats.stats["QUERY_ANYTHING"]
+            self.assertEqual(stats.latency.count, 1)
+            self.assertEqual(stats.total_time, 0.25)
+            self.assertEqual(stats.response_size.max, len('{"boolean": true}'))
+
+    @patch("brainiak.triplestore.do_run_query", side_effect=ClientHTTPError(500))
+    def test_query_sparql_records_errors(self, do_run_query):
+        with patch.dict(query_stats.stats, clear=True):
+            self.assertRaises(ClientHTTPError, triplestore.query_sparql, u"ASK {?s ?p ?o}", triplestore_config)
+            stats = query_stats.stats[query_stats.UNNAMED_QUERY]
+            self.assertEqual(stats.errors, 1)
+            self.assertEqual(stats.latency.count, 0)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from brainiak.utils.bindings_decoder import BindingsDecoder, BindingsDecoderError
+
+
+RESPONSE = '''{ "head": { "link": [], "vars": ["s", "label"] },
+  "results": { "distinct": false, "ordered": true, "bindings": [
+    { "s": { "type": "uri", "value": "http://a" }, "label": { "type": "literal", "xml:lang": "pt", "value": "Maçã {\\"quoted\\"} ]" }},
+    { "s": { "type": "uri", "value": "http://b" }, "label": { "type": "literal", "value": "B" }} ] } }'''
+
+EXPECTED_ROWS = [
+    {u"s": {u"type": u"uri", u"value": u"http://a"},
+     u"label": {u"type": u"literal", u"xml:lang": u"pt", u"value": u'Ma\xe7\xe3 {"quoted"} ]'}},
+    {u"s": {u"type": u"uri", u"value": u"http://b"},
+     u"label": {u"type": u"literal", u"value": u"B"}}
+]
+
+
+class BindingsDecoderTestCase(unittest.TestCase):
+
+    maxDiff = None
+
+    def test_feed_whole_response(self):
+        decoder = BindingsDecoder()
+        self.assertEqual(decoder.feed(RESPONSE), EXPECTED_ROWS)
+        self.assertTrue(decoder.finished)
+        self.assertEqual(decoder.rows_count, 2)
+
+    def test_feed_one_byte_at_a_time(self):
+        decoder = BindingsDecoder()
+        rows = []
+        for byte in RESPONSE:
+            rows.extend(decoder.feed(byte))
+        self.assertEqual(rows, EXPECTED_ROWS)
+        self.assertTrue(decoder.finished)
+
+    def test_buffer_only_keeps_incomplete_row(self):
+        decoder = BindingsDecoder()
+        position = RESPONSE.index('{ "s": { "type": "uri", "value": "http://b"')
+        decoder.feed(RESPONSE[:position + 10])
+        self.assertEqual(decoder.buffer, RESPONSE[position:position + 10])
+
+    def test_empty_bindings(self):
+        decoder = BindingsDecoder()
+        response = '{"head": {"vars": ["s"]}, "results": {"bindings": []}}'
+        self.assertEqual(decoder.feed(response), [])
+        self.assertTrue(decoder.finished)
+
+    def test_response_without_bindings(self):
+        decoder = BindingsDecoder()
+        self.assertEqual(decoder.feed('{"head": {"link": []}, "boolean": true}'), [])
+        self.assertFalse(decoder.started)
+        self.assertFalse(decoder.finished)
+
+    def test_invalid_row_raises_error(self):
+        decoder = BindingsDecoder()
+        self.assertRaises(BindingsDecoderError, decoder.feed, '{"results": {"bindings": [{"s": {"type": uri}}]}}')
@@ -1,12 +1,23 @@
 import logging
+import time
 import unittest
+from collections import Counter
 
 import redis
-from mock import patch, Mock
+import ujson
+from mock import call, patch, Mock
 
+from brainiak.greenlet_redis import PoolTimeoutError
+from brainiak.utils import cache
 from brainiak.utils.cache import build_key_for_class, CacheError, connect, memoize, ping, \
-    purge_by_path, safe_redis, status_message, build_instance_key, get_usage_message
-from brainiak.utils.params import ParamDict
+    purge_by_path, safe_redis, status_message, build_instance_key, get_usage_message, create_tagged, \
+    purge_tags, purge_graph_queries, build_key_for_query, retrieve, delete, flushall, listen_invalidations, \
+    get_local_usage_message, keys, purge, purge_an_instance, unlink, build_instance_tags, must_refresh, \
+    refresh_in_background, encode_entry, decode_entry, is_not_modified, build_namespace, create, \
+    build_response_etag, record_schema_request, most_requested_schemas, build_key_for_collection, purge_collections, \
+    build_canonical_params, build_key_for_request, memoize_many, retrieve_many, recompute_many, purge_class_queries
+from brainiak.utils.local_cache import LocalCache
+from brainiak.utils.params import ParamDict, INSTANCE_PARAMS, LIST_PARAMS
 from tests.mocks import MockRequest, MockHandler
 
 
@@ -61,29 +72,34 @@ class MemoizeTestCase(unittest.TestCase):
         self.assertEqual(redis_get.call_count, 0)
         self.assertEqual(redis_set.call_count, 0)
 
+    @patch("brainiak.utils.cache.time.time", return_value=1000)
     @patch("brainiak.utils.cache.current_time", return_value='Fri, 11 May 1984 20:00:00 -0300')
-    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_STALE_SECS=3600, CACHE_RECOMPUTE_LOCK_MS=0)
     @patch("brainiak.utils.cache.create", return_value=True)
     @patch("brainiak.utils.cache.retrieve", return_value=None)
     @patch("brainiak.utils.cache.redis", StrictRedis=StrictRedisMock)
-    def test_memoize_cache_enabled_but_without_cache(self, strict_redis, redis_get, redis_set, settings, isoformat):
+    def test_memoize_cache_enabled_but_without_cache(self, strict_redis, redis_get, redis_set, settings, isoformat, time):
 
         def clean_up():
             return {"status": "Laundry done"}
 
-        params = Mock(request=MockRequest(uri="/home"))
+        params = ParamDict(MockHandler(uri="http://mock.test.com/home"))
         answer = memoize(params, clean_up)
 
         expected = {
             'body': {"status": "Laundry done"},
             'meta': {
                 'cache': 'MISS',
-                'last_modified': 'Fri, 11 May 1984 20:00:00 -0300'
+                'last_modified': 'Fri, 11 May 1984 20:00:00 -0300',
+                'expires_at': 1000 + 86400,
+                'compute_time': 0,
+                'etag': '"f44c8a3da8b8d1c5b432780e529851f9"'
             }
         }
         self.assertEqual(answer, expected)
-        self.assertEqual(redis_get.call_count, 1)
+        redis_get.assert_called_once_with(u"/home@@##request")
         self.assertEqual(redis_set.call_count, 1)
+        self.assertEqual(redis_set.call_args[0][2], 86400 + 3600)
 
     @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
     @patch("brainiak.utils.cache.create", return_value=True)
@@ -94,7 +110,7 @@ class MemoizeTestCase(unittest.TestCase):
         def clean_up():
             return {"status": "Laundry done"}
 
-        params = Mock(request=MockRequest(uri="/home"))
+        params = ParamDict(MockHandler(uri="http://mock.test.com/home"))
         answer = memoize(params, clean_up)
         self.assertEqual(answer['status'], "Dishes cleaned up")
         self.assertEqual(redis_get.call_count, 1)
@@ -210,6 +226,21 @@ class SafeRedisTestCase(unittest.TestCase):
 
         response = some_function(self)
         self.assertEqual(response, "xubi")
+        # the pool of the client is reused, its failed connection was closed
+        self.assertFalse(connect.called)
+
+    @patch("brainiak.utils.cache.log.logger.error")
+    @patch("brainiak.utils.cache.log", logger=logging.getLogger("xubiru"))
+    def test_safe_redis_does_not_retry_when_no_connection_is_free(self, logger, error):
+
+        @safe_redis
+        def some_function(self):
+            self.ncalls += 1
+            raise PoolTimeoutError("Timeout of 0.500s waiting for a free Redis connection")
+
+        response = some_function(self)
+        self.assertIsNone(response)
+        self.assertEqual(self.ncalls, 1)
 
     @patch("brainiak.utils.cache.connect")
     @patch("brainiak.utils.cache.redis_client.ping", return_value=True)
@@ -254,7 +285,14 @@ class CacheUtilsTestCase(unittest.TestCase):
         handler = MockHandler(**url_params)
         params = ParamDict(handler, **url_params)
         computed = build_instance_key(params)
-        expected = "_@@_@@instance@@expand_uri=0&instance_uri=instance&lang=pt##instance"
+        expected = "_@@_@@instance@@##instance"
+        self.assertEqual(computed, expected)
+
+    def test_build_key_for_instance_with_arguments(self):
+        handler = MockHandler(querystring="expand_object_properties=1&lang=en")
+        params = ParamDict(handler, **dict(INSTANCE_PARAMS, instance_uri="instance"))
+        computed = build_instance_key(params)
+        expected = "_@@_@@instance@@expand_object_properties=1##instance"
         self.assertEqual(computed, expected)
 
     @patch("brainiak.utils.cache.delete")
@@ -290,3 +328,671 @@ class CacheUtilsTestCase(unittest.TestCase):
         self.assertFalse(mock_purge.called)
         self.assertTrue(mock_delete.called)
         mock_delete.assert_called_with(u"graph@@class##type")
+
+
+class QueryCacheTestCase(unittest.TestCase):
+
+    def test_build_key_for_query(self):
+        computed = build_key_for_query(u"http://a@@SELECT ?s {?s a owl:Class}")
+        self.assertTrue(computed.endswith(u"##query"))
+        self.assertNotEqual(computed, build_key_for_query(u"http://a@@SELECT ?o {?s a owl:Class}"))
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_create_tagged(self, redis_client):
+        pipeline = redis_client.pipeline.return_value
+        create_tagged("key##query", "{}", ["query@@http://g1", "query@@http://g2"])
+        pipeline.setex.assert_called_with("key##query", 86400, "{}")
+        self.assertEqual(pipeline.sadd.call_count, 2)
+        pipeline.sadd.assert_called_with(u"query@@http://g2##tag", "key##query")
+        self.assertTrue(pipeline.execute.called)
+
+    @patch("brainiak.utils.cache.purge_tags")
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=False)
+    def test_purge_graph_queries_cache_disabled(self, settings, purge_tags):
+        purge_graph_queries("http://g")
+        self.assertFalse(purge_tags.called)
+
+    @patch("brainiak.utils.cache.purge_tags")
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_purge_graph_queries(self, settings, purge_tags):
+        purge_graph_queries("http://g")
+        purge_tags.assert_called_with([u"query@@http://g"])
+
+    @patch("brainiak.utils.cache.purge_tags")
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_purge_class_queries(self, settings, purge_tags):
+        purge_class_queries("http://g/City")
+        purge_tags.assert_called_with([u"query@@http://g/City"])
+
+
+@patch("brainiak.utils.cache.unlink_command", "UNLINK")
+@patch("brainiak.utils.cache.redis_client")
+class TagInvalidationTestCase(unittest.TestCase):
+
+    def test_purge_tags_unlinks_tagged_keys_and_tag_sets_in_one_pipeline(self, redis_client):
+        smembers_pipeline = Mock()
+        smembers_pipeline.execute.return_value = [set(["a##instance", "b##instance"]), set(["b##instance"])]
+        unlink_pipeline = Mock()
+        unlink_pipeline.execute.return_value = [4]
+        redis_client.pipeline.side_effect = [smembers_pipeline, unlink_pipeline]
+
+        response = purge_tags(["instance@@http://a", "instances"])
+
+        self.assertEqual(response, 4)
+        self.assertEqual(smembers_pipeline.smembers.call_count, 2)
+        self.assertEqual(unlink_pipeline.execute_command.call_count, 1)
+        command = unlink_pipeline.execute_command.call_args[0]
+        self.assertEqual(command[0], "UNLINK")
+        self.assertEqual(sorted(command[1:]),
+                         ["a##instance", "b##instance", u"instance@@http://a##tag", u"instances##tag"])
+        self.assertFalse(redis_client.keys.called)
+
+    def test_unlink_batches_keys(self, redis_client):
+        pipeline = redis_client.pipeline.return_value
+        pipeline.execute.return_value = [1000, 1]
+        response = unlink(["key{0}".format(i) for i in range(1001)])
+        self.assertEqual(response, 1001)
+        self.assertEqual(pipeline.execute_command.call_count, 2)
+        self.assertEqual(len(pipeline.execute_command.call_args[0]), 2)
+
+    def test_unlink_falls_back_to_del_before_redis_4(self, redis_client):
+        pipeline = redis_client.pipeline.return_value
+        pipeline.execute.side_effect = [redis.exceptions.ResponseError("unknown command 'UNLINK'"), [1]]
+        self.assertEqual(unlink(["key"]), 1)
+        pipeline.execute_command.assert_called_with("DEL", "key")
+
+    def test_keys_scans_with_cursor(self, redis_client):
+        redis_client.execute_command.side_effect = [["17", ["a1", "a2"]], ["0", ["a3"]]]
+        self.assertEqual(keys("a"), ["a1", "a2", "a3"])
+        redis_client.execute_command.assert_called_with("SCAN", "17", "MATCH", u"a*", "COUNT", 1000)
+        self.assertFalse(redis_client.keys.called)
+
+    @patch("brainiak.utils.cache.log")
+    def test_purge_by_pattern_unlinks_keys_found(self, log, redis_client):
+        redis_client.execute_command.return_value = ["0", ["a1", "a2"]]
+        pipeline = redis_client.pipeline.return_value
+        pipeline.execute.return_value = [2]
+        purge("a")
+        pipeline.execute_command.assert_called_with("UNLINK", "a1", "a2")
+
+    @patch("brainiak.utils.cache.purge_tags")
+    def test_purge_an_instance_purges_its_tag(self, purge_tags, redis_client):
+        purge_an_instance("http://a")
+        purge_tags.assert_called_with([u"instance@@http://a"])
+
+    def test_build_instance_tags(self, redis_client):
+        params = {"instance_uri": "http://i", "class_uri": "http://C", "graph_uri": "http://g"}
+        self.assertEqual(build_instance_tags(params),
+                         [u"instance@@http://i", u"class@@http://C", u"graph@@http://g", u"instances"])
+
+    def test_build_instance_tags_without_class_and_graph(self, redis_client):
+        params = ParamDict(MockHandler(querystring="instance_uri=http://ex/i"),
+                           context_name="_", class_name="_", instance_id="_", **INSTANCE_PARAMS)
+        self.assertEqual(build_instance_tags(params), [u"instance@@http://ex/i", u"instances"])
+        params = {"instance_uri": "http://i", "class_uri": "http://C", "graph_uri": "_"}
+        self.assertEqual(build_instance_tags(params), [u"instance@@http://i", u"instances"])
+
+    @patch("brainiak.utils.cache.create_tagged")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    def test_memoize_with_tags(self, settings, retrieve, create_tagged, redis_client):
+        params = Mock(request=MockRequest(uri="/home"))
+        memoize(params, lambda: {"a": 1}, key="key##instance", tags=["instances"])
+        self.assertEqual(create_tagged.call_args[0][0], "key##instance")
+        self.assertEqual(create_tagged.call_args[0][2], ["instances"])
+
+
+@patch("brainiak.utils.cache.ensure_invalidation_listener")
+class LocalCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        self.patcher = patch("brainiak.utils.cache.local_cache", self.local_cache)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def assertPublished(self, redis_client, keys):
+        (channel, message) = redis_client.publish.call_args[0]
+        self.assertEqual(channel, "brainiak##cache_invalidation")
+        self.assertEqual(ujson.loads(message), {"invalidate": keys, "origin": cache.process_id()})
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_retrieve_reads_redis_once(self, redis_client, ensure_listener):
+        redis_client.get.return_value = '{"body": "value"}'
+        self.assertEqual(retrieve("key"), {"body": "value"})
+        self.assertEqual(retrieve("key"), {"body": "value"})
+        self.assertEqual(redis_client.get.call_count, 1)
+        self.assertEqual(self.local_cache.hits, 1)
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_retrieve_returns_new_object_on_each_hit(self, redis_client, ensure_listener):
+        redis_client.get.return_value = '{"body": "value"}'
+        retrieve("key")["body"] = "changed by caller"
+        self.assertEqual(retrieve("key"), {"body": "value"})
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_delete_invalidates_local_cache_of_every_process(self, redis_client, ensure_listener):
+        self.local_cache.set("key", "value")
+        delete("key")
+        self.assertEqual(self.local_cache.get("key"), None)
+        self.assertPublished(redis_client, ["key"])
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_overwritten_key_is_invalidated_in_other_processes(self, redis_client, ensure_listener):
+        redis_client.pipeline.return_value.execute.return_value = [True, True]
+        create("key", "new value")
+        self.assertEqual(self.local_cache.get("key"), "new value")
+        self.assertPublished(redis_client, ["key"])
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_new_key_is_not_invalidated(self, redis_client, ensure_listener):
+        redis_client.pipeline.return_value.execute.return_value = [False, True]
+        create("key", "value")
+        self.assertFalse(redis_client.publish.called)
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_overwritten_tagged_key_is_invalidated_in_other_processes(self, redis_client, ensure_listener):
+        redis_client.pipeline.return_value.execute.return_value = [1, True, 1, True]
+        create_tagged("key", "new value", ["instances"])
+        self.assertEqual(self.local_cache.get("key"), "new value")
+        self.assertPublished(redis_client, ["key"])
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_flushall_clears_local_cache(self, redis_client, ensure_listener):
+        self.local_cache.set("key", "value")
+        flushall()
+        self.assertEqual(self.local_cache.stats()["entries"], 0)
+        self.assertPublished(redis_client, "*")
+
+    @patch("brainiak.utils.cache.process_id", return_value=u"host:1")
+    @patch("brainiak.utils.cache.time.sleep", side_effect=KeyboardInterrupt)
+    @patch("brainiak.utils.cache.connect")
+    def test_listener_applies_invalidations_published(self, connect, sleep, process_id, ensure_listener):
+        self.local_cache.set("a", "1")
+        self.local_cache.set("b", "2")
+        self.local_cache.set("c", "3")
+        connect.return_value.pubsub.return_value.listen.return_value = [
+            {"type": "subscribe", "data": 1},
+            {"type": "message", "data": '{"invalidate": ["a", "b"], "origin": "host:2"}'},
+            # e.g. the overwrite of c by this process, which already has its new value
+            {"type": "message", "data": '{"invalidate": ["c"], "origin": "host:1"}'}
+        ]
+        io_loop = Mock()
+        self.assertRaises(KeyboardInterrupt, listen_invalidations, io_loop)
+        self.assertEqual(io_loop.add_callback.call_count, 3)
+        for (args, kwargs) in io_loop.add_callback.call_args_list[1:]:
+            args[0](*args[1:])
+        self.assertEqual(self.local_cache.get("a"), None)
+        self.assertEqual(self.local_cache.get("c"), "3")
+
+    @patch("brainiak.utils.cache.process_id", return_value=u"host:1")
+    @patch("brainiak.utils.cache.time.sleep", side_effect=KeyboardInterrupt)
+    @patch("brainiak.utils.cache.connect")
+    def test_listener_reloads_graphs_asked_by_other_processes(self, connect, sleep, process_id, ensure_listener):
+        connect.return_value.pubsub.return_value.listen.return_value = [
+            {"type": "message", "data": '{"reload_graphs": ["http://a/"], "origin": "host:2"}'},
+            {"type": "message", "data": '{"reload_graphs": ["http://b/"], "origin": "host:1"}'}
+        ]
+        io_loop = Mock()
+        self.assertRaises(KeyboardInterrupt, listen_invalidations, io_loop)
+        reload_listener = Mock()
+        with patch("brainiak.utils.cache.graphs_reload_listener", reload_listener):
+            for (args, kwargs) in io_loop.add_callback.call_args_list[1:]:
+                args[0](*args[1:])
+        reload_listener.assert_called_once_with(["http://a/"])
+
+    def test_local_usage_message(self, ensure_listener):
+        self.local_cache.set("a", "1")
+        self.local_cache.get("a")
+        message = get_local_usage_message()
+        self.assertIn("Entries: 1/10", message)
+        self.assertIn("L1 (local) hits: 1 | misses: 0 | Hit ratio: 1.0", message)
+
+
+@patch("brainiak.utils.cache.greenlet_spawn")
+@patch("brainiak.utils.cache.greenlet_sleep")
+@patch("brainiak.utils.cache.redis_client")
+@patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_STALE_SECS=3600, CACHE_RECOMPUTE_LOCK_MS=5000,
+       CACHE_RECOMPUTE_POLL_SECS=0.05, CACHE_RECOMPUTE_WAIT_SECS=5)
+class RecomputeLockTestCase(unittest.TestCase):
+
+    entry = {"body": "winner", "meta": {"last_modified": ""}}
+
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    def test_miss_takes_the_lock_computes_and_releases_it(self, retrieve, create, settings, redis_client, sleep, spawn):
+        redis_client.set.return_value = True
+        answer = memoize(Mock(), lambda: "fresh", key="key")
+        self.assertEqual(answer["body"], "fresh")
+        (lock_key, token) = redis_client.set.call_args[0]
+        self.assertEqual(lock_key, u"key##lock")
+        self.assertEqual(redis_client.set.call_args[1], {"px": 5000, "nx": True})
+        # released only if it is still held by its token
+        redis_client.eval.assert_called_with(cache.RELEASE_LOCK_SCRIPT, 1, u"key##lock", token)
+        self.assertFalse(redis_client.delete.called)
+        self.assertFalse(sleep.called)
+        self.assertEqual(cache.held_locks, set())
+
+    def test_lock_is_extended_while_it_is_held(self, settings, redis_client, sleep, spawn):
+        redis_client.set.return_value = True
+        redis_client.eval.return_value = 1
+        token = cache.acquire_recompute_lock("key")
+        extend = spawn.call_args[0][0]
+        sleep.side_effect = self.release_on_third_sleep("key", token)
+        extend()
+        extensions = [item for item in redis_client.eval.call_args_list if item[0][0] == cache.EXTEND_LOCK_SCRIPT]
+        self.assertEqual(len(extensions), 2)
+        self.assertEqual(extensions[0][0][1:], (1, u"key##lock", token, 5000))
+        sleep.assert_called_with(2.5)
+
+    def release_on_third_sleep(self, key, token):
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 3:
+                cache.release_recompute_lock(key, token)
+        return sleep
+
+    def test_lost_lock_is_no_longer_extended(self, settings, redis_client, sleep, spawn):
+        redis_client.set.return_value = True
+        redis_client.eval.return_value = 0
+        token = cache.acquire_recompute_lock("key")
+        spawn.call_args[0][0]()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertNotIn(("key", token), cache.held_locks)
+
+    @patch("brainiak.utils.cache.retrieve")
+    def test_miss_waits_for_the_holder_of_the_lock(self, retrieve, settings, redis_client, sleep, spawn):
+        redis_client.set.return_value = None
+        redis_client.exists.return_value = True
+        retrieve.side_effect = [None, None, self.entry]
+        function = Mock(return_value="fresh")
+        answer = memoize(Mock(), function, key="key")
+        self.assertEqual(answer["body"], "winner")
+        self.assertEqual(answer["meta"]["cache"], "HIT")
+        self.assertFalse(function.called)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertFalse(redis_client.delete.called)
+
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    def test_miss_computes_when_the_lock_is_released_without_the_entry(self, retrieve, create, settings, redis_client, sleep, spawn):
+        redis_client.set.return_value = None
+        redis_client.exists.return_value = False
+        answer = memoize(Mock(), lambda: "fresh", key="key")
+        self.assertEqual(answer["body"], "fresh")
+        self.assertEqual(sleep.call_count, 1)
+
+    @patch("brainiak.utils.cache.time.time")
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    def test_miss_computes_after_waiting_too_long(self, retrieve, create, time, settings, redis_client, sleep, spawn):
+        times = iter([1000, 1001, 1006])
+        time.side_effect = lambda: next(times, 1010)
+        redis_client.set.return_value = None
+        redis_client.exists.return_value = True
+        answer = memoize(Mock(), lambda: "fresh", key="key")
+        self.assertEqual(answer["body"], "fresh")
+        self.assertEqual(sleep.call_count, 1)
+        self.assertFalse(redis_client.delete.called)
+
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    def test_miss_computes_when_redis_fails_to_lock(self, retrieve, create, settings, redis_client, sleep, spawn):
+        redis_client.set.side_effect = redis.connection.ConnectionError
+        answer = memoize(Mock(), lambda: "fresh", key="key")
+        self.assertEqual(answer["body"], "fresh")
+        self.assertFalse(sleep.called)
+
+    @patch("brainiak.utils.cache.create")
+    def test_refresh_is_skipped_while_another_process_holds_the_lock(self, create, settings, redis_client, sleep, spawn):
+        spawn.side_effect = lambda function: function()
+        redis_client.set.return_value = None
+        function = Mock(return_value="new")
+        refresh_in_background("key", function, None, None)
+        self.assertTrue(spawn.called)
+        self.assertFalse(function.called)
+        self.assertFalse(create.called)
+        self.assertNotIn("key", cache.refreshing_keys)
+
+
+@patch("brainiak.utils.cache.ensure_invalidation_listener")
+@patch("brainiak.utils.cache.greenlet_sleep")
+@patch("brainiak.utils.cache.redis_client")
+@patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_STALE_SECS=3600, CACHE_RECOMPUTE_LOCK_MS=5000,
+       CACHE_RECOMPUTE_POLL_SECS=0.05, CACHE_RECOMPUTE_WAIT_SECS=5, CACHE_EARLY_REFRESH_BETA=0)
+class MemoizeManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        self.patcher = patch("brainiak.utils.cache.local_cache", self.local_cache)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_retrieve_many_reads_the_keys_not_in_the_local_cache_by_one_mget(self, settings, redis_client, sleep, ensure_listener):
+        self.local_cache.set("a", encode_entry({"body": "A", "meta": {}}))
+        redis_client.mget.return_value = [None, encode_entry({"body": "C", "meta": {}})]
+        entries = retrieve_many(["a", "b", "c"])
+        redis_client.mget.assert_called_once_with(["b", "c"])
+        self.assertEqual([entry and entry["body"] for entry in entries], ["A", None, "C"])
+        self.assertFalse(redis_client.get.called)
+
+    @patch("brainiak.utils.cache.create")
+    def test_misses_are_computed_by_a_single_call(self, create, settings, redis_client, sleep, ensure_listener):
+        redis_client.mget.return_value = [encode_entry({"body": "cached", "meta": {}}), None, None]
+        redis_client.set.return_value = True
+        function = Mock(return_value=["fresh b", None])
+        entries = memoize_many(["a", "b", "c"], function, ["arg a", "arg b", "arg c"])
+        function.assert_called_once_with(["arg b", "arg c"])
+        self.assertEqual(entries[0]["body"], "cached")
+        self.assertEqual(entries[0]["meta"]["cache"], "HIT")
+        self.assertEqual(entries[1]["body"], "fresh b")
+        self.assertEqual(entries[1]["meta"]["cache"], "MISS")
+        self.assertEqual(entries[2], None)
+        self.assertEqual(create.call_args[0][0], "b")
+        self.assertEqual(sorted(item[0][2] for item in redis_client.eval.call_args_list), [u"b##lock", u"c##lock"])
+
+    @patch("brainiak.utils.cache.create_tagged")
+    def test_misses_are_stored_with_their_tags(self, create_tagged, settings, redis_client, sleep, ensure_listener):
+        redis_client.mget.return_value = [None, None]
+        redis_client.set.return_value = True
+        function = Mock(return_value=["fresh a", "fresh b"])
+        memoize_many(["a", "b"], function, ["arg a", "arg b"], [["tag a"], ["tag b"]])
+        self.assertEqual([(item[0][0], item[0][2]) for item in create_tagged.call_args_list],
+                         [("a", ["tag a"]), ("b", ["tag b"])])
+
+    @patch("brainiak.utils.cache.create")
+    def test_misses_locked_by_another_process_are_waited_for(self, create, settings, redis_client, sleep, ensure_listener):
+        redis_client.mget.return_value = [None]
+        redis_client.set.return_value = None
+        redis_client.get.return_value = encode_entry({"body": "winner", "meta": {}})
+        function = Mock()
+        entries = memoize_many(["a"], function, ["arg a"])
+        self.assertEqual(entries[0]["body"], "winner")
+        self.assertFalse(function.called)
+
+    @patch("brainiak.utils.cache.unlink")
+    @patch("brainiak.utils.cache.create")
+    def test_recompute_only_the_cached_entries(self, create, unlink, settings, redis_client, sleep, ensure_listener):
+        self.local_cache.set("a", encode_entry({"body": "old a", "meta": {}}))
+        redis_client.mget.return_value = [None, encode_entry({"body": "old c", "meta": {}})]
+        redis_client.set.return_value = True
+        function = Mock(return_value=["new a", None])
+        self.assertEqual(recompute_many(["a", "b", "c"], function, ["arg a", "arg b", "arg c"]), ["a", "c"])
+        function.assert_called_once_with(["arg a", "arg c"])
+        self.assertEqual(create.call_args[0][0], "a")
+        unlink.assert_called_once_with(["c"])
+        self.assertEqual(self.local_cache.get("a"), None)
+
+    def test_recompute_skips_the_entries_locked_by_another_process(self, settings, redis_client, sleep, ensure_listener):
+        redis_client.mget.return_value = [encode_entry({"body": "old a", "meta": {}})]
+        redis_client.set.return_value = None
+        function = Mock()
+        self.assertEqual(recompute_many(["a"], function, ["arg a"]), [])
+        self.assertFalse(function.called)
+
+    def test_cache_disabled(self, settings, redis_client, sleep, ensure_listener):
+        settings.ENABLE_CACHE = False
+        entries = memoize_many(["a", "b"], lambda arguments: [argument.upper() for argument in arguments], ["a", "b"])
+        self.assertEqual([entry["body"] for entry in entries], ["A", "B"])
+        self.assertFalse(redis_client.mget.called)
+
+
+@patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_STALE_SECS=3600, CACHE_EARLY_REFRESH_BETA=1.0,
+       CACHE_RECOMPUTE_LOCK_MS=0)
+class StaleWhileRevalidateTestCase(unittest.TestCase):
+
+    def cached(self, expires_at, compute_time=0.5):
+        return {"body": "old", "meta": {"last_modified": "", "expires_at": expires_at, "compute_time": compute_time}}
+
+    @patch("brainiak.utils.cache.refresh_in_background")
+    @patch("brainiak.utils.cache.retrieve")
+    def test_fresh_entry_is_a_hit(self, retrieve, refresh, settings):
+        retrieve.return_value = self.cached(time.time() + 3600)
+        answer = memoize(Mock(), lambda: "new", key="key")
+        self.assertEqual(answer["body"], "old")
+        self.assertEqual(answer["meta"]["cache"], "HIT")
+        self.assertFalse(refresh.called)
+
+    @patch("brainiak.utils.cache.refresh_in_background")
+    @patch("brainiak.utils.cache.retrieve")
+    def test_expired_entry_is_returned_stale_and_refreshed(self, retrieve, refresh, settings):
+        retrieve.return_value = self.cached(time.time() - 1)
+        function = Mock(return_value="new")
+        answer = memoize(Mock(), function, key="key", tags=["instances"])
+        self.assertEqual(answer["body"], "old")
+        self.assertEqual(answer["meta"]["cache"], "STALE")
+        self.assertFalse(function.called)
+        refresh.assert_called_with("key", function, None, ["instances"])
+
+    @patch("brainiak.utils.cache.refresh_in_background")
+    @patch("brainiak.utils.cache.retrieve", return_value={"body": "old", "meta": {"last_modified": ""}})
+    def test_entry_without_expiry_is_a_hit(self, retrieve, refresh, settings):
+        answer = memoize(Mock(), lambda: "new", key="key")
+        self.assertEqual(answer["meta"]["cache"], "HIT")
+        self.assertFalse(refresh.called)
+
+    @patch("brainiak.utils.cache.random.random")
+    def test_early_refresh_is_likelier_near_expiry(self, random, settings):
+        meta = {"expires_at": 1000, "compute_time": 1}
+        # -log(1 - 0.9) = 2.3 seconds before the expiry
+        random.return_value = 0.9
+        self.assertTrue(must_refresh(meta, now=998))
+        self.assertFalse(must_refresh(meta, now=997))
+        random.return_value = 0.0
+        self.assertFalse(must_refresh(meta, now=999.9))
+        self.assertTrue(must_refresh(meta, now=1000))
+
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.greenlet_spawn")
+    def test_refresh_in_background_runs_once_per_key(self, greenlet_spawn, create, settings):
+        function = Mock(return_value="new")
+        refresh_in_background("key", function, None, None)
+        refresh_in_background("key", function, None, None)
+        self.assertEqual(greenlet_spawn.call_count, 1)
+        self.assertFalse(function.called)
+
+        greenlet_spawn.call_args[0][0]()
+        self.assertTrue(function.called)
+        self.assertEqual(create.call_args[0][0], "key")
+        refresh_in_background("key", function, None, None)
+        self.assertEqual(greenlet_spawn.call_count, 2)
+
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.greenlet_spawn")
+    def test_refresh_in_background_is_not_affected_by_later_changes_of_params(self, greenlet_spawn, create, settings):
+        function = Mock(return_value={"status": "ok"})
+        params = {"lang": "pt"}
+        refresh_in_background("key", function, params, None)
+        params["lang"] = "en"
+        greenlet_spawn.call_args[0][0]()
+        function.assert_called_once_with({"lang": "pt"})
+
+
+class ConditionalRequestTestCase(unittest.TestCase):
+
+    def entry(self):
+        return {"body": {"status": "Laundry done"}, "meta": {"last_modified": "Fri, 11 May 1984 20:00:00 -0300"}}
+
+    def test_encode_entry_adds_etag_of_body(self):
+        value = encode_entry(self.entry())
+        self.assertEqual(decode_entry(value)["meta"]["etag"], '"f44c8a3da8b8d1c5b432780e529851f9"')
+        self.assertEqual(decode_entry(value)["body"], {"status": "Laundry done"})
+
+    def test_decode_entry_skips_body(self):
+        value = encode_entry(self.entry())
+        entry = decode_entry(value, skip_body=lambda meta: True)
+        self.assertNotIn("body", entry)
+        self.assertIn("etag", entry["meta"])
+
+    def test_decode_value_without_meta(self):
+        self.assertEqual(decode_entry('{"body": "value"}'), {"body": "value"})
+
+    def test_is_not_modified_by_etag(self):
+        meta = {"etag": '"abc"', "last_modified": "Fri, 11 May 1984 20:00:00 -0300"}
+        self.assertTrue(is_not_modified(meta, {"If-None-Match": '"xyz", "abc"'}))
+        self.assertTrue(is_not_modified(meta, {"If-None-Match": 'W/"abc"'}))
+        self.assertTrue(is_not_modified(meta, {"If-None-Match": '*'}))
+        # If-Modified-Since is ignored when If-None-Match is given
+        self.assertFalse(is_not_modified(meta, {"If-None-Match": '"xyz"',
+                                                "If-Modified-Since": "Sat, 12 May 1984 20:00:00 -0300"}))
+        self.assertFalse(is_not_modified({}, {"If-None-Match": '"abc"'}))
+
+    def test_is_not_modified_by_etag_of_the_view(self):
+        meta = {"etag": '"abc"'}
+        pt_params = ParamDict(MockHandler(querystring="lang=pt"), **INSTANCE_PARAMS)
+        en_params = ParamDict(MockHandler(querystring="lang=en"), **INSTANCE_PARAMS)
+        pt_etag = build_response_etag(meta, pt_params)
+        self.assertNotEqual(pt_etag, build_response_etag(meta, en_params))
+        self.assertTrue(is_not_modified(meta, {"If-None-Match": pt_etag}, pt_params))
+        self.assertFalse(is_not_modified(meta, {"If-None-Match": pt_etag}, en_params))
+        self.assertFalse(is_not_modified(meta, {"If-None-Match": '"abc"'}, pt_params))
+
+    def test_is_not_modified_by_date(self):
+        meta = {"last_modified": "Fri, 11 May 1984 20:00:00 -0300"}
+        self.assertTrue(is_not_modified(meta, {"If-Modified-Since": "Fri, 11 May 1984 23:00:00 GMT"}))
+        self.assertFalse(is_not_modified(meta, {"If-Modified-Since": "Fri, 11 May 1984 22:59:59 GMT"}))
+        self.assertFalse(is_not_modified(meta, {"If-Modified-Since": "not a date"}))
+        self.assertFalse(is_not_modified(meta, {}))
+
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True)
+    @patch("brainiak.utils.cache.refresh_in_background")
+    @patch("brainiak.utils.cache.ensure_invalidation_listener")
+    @patch("brainiak.utils.cache.redis_client")
+    def test_memoize_conditional_hit_does_not_deserialize_body(self, redis_client, ensure_listener, refresh, settings):
+        entry = self.entry()
+        redis_client.get.return_value = encode_entry(entry)
+        params = ParamDict(MockHandler(querystring="lang=pt"), **INSTANCE_PARAMS)
+        params.request.headers["If-None-Match"] = build_response_etag(entry["meta"], params)
+        with patch("brainiak.utils.cache.local_cache", LocalCache(0, 0, 60)):
+            with patch("brainiak.utils.cache.ujson.loads", wraps=ujson.loads) as loads:
+                answer = memoize(params, lambda: "new", key="key", conditional=True)
+        self.assertTrue(answer["not_modified"])
+        self.assertNotIn("body", answer)
+        self.assertEqual(answer["meta"]["cache"], "HIT")
+        self.assertEqual(loads.call_count, 1)
+
+        # the ETag of another view of the same entry
+        params = ParamDict(MockHandler(querystring="lang=en", headers={"If-None-Match": params.request.headers["If-None-Match"]}),
+                           **INSTANCE_PARAMS)
+        with patch("brainiak.utils.cache.local_cache", LocalCache(0, 0, 60)):
+            answer = memoize(params, lambda: "new", key="key", conditional=True)
+        self.assertEqual(answer["body"], {"status": "Laundry done"})
+        self.assertNotIn("not_modified", answer)
+
+    @patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_STALE_SECS=3600)
+    @patch("brainiak.utils.cache.create")
+    @patch("brainiak.utils.cache.retrieve", return_value=None)
+    def test_memoize_conditional_miss_with_same_etag(self, retrieve, create, settings):
+        params = ParamDict(MockHandler())
+        params.request.headers["If-None-Match"] = build_response_etag({"etag": '"f44c8a3da8b8d1c5b432780e529851f9"'}, params)
+        answer = memoize(params, lambda: {"status": "Laundry done"}, key="key", conditional=True)
+        self.assertTrue(answer["not_modified"])
+        self.assertEqual(answer["meta"]["cache"], "MISS")
+
+
+@patch("brainiak.utils.cache.namespace", "abc")
+class NamespaceTestCase(unittest.TestCase):
+
+    def test_build_namespace_changes_with_version(self):
+        namespace = build_namespace(u"2.6.0")
+        self.assertEqual(len(namespace), 12)
+        self.assertEqual(namespace, build_namespace(u"2.6.0"))
+        self.assertNotEqual(namespace, build_namespace(u"2.6.1"))
+
+    @patch("brainiak.utils.cache.local_cache", LocalCache(0, 0, 60))
+    @patch("brainiak.utils.cache.redis_client")
+    def test_keys_are_namespaced(self, redis_client):
+        pipeline = redis_client.pipeline.return_value
+        pipeline.execute.return_value = [False, True]
+        create("key", "value")
+        pipeline.setex.assert_called_with(u"abc::key", 86400, "value")
+        redis_client.get.return_value = '"value"'
+        self.assertEqual(retrieve("key"), "value")
+        redis_client.get.assert_called_with(u"abc::key")
+        delete("key")
+        redis_client.delete.assert_called_with(u"abc::key")
+
+    @patch("brainiak.utils.cache.local_cache", LocalCache(0, 0, 60))
+    @patch("brainiak.utils.cache.redis_client")
+    def test_tags_are_namespaced(self, redis_client):
+        create_tagged("key", "value", ["tag"])
+        redis_client.pipeline.return_value.sadd.assert_called_with(u"abc::tag##tag", u"abc::key")
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_keys_are_listed_without_namespace(self, redis_client):
+        redis_client.execute_command.return_value = ("0", [u"abc::a##class", u"abc::b##class"])
+        self.assertEqual(keys("a"), [u"a##class", u"b##class"])
+        redis_client.execute_command.assert_called_with("SCAN", "0", "MATCH", u"abc::a*", "COUNT", 1000)
+
+
+@patch("brainiak.utils.cache.settings", ENABLE_CACHE=True, CACHE_WARM_UP_FLUSH_EVERY=3)
+class SchemaPopularityTestCase(unittest.TestCase):
+
+    @patch("brainiak.utils.cache.schema_requests", Counter())
+    @patch("brainiak.utils.cache.redis_client")
+    def test_schema_requests_are_sent_in_batches(self, redis_client, settings):
+        record_schema_request("person", "Gender")
+        record_schema_request("person", "Person")
+        self.assertFalse(redis_client.pipeline.called)
+        record_schema_request("person", "Gender")
+        pipeline = redis_client.pipeline.return_value
+        self.assertEqual(sorted(pipeline.zincrby.call_args_list), [
+            call(u"_##schema_popularity", u"person/Gender", 2),
+            call(u"_##schema_popularity", u"person/Person", 1)
+        ])
+
+    @patch("brainiak.utils.cache.redis_client")
+    def test_most_requested_schemas(self, redis_client, settings):
+        redis_client.zrevrange.return_value = ["person/Gender", "place/City"]
+        self.assertEqual(most_requested_schemas(2), [(u"person", u"Gender"), (u"place", u"City")])
+        redis_client.zrevrange.assert_called_with(u"_##schema_popularity", 0, 1)
+
+
+class CollectionCacheTestCase(unittest.TestCase):
+
+    def test_build_key_for_collection(self):
+        handler = MockHandler(querystring="page=2&lang=en")
+        params = ParamDict(handler, graph_uri="graph", class_uri="Class", **LIST_PARAMS)
+        computed = build_key_for_collection(params)
+        expected = "graph@@Class@@lang=en&page=1##collection"
+        self.assertEqual(computed, expected)
+
+
+class CanonicalParamsTestCase(unittest.TestCase):
+
+    def canonical_params(self, querystring):
+        handler = MockHandler(querystring=querystring)
+        params = ParamDict(handler, context_name="place", class_name="City", **LIST_PARAMS)
+        return build_canonical_params(params)
+
+    def test_defaults_are_dropped(self):
+        self.assertEqual(self.canonical_params(""), "")
+        self.assertEqual(self.canonical_params("lang=pt&expand_uri=0&page=1&per_page=10&sort_order=asc"), "")
+
+    def test_order_of_arguments_does_not_matter(self):
+        self.assertEqual(self.canonical_params("per_page=5&lang=en&page=2"), "lang=en&page=1&per_page=5")
+        self.assertEqual(self.canonical_params("page=2&per_page=5&lang=en"), "lang=en&page=1&per_page=5")
+
+    def test_prefixed_uris_are_expanded(self):
+        expected = "sort_by=http://www.w3.org/2000/01/rdf-schema#label"
+        self.assertEqual(self.canonical_params("sort_by=rdfs:label"), expected)
+        self.assertEqual(self.canonical_params("sort_by=http://www.w3.org/2000/01/rdf-schema%23label"), expected)
+
+    def test_params_of_the_path_are_excluded(self):
+        self.assertEqual(self.canonical_params("graph_uri=http://other/"), "")
+
+    def test_build_key_for_request(self):
+        handler = MockHandler(uri="http://mock.test.com/place/City/", querystring="lang=en")
+        params = ParamDict(handler, context_name="place", class_name="City")
+        self.assertEqual(build_key_for_request(params), "/place/City/@@lang=en##request")
+
+    @patch("brainiak.utils.cache.purge_tags")
+    def test_purge_collections(self, purge_tags):
+        purge_collections([u"http://a/City", u"http://a/Place"])
+        purge_tags.assert_called_with([u"collection@@http://a/City", u"collection@@http://a/Place"])
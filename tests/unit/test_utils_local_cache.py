@@ -0,0 +1,72 @@
+import unittest
+
+from brainiak.utils.local_cache import LocalCache
+
+
+class LocalCacheTestCase(unittest.TestCase):
+
+    def test_get_returns_value_set(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        local_cache.set("key", "value")
+        self.assertEqual(local_cache.get("key"), "value")
+        self.assertEqual(local_cache.get("other"), None)
+        self.assertEqual(local_cache.stats()["hits"], 1)
+        self.assertEqual(local_cache.stats()["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted_by_count(self):
+        local_cache = LocalCache(max_entries=2, max_bytes=1024, ttl=60)
+        local_cache.set("a", "1")
+        local_cache.set("b", "2")
+        local_cache.get("a")
+        local_cache.set("c", "3")
+        self.assertEqual(local_cache.get("b"), None)
+        self.assertEqual(local_cache.get("a"), "1")
+        self.assertEqual(local_cache.get("c"), "3")
+        self.assertEqual(local_cache.evictions, 1)
+
+    def test_entries_are_evicted_by_size(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=10, ttl=60)
+        local_cache.set("a", "1234")
+        local_cache.set("b", "1234")
+        self.assertEqual(local_cache.size, 10)
+        local_cache.set("c", "1")
+        self.assertEqual(local_cache.get("a"), None)
+        self.assertEqual(local_cache.size, 7)
+
+    def test_value_larger_than_cache_is_not_kept(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=10, ttl=60)
+        local_cache.set("a", "1")
+        local_cache.set("big", "12345678901")
+        self.assertEqual(local_cache.get("big"), None)
+        self.assertEqual(local_cache.get("a"), "1")
+
+    def test_expired_entry_is_a_miss(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        local_cache.set("key", "value", now=1000)
+        self.assertEqual(local_cache.get("key", now=1059), "value")
+        self.assertEqual(local_cache.get("key", now=1060), None)
+        self.assertEqual(local_cache.size, 0)
+
+    def test_set_replaces_value_and_size(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        local_cache.set("key", "value")
+        local_cache.set("key", "v")
+        self.assertEqual(local_cache.get("key"), "v")
+        self.assertEqual(local_cache.size, 4)
+
+    def test_delete_and_clear(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        local_cache.set("a", "1")
+        local_cache.set("b", "2")
+        local_cache.delete(["a", "missing"])
+        self.assertEqual(local_cache.get("a"), None)
+        self.assertEqual(local_cache.size, 2)
+        local_cache.clear()
+        self.assertEqual(local_cache.stats()["entries"], 0)
+        self.assertEqual(local_cache.size, 0)
+
+    def test_disabled_cache_keeps_nothing(self):
+        local_cache = LocalCache(max_entries=0, max_bytes=1024, ttl=60)
+        self.assertFalse(local_cache.enabled)
+        local_cache.set("a", "1")
+        self.assertEqual(local_cache.get("a"), None)
@@ -1,3 +1,4 @@
+from copy import copy
 from unittest import TestCase
 from brainiak import settings
 
@@ -109,6 +110,21 @@ class ParamsTestCase(TestCase):
         params = ParamDict(handler, context_name="glb", class_uri="base:Conteudo")
         self.assertEquals(u'http://semantica.globo.com/base/', params.get("class_prefix"))
 
+    def test_copy_does_not_share_changes(self):
+        handler = MockHandler(querystring="lang=en")
+        params = ParamDict(handler, context_name="person", class_name="Person")
+        params.set_aux_param("uniqueness_property", "a")
+        params_copy = copy(params)
+        self.assertEquals(params, params_copy)
+        self.assertEquals(params.base_url, params_copy.base_url)
+
+        params_copy["class_name"] = "Gender"
+        params_copy.set_aux_param("uniqueness_property", "b")
+        params_copy.arguments["lang"] = "pt"
+        self.assertEquals("http://semantica.globo.com/person/Person", params["class_uri"])
+        self.assertEquals("a", params.get_aux_param("uniqueness_property"))
+        self.assertEquals("en", params.arguments["lang"])
+
     def test_has_default_triplestore_config(self):
         handler = MockHandler()
         params = ParamDict(handler)
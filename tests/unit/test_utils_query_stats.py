@@ -0,0 +1,56 @@
+import unittest
+
+from mock import patch
+
+from brainiak.utils import query_stats
+from brainiak.utils.query_stats import Histogram, bucket_index, bucket_lower_bound
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_buckets_contain_their_values(self):
+        for value in [0, 1, 63, 64, 65, 1000, 123456, 10 ** 9]:
+            index = bucket_index(value)
+            self.assertTrue(bucket_lower_bound(index) <= value < bucket_lower_bound(index + 1))
+
+    def test_relative_error_is_bounded(self):
+        for value in [100, 5000, 123456, 10 ** 9]:
+            index = bucket_index(value)
+            width = bucket_lower_bound(index + 1) - bucket_lower_bound(index)
+            self.assertTrue(float(width) / value <= 1.0 / query_stats.SUB_BUCKETS)
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.min, 1)
+        self.assertEqual(histogram.max, 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=500 / query_stats.SUB_BUCKETS)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=990 / query_stats.SUB_BUCKETS)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_empty_histogram(self):
+        summary = Histogram().to_dict()
+        self.assertEqual(summary["count"], 0)
+        self.assertEqual(summary["p99"], None)
+        self.assertEqual(summary["mean"], None)
+
+
+class QueryStatsTestCase(unittest.TestCase):
+
+    def test_get_stats_sorted_by_total_time(self):
+        with patch.dict(query_stats.stats, clear=True):
+            query_stats.record_query("QUERY_FAST", 0.01, 100)
+            query_stats.record_query("QUERY_SLOW", 2.0, 5000)
+            query_stats.record_query("QUERY_FAST", 0.02, 200)
+            query_stats.record_query_error("QUERY_SLOW")
+            query_stats.record_query(None, 0.5)
+            computed = query_stats.get_stats()
+
+        self.assertEqual([item["name"] for item in computed], ["QUERY_SLOW", query_stats.UNNAMED_QUERY, "QUERY_FAST"])
+        self.assertEqual(computed[0]["errors"], 1)
+        self.assertEqual(computed[0]["latency_us"]["max"], 2000000)
+        self.assertEqual(computed[2]["count"], 2)
+        self.assertEqual(computed[2]["response_size_bytes"]["max"], 200)
+        self.assertEqual(computed[1]["response_size_bytes"]["count"], 0)
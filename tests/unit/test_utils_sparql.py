@@ -635,6 +635,25 @@ class LanguageSupportTestCase(TestCase):
         self.assertIn(expected_filter, response_params["lang_filter_label"])
         self.assertEquals("@en", language_tag)
 
+    def test_lang_matches(self):
+        self.assertTrue(lang_matches("pt", "pt"))
+        self.assertTrue(lang_matches("pt-BR", "PT"))
+        self.assertTrue(lang_matches("en", "*"))
+        self.assertTrue(lang_matches("", ""))
+        self.assertFalse(lang_matches("ptx", "pt"))
+        self.assertFalse(lang_matches("en", ""))
+        self.assertFalse(lang_matches("", "*"))
+
+    def test_filter_bindings_by_language(self):
+        bindings = [
+            {"object": {"type": "literal", "xml:lang": "pt", "value": "Gato"}},
+            {"object": {"type": "literal", "xml:lang": "en", "value": "Cat"}},
+            {"object": {"type": "typed-literal", "value": "4"}},
+            {"object": {"type": "uri", "value": "http://dbpedia.org/resource/Cat"}}
+        ]
+        computed = [item["object"]["value"] for item in filter_bindings_by_language(bindings, "en")]
+        self.assertEqual(computed, ["Cat", "4", "http://dbpedia.org/resource/Cat"])
+
 
 class NormalizeTerm(TestCase):
 
@@ -1144,3 +1163,41 @@ class RdfsLabelValidationTestCase(TestCase):
             u"a:property": "a value"
         }
         self.assertFalse(are_there_label_properties_in(instance_data))
+
+
+class SelectBindingsByLanguageTestCase(TestCase):
+
+    def test_bindings_with_required_variable_in_other_language_are_dropped(self):
+        bindings = [
+            {"title": {"type": "literal", "value": "Cidade", "xml:lang": "pt"}},
+            {"title": {"type": "literal", "value": "City", "xml:lang": "en"}},
+            {"title": {"type": "literal", "value": "Town"}}
+        ]
+        selected = select_bindings_by_language(bindings, "pt", ["title"])
+        self.assertEqual([item["title"]["value"] for item in selected], ["Cidade", "Town"])
+
+    def test_all_bindings_are_kept_without_language(self):
+        bindings = [
+            {"title": {"type": "literal", "value": "Cidade", "xml:lang": "pt"}},
+            {"title": {"type": "literal", "value": "City", "xml:lang": "en"}}
+        ]
+        self.assertEqual(select_bindings_by_language(bindings, "", ["title"]), bindings)
+
+    def test_optional_group_in_other_language_is_unbound(self):
+        bindings = [
+            {"predicate": {"type": "uri", "value": "http://ex/place"},
+             "range_label": {"type": "literal", "value": "Place", "xml:lang": "en"},
+             "range_graph": {"type": "uri", "value": "http://ex/"}}
+        ]
+        selected = select_bindings_by_language(bindings, "pt", [], [("range_label", "range_graph")])
+        self.assertEqual(selected, [{"predicate": {"type": "uri", "value": "http://ex/place"}}])
+
+    def test_optional_group_in_the_language_replaces_the_unbound_one(self):
+        predicate = {"type": "uri", "value": "http://ex/place"}
+        bindings = [
+            {"predicate": predicate, "range_label": {"type": "literal", "value": "Place", "xml:lang": "en"}},
+            {"predicate": predicate, "range_label": {"type": "literal", "value": "Lugar", "xml:lang": "pt"}},
+            {"predicate": predicate, "range_label": {"type": "literal", "value": "Local", "xml:lang": "es"}}
+        ]
+        selected = select_bindings_by_language(bindings, "pt", [], [("range_label",)])
+        self.assertEqual(selected, [bindings[1]])
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from brainiak.prefixes import MemorizeContext
+from brainiak.utils.sparql import bindings_to_dict, compress_keys_and_values, filter_values, \
+    get_one_value, get_super_properties
+from brainiak.utils.sparql_result import SparqlResult, decode_sparql_results
+
+
+RESULT_DICT = {
+    "head": {"vars": ["predicate", "title", "super_property", "min"]},
+    "results": {"bindings": [
+        {
+            "predicate": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/name"},
+            "title": {"type": "literal", "xml:lang": "pt", "value": "Nome"}
+        },
+        {
+            "predicate": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/nick"},
+            "title": {"type": "literal", "value": "Apelido"},
+            "super_property": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/name"},
+            "min": {"type": "typed-literal", "datatype": "http://www.w3.org/2001/XMLSchema#integer", "value": "1"}
+        }
+    ]}
+}
+
+RESULT_JSON = '{"head": {"link": [], "vars": ["predicate", "title", "super_property", "min"]},' + \
+    ' "results": {"distinct": false, "ordered": true, "bindings": [' + \
+    '{"predicate": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/name"}, "title": {"type": "literal", "xml:lang": "pt", "value": "Nome"}},' + \
+    '{"predicate": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/nick"}, "title": {"type": "literal", "value": "Apelido"},' + \
+    ' "super_property": {"type": "uri", "value": "http://xmlns.com/foaf/0.1/name"},' + \
+    ' "min": {"type": "typed-literal", "datatype": "http://www.w3.org/2001/XMLSchema#integer", "value": "1"}}]}}'
+
+
+class SparqlResultTestCase(unittest.TestCase):
+
+    maxDiff = None
+
+    def test_from_dict_keeps_columns(self):
+        result = SparqlResult.from_dict(RESULT_DICT)
+        self.assertEqual(result.variables, ["predicate", "title", "super_property", "min"])
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result.column("super_property"), [None, "http://xmlns.com/foaf/0.1/name"])
+        self.assertEqual(result.column("inexistent"), [None, None])
+
+    def test_compatibility_with_dict(self):
+        result = SparqlResult.from_dict(RESULT_DICT)
+        bindings = result["results"]["bindings"]
+        self.assertEqual(len(bindings), 2)
+        self.assertEqual(bindings, RESULT_DICT["results"]["bindings"])
+        self.assertEqual(bindings[1]["min"]["datatype"], "http://www.w3.org/2001/XMLSchema#integer")
+        self.assertEqual(bindings[0]["title"]["xml:lang"], "pt")
+        self.assertNotIn("super_property", bindings[0])
+        self.assertEqual(bindings[0].get("range_graph", {}).get("value", ""), "")
+        self.assertRaises(KeyError, lambda: bindings[0]["super_property"])
+        self.assertEqual(result.get("boolean", False), False)
+        self.assertEqual(result.to_dict()["results"]["bindings"], RESULT_DICT["results"]["bindings"])
+
+    def test_empty_result(self):
+        result = SparqlResult.from_dict({"head": {"vars": ["s"]}, "results": {"bindings": []}})
+        self.assertFalse(result["results"]["bindings"])
+
+    def test_from_json(self):
+        result = SparqlResult.from_json(RESULT_JSON)
+        self.assertEqual(result.variables, ["predicate", "title", "super_property", "min"])
+        self.assertEqual(result.to_dict()["results"]["bindings"], RESULT_DICT["results"]["bindings"])
+
+    def test_decode_ask_response(self):
+        self.assertEqual(decode_sparql_results('{"head": {"link": []}, "boolean": true}'), {"head": {"link": []}, "boolean": True})
+
+    def test_decode_truncated_response(self):
+        self.assertRaises(ValueError, decode_sparql_results, RESULT_JSON[:200])
+
+
+class SparqlResultHelpersTestCase(unittest.TestCase):
+
+    maxDiff = None
+
+    def setUp(self):
+        self.result = SparqlResult.from_dict(RESULT_DICT)
+
+    def test_filter_values(self):
+        self.assertEqual(filter_values(self.result, "super_property"), filter_values(RESULT_DICT, "super_property"))
+
+    def test_get_one_value(self):
+        self.assertEqual(get_one_value(self.result, "title"), "Nome")
+        self.assertEqual(get_one_value(self.result, "inexistent"), False)
+
+    def test_bindings_to_dict(self):
+        computed = bindings_to_dict("predicate", self.result)
+        self.assertEqual(computed, bindings_to_dict("predicate", RESULT_DICT))
+
+    def test_get_super_properties(self):
+        computed = get_super_properties(self.result["results"]["bindings"])
+        self.assertEqual(computed, {"http://xmlns.com/foaf/0.1/name": "http://xmlns.com/foaf/0.1/nick"})
+
+    def test_compress_keys_and_values(self):
+        computed = compress_keys_and_values(self.result, keymap={"predicate": "@id"}, ignore_keys=["min"],
+                                            context=MemorizeContext())
+        expected = compress_keys_and_values(RESULT_DICT, keymap={"predicate": "@id"}, ignore_keys=["min"],
+                                            context=MemorizeContext())
+        self.assertEqual(computed, expected)
+        self.assertEqual(computed[1]["super_property"], "foaf:name")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the cold latency of the class schemas of the sample ontologies (tests/sample) fetched by:
+
+- separate: QUERY_CLASS_SCHEMA, QUERY_SUPERCLASS, QUERY_CARDINALITIES and QUERY_PREDICATE_WITH_LANG
+  (plus QUERY_PREDICATE_WITHOUT_LANG, when there is no predicate in the language)
+- single: QUERY_SCHEMA, in all languages, with the language selected in Python
+- model: the in-memory ontology model (see brainiak.schema.ontology_model)
+
+The cache is disabled, so every schema is computed. It requires Virtuoso and isql, as the integration tests:
+
+    PYTHONPATH=src:. python tools/benchmark_schema.py [--load] [--lang pt] [--repeat 5]
+"""
+import argparse
+import time
+
+from tornado.ioloop import IOLoop
+
+from brainiak import settings, triplestore
+from brainiak.greenlet_tornado import greenlet_set_ioloop, greenlet_spawn
+from brainiak.schema import get_class, ontology_model
+from brainiak.utils import query_stats
+from brainiak.utils.config_parser import parse_section
+from brainiak.utils.params import ParamDict
+from brainiak.utils.sparql import filter_values
+from tests.mocks import MockHandler
+from tests.sparql import ISQL_DOWN, ISQL_UP, copy_ttl_to_virtuoso_dir, run_isql
+
+SAMPLES = [
+    ("http://semantica.globo.com/", "tests/sample/schemas.n3"),
+    ("http://test.graph/animalia/", "tests/sample/animalia.n3"),
+    ("http://test.graph/people/", "tests/sample/people.ttl"),
+    ("http://test.graph/place_and_university/", "tests/sample/place_and_university.n3"),
+    ("http://test.graph/sports/", "tests/sample/sports.n3"),
+]
+MODES = ("separate", "single", "model")
+
+QUERY_CLASSES = u"""
+SELECT DISTINCT ?class
+FROM <%(graph_uri)s>
+WHERE { ?class a owl:Class . FILTER (!isBlank(?class)) }
+"""
+
+
+def load_samples():
+    for (graph_uri, fixture) in SAMPLES:
+        fixture_file = copy_ttl_to_virtuoso_dir(fixture)
+        run_isql(ISQL_DOWN % {"graph": graph_uri})
+        run_isql(ISQL_UP % {"ttl": fixture_file, "graph": graph_uri})
+
+
+def list_classes(graph_uri, triplestore_config):
+    result = triplestore.query_sparql(QUERY_CLASSES % {"graph_uri": graph_uri}, triplestore_config, async=False)
+    return filter_values(result, "class")
+
+
+def build_params(graph_uri, class_uri, lang):
+    querystring = "graph_uri={0}&class_uri={1}&lang={2}".format(graph_uri, class_uri, lang)
+    return ParamDict(MockHandler(querystring=querystring), context_name="_", class_name="_")
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def run_mode(mode, schemas, lang, repeat):
+    settings.SCHEMA_SINGLE_QUERY = mode == "single"
+    query_stats.stats.clear()
+    latencies = []
+    for _ in range(repeat):
+        for (graph_uri, class_uri) in schemas:
+            params = build_params(graph_uri, class_uri, lang)
+            start = time.time()
+            get_class.get_schema(params)
+            latencies.append((time.time() - start) * 1000)
+    queries = sum(item["count"] for item in query_stats.get_stats())
+    return {
+        "mode": mode,
+        "schemas": len(latencies),
+        "median_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "queries_per_schema": float(queries) / max(len(latencies), 1)
+    }
+
+
+def benchmark(schemas, model, lang, repeat):
+    reports = []
+    for mode in MODES:
+        if mode == "model" and model is None:
+            continue
+        ontology_model._model = model if mode == "model" else None
+        reports.append(run_mode(mode, schemas, lang, repeat))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold class schema latency per schema-fetch mode")
+    parser.add_argument("--load", action="store_true", help="load tests/sample into Virtuoso first (isql)")
+    parser.add_argument("--lang", default="pt")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # the samples, their classes and the model are loaded without greenlets, before the IOLoop starts
+    triplestore_config = parse_section()
+    if args.load:
+        load_samples()
+    settings.ENABLE_CACHE = False
+    ontology_model.load_ontology_model(triplestore_config=triplestore_config)
+    model = ontology_model._model
+    schemas = [(graph_uri, class_uri) for (graph_uri, fixture) in SAMPLES
+               for class_uri in list_classes(graph_uri, triplestore_config)]
+
+    io_loop = IOLoop.instance()
+    greenlet_set_ioloop(io_loop)
+    reports = []
+
+    def run():
+        try:
+            reports.extend(benchmark(schemas, model, args.lang, args.repeat))
+        finally:
+            io_loop.add_callback(io_loop.stop)
+
+    io_loop.add_callback(lambda: greenlet_spawn(run))
+    io_loop.start()
+    for report in reports:
+        print("{mode:>8}: {schemas} schemas, median {median_ms:.1f} ms, p90 {p90_ms:.1f} ms, "
+              "{queries_per_schema:.1f} queries per schema".format(**report))
+
+
+if __name__ == "__main__":
+    main()